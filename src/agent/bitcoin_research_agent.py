@@ -115,6 +115,8 @@ class BitcoinResearchAgent:
         # 初始化各个模块
         self.feature_engineer = FeatureEngineer(verbose=False)
         self.market_regime = MarketRegimeIdentifier(n_regimes=4, method='kmeans', verbose=False)
+        # 市场状态模型在多次运行间复用（数据漂移时热启动重新训练）
+        self.regime_model_path = 'data/models/market_regime_kmeans.pkl'
         self.volatility_analyzer = VolatilityAnalyzer(verbose=False)
         self.sentiment_analyzer = SentimentAnalyzer(verbose=False)
         self.capital_analyzer = CapitalFlowAnalyzer(verbose=False)
@@ -244,8 +246,8 @@ class BitcoinResearchAgent:
         try:
             df = state['processed_data']
             
-            # 市场状态识别
-            df_regime = self.market_regime.fit(df, method='kmeans')
+            # 市场状态识别（优先复用已保存的模型）
+            df_regime = self.market_regime.fit_or_load(df, method='kmeans', model_path=self.regime_model_path)
             regime_stats = self.market_regime.analyze_regime_characteristics(df_regime)
             
             state['regime_analysis'] = {
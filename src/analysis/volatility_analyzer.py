@@ -2,8 +2,8 @@
 Bitcoin Research Agent - 波动率与流动性分析
 
 功能：
-1. 历史波动率分析（实际波动率）
-2. GARCH模型预测波动率
+1. 历史波动率分析（实际波动率；Parkinson / Garman-Klass / Rogers-Satchell / Yang-Zhang OHLC 估计）
+2. GARCH模型预测波动率（含滚动 / 扩张窗口重新拟合的样本外预测；GARCH / GJR / EGARCH × 阶数 × 分布的并行模型选择）
 3. 流动性指标分析
 4. 波动率锥形图（Volatility Cone）
 5. 结合市场状态的波动率分析
@@ -12,8 +12,14 @@ Bitcoin Research Agent - 波动率与流动性分析
 日期：2025-10-25
 """
 
+import os
+import json
+import time
+import hashlib
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from scipy import stats
 from arch import arch_model
@@ -21,19 +27,132 @@ import warnings
 warnings.filterwarnings('ignore')
 
 
+# OHLC 估计量 -> 输出列前缀
+OHLC_ESTIMATORS = {
+    'parkinson': 'ParkinsonVol',
+    'garman_klass': 'GKVol',
+    'rogers_satchell': 'RSVol',
+    'yang_zhang': 'YZVol',
+}
+
+
+# ==================== 滚动GARCH（进程池任务） ====================
+
+# 进程内共享的数据（由 _init_garch_worker 设置，每个进程只接收一次）
+_GARCH_DATA: Dict = {}
+
+
+def _init_garch_worker(returns: np.ndarray, spec: Dict):
+    _GARCH_DATA.update({'returns': returns, 'spec': spec})
+
+
+def _garch_model(returns: np.ndarray, spec: Dict):
+    return arch_model(returns, mean=spec['mean'], vol=spec['vol'], p=spec['p'], o=spec['o'],
+                      q=spec['q'], dist=spec['dist'], rescale=False)
+
+
+def _garch_block(windows: List[Dict]) -> List[Dict]:
+    """
+    按顺序拟合一组连续的窗口：缓存命中的窗口直接用缓存参数，其余以前一个窗口的参数为初值热启动
+
+    Args:
+        windows: [{'train_start', 'train_end', 'test_end', 'params'（缓存参数或 None）}]，行号，左闭右开
+
+    Returns:
+        各窗口的参数和样本外一步预测的条件波动率（收益率 ×100 的单位）
+    """
+    returns, spec = _GARCH_DATA['returns'], _GARCH_DATA['spec']
+    results = []
+    previous = None
+    for window in windows:
+        start = time.perf_counter()
+        train = returns[window['train_start']:window['train_end']]
+        params, converged, cached = window['params'], True, window['params'] is not None
+        if params is None:
+            model = _garch_model(train, spec)
+            try:
+                fit = model.fit(disp='off', starting_values=previous if spec['warm_start'] else None)
+            except (ValueError, np.linalg.LinAlgError):
+                fit = model.fit(disp='off')
+            params, converged = fit.params.to_numpy(), fit.convergence_flag == 0
+        previous = np.asarray(params, dtype=np.float64)
+
+        # 参数固定，在训练 + 测试段上递推：t 时刻的条件波动率只用到 t-1 及之前的收益
+        fixed = _garch_model(returns[window['train_start']:window['test_end']], spec).fix(previous)
+        n_train = window['train_end'] - window['train_start']
+        results.append({
+            **window,
+            'params': previous.tolist(),
+            'param_names': list(fixed.params.index),
+            'forecast': np.asarray(fixed.conditional_volatility)[n_train:],
+            'converged': bool(converged),
+            'cached': cached,
+            'seconds': time.perf_counter() - start,
+        })
+    return results
+
+
+# 模型族 -> (arch_model 的 vol 参数, 非对称项阶数 o)
+GARCH_FAMILIES = {
+    'GARCH': ('GARCH', 0),
+    'GJR': ('GARCH', 1),
+    'EGARCH': ('EGARCH', 1),
+}
+
+
+# select_garch 最优模型的默认保存路径（full_analysis 从这里读取模型设定）
+GARCH_MODEL_PATH = 'data/models/garch_model.json'
+
+
+def _qlike(returns: np.ndarray, variance: np.ndarray) -> float:
+    """QLIKE 损失（以 r² 为实际方差代理）：mean(log h + r² / h)"""
+    return float(np.mean(np.log(variance) + returns ** 2 / variance))
+
+
+def _garch_select_worker(task: Dict) -> Dict:
+    """
+    拟合一个候选模型（进程池任务）：前 n - test_size 行拟合，最后 test_size 行参数固定做一步预测计算 QLIKE
+    """
+    returns = _GARCH_DATA['returns']
+    n_train = len(returns) - task['test_size']
+    result = {k: task[k] for k in ('family', 'vol', 'p', 'o', 'q', 'dist')}
+    start = time.perf_counter()
+    try:
+        fit = _garch_model(returns[:n_train], task).fit(disp='off')
+        fixed = _garch_model(returns, task).fix(fit.params.to_numpy())
+        variance = np.asarray(fixed.conditional_volatility)[n_train:] ** 2
+        result.update({
+            'log_likelihood': fit.loglikelihood,
+            'aic': fit.aic,
+            'bic': fit.bic,
+            'qlike': _qlike(returns[n_train:], variance),
+            'converged': fit.convergence_flag == 0,
+        })
+    except (ValueError, np.linalg.LinAlgError) as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
 class VolatilityAnalyzer:
     """波动率与流动性分析器"""
     
-    def __init__(self, verbose: bool = True):
+    def __init__(self, verbose: bool = True, garch_path: Optional[str] = GARCH_MODEL_PATH):
         """
         初始化分析器
         
         Args:
             verbose: 是否打印详细信息
+            garch_path: GARCH 最优模型保存路径（select_garch 写入，full_analysis 读取；None 表示不持久化）
         """
         self.verbose = verbose
+        self.garch_path = garch_path
         self.garch_model = None
         self.garch_forecast = None
+        self.garch_spec: Optional[Dict] = None
+        self.garch_selection: Optional[pd.DataFrame] = None
+        self.garch_param_cache: Dict[str, Dict] = {}
+        self.rolling_params: Optional[pd.DataFrame] = None
     
     def log(self, message: str):
         """打印日志"""
@@ -77,39 +196,123 @@ class VolatilityAnalyzer:
         
         return df
     
-    def calculate_parkinson_volatility(self, df: pd.DataFrame, window: int = 30) -> pd.DataFrame:
+    @staticmethod
+    def _ohlc_columns(df: pd.DataFrame) -> Dict[str, str]:
+        """OHLC 列名（优先 market_ 前缀）"""
+        return {name: f'market_{name}' if f'market_{name}' in df.columns else name
+                for name in ('Open', 'High', 'Low', 'Close')}
+    
+    @staticmethod
+    def ohlc_log_terms(df: pd.DataFrame) -> pd.DataFrame:
         """
-        计算Parkinson波动率（基于高低价）
+        各估计量共用的逐根对数价格项（只计算一次）
+        
+        Args:
+            df: 包含 Open/High/Low/Close（或 market_ 前缀）列的DataFrame
+        
+        Returns:
+            DataFrame (index 与 df 相同):
+                hl2: ln(H/L)²；co2: ln(C/O)²；rs: ln(H/C)·ln(H/O) + ln(L/C)·ln(L/O)；
+                overnight: ln(O/前收)；oc: ln(C/O)
+        """
+        cols = VolatilityAnalyzer._ohlc_columns(df)
+        log_o, log_h, log_l, log_c = (np.log(df[cols[name]].to_numpy(dtype=np.float64))
+                                      for name in ('Open', 'High', 'Low', 'Close'))
+        hl = log_h - log_l
+        oc = log_c - log_o
+        overnight = np.empty_like(log_o)
+        overnight[0] = np.nan
+        overnight[1:] = log_o[1:] - log_c[:-1]
+        return pd.DataFrame({
+            'hl2': hl ** 2,
+            'co2': oc ** 2,
+            'rs': (log_h - log_c) * (log_h - log_o) + (log_l - log_c) * (log_l - log_o),
+            'overnight': overnight,
+            'oc': oc,
+        }, index=df.index)
+    
+    def calculate_ohlc_volatility(self,
+                                  df: pd.DataFrame,
+                                  windows: List[int] = [30],
+                                  estimators: Tuple[str, ...] = tuple(OHLC_ESTIMATORS),
+                                  periods_per_year: int = 252) -> pd.DataFrame:
+        """
+        OHLC 波动率估计（对数价格项只算一次，各窗口用滚动均值 / 方差向量化计算）
+        
+        Parkinson:        σ² = mean(ln(H/L)²) / (4 ln2)
+        Garman-Klass:     σ² = 0.5·mean(ln(H/L)²) − (2 ln2 − 1)·mean(ln(C/O)²)
+        Rogers-Satchell:  σ² = mean(ln(H/C)·ln(H/O) + ln(L/C)·ln(L/O))
+        Yang-Zhang:       σ² = var(隔夜) + k·var(开收) + (1 − k)·σ²_RS，k = 0.34 / (1.34 + (n+1)/(n−1))
         
         Args:
             df: 输入DataFrame
-            window: 计算窗口
+            windows: 计算窗口列表
+            estimators: 估计量（parkinson / garman_klass / rogers_satchell / yang_zhang）
+            periods_per_year: 年化因子（日线 252；分钟线按实际每年K线数）
         
         Returns:
-            添加了Parkinson波动率的DataFrame
+            添加了 <前缀>_<window>d 列的DataFrame（前缀见 OHLC_ESTIMATORS）
         """
-        self.log("计算Parkinson波动率...")
-        df = df.copy()
+        unknown = set(estimators) - set(OHLC_ESTIMATORS)
+        if unknown:
+            raise ValueError(f"未知的波动率估计量: {sorted(unknown)}")
         
-        # 确保列名
-        high_col = 'market_High' if 'market_High' in df.columns else 'High'
-        low_col = 'market_Low' if 'market_Low' in df.columns else 'Low'
+        self.log(f"计算OHLC波动率 ({', '.join(estimators)})...")
+        df = df.copy()
         
-        if high_col not in df.columns or low_col not in df.columns:
-            self.log("警告: 缺少High或Low列")
+        cols = self._ohlc_columns(df)
+        needed = ['High', 'Low'] if set(estimators) == {'parkinson'} else ['Open', 'High', 'Low', 'Close']
+        missing = [cols[name] for name in needed if cols[name] not in df.columns]
+        if missing:
+            self.log(f"警告: 缺少列 {missing}")
             return df
         
-        # Parkinson公式: sqrt(1/(4*ln(2)) * (ln(High/Low))^2)
-        hl_ratio = np.log(df[high_col] / df[low_col])
-        parkinson_vol = hl_ratio.rolling(window=window).apply(
-            lambda x: np.sqrt(np.mean(x**2) / (4 * np.log(2))) * np.sqrt(252)
-        )
+        if set(estimators) == {'parkinson'}:
+            # 只需高低价
+            hl = np.log(df[cols['High']].to_numpy(dtype=np.float64) / df[cols['Low']].to_numpy(dtype=np.float64))
+            terms = pd.DataFrame({'hl2': hl ** 2}, index=df.index)
+        else:
+            terms = self.ohlc_log_terms(df)
+        
+        annual = np.sqrt(periods_per_year)
+        new_cols = {}
+        with np.errstate(invalid='ignore'):
+            for window in windows:
+                means = terms.rolling(window=window).mean()
+                if 'parkinson' in estimators:
+                    new_cols[f"{OHLC_ESTIMATORS['parkinson']}_{window}d"] = \
+                        np.sqrt(means['hl2'] / (4 * np.log(2))) * annual
+                if 'garman_klass' in estimators:
+                    new_cols[f"{OHLC_ESTIMATORS['garman_klass']}_{window}d"] = \
+                        np.sqrt(0.5 * means['hl2'] - (2 * np.log(2) - 1) * means['co2']) * annual
+                if 'rogers_satchell' in estimators:
+                    new_cols[f"{OHLC_ESTIMATORS['rogers_satchell']}_{window}d"] = np.sqrt(means['rs']) * annual
+                if 'yang_zhang' in estimators:
+                    variances = terms[['overnight', 'oc']].rolling(window=window).var()
+                    k = 0.34 / (1.34 + (window + 1) / (window - 1)) if window > 1 else 0.0
+                    new_cols[f"{OHLC_ESTIMATORS['yang_zhang']}_{window}d"] = np.sqrt(
+                        variances['overnight'] + k * variances['oc'] + (1 - k) * means['rs']) * annual
+        
+        for col, values in new_cols.items():
+            df[col] = values
+        
+        self.log(f"  计算了 {len(windows)} 个窗口 × {len(estimators)} 个估计量")
         
-        df[f'ParkinsonVol_{window}d'] = parkinson_vol
+        return df
+    
+    def calculate_parkinson_volatility(self, df: pd.DataFrame, window: int = 30) -> pd.DataFrame:
+        """
+        计算Parkinson波动率（基于高低价）
         
-        self.log(f"  计算了 {window} 天窗口的Parkinson波动率")
+        Args:
+            df: 输入DataFrame
+            window: 计算窗口
         
-        return df
+        Returns:
+            添加了Parkinson波动率的DataFrame
+        """
+        # Parkinson公式: sqrt(1/(4*ln(2)) * mean((ln(High/Low))^2))
+        return self.calculate_ohlc_volatility(df, windows=[window], estimators=('parkinson',))
     
     def calculate_garman_klass_volatility(self, df: pd.DataFrame, window: int = 30) -> pd.DataFrame:
         """
@@ -122,29 +325,7 @@ class VolatilityAnalyzer:
         Returns:
             添加了GK波动率的DataFrame
         """
-        self.log("计算Garman-Klass波动率...")
-        df = df.copy()
-        
-        # 确保列名
-        high_col = 'market_High' if 'market_High' in df.columns else 'High'
-        low_col = 'market_Low' if 'market_Low' in df.columns else 'Low'
-        open_col = 'market_Open' if 'market_Open' in df.columns else 'Open'
-        close_col = 'market_Close' if 'market_Close' in df.columns else 'Close'
-        
-        # GK公式
-        log_hl = np.log(df[high_col] / df[low_col])
-        log_co = np.log(df[close_col] / df[open_col])
-        
-        gk_vol = np.sqrt(
-            0.5 * log_hl.rolling(window=window).apply(lambda x: np.mean(x**2)) -
-            (2 * np.log(2) - 1) * log_co.rolling(window=window).apply(lambda x: np.mean(x**2))
-        ) * np.sqrt(252)
-        
-        df[f'GKVol_{window}d'] = gk_vol
-        
-        self.log(f"  计算了 {window} 天窗口的GK波动率")
-        
-        return df
+        return self.calculate_ohlc_volatility(df, windows=[window], estimators=('garman_klass',))
     
     # ==================== GARCH模型 ====================
     
@@ -152,7 +333,10 @@ class VolatilityAnalyzer:
                   df: pd.DataFrame,
                   return_col: str = 'Return',
                   p: int = 1,
-                  q: int = 1) -> Dict:
+                  q: int = 1,
+                  o: int = 0,
+                  vol: str = 'Garch',
+                  dist: str = 'normal') -> Dict:
         """
         拟合GARCH模型
         
@@ -161,11 +345,15 @@ class VolatilityAnalyzer:
             return_col: 收益率列名
             p: GARCH(p,q)的p参数
             q: GARCH(p,q)的q参数
+            o: 非对称项阶数（GJR / EGARCH）
+            vol: 波动率模型（Garch / EGARCH）
+            dist: 残差分布（normal / t / skewt）
         
         Returns:
             模型拟合结果字典
         """
-        self.log(f"拟合GARCH({p},{q})模型...")
+        self.log(f"拟合{vol}({p},{q})模型..." if o == 0 and dist == 'normal'
+                 else f"拟合{vol}({p},{o},{q}) [{dist}] 模型...")
         
         # 确保列名
         if f'market_{return_col}' in df.columns:
@@ -179,7 +367,7 @@ class VolatilityAnalyzer:
         returns = df[return_col].dropna() * 100
         
         # 拟合GARCH模型
-        model = arch_model(returns, vol='Garch', p=p, q=q, rescale=False)
+        model = arch_model(returns, vol=vol, p=p, o=o, q=q, dist=dist, rescale=False)
         self.garch_model = model.fit(disp='off')
         
         self.log("  GARCH模型拟合完成")
@@ -213,7 +401,12 @@ class VolatilityAnalyzer:
         self.log(f"预测未来 {horizon} 天波动率...")
         
         # 预测
-        forecast = self.garch_model.forecast(horizon=horizon, reindex=False)
+        try:
+            forecast = self.garch_model.forecast(horizon=horizon, reindex=False)
+        except ValueError:
+            # EGARCH 等没有多步解析预测，改用模拟
+            forecast = self.garch_model.forecast(horizon=horizon, reindex=False, method='simulation',
+                                                 simulations=1000)
         
         # 提取波动率预测
         vol_forecast = np.sqrt(forecast.variance.values[-1, :]) / 100  # 转回比例
@@ -230,6 +423,307 @@ class VolatilityAnalyzer:
         
         return self.garch_forecast
     
+    # ==================== GARCH模型选择 ====================
+    
+    def select_garch(self,
+                     df: pd.DataFrame,
+                     return_col: str = 'Return',
+                     families: Tuple[str, ...] = tuple(GARCH_FAMILIES),
+                     orders: Tuple[Tuple[int, int], ...] = ((1, 1), (1, 2), (2, 1), (2, 2)),
+                     dists: Tuple[str, ...] = ('normal', 't', 'skewt'),
+                     test_size: int = 250,
+                     criterion: str = 'qlike',
+                     processes: Optional[int] = None,
+                     save_path: Optional[str] = None) -> pd.DataFrame:
+        """
+        GARCH 族模型选择：各候选模型在进程池中并行拟合，按 AIC / BIC / 样本外 QLIKE 排序
+        
+        每个候选模型用前 n - test_size 行拟合，最后 test_size 行参数固定做一步预测计算 QLIKE。
+        按 criterion 选出的最优模型在全部数据上重新拟合，设为 forecast_garch 使用的模型；
+        并保存其设定和参数（load_garch 可恢复，full_analysis 按保存的设定拟合）。
+        
+        Args:
+            df: 输入DataFrame
+            return_col: 收益率列名
+            families: 模型族（GARCH / GJR / EGARCH）
+            orders: (p, q) 阶数列表
+            dists: 残差分布列表（normal / t / skewt）
+            test_size: 样本外评估长度（行）
+            criterion: 选择标准（aic / bic / qlike，均为越小越好）
+            processes: 进程数（None 表示 CPU 核数）
+            save_path: 最优模型保存路径（JSON；None 表示 self.garch_path）
+        
+        Returns:
+            各候选模型一行，按 criterion 升序：family, vol, p, o, q, dist, log_likelihood, aic, bic, qlike,
+            converged, seconds, rank_aic, rank_bic, rank_qlike
+        """
+        if criterion not in ('aic', 'bic', 'qlike'):
+            raise ValueError(f"未知的选择标准: {criterion}")
+        unknown = set(families) - set(GARCH_FAMILIES)
+        if unknown:
+            raise ValueError(f"未知的模型族: {sorted(unknown)}")
+        
+        if f'market_{return_col}' in df.columns:
+            return_col = f'market_{return_col}'
+        
+        if return_col not in df.columns:
+            self.log(f"错误: 列 {return_col} 不存在")
+            return pd.DataFrame()
+        
+        returns = df[return_col].dropna().to_numpy(dtype=np.float64) * 100
+        if len(returns) <= 2 * test_size:
+            self.log(f"错误: 数据不足，需要多于 {2 * test_size} 行")
+            return pd.DataFrame()
+        
+        tasks = [{'family': family, 'mean': 'Constant', 'vol': GARCH_FAMILIES[family][0],
+                  'p': p, 'o': GARCH_FAMILIES[family][1], 'q': q, 'dist': dist, 'test_size': test_size}
+                 for family in families for p, q in orders for dist in dists]
+        processes = min(processes or os.cpu_count() or 1, len(tasks))
+        self.log(f"GARCH模型选择: {len(tasks)} 个模型，{processes} 个进程")
+        start = time.perf_counter()
+        
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_garch_worker,
+                                     initargs=(returns, None)) as pool:
+                runs = list(pool.map(_garch_select_worker, tasks))
+        else:
+            _init_garch_worker(returns, None)
+            runs = [_garch_select_worker(task) for task in tasks]
+        
+        table = pd.DataFrame(runs)
+        failed = table['error'].notna().sum() if 'error' in table.columns else 0
+        ok = table.dropna(subset=[criterion]) if criterion in table.columns else table.iloc[0:0]
+        if ok.empty:
+            self.log("错误: 所有候选模型拟合失败")
+            return table
+        for metric in ('aic', 'bic', 'qlike'):
+            table[f'rank_{metric}'] = table[metric].rank(method='min')
+        table = table.sort_values(criterion).reset_index(drop=True)
+        self.garch_selection = table
+        
+        best = table.iloc[0]
+        self.log(f"  完成，{time.perf_counter() - start:.2f}s（逐模型合计 {table['seconds'].sum():.2f}s），失败 {failed} 个")
+        self.log(f"  最优 ({criterion}): {best['family']}({best['p']},{best['o']},{best['q']}) [{best['dist']}]，"
+                 f"AIC {best['aic']:.2f}，BIC {best['bic']:.2f}，QLIKE {best['qlike']:.4f}")
+        
+        # 最优模型在全部数据上重新拟合，供 forecast_garch 使用
+        self.garch_spec = {'vol': best['vol'], 'p': int(best['p']), 'o': int(best['o']),
+                           'q': int(best['q']), 'dist': best['dist']}
+        self.fit_garch(df, return_col=return_col, **self.garch_spec)
+        save_path = save_path or self.garch_path
+        if save_path:
+            self.save_garch(save_path, selection={'criterion': criterion, 'family': best['family'],
+                                                  'aic': float(best['aic']), 'bic': float(best['bic']),
+                                                  'qlike': float(best['qlike'])})
+        
+        return table
+    
+    def save_garch(self, path: str, selection: Optional[Dict] = None):
+        """
+        保存当前GARCH模型的设定和参数（JSON，原子写入）
+        
+        Args:
+            path: 保存路径
+            selection: 附加的模型选择信息
+        """
+        if self.garch_model is None:
+            raise ValueError("请先拟合GARCH模型")
+        spec = self.garch_spec or {'vol': 'Garch', 'p': 1, 'o': 0, 'q': 1, 'dist': 'normal'}
+        state = {
+            'spec': spec,
+            'params': self.garch_model.params.tolist(),
+            'param_names': list(self.garch_model.params.index),
+            'selection': selection,
+            'saved_at': pd.Timestamp.now().isoformat(),
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, path)
+        self.log(f"  GARCH模型已保存: {path}")
+    
+    def load_garch_spec(self, path: Optional[str] = None) -> Optional[Dict]:
+        """
+        读取 save_garch 保存的模型设定（不含参数），设为 fit_garch 的默认设定
+        
+        Args:
+            path: 保存路径（None 表示 self.garch_path）
+        
+        Returns:
+            模型设定；文件不存在时为 None
+        """
+        path = path or self.garch_path
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            self.garch_spec = json.load(f)['spec']
+        self.log(f"  使用已保存的GARCH模型设定: {self.garch_spec}")
+        return self.garch_spec
+    
+    def load_garch(self, df: pd.DataFrame, path: str, return_col: str = 'Return') -> bool:
+        """
+        加载 save_garch 保存的模型：在 df 的收益率上以固定参数重建，之后可直接 forecast_garch
+        
+        Args:
+            df: 输入DataFrame（预测从其最后一行开始）
+            path: 保存路径
+            return_col: 收益率列名
+        
+        Returns:
+            是否加载成功
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        
+        if f'market_{return_col}' in df.columns:
+            return_col = f'market_{return_col}'
+        returns = df[return_col].dropna() * 100
+        
+        self.garch_spec = state['spec']
+        model = arch_model(returns, rescale=False, **self.garch_spec)
+        self.garch_model = model.fix(state['params'])
+        self.log(f"  已加载GARCH模型: {self.garch_spec}")
+        return True
+    
+    # ==================== 滚动GARCH ====================
+    
+    @staticmethod
+    def garch_fingerprint(returns: np.ndarray, spec: Dict) -> str:
+        """参数缓存键：窗口收益率内容哈希 + 模型设定"""
+        digest = hashlib.sha1(json.dumps({k: spec[k] for k in ('mean', 'vol', 'p', 'o', 'q', 'dist')},
+                                         sort_keys=True).encode())
+        digest.update(np.ascontiguousarray(returns, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+    
+    def _load_param_cache(self, cache_path: Optional[str]):
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self.garch_param_cache.update(json.load(f))
+            except (OSError, ValueError):
+                self.log(f"警告: 无法读取参数缓存 {cache_path}")
+    
+    def _save_param_cache(self, cache_path: Optional[str]):
+        if not cache_path:
+            return
+        path = Path(cache_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.garch_param_cache, f)
+        os.replace(tmp_path, path)
+    
+    def rolling_garch(self,
+                      df: pd.DataFrame,
+                      return_col: str = 'Return',
+                      window: Optional[int] = None,
+                      min_train: int = 500,
+                      step: int = 20,
+                      p: int = 1,
+                      q: int = 1,
+                      o: int = 0,
+                      vol: str = 'GARCH',
+                      dist: str = 'normal',
+                      mean: str = 'Constant',
+                      warm_start: bool = True,
+                      processes: Optional[int] = None,
+                      cache_path: Optional[str] = None) -> pd.DataFrame:
+        """
+        滚动 / 扩张窗口GARCH样本外预测
+        
+        每 step 行重新拟合一次（window=None 为扩张窗口，否则为长度 window 的滚动窗口），
+        参数在之后 step 行内固定，每行的条件波动率是用前一行及之前的收益做的一步预测。
+        连续的窗口按进程分块，块内以前一个窗口的参数为初值；拟合参数按窗口数据指纹缓存。
+        
+        Args:
+            df: 输入DataFrame
+            return_col: 收益率列名
+            window: 滚动窗口长度（None 表示扩张窗口）
+            min_train: 第一个窗口的训练长度
+            step: 重新拟合间隔（行）
+            p, q, o: GARCH(p,o,q) 阶数（o 为非对称项阶数）
+            vol: 波动率模型（arch_model 的 vol 参数）
+            dist: 残差分布
+            mean: 均值模型
+            warm_start: 是否以前一个窗口的参数为初值
+            processes: 进程数（None 表示 CPU 核数；1 表示在当前进程顺序拟合）
+            cache_path: 参数缓存 JSON 路径（None 表示只在本对象内缓存）
+        
+        Returns:
+            DataFrame (样本外各行): return, forecast_volatility（一步预测的日波动率，比例）, window
+        """
+        if f'market_{return_col}' in df.columns:
+            return_col = f'market_{return_col}'
+        
+        if return_col not in df.columns:
+            self.log(f"错误: 列 {return_col} 不存在")
+            return pd.DataFrame()
+        
+        series = df[return_col].dropna()
+        returns = series.to_numpy(dtype=np.float64) * 100
+        train_size = window or min_train
+        if len(returns) <= train_size:
+            self.log(f"错误: 数据不足，需要多于 {train_size} 行")
+            return pd.DataFrame()
+        
+        spec = {'mean': mean, 'vol': vol, 'p': p, 'o': o, 'q': q, 'dist': dist, 'warm_start': warm_start}
+        self._load_param_cache(cache_path)
+        
+        windows = []
+        for train_end in range(train_size, len(returns), step):
+            train_start = 0 if window is None else train_end - window
+            key = self.garch_fingerprint(returns[train_start:train_end], spec)
+            cached = self.garch_param_cache.get(key)
+            windows.append({'train_start': train_start, 'train_end': train_end,
+                            'test_end': min(train_end + step, len(returns)), 'key': key,
+                            'params': None if cached is None else cached['params']})
+        
+        processes = min(processes or os.cpu_count() or 1, len(windows))
+        blocks = [[windows[i] for i in block]
+                  for block in np.array_split(np.arange(len(windows)), processes) if len(block)]
+        n_cached = sum(w['params'] is not None for w in windows)
+        self.log(f"滚动{vol}({p},{o},{q}): {len(windows)} 个窗口 "
+                 f"({'扩张' if window is None else f'滚动 {window}'}, step={step}), "
+                 f"缓存命中 {n_cached}，{processes} 个进程")
+        start = time.perf_counter()
+        
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_garch_worker,
+                                     initargs=(returns, spec)) as pool:
+                results = [r for block in pool.map(_garch_block, blocks) for r in block]
+        else:
+            _init_garch_worker(returns, spec)
+            results = [r for block in blocks for r in _garch_block(block)]
+        
+        for r in results:
+            self.garch_param_cache[r['key']] = {'params': r['params'], 'param_names': r['param_names']}
+        self._save_param_cache(cache_path)
+        
+        forecast = np.concatenate([r['forecast'] for r in results]) / 100
+        window_ids = np.repeat(np.arange(len(results)), [r['test_end'] - r['train_end'] for r in results])
+        oos_index = series.index[train_size:]
+        output = pd.DataFrame({
+            'return': series.iloc[train_size:].to_numpy(),
+            'forecast_volatility': forecast,
+            'window': window_ids,
+        }, index=oos_index)
+        
+        self.rolling_params = pd.DataFrame([
+            {'window': i, 'train_start': series.index[r['train_start']], 'train_end': series.index[r['train_end'] - 1],
+             **dict(zip(r['param_names'], r['params'])),
+             'converged': r['converged'], 'cached': r['cached'], 'seconds': r['seconds']}
+            for i, r in enumerate(results)
+        ])
+        
+        self.log(f"  完成，{time.perf_counter() - start:.2f}s，样本外 {len(output)} 行，"
+                 f"未收敛 {int((~self.rolling_params['converged']).sum())} 个窗口")
+        
+        return output
+    
     # ==================== 流动性分析 ====================
     
     def calculate_liquidity_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -413,14 +907,15 @@ class VolatilityAnalyzer:
         
         # 1. 计算各种波动率
         df = self.calculate_realized_volatility(df)
-        df = self.calculate_parkinson_volatility(df)
-        df = self.calculate_garman_klass_volatility(df)
+        df = self.calculate_ohlc_volatility(df)
         
         # 2. 流动性指标
         df = self.calculate_liquidity_metrics(df)
         
-        # 3. GARCH模型
-        garch_results = self.fit_garch(df)
+        # 3. GARCH模型（优先使用 select_garch 保存的最优设定）
+        if self.garch_spec is None:
+            self.load_garch_spec()
+        garch_results = self.fit_garch(df, **(self.garch_spec or {}))
         if garch_results:
             df['GARCH_ConditionalVol'] = np.nan
             df.loc[garch_results['conditional_volatility'].index, 'GARCH_ConditionalVol'] = \
@@ -100,6 +100,7 @@ def get_latest_metrics(df):
         # 市场状态
         'regime': latest.get('market_regime_name', 'Unknown'),
         'regime_cn': latest.get('market_regime_cn', '未知'),
+        'regime_confidence': latest.get('market_regime_confidence', np.nan),
         
         # 波动率
         'volatility': latest.get('RealizedVol_30d', 0) * 100,
@@ -338,7 +339,9 @@ def show_market_regime(df, metrics):
     """显示市场状态分析"""
     st.header("📈 市场状态分析")
     
-    st.info(f"🎯 当前市场状态: **{metrics['regime_cn']}** ({metrics['regime']})")
+    confidence = metrics.get('regime_confidence', np.nan)
+    confidence_text = f"，置信度 {confidence:.0%}" if pd.notna(confidence) else ""
+    st.info(f"🎯 当前市场状态: **{metrics['regime_cn']}** ({metrics['regime']}){confidence_text}")
     
     # 状态分布
     col1, col2 = st.columns([1, 1])
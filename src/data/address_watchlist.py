@@ -0,0 +1,173 @@
+"""
+地址观察列表（交易所 / 鲸鱼地址余额监控）
+
+功能：
+1. 批量查询观察列表中的地址余额（单次请求多个地址，分块并发）
+2. 按区块高度缓存余额：高度未变化时不发请求
+3. 每次扫描只返回相对上次扫描发生变化的地址（余额变化量）
+
+缓存文件（JSON）:
+    {
+        "height": 870000,
+        "swept_at": "2024-11-10T08:00:00",
+        "balances": {address: {balance_btc, total_received_btc, total_sent_btc, n_tx}}
+    }
+
+依赖：pandas
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+try:
+    from onchain_collector import OnchainCollector
+except ImportError:
+    from data.onchain_collector import OnchainCollector
+
+
+class AddressWatchlist:
+    """地址观察列表"""
+
+    DELTA_COLUMNS = ['label', 'prev_balance_btc', 'balance_btc', 'delta_btc', 'new_tx']
+
+    def __init__(self,
+                 addresses: Union[List[str], Dict[str, str]],
+                 collector: Optional[OnchainCollector] = None,
+                 cache_path: str = 'data/raw/store/watchlist/balances.json',
+                 chunk_size: int = 100,
+                 max_workers: int = 3,
+                 verbose: bool = True):
+        """
+        初始化
+
+        Args:
+            addresses: 地址列表，或 {地址: 标签}（如 'binance_cold'）
+            collector: 链上数据收集器（默认新建）
+            cache_path: 余额缓存文件
+            chunk_size: 每次请求的地址数
+            max_workers: 并发请求数
+            verbose: 是否打印详细信息
+        """
+        if isinstance(addresses, dict):
+            self.labels = dict(addresses)
+        else:
+            self.labels = {addr: '' for addr in addresses}
+
+        self.collector = collector or OnchainCollector()
+        self.cache_path = Path(cache_path)
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.verbose = verbose
+        self.last_height: Optional[int] = None
+
+    def log(self, message: str):
+        if self.verbose:
+            print(f"[Watchlist] {message}")
+
+    @property
+    def addresses(self) -> List[str]:
+        return list(self.labels)
+
+    # ==================== 缓存 ====================
+
+    def load_cache(self) -> Dict:
+        """读取余额缓存（不存在时返回空缓存）"""
+        if not self.cache_path.exists():
+            return {'height': None, 'swept_at': None, 'balances': {}}
+        with open(self.cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_cache(self, cache: Dict):
+        """原子写入余额缓存"""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    # ==================== 扫描 ====================
+
+    def sweep(self, force: bool = False) -> pd.DataFrame:
+        """
+        扫描观察列表，返回相对上次扫描的余额变化
+
+        区块高度未变化时余额不可能变化，只查询缓存中没有的地址；
+        首次出现的地址只建立基准，不计入变化。
+
+        Args:
+            force: 忽略区块高度缓存，重新查询全部地址
+
+        Returns:
+            DataFrame (index=address) with label, prev_balance_btc, balance_btc,
+            delta_btc, new_tx（按变化量绝对值降序）
+        """
+        cache = self.load_cache()
+        previous = cache.get('balances', {})
+        height = self.collector.get_block_height()
+        self.last_height = height
+
+        same_height = height is not None and height == cache.get('height') and not force
+        if same_height:
+            to_fetch = [addr for addr in self.addresses if addr not in previous]
+        else:
+            to_fetch = self.addresses
+
+        if to_fetch:
+            self.log(f"区块高度 {height}，查询 {len(to_fetch)}/{len(self.addresses)} 个地址")
+            fetched = self.collector.get_address_balances(
+                to_fetch, chunk_size=self.chunk_size, max_workers=self.max_workers
+            )
+        else:
+            self.log(f"区块高度 {height} 未变化，使用缓存")
+            fetched = pd.DataFrame()
+
+        current = dict(previous)
+        current.update(fetched.to_dict(orient='index') if not fetched.empty else {})
+
+        rows = {}
+        for addr in fetched.index:
+            if addr not in previous:
+                continue
+            prev, now = previous[addr], current[addr]
+            delta = now['balance_btc'] - prev['balance_btc']
+            new_tx = now['n_tx'] - prev['n_tx']
+            if delta != 0 or new_tx != 0:
+                rows[addr] = {
+                    'label': self.labels.get(addr, ''),
+                    'prev_balance_btc': prev['balance_btc'],
+                    'balance_btc': now['balance_btc'],
+                    'delta_btc': delta,
+                    'new_tx': new_tx,
+                }
+
+        # 查询失败时保留旧高度，下次扫描重新查询
+        complete = all(addr in fetched.index for addr in to_fetch)
+        self.save_cache({
+            'height': height if complete else cache.get('height'),
+            'swept_at': datetime.now().isoformat(timespec='seconds'),
+            'balances': current,
+        })
+
+        deltas = pd.DataFrame.from_dict(rows, orient='index', columns=self.DELTA_COLUMNS)
+        deltas.index.name = 'address'
+        if not deltas.empty:
+            deltas = deltas.reindex(deltas['delta_btc'].abs().sort_values(ascending=False).index)
+            self.log(f"{len(deltas)} 个地址余额变化，净变化 {deltas['delta_btc'].sum():+,.4f} BTC")
+        return deltas
+
+    def balances(self) -> pd.DataFrame:
+        """当前缓存的余额（不发请求）"""
+        balances = self.load_cache().get('balances', {})
+        rows = {addr: balances[addr] for addr in self.addresses if addr in balances}
+        if not rows:
+            return pd.DataFrame()
+
+        df = pd.DataFrame.from_dict(rows, orient='index')
+        df.insert(0, 'label', [self.labels[addr] for addr in df.index])
+        df.index.name = 'address'
+        return df
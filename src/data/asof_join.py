@@ -0,0 +1,150 @@
+"""
+时点对齐（as-of join）引擎
+
+功能：
+1. 将多个不同频率的数据源对齐到同一个基准时间索引（merge_asof backward 语义）
+2. 发布延迟：数据在 index + lag 之后才可用（例如宏观数据 T+1 发布）
+3. 陈旧度上限：超过 tolerance 的旧值视为缺失，不无限前向填充
+4. 向量化：每个数据源一次 searchsorted + take，所有数据源一次性拼接成结果，
+   20+ 个数据源对齐到分钟级索引也很快
+5. 无未来数据泄漏：基准时刻 t 只能看到可用时间 <= t 的数据
+
+数据源描述（source spec）:
+    {
+        'data': DataFrame,        # 时间索引的数据（必填）
+        'lag': '1D',              # 发布延迟（默认 0）
+        'tolerance': '3D',        # 最大陈旧度（默认不限制）
+        'prefix': 'macro_',       # 列名前缀（默认 '<name>_'）
+    }
+也可以直接传入 DataFrame（使用默认参数）。
+
+依赖：numpy, pandas
+"""
+
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+SourceSpec = Union[pd.DataFrame, Dict]
+
+
+def _to_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    """时间索引 -> int64 纳秒（统一不同精度的 DatetimeIndex）"""
+    return index.as_unit('ns').asi8
+
+
+def asof_positions(base_index: pd.DatetimeIndex,
+                   source_index: pd.DatetimeIndex,
+                   lag=None,
+                   tolerance=None,
+                   allow_exact_matches: bool = True) -> np.ndarray:
+    """
+    计算基准索引每个时刻可用的最新源数据行号
+
+    Args:
+        base_index: 基准时间索引（需有序）
+        source_index: 数据源时间索引（无需有序）
+        lag: 发布延迟（Timedelta 或字符串）
+        tolerance: 最大陈旧度（Timedelta 或字符串）
+        allow_exact_matches: 可用时间恰好等于基准时刻时是否可用
+
+    Returns:
+        np.ndarray (len(base_index),)，源数据的行号，不可用为 -1
+    """
+    if (base_index.tz is None) != (source_index.tz is None):
+        raise ValueError("基准索引与数据源的时区设置不一致（tz-aware 与 tz-naive 不能混用）")
+
+    available = _to_ns(source_index)
+    if lag is not None:
+        available = available + pd.Timedelta(lag).value
+
+    # 稳定排序：同一可用时间的多行取最后一行（最新修订）
+    order = np.argsort(available, kind='stable')
+    available = available[order]
+
+    base = _to_ns(base_index)
+    side = 'right' if allow_exact_matches else 'left'
+    pos = np.searchsorted(available, base, side=side) - 1
+
+    valid = pos >= 0
+    if tolerance is not None:
+        age = base - available[np.maximum(pos, 0)]
+        valid &= age <= pd.Timedelta(tolerance).value
+
+    return np.where(valid, order[np.maximum(pos, 0)], -1)
+
+
+def _take(df: pd.DataFrame, rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """按行号取值（-1 为缺失），数值列走一次二维 take"""
+    missing = rows < 0
+    safe = np.maximum(rows, 0)
+    result = {}
+
+    numeric = df.select_dtypes(include=[np.number, 'bool']).columns
+    if len(numeric):
+        values = df[numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        block = values[safe] if len(values) else np.full((len(rows), len(numeric)), np.nan)
+        block[missing] = np.nan
+        for i, col in enumerate(numeric):
+            result[col] = block[:, i]
+
+    for col in df.columns.difference(numeric, sort=False):
+        values = df[col].to_numpy(dtype=object)
+        taken = values[safe] if len(values) else np.full(len(rows), None, dtype=object)
+        taken[missing] = None
+        result[col] = taken
+
+    return {col: result[col] for col in df.columns}
+
+
+def asof_join(base_index: pd.DatetimeIndex,
+              sources: Dict[str, SourceSpec],
+              tolerance=None,
+              lag=None,
+              allow_exact_matches: bool = True) -> pd.DataFrame:
+    """
+    将多个数据源按时点对齐到基准索引
+
+    Args:
+        base_index: 基准时间索引
+        sources: {名称: DataFrame 或 source spec}
+        tolerance: 默认最大陈旧度（spec 中的 'tolerance' 优先）
+        lag: 默认发布延迟（spec 中的 'lag' 优先）
+        allow_exact_matches: 可用时间恰好等于基准时刻时是否可用
+
+    Returns:
+        DataFrame (index=base_index)，各数据源的列（加前缀）
+    """
+    base_index = pd.DatetimeIndex(base_index)
+    if not base_index.is_monotonic_increasing:
+        raise ValueError("基准索引必须按时间升序排列")
+
+    columns: Dict[str, np.ndarray] = {}
+    for name, spec in sources.items():
+        if isinstance(spec, pd.DataFrame):
+            spec = {'data': spec}
+
+        df = spec['data']
+        if df is None or df.empty:
+            continue
+        if not isinstance(df.index, pd.DatetimeIndex):
+            df = df.set_axis(pd.to_datetime(df.index))
+
+        rows = asof_positions(
+            base_index, df.index,
+            lag=spec.get('lag', lag),
+            tolerance=spec.get('tolerance', tolerance),
+            allow_exact_matches=allow_exact_matches
+        )
+
+        prefix = spec.get('prefix', f'{name}_')
+        for col, values in _take(df, rows).items():
+            key = f'{prefix}{col}'
+            if key in columns:
+                raise ValueError(f"列名冲突: {key}（请为数据源 {name} 设置不同的 prefix）")
+            columns[key] = values
+
+    # 一次性构建结果，避免逐列插入
+    return pd.DataFrame(columns, index=base_index)
@@ -17,6 +17,11 @@ from datetime import datetime, timedelta
 from typing import Optional, List
 import time
 
+try:
+    from http_client import create_session
+except ImportError:
+    from data.http_client import create_session
+
 
 class BinanceCollector:
     """Binance 数据收集器"""
@@ -40,10 +45,7 @@ class BinanceCollector:
             symbol: 交易对符号，默认 BTCUSDT
         """
         self.symbol = symbol
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Bitcoin Research Agent)'
-        })
+        self.session = create_session()
     
     def get_klines(self, 
                    interval: str = '1d', 
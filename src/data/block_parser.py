@@ -0,0 +1,698 @@
+"""
+本地区块文件解析与链上指标计算
+
+功能：
+1. 解析 Bitcoin Core 区块文件（blk*.dat，支持 SegWit 和 xor.dat 混淆）
+2. 兼容 bitcoind JSON-RPC 的区块来源（getblockhash + getblock verbosity=0）
+3. 紧凑 UTXO 索引：sqlite 表（WITHOUT ROWID，outpoint 主键，每条约 40 字节）+ 内存写缓冲
+4. 按天统计：活跃地址数、交易数、输出总额、UTXO 数量、区块数
+5. 多进程并行解析区块文件（预取窗口有界），可断点续跑（checkpoint）
+
+说明：
+- 地址以 scriptPubKey 的 8 字节哈希表示（相同脚本即相同地址），无需解码地址格式
+- OP_RETURN 输出不可花费，不进入 UTXO 索引，也不计入活跃地址
+- blk 文件中的区块不保证按高度排列，解析后按 prev_hash 串成链再顺序处理，
+  只沿最先连上的链前进（不处理重组）；链尖前进 stale_depth 个区块后仍未连上的区块视为分叉丢弃
+- 检查点就是 UTXO 所在的 sqlite 文件：每 checkpoint_every 个文件 / 批次提交一次，只写入变化的页面，
+  链尖、按天统计等小状态存在同一个库的 meta 表中
+
+依赖：numpy, pandas, requests（仅 RPC）
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from http_client import create_session
+except ImportError:
+    from data.http_client import create_session
+
+
+MAINNET_MAGIC = bytes.fromhex('f9beb4d9')
+NULL_HASH = b'\x00' * 32
+COIN = 100_000_000
+
+# UTXO key = txid 前 12 字节 << 20 | vout（单笔交易输出数远小于 2^20）
+TXID_PREFIX_BYTES = 12
+VOUT_BITS = 20
+# UTXO value = 地址 key << 51 | 金额（聪，总量 < 2^51）
+VALUE_BITS = 51
+VALUE_MASK = (1 << VALUE_BITS) - 1
+# UTXO key 的字节长度（96 + 20 位）
+KEY_BYTES = 15
+# sqlite 单条语句的参数个数上限（兼容旧版本的 999）
+SQL_BATCH = 900
+
+SECONDS_PER_DAY = 86400
+# 区块时间不严格单调，超过该延迟的日期才视为已结束
+DAY_FLUSH_LAG = SECONDS_PER_DAY
+
+# 区块: (block_hash, prev_hash, time, [tx, ...])
+# 交易: (utxo_key_base, is_coinbase, [spent_utxo_key, ...], [(value, address_key|None), ...])
+Block = Tuple[bytes, bytes, int, list]
+
+
+# ==================== 解析 ====================
+
+def _dsha256(data: bytes) -> bytes:
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def _read_varint(buf, pos: int) -> Tuple[int, int]:
+    """读取 CompactSize 整数，返回 (值, 新位置)"""
+    n = buf[pos]
+    if n < 0xfd:
+        return n, pos + 1
+    if n == 0xfd:
+        return struct.unpack_from('<H', buf, pos + 1)[0], pos + 3
+    if n == 0xfe:
+        return struct.unpack_from('<I', buf, pos + 1)[0], pos + 5
+    return struct.unpack_from('<Q', buf, pos + 1)[0], pos + 9
+
+
+def address_key(script: bytes) -> int:
+    """scriptPubKey -> 8 字节地址 key"""
+    return int.from_bytes(hashlib.blake2b(script, digest_size=8).digest(), 'little')
+
+
+def _parse_tx(buf, pos: int) -> Tuple[tuple, int]:
+    """解析一笔交易，返回 (交易, 新位置)"""
+    start = pos
+    pos += 4  # version
+
+    segwit = buf[pos] == 0 and buf[pos + 1] == 1
+    if segwit:
+        pos += 2
+    body_start = pos
+
+    n_in, pos = _read_varint(buf, pos)
+    inputs = []
+    coinbase = False
+    for _ in range(n_in):
+        prev_txid = bytes(buf[pos:pos + 32])
+        vout = struct.unpack_from('<I', buf, pos + 32)[0]
+        script_len, pos = _read_varint(buf, pos + 36)
+        pos += script_len + 4  # scriptSig + sequence
+
+        if prev_txid == NULL_HASH and vout == 0xffffffff:
+            coinbase = True
+        else:
+            prefix = int.from_bytes(prev_txid[:TXID_PREFIX_BYTES], 'little')
+            inputs.append((prefix << VOUT_BITS) | vout)
+
+    n_out, pos = _read_varint(buf, pos)
+    outputs = []
+    for _ in range(n_out):
+        value = struct.unpack_from('<q', buf, pos)[0]
+        script_len, pos = _read_varint(buf, pos + 8)
+        script = bytes(buf[pos:pos + script_len])
+        pos += script_len
+        # OP_RETURN (0x6a) 不可花费
+        outputs.append((value, None if script[:1] == b'\x6a' else address_key(script)))
+    body_end = pos
+
+    if segwit:
+        for _ in range(n_in):
+            n_items, pos = _read_varint(buf, pos)
+            for _ in range(n_items):
+                item_len, pos = _read_varint(buf, pos)
+                pos += item_len
+
+    end = pos + 4  # locktime
+    if segwit:
+        # txid 不包含 marker/flag 和见证数据
+        stripped = bytes(buf[start:start + 4]) + bytes(buf[body_start:body_end]) + bytes(buf[pos:end])
+    else:
+        stripped = bytes(buf[start:end])
+
+    txid = _dsha256(stripped)
+    base = int.from_bytes(txid[:TXID_PREFIX_BYTES], 'little') << VOUT_BITS
+    return (base, coinbase, inputs, outputs), end
+
+
+def parse_block(raw) -> Block:
+    """
+    解析一个区块（序列化字节）
+
+    Args:
+        raw: 区块字节（bytes 或 memoryview）
+
+    Returns:
+        (block_hash, prev_hash, time, txs)
+    """
+    buf = memoryview(raw)
+    header = bytes(buf[:80])
+    block_hash = _dsha256(header)
+    prev_hash = header[4:36]
+    block_time = struct.unpack_from('<I', header, 68)[0]
+
+    n_tx, pos = _read_varint(buf, 80)
+    txs = []
+    for _ in range(n_tx):
+        tx, pos = _parse_tx(buf, pos)
+        txs.append(tx)
+
+    return block_hash, prev_hash, block_time, txs
+
+
+def read_xor_key(blocks_dir: str) -> Optional[bytes]:
+    """读取 blocks 目录下的 xor.dat（Bitcoin Core 28+ 的区块文件混淆密钥）"""
+    path = Path(blocks_dir) / 'xor.dat'
+    if not path.exists():
+        return None
+    key = path.read_bytes()
+    return key if any(key) else None
+
+
+def read_block_file(path: str, magic: bytes = MAINNET_MAGIC, xor_key: Optional[bytes] = None) -> List[Block]:
+    """
+    解析一个 blk*.dat 文件
+
+    文件格式：[magic 4B][size 4B][block] 重复；文件末尾可能有预分配的零填充，
+    最后一个区块可能尚未写完，遇到这两种情况即停止。
+
+    Args:
+        path: 区块文件路径
+        magic: 网络魔数
+        xor_key: 混淆密钥（None 表示未混淆）
+
+    Returns:
+        文件内的区块列表（文件顺序）
+    """
+    data = Path(path).read_bytes()
+    if xor_key:
+        key = np.frombuffer(xor_key, dtype=np.uint8)
+        arr = np.frombuffer(data, dtype=np.uint8) ^ np.resize(key, len(data))
+        data = arr.tobytes()
+
+    buf = memoryview(data)
+    blocks = []
+    pos = 0
+    while pos + 8 <= len(data):
+        if data[pos:pos + 4] != magic:
+            break
+        size = struct.unpack_from('<I', data, pos + 4)[0]
+        if pos + 8 + size > len(data):
+            break
+        blocks.append(parse_block(buf[pos + 8:pos + 8 + size]))
+        pos += 8 + size
+
+    return blocks
+
+
+def _parse_file_worker(args) -> Tuple[str, int, List[Block]]:
+    """进程池任务：解析单个区块文件"""
+    path, magic, xor_key = args
+    return os.path.basename(path), os.path.getsize(path), read_block_file(path, magic, xor_key)
+
+
+# ==================== RPC 区块来源 ====================
+
+class BitcoindRPCSource:
+    """bitcoind 兼容的 JSON-RPC 区块来源"""
+
+    def __init__(self,
+                 url: str = 'http://127.0.0.1:8332',
+                 user: Optional[str] = None,
+                 password: Optional[str] = None,
+                 timeout: float = 30.0):
+        """
+        初始化
+
+        Args:
+            url: RPC 地址
+            user: RPC 用户名
+            password: RPC 密码
+            timeout: 单次请求超时（秒）
+        """
+        self.url = url
+        self.session = create_session(headers={'Content-Type': 'application/json'},
+                                      default_timeout=timeout)
+        if user:
+            self.session.auth = (user, password or '')
+        self._id = 0
+
+    def call(self, method: str, *params):
+        """调用 RPC 方法（出错时抛出 RuntimeError）"""
+        self._id += 1
+        payload = {'jsonrpc': '1.0', 'id': self._id, 'method': method, 'params': list(params)}
+        response = self.session.post(self.url, json=payload)
+
+        try:
+            data = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise RuntimeError(f"RPC {method} 返回非 JSON 响应")
+
+        if data.get('error'):
+            raise RuntimeError(f"RPC {method} 失败: {data['error']}")
+        return data['result']
+
+    def get_block_count(self) -> int:
+        """当前链高度"""
+        return self.call('getblockcount')
+
+    def get_raw_block(self, height: int) -> bytes:
+        """按高度获取序列化区块"""
+        block_hash = self.call('getblockhash', height)
+        return bytes.fromhex(self.call('getblock', block_hash, 0))
+
+
+# ==================== UTXO 索引 ====================
+
+def _to_signed(value: int) -> int:
+    """无符号 64 位 -> sqlite INTEGER（有符号 64 位）"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class UTXOStore:
+    """
+    UTXO 索引：sqlite 表 + 内存写缓冲
+
+    新产生的输出先放在内存 dict（多数输出很快被花费，不会落盘）；缓冲超过 cache_size 或
+    提交检查点时批量写入，已落盘输出的花费批量删除。花费前按区块批量查询库中的输出。
+    """
+
+    def __init__(self, conn: sqlite3.Connection, count: int = 0, cache_size: int = 2_000_000):
+        """
+        初始化
+
+        Args:
+            conn: sqlite 连接（与检查点共用，由调用方提交）
+            count: 当前 UTXO 数量（来自检查点）
+            cache_size: 内存写缓冲的条数上限
+        """
+        self.conn = conn
+        self.cache_size = cache_size
+        self._count = count
+        self._new: Dict[int, int] = {}
+        self._spent: List[bytes] = []
+        conn.execute('CREATE TABLE IF NOT EXISTS utxo '
+                     '(k BLOB PRIMARY KEY, addr INTEGER NOT NULL, value INTEGER NOT NULL) WITHOUT ROWID')
+
+    def __len__(self) -> int:
+        return self._count
+
+    def fetch(self, keys: List[int]) -> Dict[int, int]:
+        """批量查询已落盘的输出（缓冲中的跳过），返回 {key: 打包值}"""
+        keys = [k for k in keys if k not in self._new]
+        found = {}
+        for i in range(0, len(keys), SQL_BATCH):
+            chunk = [k.to_bytes(KEY_BYTES, 'big') for k in keys[i:i + SQL_BATCH]]
+            rows = self.conn.execute(
+                f"SELECT k, addr, value FROM utxo WHERE k IN ({','.join('?' * len(chunk))})", chunk)
+            for k, addr, value in rows:
+                found[int.from_bytes(k, 'big')] = ((addr & 0xFFFFFFFFFFFFFFFF) << VALUE_BITS) | value
+        return found
+
+    def add(self, key: int, packed: int):
+        if key not in self._new:
+            self._count += 1
+        self._new[key] = packed
+
+    def spend(self, key: int, stored: Dict[int, int]) -> Optional[int]:
+        """
+        花费一个输出
+
+        Args:
+            key: outpoint key
+            stored: 本区块 fetch() 的结果（命中的条目会被取出）
+
+        Returns:
+            打包值（不存在时返回 None）
+        """
+        packed = self._new.pop(key, None)
+        if packed is None:
+            packed = stored.pop(key, None)
+            if packed is not None:
+                self._spent.append(key.to_bytes(KEY_BYTES, 'big'))
+        if packed is not None:
+            self._count -= 1
+        return packed
+
+    def maybe_flush(self):
+        if len(self._new) >= self.cache_size:
+            self.flush()
+
+    def flush(self):
+        """把缓冲写入 sqlite（不提交）"""
+        if self._spent:
+            self.conn.executemany('DELETE FROM utxo WHERE k = ?', ((k,) for k in self._spent))
+            self._spent = []
+        if self._new:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO utxo (k, addr, value) VALUES (?, ?, ?)',
+                ((k.to_bytes(KEY_BYTES, 'big'), _to_signed(v >> VALUE_BITS), v & VALUE_MASK)
+                 for k, v in self._new.items()))
+            self._new = {}
+
+
+# ==================== 指标引擎 ====================
+
+class ChainMetricsEngine:
+    """流式处理区块，维护 UTXO 索引并按天统计链上指标"""
+
+    def __init__(self,
+                 checkpoint_path: Optional[str] = None,
+                 magic: bytes = MAINNET_MAGIC,
+                 cache_size: int = 2_000_000,
+                 stale_depth: int = 1000,
+                 verbose: bool = True):
+        """
+        初始化（存在检查点时自动恢复）
+
+        Args:
+            checkpoint_path: 检查点 sqlite 文件路径（None 表示只在内存中，不保存）
+            magic: 网络魔数
+            cache_size: UTXO 内存写缓冲的条数上限
+            stale_depth: 待连接区块在链尖前进多少个区块后丢弃（分叉 / 孤块）
+            verbose: 是否打印进度
+        """
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.magic = magic
+        self.stale_depth = stale_depth
+        self.verbose = verbose
+
+        self.tip = NULL_HASH
+        self.height = -1
+        self.pending: Dict[bytes, List[Block]] = {}
+        self._pending_height: Dict[bytes, int] = {}
+        self._seen_new: List[bytes] = []
+        self.files_done: Dict[str, int] = {}
+        self._days: Dict[int, Dict] = {}
+        self._closed: Dict[int, Dict] = {}
+
+        if self.checkpoint_path is not None:
+            self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.checkpoint_path) if self.checkpoint_path else ':memory:')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS blocks (h BLOB PRIMARY KEY) WITHOUT ROWID')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v BLOB)')
+        self.utxo = UTXOStore(self.conn, cache_size=cache_size)
+
+        if self.checkpoint_path is not None:
+            self.load_checkpoint()
+
+    def log(self, message: str):
+        if self.verbose:
+            print(f"[ChainMetrics] {message}")
+
+    # ---------- 区块处理 ----------
+
+    def _seen(self, hashes: List[bytes]) -> set:
+        """已处理过的区块（8 字节哈希前缀）"""
+        found = set(hashes) & set(self._seen_new)
+        for i in range(0, len(hashes), SQL_BATCH):
+            chunk = hashes[i:i + SQL_BATCH]
+            rows = self.conn.execute(f"SELECT h FROM blocks WHERE h IN ({','.join('?' * len(chunk))})", chunk)
+            found.update(h for (h,) in rows)
+        return found
+
+    def add_blocks(self, blocks: List[Block]):
+        """加入区块（任意顺序），能连到当前链尖的区块立即处理"""
+        seen = self._seen([block[0][:8] for block in blocks])
+        for block in blocks:
+            if block[0][:8] in seen:
+                continue
+            self.pending.setdefault(block[1], []).append(block)
+            self._pending_height.setdefault(block[1], self.height)
+
+        while True:
+            children = self.pending.pop(self.tip, None)
+            if not children:
+                break
+            self._pending_height.pop(self.tip, None)
+            self._apply_block(children[0])
+
+        # 链尖已前进 stale_depth 个区块仍未连上：分叉上的区块，丢弃
+        stale = [prev for prev, height in self._pending_height.items() if height < self.height - self.stale_depth]
+        for prev in stale:
+            self.pending.pop(prev, None)
+            self._pending_height.pop(prev)
+        if stale:
+            self.log(f"丢弃 {len(stale)} 组无法连接的分叉区块")
+
+    def _apply_block(self, block: Block):
+        block_hash, _, block_time, txs = block
+        day = block_time // SECONDS_PER_DAY
+
+        stats = self._days.get(day)
+        if stats is None:
+            # 已结束的日期又出现区块时重新打开（地址数为近似值）
+            stats = self._closed.pop(day, None) or {
+                'active_addresses': 0, 'tx_count': 0, 'output_value': 0, 'block_count': 0, 'utxo_count': 0
+            }
+            stats['addresses'] = set()
+            self._days[day] = stats
+
+        utxo = self.utxo
+        addresses = stats['addresses']
+        output_value = 0
+        # 已落盘的被花费输出一次批量查询（本区块内产生的输出在写缓冲中）
+        stored = utxo.fetch([key for _, _, inputs, _ in txs for key in inputs])
+
+        for base, _, inputs, outputs in txs:
+            for key in inputs:
+                spent = utxo.spend(key, stored)
+                if spent is not None:
+                    addresses.add(spent >> VALUE_BITS)
+
+            for vout, (value, addr) in enumerate(outputs):
+                output_value += value
+                if addr is not None:
+                    addresses.add(addr)
+                    utxo.add(base | vout, (addr << VALUE_BITS) | value)
+
+        stats['tx_count'] += len(txs)
+        stats['output_value'] += output_value
+        stats['block_count'] += 1
+        stats['utxo_count'] = len(utxo)
+
+        self.tip = block_hash
+        self.height += 1
+        self._seen_new.append(block_hash[:8])
+        utxo.maybe_flush()
+        self._flush_days(block_time)
+
+    def _flush_days(self, block_time: int):
+        """结束已完结日期的统计（释放地址集合）"""
+        cutoff = (block_time - DAY_FLUSH_LAG) // SECONDS_PER_DAY
+        for day in [d for d in self._days if d < cutoff]:
+            stats = self._days.pop(day)
+            stats['active_addresses'] += len(stats.pop('addresses'))
+            self._closed[day] = stats
+
+    # ---------- 数据源 ----------
+
+    def run_files(self, blocks_dir: str, processes: Optional[int] = None, checkpoint_every: int = 10) -> pd.DataFrame:
+        """
+        处理 blocks 目录下的 blk*.dat（多进程解析，主进程按链顺序处理）
+
+        已完整处理且大小未变的文件会跳过；大小变化的文件重新解析（已处理的区块会被忽略）。
+        进程池最多预取 2 × processes 个文件的解析结果，主进程处理不过来时不会无限堆积。
+
+        Args:
+            blocks_dir: 区块文件目录
+            processes: 解析进程数（默认 CPU 数，1 表示不使用进程池）
+            checkpoint_every: 每处理多少个文件提交一次检查点
+
+        Returns:
+            按天统计的指标 DataFrame
+        """
+        files = sorted(Path(blocks_dir).glob('blk*.dat'))
+        todo = [f for f in files if self.files_done.get(f.name) != f.stat().st_size]
+        xor_key = read_xor_key(blocks_dir)
+        processes = processes or os.cpu_count() or 1
+        self.log(f"{len(files)} 个区块文件，待处理 {len(todo)} 个")
+
+        args = iter([(str(f), self.magic, xor_key) for f in todo])
+        start = time.time()
+        pool = None
+        try:
+            if processes == 1 or len(todo) <= 1:
+                results = map(_parse_file_worker, args)
+            else:
+                pool = Pool(processes)
+                results = self._windowed(pool, args, 2 * processes)
+
+            # 结果保持文件顺序，检查点之前的文件都已完整处理
+            for i, (name, size, blocks) in enumerate(results, 1):
+                self.add_blocks(blocks)
+                self.files_done[name] = size
+                self.log(f"{name}: {len(blocks)} 个区块，链高度 {self.height}，UTXO {len(self.utxo):,}")
+
+                if i % checkpoint_every == 0:
+                    self.save_checkpoint()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.save_checkpoint()
+        self.log(f"完成: 链高度 {self.height}，待连接区块 {sum(len(v) for v in self.pending.values())}，"
+                 f"耗时 {time.time() - start:.1f}s")
+        return self.daily_metrics()
+
+    @staticmethod
+    def _windowed(pool: Pool, args, window: int):
+        """按顺序产出解析结果，同时最多有 window 个文件在解析或等待处理"""
+        inflight = deque(pool.apply_async(_parse_file_worker, (a,)) for _, a in zip(range(window), args))
+        while inflight:
+            result = inflight.popleft().get()
+            nxt = next(args, None)
+            if nxt is not None:
+                inflight.append(pool.apply_async(_parse_file_worker, (nxt,)))
+            yield result
+
+    def run_rpc(self, source: BitcoindRPCSource, end_height: Optional[int] = None,
+                batch_size: int = 100, max_workers: int = 4, checkpoint_every: int = 10) -> pd.DataFrame:
+        """
+        从 RPC 来源按高度顺序处理区块（从检查点高度继续）
+
+        Args:
+            source: 提供 get_block_count() 和 get_raw_block(height) 的区块来源
+            end_height: 结束高度（含），默认当前链高度
+            batch_size: 每批获取的区块数
+            max_workers: 并发获取区块的线程数
+            checkpoint_every: 每处理多少批提交一次检查点
+
+        Returns:
+            按天统计的指标 DataFrame
+        """
+        if end_height is None:
+            end_height = source.get_block_count()
+
+        start = time.time()
+        batches = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            while self.height < end_height:
+                heights = range(self.height + 1, min(self.height + batch_size, end_height) + 1)
+                # map 保持高度顺序
+                blocks = [parse_block(raw) for raw in executor.map(source.get_raw_block, heights)]
+                before = self.height
+                self.add_blocks(blocks)
+                if self.height == before:
+                    raise RuntimeError(f"高度 {heights[0]} 的区块无法连接到当前链尖（检查点与节点数据不一致）")
+                batches += 1
+                if batches % checkpoint_every == 0:
+                    self.save_checkpoint()
+                self.log(f"链高度 {self.height}/{end_height}，UTXO {len(self.utxo):,}")
+
+        self.save_checkpoint()
+        self.log(f"完成，耗时 {time.time() - start:.1f}s")
+        return self.daily_metrics()
+
+    # ---------- 结果 ----------
+
+    def daily_metrics(self) -> pd.DataFrame:
+        """
+        按天统计的链上指标（包含尚未结束的日期）
+
+        Returns:
+            DataFrame (index=date) with active_addresses, tx_count, output_value_btc,
+            utxo_count, block_count
+        """
+        rows = {}
+        for day, stats in self._closed.items():
+            rows[day] = dict(stats)
+        for day, stats in self._days.items():
+            row = {k: v for k, v in stats.items() if k != 'addresses'}
+            row['active_addresses'] += len(stats['addresses'])
+            rows[day] = row
+
+        columns = ['active_addresses', 'tx_count', 'output_value_btc', 'utxo_count', 'block_count']
+        if not rows:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.DataFrame.from_dict(rows, orient='index').sort_index()
+        df.index = pd.to_datetime(df.index * SECONDS_PER_DAY, unit='s')
+        df.index.name = 'date'
+        df['output_value_btc'] = df.pop('output_value') / COIN
+        return df[columns]
+
+    # ---------- 检查点 ----------
+
+    def save_checkpoint(self):
+        """提交检查点：写入 UTXO 缓冲、新区块哈希和小状态，一个事务内完成（只写变化的页面）"""
+        if self.checkpoint_path is None:
+            return
+
+        self.utxo.flush()
+        self.conn.executemany('INSERT OR IGNORE INTO blocks (h) VALUES (?)', ((h,) for h in self._seen_new))
+        self._seen_new = []
+        state = {
+            'tip': self.tip,
+            'height': self.height,
+            'pending': self.pending,
+            'pending_height': self._pending_height,
+            'files_done': self.files_done,
+            'days': self._days,
+            'closed': self._closed,
+            'utxo_count': len(self.utxo),
+        }
+        self.conn.execute('INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)',
+                          ('state', pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)))
+        self.conn.commit()
+
+    def load_checkpoint(self):
+        """从检查点恢复（库中没有状态时保持初始值）"""
+        row = self.conn.execute("SELECT v FROM meta WHERE k = 'state'").fetchone()
+        if row is None:
+            return
+        state = pickle.loads(row[0])
+
+        self.tip = state['tip']
+        self.height = state['height']
+        self.pending = state['pending']
+        self._pending_height = state['pending_height']
+        self.files_done = state['files_done']
+        self._days = state['days']
+        self._closed = state['closed']
+        self.utxo._count = state['utxo_count']
+        self.log(f"从检查点恢复: 链高度 {self.height}，UTXO {len(self.utxo):,}")
+
+    def close(self):
+        """关闭 sqlite 连接（未提交的进度丢弃）"""
+        self.conn.close()
+
+
+def main():
+    """解析本地区块文件（或 RPC）并保存按天指标"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地区块解析与链上指标')
+    parser.add_argument('--blocks-dir', help='blk*.dat 所在目录')
+    parser.add_argument('--rpc-url', help='bitcoind RPC 地址（不使用区块文件时）')
+    parser.add_argument('--rpc-user', default=os.getenv('BITCOIND_RPC_USER'))
+    parser.add_argument('--rpc-password', default=os.getenv('BITCOIND_RPC_PASSWORD'))
+    parser.add_argument('--checkpoint', default='data/raw/store/chain/checkpoint.sqlite')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--output', default='data/raw/chain_metrics.csv')
+    args = parser.parse_args()
+
+    engine = ChainMetricsEngine(checkpoint_path=args.checkpoint)
+    if args.blocks_dir:
+        df = engine.run_files(args.blocks_dir, processes=args.processes)
+    elif args.rpc_url:
+        df = engine.run_rpc(BitcoindRPCSource(args.rpc_url, args.rpc_user, args.rpc_password))
+    else:
+        parser.error('需要 --blocks-dir 或 --rpc-url')
+
+    df.to_csv(args.output)
+    print(f"✓ 已保存 {len(df)} 天的链上指标: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ CoinGecko API 数据收集器
 
 功能：
 1. 获取比特币市场数据（价格、市值、交易量）
-2. 获取历史数据
+2. 获取历史数据（含按区间批量获取 + 本地缓存）
 3. 获取币种基本信息
 4. 支持多种法币
 
@@ -14,9 +14,21 @@ CoinGecko API 数据收集器
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import time
 
+try:
+    from http_client import create_session
+except ImportError:
+    from data.http_client import create_session
+
+try:
+    from series_store import SeriesStore
+except ImportError:
+    from data.series_store import SeriesStore
+
 
 class CoinGeckoCollector:
     """CoinGecko 数据收集器"""
@@ -30,35 +42,75 @@ class CoinGeckoCollector:
         'USDT': 'tether'
     }
     
-    def __init__(self, coin_id: str = "bitcoin", vs_currency: str = "usd"):
+    # market_chart/range 的自动粒度：<=1 天为 5 分钟，1-90 天为小时，>90 天为日
+    # 按粒度限定每个分块的跨度，保证所有分块返回相同粒度
+    RANGE_CHUNK_DAYS = {
+        'hourly': (2, 89),     # (最小跨度, 最大跨度)
+        'daily': (91, 365),
+    }
+    # 各粒度的K线周期（用于判断最后一根K线是否已结束）
+    RANGE_BAR_FREQ = {'hourly': 'h', 'daily': 'D'}
+    
+    def __init__(self, coin_id: str = "bitcoin", vs_currency: str = "usd",
+                 cache_dir: str = 'data/raw/store'):
         """
         初始化
         
         Args:
             coin_id: 币种 ID（如 'bitcoin', 'ethereum'）
             vs_currency: 对标货币（如 'usd', 'cny'）
+            cache_dir: 区间数据缓存目录
         """
         self.coin_id = coin_id
         self.vs_currency = vs_currency
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Bitcoin Research Agent)',
-            'Accept': 'application/json'
-        })
+        self.cache_dir = cache_dir
+        self.session = create_session(headers={'Accept': 'application/json'})
         self.request_count = 0
         self.last_request_time = time.time()
+        self._rate_lock = threading.Lock()
+        self._store = None
     
     def _rate_limit(self):
-        """限流控制（免费版约 10-50 次/分钟）"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+        """限流控制（免费版约 10-50 次/分钟，多线程共享同一配额）"""
+        with self._rate_lock:
+            current_time = time.time()
+            time_since_last = current_time - self.last_request_time
+            
+            # 每次请求至少间隔 2 秒（安全起见）
+            if time_since_last < 2:
+                time.sleep(2 - time_since_last)
+            
+            self.last_request_time = time.time()
+            self.request_count += 1
+    
+    @property
+    def store(self) -> SeriesStore:
+        """区间数据本地缓存（懒加载）"""
+        if self._store is None:
+            self._store = SeriesStore(self.cache_dir)
+        return self._store
+    
+    @staticmethod
+    def _parse_market_chart(data: Dict) -> pd.DataFrame:
+        """将 market_chart 响应解析为 DataFrame（price, market_cap, volume）"""
+        prices = data.get('prices', [])
+        market_caps = data.get('market_caps', [])
+        volumes = data.get('total_volumes', [])
         
-        # 每次请求至少间隔 2 秒（安全起见）
-        if time_since_last < 2:
-            time.sleep(2 - time_since_last)
+        # 转换为 DataFrame
+        df_price = pd.DataFrame(prices, columns=['timestamp', 'price'])
+        df_market_cap = pd.DataFrame(market_caps, columns=['timestamp', 'market_cap'])
+        df_volume = pd.DataFrame(volumes, columns=['timestamp', 'volume'])
         
-        self.last_request_time = time.time()
-        self.request_count += 1
+        # 合并数据
+        df = df_price.merge(df_market_cap, on='timestamp', how='outer')
+        df = df.merge(df_volume, on='timestamp', how='outer')
+        
+        # 转换时间戳
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df.set_index('timestamp', inplace=True)
+        df.sort_index(inplace=True)
+        return df
     
     def get_current_price(self) -> Dict:
         """
@@ -121,26 +173,7 @@ class CoinGeckoCollector:
         try:
             response = self.session.get(endpoint, params=params, timeout=15)
             response.raise_for_status()
-            data = response.json()
-            
-            # 解析数据
-            prices = data.get('prices', [])
-            market_caps = data.get('market_caps', [])
-            volumes = data.get('total_volumes', [])
-            
-            # 转换为 DataFrame
-            df_price = pd.DataFrame(prices, columns=['timestamp', 'price'])
-            df_market_cap = pd.DataFrame(market_caps, columns=['timestamp', 'market_cap'])
-            df_volume = pd.DataFrame(volumes, columns=['timestamp', 'volume'])
-            
-            # 合并数据
-            df = df_price.merge(df_market_cap, on='timestamp', how='outer')
-            df = df.merge(df_volume, on='timestamp', how='outer')
-            
-            # 转换时间戳
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-            df.sort_index(inplace=True)
+            df = self._parse_market_chart(response.json())
             
             print(f"✓ 成功获取 {len(df)} 条市场数据 ({days} 天)")
             return df
@@ -149,6 +182,148 @@ class CoinGeckoCollector:
             print(f"✗ CoinGecko 市场数据请求失败: {e}")
             return pd.DataFrame()
     
+    def _split_range(self,
+                     start: pd.Timestamp,
+                     end: pd.Timestamp,
+                     granularity: str) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """将区间切分为不超过最大跨度的分块（不扩展）"""
+        max_days = self.RANGE_CHUNK_DAYS[granularity][1]
+        chunks = []
+        cursor = start
+        
+        while cursor < end:
+            chunk_end = min(cursor + timedelta(days=max_days), end)
+            chunks.append((cursor, chunk_end))
+            cursor = chunk_end
+        
+        return chunks
+    
+    def _plan_requests(self,
+                       ranges: List[Tuple[pd.Timestamp, pd.Timestamp]],
+                       granularity: str) -> List[Tuple[pd.Timestamp, pd.Timestamp, List[Tuple[pd.Timestamp, pd.Timestamp]]]]:
+        """
+        缺失区间 -> 请求计划 [(请求起点, 请求终点, [需要保留的子区间])]
+        
+        相邻的小缺口在最大跨度内合并为一个请求；只有请求跨度不足该粒度的最小值
+        （CoinGecko 会自动换成更细的粒度）时才向前扩展，扩展部分只用于请求，不写入缓存。
+        """
+        min_days, max_days = self.RANGE_CHUNK_DAYS[granularity]
+        pieces = [c for s, e in ranges for c in self._split_range(s, e, granularity)]
+        
+        groups = []
+        for piece in pieces:
+            if groups and piece[1] - groups[-1][0][0] <= timedelta(days=max_days):
+                groups[-1].append(piece)
+            else:
+                groups.append([piece])
+        
+        plans = []
+        for group in groups:
+            request_start, request_end = group[0][0], group[-1][1]
+            if request_end - request_start < timedelta(days=min_days):
+                request_start = request_end - timedelta(days=min_days)
+            plans.append((request_start, request_end, group))
+        return plans
+    
+    def _fetch_market_chart_range(self, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """调用 market_chart/range 获取单个分块"""
+        endpoint = f"{self.BASE_URL}/coins/{self.coin_id}/market_chart/range"
+        
+        params = {
+            "vs_currency": self.vs_currency,
+            "from": int(start.timestamp()),
+            "to": int(end.timestamp())
+        }
+        
+        self._rate_limit()
+        
+        response = self.session.get(endpoint, params=params, timeout=15)
+        response.raise_for_status()
+        return self._parse_market_chart(response.json())
+    
+    def get_market_chart_range(self,
+                               start_date: str,
+                               end_date: Optional[str] = None,
+                               granularity: str = 'daily',
+                               max_workers: int = 3,
+                               use_cache: bool = True) -> pd.DataFrame:
+        """
+        按日期区间获取市场数据（market_chart/range）
+        
+        长区间按粒度切分为多个分块并发获取（共享限流配额），结果合并为一个 DataFrame。
+        启用缓存时，只请求本地尚未覆盖的区间。
+        
+        Args:
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)，默认当前时间
+            granularity: 数据粒度 ('daily' 或 'hourly')
+            max_workers: 并发请求数
+            use_cache: 是否使用本地缓存
+        
+        Returns:
+            DataFrame with price, market_cap, volume
+        """
+        if granularity not in self.RANGE_CHUNK_DAYS:
+            print(f"✗ 不支持的粒度: {granularity} (可选: {', '.join(self.RANGE_CHUNK_DAYS)})")
+            return pd.DataFrame()
+        
+        now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date) if end_date else now
+        if start >= end:
+            return pd.DataFrame()
+        
+        # 最后一根已结束的K线：之后的点（CoinGecko 的实时点）不写入缓存，每次重新获取
+        complete_until = now.floor(self.RANGE_BAR_FREQ[granularity])
+        
+        cache_key = f"coingecko/{self.coin_id}_{self.vs_currency}_{granularity}"
+        ranges = self.store.missing_ranges(cache_key, start, end) if use_cache else [(start, end)]
+        plans = self._plan_requests(ranges, granularity)
+        
+        frames = []
+        live = []
+        if plans:
+            print(f"正在获取 {len(plans)} 个区间分块 ({granularity})...")
+            
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                futures = {executor.submit(self._fetch_market_chart_range, s, e): (s, e, keep) for s, e, keep in plans}
+                
+                for future in as_completed(futures):
+                    chunk_start, chunk_end, keep = futures[future]
+                    try:
+                        df_chunk = future.result()
+                    except requests.exceptions.RequestException as e:
+                        print(f"✗ 区间 {chunk_start.date()} ~ {chunk_end.date()} 请求失败: {e}")
+                        continue
+                    
+                    if df_chunk.empty:
+                        continue
+                    
+                    # 只保留缺失区间（扩展部分丢弃）
+                    df_chunk = pd.concat([df_chunk.loc[s:e] for s, e in keep])
+                    df_chunk = df_chunk[~df_chunk.index.duplicated(keep='last')].sort_index()
+                    frames.append(df_chunk)
+                    live.append(df_chunk[df_chunk.index > complete_until])
+                    if use_cache:
+                        complete = df_chunk[df_chunk.index <= complete_until]
+                        if not complete.empty:
+                            self.store.upsert(cache_key, complete)
+                        for s, e in keep:
+                            if s < complete_until:
+                                self.store.add_coverage(cache_key, s, min(e, complete_until))
+        
+        if use_cache:
+            df = pd.concat([self.store.read(cache_key, start, end)] + live)
+            df = df[~df.index.duplicated(keep='last')].sort_index()
+        elif frames:
+            df = pd.concat(frames)
+            df = df[~df.index.duplicated(keep='last')].sort_index().loc[start:end]
+        else:
+            df = pd.DataFrame()
+        
+        print(f"✓ 区间数据共 {len(df)} 条 ({start.date()} ~ {end.date()}, 新请求 {len(plans)} 个分块)")
+        return df
+    
     def get_coin_info(self) -> Dict:
         """
         获取币种详细信息
@@ -250,6 +425,8 @@ class CoinGeckoCollector:
         """
         获取特定日期的历史数据
         
+        单日快照接口，重建一段时间的历史数据请使用 get_market_chart_range()
+        
         Args:
             date: 日期字符串 (格式: DD-MM-YYYY)
         
@@ -5,6 +5,10 @@ Bitcoin Research Agent - 数据整合模块
 1. 整合多个数据源（市场数据、链上数据、宏观数据、新闻数据）
 2. 时间序列对齐
 3. 生成统一的特征数据集
+4. 增量模式：按数据源高水位只整合新数据，追加写入（成本与历史长度无关）
+5. 时点对齐模式（align_method='asof'）：按发布延迟和陈旧度上限对齐，无未来数据泄漏
+6. 分块模式：按时间分区流式处理分钟级长历史，写入分区列式存储，内存占用与分块大小相关
+7. 并行加载：各数据源并发读取（线程池 / 进程池），显式日期格式和列类型，记录每个数据源的加载耗时
 
 作者：Bitcoin Research Agent Team
 日期：2025-10-25
@@ -12,19 +16,140 @@ Bitcoin Research Agent - 数据整合模块
 
 import pandas as pd
 import numpy as np
+import io
+import json
 import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+# src 目录（链上收集器等模块按 data.* 导入其依赖）
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from src.feature_engineering import FeatureEngineer
 
+try:
+    from asof_join import asof_join
+    from partitioned_store import PartitionedStore
+    from series_store import SeriesStore
+    from onchain_collector import read_glassnode_metrics, read_chain_metrics
+except ImportError:
+    from src.data.asof_join import asof_join
+    from src.data.partitioned_store import PartitionedStore
+    from src.data.series_store import SeriesStore
+    from src.data.onchain_collector import read_glassnode_metrics, read_chain_metrics
+
+
+def read_csv_tail(path, after: Optional[pd.Timestamp] = None, lookback: int = 0,
+                  block_size: int = 1 << 16) -> pd.DataFrame:
+    """
+    从文件末尾读取按时间排序的 CSV（只读取需要的部分）
+    
+    返回 after 之后的所有行，外加 after 及之前的至少 lookback 行
+    （after=None 时返回末尾至少 lookback 行）。读取块大小按需翻倍。
+    
+    Args:
+        path: CSV 路径（第一列为时间索引）
+        after: 时间界限
+        lookback: after 及之前需要保留的行数
+        block_size: 初始读取字节数
+    
+    Returns:
+        DataFrame
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        end = f.seek(0, os.SEEK_END)
+        
+        size = block_size
+        while True:
+            start = max(data_start, end - size)
+            f.seek(start)
+            chunk = f.read(end - start)
+            if start > data_start:
+                # 丢弃不完整的第一行
+                chunk = chunk.split(b'\n', 1)[1] if b'\n' in chunk else b''
+            
+            df = pd.read_csv(io.BytesIO(header + chunk), index_col=0, parse_dates=True)
+            n_old = len(df) if after is None else int((df.index <= after).sum())
+            if start == data_start or n_old > lookback:
+                break
+            size *= 2
+    
+    if after is None:
+        return df.iloc[-lookback:] if lookback else df
+    
+    old = df[df.index <= after]
+    return pd.concat([old.iloc[len(old) - lookback:] if lookback else old.iloc[:0], df[df.index > after]])
+
+
+def read_source_csv(path, dtypes: Optional[Dict[str, str]] = None,
+                    date_format: str = 'ISO8601') -> pd.DataFrame:
+    """
+    读取时间索引的 CSV（显式列类型和日期格式，避免逐列 / 逐行推断）
+    
+    列类型不匹配（如 yfinance 文件中的多级表头行）时回退到类型推断，
+    日期格式不匹配时回退到日期推断，结果与 read_csv(parse_dates=True) 一致。
+    
+    Args:
+        path: CSV 路径（第一列为时间索引）
+        dtypes: {列名: 类型}，只作用于文件中存在的列
+        date_format: 索引的日期格式
+    
+    Returns:
+        DataFrame
+    """
+    try:
+        df = pd.read_csv(path, index_col=0, dtype=dtypes)
+    except (ValueError, TypeError):
+        df = pd.read_csv(path, index_col=0)
+    
+    try:
+        df.index = pd.to_datetime(df.index, format=date_format)
+    except (ValueError, TypeError):
+        try:
+            df.index = pd.to_datetime(df.index)
+        except (ValueError, TypeError):
+            pass
+    return df
+
 
 class DataIntegrator:
     """数据整合器 - 合并多个数据源"""
     
+    # 时点对齐参数（align_method='asof'）：发布延迟 lag / 最大陈旧度 tolerance
+    ASOF_SOURCES = {
+        'onchain': {'lag': None, 'tolerance': '3D'},
+        'macro': {'lag': None, 'tolerance': '5D'},   # 工作日数据，覆盖周末和假日
+        'news': {'lag': None, 'tolerance': '2D'},
+    }
+    
+    # 数据源名称 -> 加载方法
+    SOURCE_LOADERS = {
+        'market': 'load_market_data',
+        'onchain': 'load_onchain_data',
+        'macro': 'load_macro_data',
+        'news': 'load_news_sentiment',
+    }
+    
+    # 读取 CSV 时的显式类型（不在文件中的列忽略）和索引日期格式
+    SOURCE_DTYPES = {
+        'market': {col: 'float64' for col in ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']},
+        'onchain': {col: 'float64' for col in [
+            'active_addresses', 'utxo_count', 'exchange_inflow', 'exchange_outflow',
+            'exchange_netflow', 'hash_rate', 'difficulty', 'n_transactions',
+        ]},
+        'macro': {col: 'float64' for col in ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']},
+        'news': {},
+    }
+    DATE_FORMAT = 'ISO8601'
+    
     def __init__(self, data_dir: str = 'data', verbose: bool = True):
         """
         初始化数据整合器
@@ -36,6 +161,8 @@ class DataIntegrator:
         self.data_dir = Path(data_dir)
         self.raw_dir = self.data_dir / 'raw'
         self.processed_dir = self.data_dir / 'processed'
+        self.output_file = self.processed_dir / 'integrated_features.csv'
+        self.state_file = self.processed_dir / 'integration_state.json'
         self.verbose = verbose
         
         # 确保目录存在
@@ -43,6 +170,9 @@ class DataIntegrator:
         
         # 特征工程器
         self.feature_engineer = FeatureEngineer(verbose=verbose)
+        
+        # 最近一次 load_sources 各数据源的加载耗时（秒）
+        self.load_timings: Dict[str, float] = {}
     
     def log(self, message: str):
         """打印日志"""
@@ -63,7 +193,7 @@ class DataIntegrator:
             return None
         
         try:
-            df = pd.read_csv(market_file, index_col=0, parse_dates=True)
+            df = self._read_source(market_file, 'market')
             self.log(f"Loaded market data: {len(df)} rows")
             return df
         except Exception as e:
@@ -74,22 +204,47 @@ class DataIntegrator:
         """
         加载链上数据
         
+        合并 onchain_data.csv、本地存储中的 Glassnode 指标宽表和本地区块计算的指标
+        （分别由 OnchainCollector.get_glassnode_metrics / get_chain_metrics 增量更新，
+        这里直接读取存储文件，不创建收集器、不发网络请求）
+        
         Returns:
             链上数据 DataFrame
         """
         onchain_file = self.raw_dir / 'onchain_data.csv'
         
-        if not onchain_file.exists():
-            self.log(f"Info: Onchain data not found at {onchain_file} (skipping)")
-            return None
+        df = None
+        if onchain_file.exists():
+            try:
+                df = self._read_source(onchain_file, 'onchain')
+                self.log(f"Loaded onchain data: {len(df)} rows")
+            except Exception as e:
+                self.log(f"Error loading onchain data: {e}")
+        
+        store_dir = self.raw_dir / 'store'
+        stored = {}
+        if store_dir.exists():
+            try:
+                store = SeriesStore(str(store_dir))
+                stored['Glassnode metrics'] = read_glassnode_metrics(store)
+                # 本地区块计算的指标加 chain_ 前缀，避免与 Glassnode 同名指标冲突
+                stored['local chain metrics'] = read_chain_metrics(store).add_prefix('chain_')
+            except Exception as e:
+                self.log(f"Error loading stored onchain metrics: {e}")
+        
+        for name, stored_df in stored.items():
+            if stored_df.empty:
+                continue
+            self.log(f"Loaded {name}: {len(stored_df)} rows, {len(stored_df.columns)} metrics")
+            if df is None:
+                df = stored_df
+            else:
+                new_cols = [c for c in stored_df.columns if c not in df.columns]
+                df = df.join(stored_df[new_cols], how='outer')
         
-        try:
-            df = pd.read_csv(onchain_file, index_col=0, parse_dates=True)
-            self.log(f"Loaded onchain data: {len(df)} rows")
-            return df
-        except Exception as e:
-            self.log(f"Error loading onchain data: {e}")
-            return None
+        if df is None:
+            self.log(f"Info: Onchain data not found at {onchain_file} (skipping)")
+        return df
     
     def load_macro_data(self) -> Optional[pd.DataFrame]:
         """
@@ -108,7 +263,7 @@ class DataIntegrator:
         for name, file_path in macro_files.items():
             if file_path.exists():
                 try:
-                    df = pd.read_csv(file_path, index_col=0, parse_dates=True)
+                    df = self._read_source(file_path, 'macro')
                     dfs[name] = df
                     self.log(f"Loaded {name} data: {len(df)} rows")
                 except Exception as e:
@@ -147,44 +302,69 @@ class DataIntegrator:
             return None
         
         try:
-            df = pd.read_csv(news_file, index_col=0, parse_dates=True)
+            df = self._read_source(news_file, 'news')
             self.log(f"Loaded news sentiment data: {len(df)} rows")
             return df
         except Exception as e:
             self.log(f"Error loading news sentiment data: {e}")
             return None
     
-    def integrate_all_data(self, 
-                          add_market_features: bool = True,
-                          align_method: str = 'outer',
-                          fill_method: str = 'ffill') -> pd.DataFrame:
+    def _read_source(self, path: Path, source: str) -> pd.DataFrame:
+        return read_source_csv(path, self.SOURCE_DTYPES.get(source), self.DATE_FORMAT)
+    
+    def _timed_load(self, name: str):
+        """加载一个数据源，返回 (DataFrame 或 None, 耗时秒数)"""
+        start = time.perf_counter()
+        df = getattr(self, self.SOURCE_LOADERS[name])()
+        return df, time.perf_counter() - start
+    
+    def load_sources(self,
+                     names: Optional[List[str]] = None,
+                     max_workers: int = 4,
+                     executor: str = 'thread') -> Dict[str, Optional[pd.DataFrame]]:
         """
-        整合所有数据源
+        并行加载多个数据源
+        
+        CSV 解析主要在 C 代码中完成，线程池即可并发；数据源文件很大时可用进程池
+        （结果需要在进程间序列化）。各数据源耗时记录在 self.load_timings。
         
         Args:
-            add_market_features: 是否添加市场技术指标
-            align_method: 时间对齐方法 ('inner', 'outer', 'left')
-            fill_method: 缺失值填补方法
+            names: 数据源名称（默认 SOURCE_LOADERS 中的全部）
+            max_workers: 并发数
+            executor: 'thread' 或 'process'
         
         Returns:
-            整合后的 DataFrame
+            {名称: DataFrame 或 None}（顺序与 names 一致）
         """
-        self.log("\n" + "=" * 60)
-        self.log("Starting data integration pipeline")
-        self.log("=" * 60 + "\n")
-        
-        # 1. 加载所有数据源
-        self.log("Step 1: Loading all data sources...")
-        market_df = self.load_market_data()
-        onchain_df = self.load_onchain_data()
-        macro_df = self.load_macro_data()
-        news_df = self.load_news_sentiment()
+        names = list(names or self.SOURCE_LOADERS)
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor: {executor}")
+        
+        start = time.perf_counter()
+        pool_cls = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+        with pool_cls(max_workers=max(1, min(max_workers, len(names)))) as pool:
+            if executor == 'thread':
+                futures = {name: pool.submit(self._timed_load, name) for name in names}
+            else:
+                futures = {name: pool.submit(_load_source_worker, str(self.data_dir), name) for name in names}
         
-        if market_df is None:
-            raise ValueError("Market data is required but not found!")
+        sources, self.load_timings = {}, {}
+        for name in names:
+            sources[name], self.load_timings[name] = futures[name].result()
         
-        # 2. 处理市场数据并添加技术指标
-        self.log("\nStep 2: Processing market data and adding technical indicators...")
+        elapsed = time.perf_counter() - start
+        details = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in self.load_timings.items())
+        self.log(f"Loaded {len(names)} sources in {elapsed:.2f}s "
+                 f"(sum {sum(self.load_timings.values()):.2f}s; {details})")
+        return sources
+    
+    def _prepare_sources(self,
+                         market_df: pd.DataFrame,
+                         onchain_df: Optional[pd.DataFrame],
+                         macro_df: Optional[pd.DataFrame],
+                         news_df: Optional[pd.DataFrame],
+                         add_market_features: bool) -> Dict[str, pd.DataFrame]:
+        """清洗各数据源、计算市场技术指标并添加列前缀"""
         if add_market_features:
             market_df = self.feature_engineer.process_pipeline(
                 market_df,
@@ -202,7 +382,7 @@ class DataIntegrator:
                          else col for col in market_df.columns}
         market_df = market_df.rename(columns=market_columns)
         
-        # 3. 构建数据源字典
+        # 构建数据源字典
         data_sources = {'market': market_df}
         
         if onchain_df is not None:
@@ -225,8 +405,34 @@ class DataIntegrator:
             news_df = news_df.rename(columns=news_columns)
             data_sources['news'] = news_df
         
-        # 4. 时间对齐
-        self.log(f"\nStep 3: Aligning {len(data_sources)} data sources (method={align_method})...")
+        return data_sources
+    
+    def _merge_sources(self, data_sources: Dict[str, pd.DataFrame], align_method: str,
+                       after: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        按时间索引合并各数据源
+        
+        Args:
+            data_sources: {名称: DataFrame}，第一个为基准（市场数据）
+            align_method: 'inner' / 'outer' / 'left' 为精确索引合并，'asof' 为时点对齐
+            after: 只保留该时间之后的行（增量模式）
+        """
+        if align_method == 'asof':
+            # 时点对齐：以市场数据为基准，其他数据源需要完整历史来查找最近可用值
+            names = list(data_sources)
+            base = data_sources[names[0]]
+            if after is not None:
+                base = base[base.index > after]
+            specs = {
+                name: {**self.ASOF_SOURCES.get(name, {}), 'data': data_sources[name], 'prefix': ''}
+                for name in names[1:]
+            }
+            aligned = asof_join(base.index, specs)
+            self.log(f"  As-of aligned {len(specs)} sources onto {names[0]} ({len(base)} rows)")
+            return pd.concat([base, aligned], axis=1)
+        
+        if after is not None:
+            data_sources = {name: df[df.index > after] for name, df in data_sources.items()}
         
         result = None
         for name, df in data_sources.items():
@@ -234,18 +440,19 @@ class DataIntegrator:
                 result = df
                 self.log(f"  Base: {name} ({len(df)} rows, {len(df.columns)} columns)")
             else:
-                before_rows = len(result)
                 result = pd.merge(result, df, 
                                 left_index=True, right_index=True, 
                                 how=align_method)
                 self.log(f"  Merged: {name} ({len(df)} rows, {len(df.columns)} columns) -> {len(result)} rows")
-        
-        # 5. 处理缺失值
-        self.log(f"\nStep 4: Handling missing values (method={fill_method})...")
+        return result
+    
+    def _fill_missing(self, result: pd.DataFrame, align_method: str, fill_method: str) -> pd.DataFrame:
+        """填补合并后的缺失值，并删除缺失过多的行"""
         missing_before = result.isnull().sum().sum()
         self.log(f"  Missing values before: {missing_before}")
         
-        if fill_method and missing_before > 0:
+        # 时点对齐已按陈旧度上限前向填充，不再额外填补
+        if fill_method and missing_before > 0 and align_method != 'asof':
             result = self.feature_engineer.handle_missing_values(
                 result, strategy=fill_method, limit=5
             )
@@ -254,13 +461,73 @@ class DataIntegrator:
         
         missing_after = result.isnull().sum().sum()
         self.log(f"  Missing values after: {missing_after}")
+        return result
+    
+    def integrate_all_data(self, 
+                          add_market_features: bool = True,
+                          align_method: str = 'outer',
+                          fill_method: str = 'ffill',
+                          incremental: bool = False) -> pd.DataFrame:
+        """
+        整合所有数据源
+        
+        Args:
+            add_market_features: 是否添加市场技术指标
+            align_method: 时间对齐方法 ('inner', 'outer', 'left', 'asof')
+            fill_method: 缺失值填补方法（'asof' 模式下不使用）
+            incremental: 是否使用增量模式（见 integrate_incremental）
+        
+        Returns:
+            整合后的 DataFrame（增量模式下只返回本次追加的行）
+        """
+        if incremental:
+            return self.integrate_incremental(add_market_features, align_method, fill_method)
+        
+        self.log("\n" + "=" * 60)
+        self.log("Starting data integration pipeline")
+        self.log("=" * 60 + "\n")
+        
+        # 1. 加载所有数据源
+        self.log("Step 1: Loading all data sources...")
+        sources = self.load_sources()
+        market_df, onchain_df, macro_df, news_df = (
+            sources['market'], sources['onchain'], sources['macro'], sources['news']
+        )
+        
+        if market_df is None:
+            raise ValueError("Market data is required but not found!")
         
-        # 6. 保存结果
-        output_file = self.processed_dir / 'integrated_features.csv'
-        result.to_csv(output_file)
-        self.log(f"\nStep 5: Saved integrated data to {output_file}")
+        high_water = self._high_water(market=market_df, onchain=onchain_df, macro=macro_df, news=news_df)
         
-        # 7. 生成数据报告
+        # 2. 处理市场数据并添加技术指标
+        self.log("\nStep 2: Processing market data and adding technical indicators...")
+        self.feature_engineer.set_recursive_seed(None)
+        data_sources = self._prepare_sources(market_df, onchain_df, macro_df, news_df, add_market_features)
+        feature_state = self.feature_engineer.recursive_state(high_water['market'])
+        
+        # 3. 时间对齐
+        self.log(f"\nStep 3: Aligning {len(data_sources)} data sources (method={align_method})...")
+        result = self._merge_sources(data_sources, align_method)
+        
+        # 4. 处理缺失值
+        self.log(f"\nStep 4: Handling missing values (method={fill_method})...")
+        result = self._fill_missing(result, align_method, fill_method)
+        
+        # 5. 保存结果（原子写入）并记录增量状态
+        tmp_file = self.output_file.with_name(self.output_file.name + '.tmp')
+        result.to_csv(tmp_file)
+        os.replace(tmp_file, self.output_file)
+        self._save_state({
+            'params': self._state_params(add_market_features, align_method, fill_method),
+            'high_water': high_water,
+            'last_index': result.index[-1],
+            'columns': list(result.columns),
+            'file_size': self.output_file.stat().st_size,
+            'feature_state': feature_state,
+        })
+        self.log(f"\nStep 5: Saved integrated data to {self.output_file}")
+        
+        # 6. 生成数据报告
         self.log("\n" + "=" * 60)
         self.log("Data Integration Summary")
         self.log("=" * 60)
@@ -275,6 +542,375 @@ class DataIntegrator:
         
         return result
     
+    # ==================== 增量整合 ====================
+    
+    @staticmethod
+    def _high_water(**sources: Optional[pd.DataFrame]) -> Dict[str, pd.Timestamp]:
+        """各数据源的最新时间戳"""
+        return {
+            name: pd.Timestamp(df.index.max())
+            for name, df in sources.items()
+            if df is not None and not df.empty
+        }
+    
+    @staticmethod
+    def _state_params(add_market_features: bool, align_method: str, fill_method: str) -> Dict:
+        return {'add_market_features': add_market_features, 'align_method': align_method,
+                'fill_method': fill_method}
+    
+    def _save_state(self, state: Dict):
+        """原子写入增量状态"""
+        state = dict(state)
+        state['high_water'] = {k: v.isoformat() for k, v in state['high_water'].items()}
+        state['last_index'] = pd.Timestamp(state['last_index']).isoformat()
+        state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        
+        tmp_file = self.state_file.with_name(self.state_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+    
+    def _load_state(self) -> Optional[Dict]:
+        """读取增量状态（不存在或与输出文件不一致时返回 None）"""
+        if not self.state_file.exists() or not self.output_file.exists():
+            return None
+        
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        state['high_water'] = {k: pd.Timestamp(v) for k, v in state['high_water'].items()}
+        state['last_index'] = pd.Timestamp(state['last_index'])
+        
+        # 上次追加中断：截断到最后一次成功提交的位置
+        size = self.output_file.stat().st_size
+        if size > state['file_size']:
+            self.log(f"Recovering {self.output_file.name}: truncating interrupted append")
+            with open(self.output_file, 'r+b') as f:
+                f.truncate(state['file_size'])
+        elif size < state['file_size']:
+            return None
+        
+        return state
+    
+    def integrate_incremental(self,
+                              add_market_features: bool = True,
+                              align_method: str = 'outer',
+                              fill_method: str = 'ffill') -> pd.DataFrame:
+        """
+        增量整合：只处理各数据源高水位之后的新数据，追加到 integrated_features.csv
+        
+        - 市场数据从文件末尾读取「回看窗口 (FEATURE_LOOKBACK 行) + 新数据」计算技术指标，
+          EMA / MACD / OBV / PVT 等递归特征用上次保存的状态续算，与全量计算一致
+        - 只合并最后一个已整合时间戳之后的新行，缺失值以已整合的最后一行为起点填补
+        - 追加写入后再原子更新状态文件；中断的追加会在下次运行时截断回滚
+        
+        以下情况自动回退到全量整合：无状态文件、参数变化、出现新列。
+        早于最后已整合时间戳的补录数据不会回写（需要全量整合）；
+        异常值标记基于回看窗口的分位数计算。
+        
+        Args:
+            add_market_features: 是否添加市场技术指标
+            align_method: 时间对齐方法 ('inner', 'outer', 'left', 'asof')
+            fill_method: 缺失值填补方法
+        
+        Returns:
+            本次追加的行
+        """
+        params = self._state_params(add_market_features, align_method, fill_method)
+        state = self._load_state()
+        if state is None or state.get('params') != params or 'market' not in state['high_water']:
+            self.log("No usable incremental state, running full integration")
+            return self.integrate_all_data(add_market_features, align_method, fill_method)
+        
+        high_water = state['high_water']
+        last_index = state['last_index']
+        market_file = self.raw_dir / 'bitcoin_price.csv'
+        if not market_file.exists():
+            raise ValueError("Market data is required but not found!")
+        
+        # 1. 只读取市场数据末尾（回看窗口 + 新数据）
+        lookback = self.feature_engineer.FEATURE_LOOKBACK
+        market_df = read_csv_tail(market_file, after=high_water['market'], lookback=lookback)
+        sources = self.load_sources(['onchain', 'macro', 'news'])
+        onchain_df, macro_df, news_df = sources['onchain'], sources['macro'], sources['news']
+        
+        new_high_water = self._high_water(market=market_df, onchain=onchain_df, macro=macro_df, news=news_df)
+        updated = [name for name, ts in new_high_water.items()
+                   if name not in high_water or ts > high_water[name]]
+        if not updated:
+            self.log("Integrated data is up to date")
+            return pd.DataFrame(columns=state['columns'])
+        self.log(f"Incremental update: {', '.join(updated)} "
+                 f"(market window {len(market_df)} rows, lookback {lookback})")
+        
+        # 2. 在窗口上计算特征，递归特征从上次的状态续算
+        self.feature_engineer.set_recursive_seed(high_water['market'], state.get('feature_state'))
+        try:
+            data_sources = self._prepare_sources(market_df, onchain_df, macro_df, news_df, add_market_features)
+            feature_state = self.feature_engineer.recursive_state(new_high_water['market'])
+        finally:
+            self.feature_engineer.set_recursive_seed(None)
+        
+        if not feature_state:
+            feature_state = state.get('feature_state', {})
+        
+        # 3. 只合并最后已整合时间戳之后的新行
+        result = self._merge_sources(data_sources, align_method, after=last_index)
+        
+        columns = state['columns']
+        extra = [c for c in result.columns if c not in columns]
+        if extra:
+            self.log(f"New columns detected ({', '.join(extra[:5])}), running full integration")
+            return self.integrate_all_data(add_market_features, align_method, fill_method)
+        result = result.reindex(columns=columns)
+        
+        # 4. 以已整合的最后一行为起点填补缺失值
+        if fill_method and align_method != 'asof' and len(result) and result.isnull().values.any():
+            last_row = read_csv_tail(self.output_file, lookback=1)
+            combined = pd.concat([last_row.reindex(columns=columns), result])
+            combined = self.feature_engineer.handle_missing_values(combined, strategy=fill_method, limit=5)
+            result = combined.iloc[1:]
+            result = result.dropna(thresh=len(columns) * 0.7)
+        
+        # 5. 追加写入，再原子更新状态
+        if len(result):
+            with open(self.output_file, 'a', encoding='utf-8', newline='') as f:
+                result.to_csv(f, header=False, lineterminator=os.linesep)
+                f.flush()
+                os.fsync(f.fileno())
+            last_index = result.index[-1]
+        
+        self._save_state({
+            'params': params,
+            'high_water': {**high_water, **new_high_water},
+            'last_index': last_index,
+            'columns': columns,
+            'file_size': self.output_file.stat().st_size,
+            'feature_state': feature_state,
+        })
+        self.log(f"Appended {len(result)} rows to {self.output_file} (last index {last_index})")
+        return result
+    
+    # ==================== 分块整合 ====================
+    
+    @staticmethod
+    def _naive(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+        return index.tz_localize(None) if index.tz is not None else index
+    
+    def _iter_periods(self, market_file: Path, freq: str, read_rows: int):
+        """流式读取市场数据，按分区逐个产出 (分区, 行)（文件需按时间排序）"""
+        emitted = set()
+        buffer = None
+        reader = pd.read_csv(market_file, index_col=0, parse_dates=True, chunksize=read_rows)
+        for piece in reader:
+            buffer = piece if buffer is None else pd.concat([buffer, piece])
+            periods = self._naive(buffer.index).to_period(freq)
+            # 最后一个分区可能还没读完，留到下一块
+            done = periods < periods[-1]
+            if not done.any():
+                continue
+            for period, rows in buffer[done].groupby(periods[done], sort=True):
+                if period in emitted:
+                    raise ValueError(f"Market data is not sorted by time (period {period} seen twice)")
+                emitted.add(period)
+                yield period, rows
+            buffer = buffer[~done]
+        
+        if buffer is not None and len(buffer):
+            periods = self._naive(buffer.index).to_period(freq)
+            for period, rows in buffer.groupby(periods, sort=True):
+                if period in emitted:
+                    raise ValueError(f"Market data is not sorted by time (period {period} seen twice)")
+                yield period, rows
+    
+    def _slice_sources(self, others: Dict[str, Optional[pd.DataFrame]], window_start: pd.Timestamp,
+                       period_end: pd.Timestamp, first: bool, last: bool,
+                       align_method: str) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        按分块切分其他数据源：首个分块包含更早的行，最后一个分块包含更晚的行；
+        时点对齐需要分块结束前的完整历史来查找最近可用值
+        """
+        sliced = {}
+        for name, df in others.items():
+            if df is None:
+                sliced[name] = None
+                continue
+            naive = self._naive(pd.DatetimeIndex(df.index))
+            mask = np.ones(len(df), dtype=bool)
+            if not last:
+                mask &= naive < period_end
+            if not first and align_method != 'asof':
+                mask &= naive >= window_start
+            sliced[name] = df[mask]
+        return sliced
+    
+    def _iter_chunk_tasks(self, market_file: Path, others: Dict[str, Optional[pd.DataFrame]],
+                          freq: str, lookback: int, read_rows: int, align_method: str):
+        """
+        生成分块任务
+        
+        Yields:
+            (分区名, 任务参数)，任务参数传给 _integrate_window
+        """
+        history = None
+        previous = None
+        periods = self._iter_periods(market_file, freq, read_rows)
+        for item in _with_sentinel(periods):
+            if previous is not None:
+                period, rows = previous
+                first, last = history is None, item is None
+                window = rows if first else pd.concat([history, rows])
+                task = {
+                    'market_window': window,
+                    'others': self._slice_sources(others, self._naive(window.index)[0],
+                                                  (period + 1).start_time, first, last, align_method),
+                    'start': None if first else rows.index[0],
+                    'anchor': None if first else history.index[-1],
+                    'end': rows.index[-1],
+                }
+                yield PartitionedStore.period_name(period), task
+                history = window.iloc[-lookback:].copy()
+            previous = item
+    
+    def _integrate_window(self,
+                          market_window: pd.DataFrame,
+                          others: Dict[str, Optional[pd.DataFrame]],
+                          start: Optional[pd.Timestamp],
+                          anchor: Optional[pd.Timestamp],
+                          end: pd.Timestamp,
+                          add_market_features: bool,
+                          align_method: str,
+                          fill_method: str,
+                          seed: Optional[Dict[str, float]] = None):
+        """
+        整合一个分块：在「回看行 + 分区行」上计算特征、合并、填补，只返回 start 及之后的行
+        
+        Args:
+            seed: anchor 行的递归特征真实值（None 表示不续算）
+        
+        Returns:
+            (结果 DataFrame, {'anchor': anchor 行的递归特征值, 'end': 最后一行的递归特征值})
+        """
+        self.feature_engineer.set_recursive_seed(anchor if seed is not None else None, seed)
+        try:
+            data_sources = self._prepare_sources(
+                market_window, others['onchain'], others['macro'], others['news'], add_market_features
+            )
+            states = {
+                'anchor': self.feature_engineer.recursive_state(anchor) if anchor is not None else {},
+                'end': self.feature_engineer.recursive_state(end),
+            }
+        finally:
+            self.feature_engineer.set_recursive_seed(None)
+        
+        result = self._merge_sources(data_sources, align_method)
+        result = self._fill_missing(result, align_method, fill_method)
+        if start is not None:
+            result = result[result.index >= start]
+        return result, states
+    
+    def integrate_chunked(self,
+                          add_market_features: bool = True,
+                          align_method: str = 'outer',
+                          fill_method: str = 'ffill',
+                          partition_freq: str = 'M',
+                          processes: Optional[int] = None,
+                          read_rows: int = 200_000,
+                          store_dir: Optional[str] = None) -> Dict:
+        """
+        分块整合：按时间分区流式处理，结果写入分区列式存储（默认 processed/integrated/）
+        
+        - 市场数据每次读取 read_rows 行（文件需按时间排序），每个分区带上之前的回看行
+          一起计算技术指标，只保留分区内的行；内存占用与分区大小相关，与历史长度无关
+        - 顺序处理时 EMA / MACD / OBV / PVT 等递归特征用上一个分区的状态续算（同增量模式），
+          与全量计算一致
+        - processes > 1 时用进程池并行处理分区：回看行延长到 EMA_WARMUP 使 EMA 收敛，
+          累计量（OBV / PVT）的常数偏移由主进程按分区顺序修正；在途分区数不超过 2 × processes
+        - 链上 / 宏观 / 新闻数据为日频，整体加载后按分区切分
+        
+        与全量整合的差异：异常值标记按分块内的分位数计算。
+        
+        Args:
+            add_market_features: 是否添加市场技术指标
+            align_method: 时间对齐方法 ('inner', 'outer', 'left', 'asof')
+            fill_method: 缺失值填补方法
+            partition_freq: 分区粒度（'M' 按月、'W' 按周、'D' 按天）
+            processes: 并行进程数（None / 1 表示顺序处理）
+            read_rows: 每次读取的市场数据行数
+            store_dir: 存储目录
+        
+        Returns:
+            {'store': PartitionedStore, 'partitions': 分区数, 'rows': 行数,
+             'columns': 列数, 'seconds': 耗时}
+        """
+        market_file = self.raw_dir / 'bitcoin_price.csv'
+        if not market_file.exists():
+            raise ValueError("Market data is required but not found!")
+        
+        started = time.time()
+        store = PartitionedStore(str(store_dir or self.processed_dir / 'integrated'), freq=partition_freq)
+        store.reset(freq=partition_freq)
+        
+        parallel = processes is not None and processes > 1
+        lookback = self.feature_engineer.FEATURE_LOOKBACK
+        if parallel and add_market_features:
+            lookback = max(lookback, self.feature_engineer.EMA_WARMUP)
+        
+        self.log(f"Chunked integration: partitions={partition_freq}, lookback={lookback}, "
+                 f"processes={processes or 1}, store={store.root}")
+        others = self.load_sources(['onchain', 'macro', 'news'])
+        params = {'add_market_features': add_market_features, 'align_method': align_method,
+                  'fill_method': fill_method}
+        tasks = self._iter_chunk_tasks(market_file, others, store.freq, lookback, read_rows, align_method)
+        
+        # 子整合器不打印逐步日志
+        worker = type(self)(data_dir=str(self.data_dir), verbose=False)
+        summary = {'store': store, 'partitions': 0, 'rows': 0, 'columns': 0, 'seconds': 0.0}
+        state: Dict[str, float] = {}
+        
+        def commit(name: str, result: pd.DataFrame, states: Dict[str, Dict[str, float]]):
+            nonlocal state
+            if parallel:
+                # 并行分块的累计量从 0 起算：加上与上一分块末尾的常数偏移
+                offsets = {
+                    key: state[key] - states['anchor'][key]
+                    for key in self.feature_engineer.CUMULATIVE_FEATURES
+                    if key in state and key in states['anchor']
+                }
+                for key, offset in offsets.items():
+                    if f'market_{key}' in result.columns:
+                        result[f'market_{key}'] += offset
+                state = {key: value + offsets.get(key, 0.0) for key, value in states['end'].items()}
+            else:
+                state = states['end']
+            
+            if len(result):
+                store.write_partition(name, result)
+                summary['partitions'] += 1
+                summary['rows'] += len(result)
+            self.log(f"  Partition {name}: {len(result)} rows")
+        
+        if parallel:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                inflight = deque()
+                for name, task in tasks:
+                    inflight.append((name, pool.submit(_integrate_window_worker, str(self.data_dir), {**task, **params})))
+                    if len(inflight) >= 2 * processes:
+                        name, future = inflight.popleft()
+                        commit(name, *future.result())
+                while inflight:
+                    name, future = inflight.popleft()
+                    commit(name, *future.result())
+        else:
+            for name, task in tasks:
+                seed = state if task['anchor'] is not None else None
+                commit(name, *worker._integrate_window(**task, **params, seed=seed))
+        
+        summary['columns'] = len(store.columns or [])
+        summary['seconds'] = time.time() - started
+        self.log(f"Chunked integration done: {summary['rows']} rows x {summary['columns']} columns "
+                 f"in {summary['partitions']} partitions ({summary['seconds']:.1f}s)")
+        return summary
+    
     def create_feature_groups(self, df: pd.DataFrame) -> Dict[str, List[str]]:
         """
         将特征分组
@@ -301,6 +937,22 @@ class DataIntegrator:
         return groups
 
 
+def _with_sentinel(iterable):
+    """依次产出元素，最后产出 None（用于识别最后一个元素）"""
+    yield from iterable
+    yield None
+
+
+def _load_source_worker(data_dir: str, name: str):
+    """进程池任务：加载一个数据源"""
+    return DataIntegrator(data_dir=data_dir, verbose=False)._timed_load(name)
+
+
+def _integrate_window_worker(data_dir: str, task: Dict):
+    """进程池任务：整合一个分块"""
+    return DataIntegrator(data_dir=data_dir, verbose=False)._integrate_window(**task)
+
+
 def main():
     """主函数 - 运行数据整合"""
     print("\n" + "=" * 60)
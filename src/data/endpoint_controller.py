@@ -0,0 +1,264 @@
+"""
+按端点的自适应并发控制与熔断
+
+功能：
+1. AIMD 并发控制：请求成功且延迟达标时加性增加并发上限，
+   出错或延迟超标时乘性减少
+2. 熔断器：连续失败达到阈值后打开，直接返回缓存/最近一次成功的数据，
+   冷却期后进入半开状态放行探测请求，探测成功即恢复
+3. 最近一次成功响应缓存（熔断时的降级数据）
+
+端点按主机名划分（同一主机共享限流配额）。
+由 http_client.PooledSession 在每次请求时调用，收集器无需改动。
+
+依赖：无（标准库）
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class CircuitBreaker:
+    """熔断器（closed -> open -> half_open -> closed）"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        """
+        初始化
+
+        Args:
+            failure_threshold: 连续失败多少次后打开熔断
+            recovery_timeout: 打开后多久进入半开状态（秒）
+            half_open_max_calls: 半开状态下允许同时进行的探测请求数
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.open_count = 0
+
+    @property
+    def state(self) -> str:
+        """当前状态（会根据冷却时间自动从 open 转为 half_open）"""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+    def allow(self) -> bool:
+        """是否放行本次请求"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def record_success(self):
+        """记录成功（半开探测成功则关闭熔断）"""
+        with self._lock:
+            self._failures = 0
+            if self._state == self.HALF_OPEN:
+                self._half_open_calls = max(self._half_open_calls - 1, 0)
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        """记录失败（半开探测失败或连续失败达到阈值则打开熔断）"""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.open_count += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+
+class AIMDLimiter:
+    """AIMD 自适应并发限制器"""
+
+    def __init__(self,
+                 initial_limit: float = 2.0,
+                 min_limit: float = 1.0,
+                 max_limit: float = 8.0,
+                 decrease_factor: float = 0.5,
+                 latency_target: float = 3.0):
+        """
+        初始化
+
+        Args:
+            initial_limit: 初始并发上限
+            min_limit: 最小并发上限
+            max_limit: 最大并发上限
+            decrease_factor: 乘性减少因子
+            latency_target: 目标延迟（秒），超过视为拥塞
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+
+        self._cond = threading.Condition()
+        self._limit = initial_limit
+        self._in_flight = 0
+
+    @property
+    def limit(self) -> float:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        获取一个并发槽位
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            是否获取成功
+        """
+        with self._cond:
+            acquired = self._cond.wait_for(lambda: self._in_flight < int(self._limit), timeout=timeout)
+            if acquired:
+                self._in_flight += 1
+            return acquired
+
+    def cancel(self):
+        """释放槽位但不调整并发上限（请求未实际发出）"""
+        with self._cond:
+            self._in_flight = max(self._in_flight - 1, 0)
+            self._cond.notify_all()
+
+    def release(self, latency: float, ok: bool):
+        """
+        释放槽位并根据结果调整并发上限
+
+        Args:
+            latency: 本次请求耗时（秒）
+            ok: 是否成功
+        """
+        with self._cond:
+            self._in_flight = max(self._in_flight - 1, 0)
+            if ok and latency <= self.latency_target:
+                # 加性增加：每个并发窗口约 +1
+                self._limit = min(self.max_limit, self._limit + 1.0 / max(self._limit, 1.0))
+            else:
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+            self._cond.notify_all()
+
+
+class Endpoint:
+    """单个端点的控制状态"""
+
+    def __init__(self, name: str, breaker: CircuitBreaker, limiter: AIMDLimiter, cache_size: int = 256):
+        self.name = name
+        self.breaker = breaker
+        self.limiter = limiter
+        self.cache_size = cache_size
+        self.short_circuits = 0
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def remember(self, key: str, value):
+        """缓存最近一次成功的结果（LRU）"""
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def last_known(self, key: str):
+        """获取最近一次成功的结果（不存在返回 None）"""
+        with self._cache_lock:
+            return self._cache.get(key)
+
+
+class EndpointController:
+    """按端点管理熔断器与并发限制器"""
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0,
+                 initial_limit: float = 2.0,
+                 max_limit: float = 8.0,
+                 latency_target: float = 3.0):
+        """
+        初始化（参数为新端点的默认配置）
+
+        Args:
+            failure_threshold: 熔断阈值（连续失败次数）
+            recovery_timeout: 熔断冷却时间（秒）
+            initial_limit: 初始并发上限
+            max_limit: 最大并发上限
+            latency_target: 目标延迟（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.initial_limit = initial_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Endpoint] = {}
+
+    def get(self, name: str) -> Endpoint:
+        """获取（或创建）端点状态"""
+        with self._lock:
+            endpoint = self._endpoints.get(name)
+            if endpoint is None:
+                endpoint = Endpoint(
+                    name,
+                    CircuitBreaker(self.failure_threshold, self.recovery_timeout),
+                    AIMDLimiter(self.initial_limit, max_limit=self.max_limit,
+                                latency_target=self.latency_target)
+                )
+                self._endpoints[name] = endpoint
+            return endpoint
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        获取各端点状态
+
+        Returns:
+            {endpoint: {circuit, concurrency_limit, in_flight, short_circuits, circuit_opens}}
+        """
+        with self._lock:
+            endpoints = list(self._endpoints.values())
+
+        return {
+            ep.name: {
+                'circuit': ep.breaker.state,
+                'concurrency_limit': round(ep.limiter.limit, 2),
+                'in_flight': ep.limiter.in_flight,
+                'short_circuits': ep.short_circuits,
+                'circuit_opens': ep.breaker.open_count,
+            }
+            for ep in endpoints
+        }
+
+    def reset(self):
+        """清空所有端点状态"""
+        with self._lock:
+            self._endpoints.clear()
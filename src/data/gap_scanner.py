@@ -0,0 +1,472 @@
+"""
+数据缺口检测与定向回补
+
+功能：
+1. 按预期日历检查每个已存储序列（加密货币 7x24，宏观数据为工作日）
+2. 生成紧凑的缺口索引（连续缺失合并为一个区间）
+3. 只针对缺失区间并发回补（不重新下载整段历史）
+4. 输出各数据源的覆盖率报告
+
+数据源描述（source spec）:
+    {
+        'path': 'data/raw/bitcoin_price.csv',   # CSV 文件，或
+        'key': 'coingecko/bitcoin_usd_daily',    # SeriesStore key，或
+        'data': DataFrame,                       # 内存数据
+        'calendar': 'crypto',                    # 'crypto' (7x24) / 'macro' (工作日)
+        'freq': 'D',                             # 采样频率
+        'start': None, 'end': None               # 预期区间（默认取序列首尾）
+    }
+
+依赖：pandas
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+from pandas.tseries.holiday import USFederalHolidayCalendar
+from pandas.tseries.offsets import CustomBusinessDay
+
+# 添加项目根目录和 src 目录到路径（调度器以 src.data.gap_scanner 导入）
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from series_store import SeriesStore
+except ImportError:
+    from src.data.series_store import SeriesStore
+
+
+# 回补函数签名: (start, end) -> DataFrame
+Backfiller = Callable[[pd.Timestamp, pd.Timestamp], pd.DataFrame]
+
+
+class GapScanner:
+    """数据缺口扫描器"""
+
+    CALENDARS = ('crypto', 'macro')
+
+    def __init__(self,
+                 raw_dir: str = 'data/raw',
+                 store: Optional[SeriesStore] = None,
+                 exclude_holidays: bool = True,
+                 verbose: bool = True):
+        """
+        初始化
+
+        Args:
+            raw_dir: 原始数据目录
+            store: 本地序列存储（默认 raw_dir/store）
+            exclude_holidays: 宏观日历是否排除美国联邦假日
+            verbose: 是否打印详细信息
+        """
+        self.raw_dir = Path(raw_dir)
+        self.store = store or SeriesStore(str(self.raw_dir / 'store'))
+        self.exclude_holidays = exclude_holidays
+        self.verbose = verbose
+
+    def log(self, message: str):
+        """打印日志"""
+        if self.verbose:
+            print(f"[GapScanner] {message}")
+
+    # ==================== 数据源 ====================
+
+    def default_sources(self) -> Dict[str, Dict]:
+        """
+        扫描原始数据目录，生成默认数据源描述
+
+        Returns:
+            {source_name: spec}
+        """
+        sources = {}
+
+        market_file = self.raw_dir / 'bitcoin_price.csv'
+        if market_file.exists():
+            sources['market'] = {'path': str(market_file), 'calendar': 'crypto', 'freq': 'D'}
+
+        onchain_file = self.raw_dir / 'onchain_data.csv'
+        if onchain_file.exists():
+            sources['onchain'] = {'path': str(onchain_file), 'calendar': 'crypto', 'freq': 'D'}
+
+        for path in sorted(self.raw_dir.glob('macro_*.csv')):
+            name = path.stem
+            if name == 'macro_snapshot':
+                continue
+            sources[name] = {'path': str(path), 'calendar': 'macro', 'freq': 'D'}
+
+        for key in self.store.keys():
+            freq = 'h' if key.endswith('_hourly') else 'D'
+            sources[key] = {'key': key, 'calendar': 'crypto', 'freq': freq}
+
+        return sources
+
+    def _load(self, spec: Dict) -> pd.DataFrame:
+        """按描述加载序列"""
+        if spec.get('data') is not None:
+            return spec['data']
+        if spec.get('key'):
+            return self.store.read(spec['key'])
+        if spec.get('path') and os.path.exists(spec['path']):
+            df = pd.read_csv(spec['path'], index_col=0)
+            df.index = pd.to_datetime(df.index, errors='coerce')
+            return df[df.index.notna()]
+        return pd.DataFrame()
+
+    # ==================== 缺口检测 ====================
+
+    def expected_index(self, start, end, calendar: str = 'crypto', freq: str = 'D') -> pd.DatetimeIndex:
+        """
+        生成预期时间索引
+
+        Args:
+            start: 起始时间
+            end: 结束时间
+            calendar: 'crypto' (7x24) 或 'macro' (工作日)
+            freq: 采样频率（宏观日历仅支持日频）
+
+        Returns:
+            DatetimeIndex
+        """
+        if calendar not in self.CALENDARS:
+            raise ValueError(f"Unknown calendar: {calendar}")
+
+        start = pd.Timestamp(start).floor(freq)
+        end = pd.Timestamp(end).floor(freq)
+
+        if calendar == 'crypto':
+            return pd.date_range(start, end, freq=freq)
+
+        if self.exclude_holidays:
+            return pd.date_range(start, end, freq=CustomBusinessDay(calendar=USFederalHolidayCalendar()))
+        return pd.bdate_range(start, end)
+
+    def find_gaps(self, index: pd.DatetimeIndex,
+                  calendar: str = 'crypto',
+                  freq: str = 'D',
+                  start=None,
+                  end=None) -> pd.DataFrame:
+        """
+        检测单个序列的缺口
+
+        Args:
+            index: 序列的时间索引
+            calendar: 预期日历
+            freq: 采样频率
+            start: 预期起始时间（默认序列首个时间点）
+            end: 预期结束时间（默认序列最后时间点）
+
+        Returns:
+            DataFrame with start, end, n_missing（每行一个连续缺失区间）
+        """
+        columns = ['start', 'end', 'n_missing']
+        if len(index) == 0 and (start is None or end is None):
+            return pd.DataFrame(columns=columns)
+
+        observed = pd.DatetimeIndex(index).floor(freq).unique()
+        start = start if start is not None else observed.min()
+        end = end if end is not None else observed.max()
+
+        expected = self.expected_index(start, end, calendar, freq)
+        is_missing = ~expected.isin(observed)
+        if not is_missing.any():
+            return pd.DataFrame(columns=columns)
+
+        # 游程编码：连续缺失的位置合并为一个区间
+        positions = pd.Series(range(len(expected)))[is_missing]
+        run_id = (positions.diff() != 1).cumsum()
+        runs = positions.groupby(run_id).agg(['first', 'last', 'size'])
+
+        return pd.DataFrame({
+            'start': expected[runs['first'].values],
+            'end': expected[runs['last'].values],
+            'n_missing': runs['size'].values,
+        })
+
+    def scan(self, sources: Optional[Dict[str, Dict]] = None) -> pd.DataFrame:
+        """
+        扫描所有数据源，生成缺口索引
+
+        Args:
+            sources: 数据源描述（默认 default_sources()）
+
+        Returns:
+            DataFrame with source, start, end, n_missing
+        """
+        sources = sources if sources is not None else self.default_sources()
+        frames = []
+
+        for name, spec in sources.items():
+            df = self._load(spec)
+            gaps = self.find_gaps(df.index,
+                                  calendar=spec.get('calendar', 'crypto'),
+                                  freq=spec.get('freq', 'D'),
+                                  start=spec.get('start'),
+                                  end=spec.get('end'))
+            if not gaps.empty:
+                gaps.insert(0, 'source', name)
+                frames.append(gaps)
+                self.log(f"{name}: {len(gaps)} 个缺口, 共缺失 {gaps['n_missing'].sum()} 个点")
+
+        if not frames:
+            self.log("未发现缺口")
+            return pd.DataFrame(columns=['source', 'start', 'end', 'n_missing'])
+
+        return pd.concat(frames, ignore_index=True)
+
+    def coverage_report(self, sources: Optional[Dict[str, Dict]] = None) -> pd.DataFrame:
+        """
+        各数据源覆盖率报告
+
+        Args:
+            sources: 数据源描述（默认 default_sources()）
+
+        Returns:
+            DataFrame (index=source) with calendar, freq, first, last, expected,
+            present, missing, coverage_pct, n_gaps, max_gap
+        """
+        sources = sources if sources is not None else self.default_sources()
+        rows = []
+
+        for name, spec in sources.items():
+            df = self._load(spec)
+            calendar = spec.get('calendar', 'crypto')
+            freq = spec.get('freq', 'D')
+
+            if df.empty and (spec.get('start') is None or spec.get('end') is None):
+                rows.append({'source': name, 'calendar': calendar, 'freq': freq,
+                             'expected': 0, 'present': 0, 'missing': 0,
+                             'coverage_pct': 0.0, 'n_gaps': 0, 'max_gap': 0})
+                continue
+
+            observed = df.index.floor(freq).unique()
+            start = spec.get('start') if spec.get('start') is not None else observed.min()
+            end = spec.get('end') if spec.get('end') is not None else observed.max()
+            expected = self.expected_index(start, end, calendar, freq)
+            gaps = self.find_gaps(df.index, calendar, freq, start, end)
+            missing = int(gaps['n_missing'].sum()) if not gaps.empty else 0
+
+            rows.append({
+                'source': name,
+                'calendar': calendar,
+                'freq': freq,
+                'first': expected.min() if len(expected) else pd.NaT,
+                'last': expected.max() if len(expected) else pd.NaT,
+                'expected': len(expected),
+                'present': len(expected) - missing,
+                'missing': missing,
+                'coverage_pct': (1 - missing / len(expected)) * 100 if len(expected) else 0.0,
+                'n_gaps': len(gaps),
+                'max_gap': int(gaps['n_missing'].max()) if not gaps.empty else 0,
+            })
+
+        return pd.DataFrame(rows).set_index('source') if rows else pd.DataFrame()
+
+    # ==================== 定向回补 ====================
+
+    @staticmethod
+    def merge_gaps(gaps: pd.DataFrame, max_distance: pd.Timedelta) -> pd.DataFrame:
+        """
+        合并间隔很近的缺口（减少请求次数）
+
+        Args:
+            gaps: 缺口索引
+            max_distance: 同一数据源内，两个缺口间隔不超过该值时合并
+
+        Returns:
+            合并后的缺口索引
+        """
+        if gaps.empty:
+            return gaps
+
+        merged = []
+        for source, group in gaps.sort_values(['source', 'start']).groupby('source', sort=False):
+            current = None
+            for row in group.itertuples(index=False):
+                if current is not None and row.start - current['end'] <= max_distance:
+                    current['end'] = row.end
+                    current['n_missing'] += row.n_missing
+                else:
+                    if current is not None:
+                        merged.append(current)
+                    current = {'source': source, 'start': row.start, 'end': row.end, 'n_missing': row.n_missing}
+            merged.append(current)
+
+        return pd.DataFrame(merged)
+
+    def backfill(self,
+                 gaps: pd.DataFrame,
+                 backfillers: Dict[str, Backfiller],
+                 sources: Optional[Dict[str, Dict]] = None,
+                 max_workers: int = 4,
+                 merge_within: Optional[pd.Timedelta] = pd.Timedelta(days=3)) -> pd.DataFrame:
+        """
+        并发回补缺失区间，并写回对应的数据源
+
+        Args:
+            gaps: 缺口索引（scan() 的输出）
+            backfillers: {source_name: fn(start, end) -> DataFrame}
+            sources: 数据源描述（用于写回，默认 default_sources()）
+            max_workers: 并发数
+            merge_within: 合并间隔小于该值的缺口（None 表示不合并）
+
+        Returns:
+            DataFrame with source, start, end, rows, status, seconds
+        """
+        sources = sources if sources is not None else self.default_sources()
+        if merge_within is not None:
+            gaps = self.merge_gaps(gaps, merge_within)
+
+        tasks = [row for row in gaps.itertuples(index=False) if row.source in backfillers]
+        skipped = set(gaps['source']) - set(backfillers) if not gaps.empty else set()
+        for name in sorted(skipped):
+            self.log(f"⚠️  {name}: 没有可用的回补函数，跳过")
+
+        if not tasks:
+            return pd.DataFrame(columns=['source', 'start', 'end', 'rows', 'status', 'seconds'])
+
+        self.log(f"开始回补 {len(tasks)} 个缺口区间 (并发 {max_workers})...")
+
+        def run(task):
+            start_time = time.time()
+            df = backfillers[task.source](task.start, task.end)
+            return df, time.time() - start_time
+
+        results = []
+        fetched: Dict[str, List[pd.DataFrame]] = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(run, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    df, seconds = future.result()
+                    status = 'ok' if df is not None and not df.empty else 'empty'
+                    rows = 0 if df is None else len(df)
+                    if status == 'ok':
+                        fetched.setdefault(task.source, []).append(df)
+                except Exception as e:
+                    status, rows, seconds = f'error: {e}', 0, 0.0
+
+                results.append({'source': task.source, 'start': task.start, 'end': task.end,
+                                'rows': rows, 'status': status, 'seconds': seconds})
+
+        # 写回数据源（已有数据优先，只补缺失的时间点）
+        for name, frames in fetched.items():
+            self._write_back(name, sources.get(name, {}), pd.concat(frames))
+
+        report = pd.DataFrame(results).sort_values(['source', 'start']).reset_index(drop=True)
+        self.log(f"回补完成: 成功 {(report['status'] == 'ok').sum()}/{len(report)}")
+        return report
+
+    def _write_back(self, name: str, spec: Dict, new_rows: pd.DataFrame):
+        """将回补数据合并回数据源"""
+        if spec.get('key'):
+            existing = self.store.read(spec['key'])
+            new_rows = new_rows[~new_rows.index.isin(existing.index)]
+            self.store.upsert(spec['key'], new_rows)
+        elif spec.get('path'):
+            existing = self._load(spec)
+            merged = pd.concat([existing, new_rows])
+            merged = merged[~merged.index.duplicated(keep='first')].sort_index()
+            SeriesStore._atomic_write(Path(spec['path']), merged.to_csv)
+        else:
+            return
+
+        self.log(f"  ✓ {name}: 写回 {len(new_rows)} 行")
+
+
+def default_backfillers(scanner: GapScanner) -> Dict[str, Backfiller]:
+    """
+    基于现有收集器构建默认回补函数
+
+    - market: yfinance BTC-USD 日线（只下载缺失区间）
+    - macro_<indicator>: MacroCollector.get_indicator
+    - coingecko/*: CoinGeckoCollector.get_market_chart_range（自带缓存写入）
+
+    Args:
+        scanner: GapScanner 实例（用于获取数据源列表）
+
+    Returns:
+        {source_name: fn(start, end) -> DataFrame}
+    """
+    backfillers: Dict[str, Backfiller] = {}
+    sources = scanner.default_sources()
+
+    if 'market' in sources:
+        def market_backfill(start, end):
+            import yfinance as yf
+            data = yf.download('BTC-USD', start=start, end=end + pd.Timedelta(days=1),
+                               progress=False, auto_adjust=True)
+            if isinstance(data.columns, pd.MultiIndex):
+                data.columns = data.columns.get_level_values(0)
+            return data
+
+        backfillers['market'] = market_backfill
+
+    macro_sources = [name for name in sources if name.startswith('macro_')]
+    if macro_sources:
+        try:
+            from macro_collector import MacroCollector
+        except ImportError:
+            from src.data.macro_collector import MacroCollector
+        macro = MacroCollector()
+
+        for name in macro_sources:
+            indicator = name[len('macro_'):]
+            if indicator in MacroCollector.TICKERS:
+                backfillers[name] = (lambda ind: lambda start, end: macro.get_indicator(
+                    ind,
+                    start_date=start.strftime('%Y-%m-%d'),
+                    end_date=(end + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+                ))(indicator)
+
+    coingecko_keys = [name for name in sources if name.startswith('coingecko/')]
+    if coingecko_keys:
+        try:
+            from coingecko_collector import CoinGeckoCollector
+        except ImportError:
+            from src.data.coingecko_collector import CoinGeckoCollector
+
+        for key in coingecko_keys:
+            coin_id, vs_currency, granularity = key.split('/', 1)[1].rsplit('_', 2)
+            collector = CoinGeckoCollector(coin_id=coin_id, vs_currency=vs_currency,
+                                           cache_dir=str(scanner.store.root))
+            backfillers[key] = (lambda c, g: lambda start, end: c.get_market_chart_range(
+                start, end + pd.Timedelta(days=1), granularity=g, use_cache=False
+            ))(collector, granularity)
+
+    return backfillers
+
+
+def main():
+    """扫描数据缺口并输出覆盖率报告"""
+    print("=" * 60)
+    print("  数据缺口扫描")
+    print("=" * 60)
+    print()
+
+    scanner = GapScanner(raw_dir='data/raw')
+
+    print("覆盖率报告:")
+    report = scanner.coverage_report()
+    if not report.empty:
+        print(report.to_string())
+    print()
+
+    gaps = scanner.scan()
+    if not gaps.empty:
+        print("\n缺口索引:")
+        print(gaps.to_string(index=False))
+
+        print()
+        result = scanner.backfill(gaps, default_backfillers(scanner))
+        print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+共享 HTTP 客户端
+
+功能：
+1. 所有收集器共享的连接池（按主机划分，keep-alive 复用连接）
+2. 有界重试 + 带抖动的指数退避（连接错误、超时、429/5xx）
+3. 单次请求超时 + 总超时预算（含重试与退避等待）
+4. 按主机统计请求延迟、重试次数和失败次数
+5. 按端点的 AIMD 自适应并发与熔断（熔断时返回最近一次成功的数据）
+
+用法：
+    from data.http_client import create_session, get_http_stats
+
+    session = create_session(headers={'Accept': 'application/json'})
+    response = session.get(url, params=params, timeout=10)
+
+每个收集器拿到的是独立的 Session（请求头互不干扰），
+但底层连接池、统计信息和端点控制器在进程内共享。
+
+依赖：requests
+"""
+
+import copy
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from endpoint_controller import EndpointController, Endpoint
+except ImportError:
+    from data.endpoint_controller import EndpointController, Endpoint
+
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Bitcoin Research Agent)'
+
+# 连接池配置：缓存的主机连接池数量 / 每个主机的最大连接数
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 10
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """端点熔断中且没有可用的缓存数据"""
+
+
+class RetryPolicy:
+    """重试策略：有界重试 + 带抖动的指数退避 + 总超时预算"""
+
+    # 可重试的 HTTP 状态码
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 jitter: float = 0.5,
+                 total_timeout: float = 30.0,
+                 retry_methods: tuple = ('GET', 'HEAD')):
+        """
+        初始化
+
+        Args:
+            max_retries: 最大重试次数（不含首次请求）
+            backoff_base: 退避基数（秒），第 n 次重试等待约 base * 2^n
+            backoff_max: 单次退避上限（秒）
+            jitter: 抖动比例（0-1），实际等待在 [delay*(1-jitter), delay] 之间
+            total_timeout: 单次调用的总超时预算（秒），包含所有重试和等待
+            retry_methods: 允许重试的 HTTP 方法
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.total_timeout = total_timeout
+        self.retry_methods = tuple(m.upper() for m in retry_methods)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第 attempt 次重试前的等待时间
+
+        Args:
+            attempt: 已失败的次数（从 0 开始）
+            retry_after: 服务端 Retry-After 提示（秒）
+
+        Returns:
+            等待秒数
+        """
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.backoff_max)
+
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (1 - self.jitter * random.random())
+
+    def can_retry(self, method: str, attempt: int) -> bool:
+        """是否允许继续重试"""
+        return method.upper() in self.retry_methods and attempt < self.max_retries
+
+
+class HTTPStats:
+    """按主机统计请求延迟与重试（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict] = {}
+
+    def _host(self, host: str) -> Dict:
+        return self._hosts.setdefault(host, {
+            'requests': 0,
+            'failures': 0,
+            'retries': 0,
+            'short_circuits': 0,
+            'total_latency': 0.0,
+            'max_latency': 0.0,
+            'wait_time': 0.0,
+        })
+
+    def record(self, host: str, latency: float, retries: int, ok: bool, wait_time: float = 0.0):
+        """
+        记录一次调用（含所有重试）
+
+        Args:
+            host: 主机名
+            latency: 总耗时（秒），包含重试与退避等待
+            retries: 重试次数
+            ok: 是否最终成功
+            wait_time: 退避等待耗时（秒）
+        """
+        with self._lock:
+            stats = self._host(host)
+            stats['requests'] += 1
+            stats['failures'] += 0 if ok else 1
+            stats['retries'] += retries
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+            stats['wait_time'] += wait_time
+
+    def record_short_circuit(self, host: str):
+        """记录一次被熔断/并发限制拦截、未实际发出的请求"""
+        with self._lock:
+            self._host(host)['short_circuits'] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        获取统计快照
+
+        Returns:
+            {host: {requests, failures, retries, short_circuits, total_latency,
+                    avg_latency, max_latency, wait_time}}
+        """
+        with self._lock:
+            result = {}
+            for host, stats in self._hosts.items():
+                item = dict(stats)
+                item['avg_latency'] = stats['total_latency'] / stats['requests'] if stats['requests'] else 0.0
+                result[host] = item
+            return result
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._hosts.clear()
+
+
+class PooledSession(requests.Session):
+    """
+    使用共享连接池的 Session
+
+    对收集器保持 requests.Session 的接口不变（get/post 及异常类型），
+    在 request() 中统一实现重试、退避、超时预算、自适应并发和熔断。
+    """
+
+    def __init__(self,
+                 adapter: HTTPAdapter,
+                 stats: HTTPStats,
+                 controller: EndpointController,
+                 policy: Optional[RetryPolicy] = None,
+                 default_timeout: float = 10.0):
+        """
+        初始化
+
+        Args:
+            adapter: 共享的 HTTPAdapter（持有连接池）
+            stats: 共享的统计对象
+            controller: 共享的端点控制器（并发与熔断）
+            policy: 重试策略
+            default_timeout: 未指定 timeout 时的单次请求超时（秒）
+        """
+        super().__init__()
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.headers.update({'User-Agent': DEFAULT_USER_AGENT})
+        self.stats = stats
+        self.controller = controller
+        self.policy = policy or RetryPolicy()
+        self.default_timeout = default_timeout
+
+    def close(self):
+        """连接池为进程共享，关闭单个 Session 时不释放底层连接"""
+        pass
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        """解析 Retry-After 响应头（仅支持秒数形式）"""
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _cache_key(method: str, url: str, params) -> str:
+        """最近成功响应的缓存 key（方法 + 完整 URL）"""
+        prepared = requests.models.PreparedRequest()
+        prepared.prepare_url(url, params)
+        return f"{method.upper()} {prepared.url}"
+
+    def _short_circuit(self, endpoint: Endpoint, host: str, url: str, cache_key: str) -> requests.Response:
+        """请求未发出：返回最近一次成功的响应（标记 from_cache），没有则抛出 CircuitOpenError"""
+        endpoint.short_circuits += 1
+        self.stats.record_short_circuit(host)
+
+        cached = endpoint.last_known(cache_key)
+        if cached is None:
+            raise CircuitOpenError(f"端点 {host} 不可用（熔断: {endpoint.breaker.state}），且无缓存数据: {url}")
+
+        response = copy.copy(cached)
+        response.from_cache = True
+        return response
+
+    def request(self, method, url, *args, **kwargs):
+        """发送请求（带熔断、并发控制、重试与总超时预算）"""
+        policy = self.policy
+        host = urlparse(url).netloc
+        endpoint = self.controller.get(host)
+        cache_key = self._cache_key(method, url, kwargs.get('params'))
+
+        # 熔断打开：立即返回最近一次成功的数据
+        if endpoint.breaker.state == endpoint.breaker.OPEN:
+            return self._short_circuit(endpoint, host, url, cache_key)
+
+        # 并发槽位，等待时间不超过总预算
+        if not endpoint.limiter.acquire(timeout=policy.total_timeout):
+            return self._short_circuit(endpoint, host, url, cache_key)
+
+        # 半开状态只放行有限的探测请求
+        if not endpoint.breaker.allow():
+            endpoint.limiter.cancel()
+            return self._short_circuit(endpoint, host, url, cache_key)
+
+        start = time.monotonic()
+        response = None
+        try:
+            response = self._send_with_retry(method, url, endpoint, host, start, *args, **kwargs)
+            return response
+        finally:
+            latency = time.monotonic() - start
+            degraded = response is None or response.status_code in policy.RETRY_STATUS
+            endpoint.limiter.release(latency, not degraded)
+
+            if degraded:
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.record_success()
+                if response.ok and method.upper() == 'GET' and not kwargs.get('stream'):
+                    response.content  # 读取响应体，便于缓存复用
+                    endpoint.remember(cache_key, response)
+
+    def _send_with_retry(self, method, url, endpoint: Endpoint, host: str, start: float, *args, **kwargs):
+        """有界重试 + 退避；单次超时不超过剩余预算"""
+        policy = self.policy
+        timeout = kwargs.pop('timeout', None) or self.default_timeout
+        deadline = start + policy.total_timeout
+        attempt = 0
+        wait_time = 0.0
+
+        while True:
+            remaining = max(deadline - time.monotonic(), 0.1)
+            attempt_timeout = min(timeout, remaining) if isinstance(timeout, (int, float)) else timeout
+
+            # 其他请求已触发熔断时不再重试
+            can_retry = policy.can_retry(method, attempt) and endpoint.breaker.state != endpoint.breaker.OPEN
+
+            response = None
+            try:
+                response = super().request(method, url, *args, timeout=attempt_timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                retry_after = None
+                if not can_retry:
+                    self.stats.record(host, time.monotonic() - start, attempt, False, wait_time)
+                    raise
+            else:
+                if response.status_code not in policy.RETRY_STATUS or not can_retry:
+                    self.stats.record(host, time.monotonic() - start, attempt, response.ok, wait_time)
+                    return response
+                retry_after = self._retry_after(response)
+
+            delay = policy.backoff(attempt, retry_after)
+
+            # 预算不足以再等待一轮，直接返回最后结果
+            if time.monotonic() + delay >= deadline:
+                self.stats.record(host, time.monotonic() - start, attempt, False, wait_time)
+                if response is not None:
+                    return response
+                raise requests.exceptions.Timeout(f"超出总超时预算 {policy.total_timeout}s: {url}")
+
+            if response is not None:
+                response.close()
+
+            time.sleep(delay)
+            wait_time += delay
+            attempt += 1
+
+
+# ==================== 共享实例 ====================
+
+_lock = threading.Lock()
+_adapter: Optional[HTTPAdapter] = None
+_stats = HTTPStats()
+_controller = EndpointController()
+
+
+def get_shared_adapter() -> HTTPAdapter:
+    """获取进程内共享的 HTTPAdapter（懒加载）"""
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            # 重试由 PooledSession 处理，这里关闭 urllib3 自带重试
+            _adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS,
+                pool_maxsize=POOL_MAXSIZE,
+                max_retries=0
+            )
+        return _adapter
+
+
+def create_session(headers: Optional[Dict[str, str]] = None,
+                   policy: Optional[RetryPolicy] = None,
+                   default_timeout: float = 10.0) -> PooledSession:
+    """
+    创建使用共享连接池的 Session
+
+    Args:
+        headers: 额外请求头（仅作用于本 Session）
+        policy: 重试策略（默认 RetryPolicy()）
+        default_timeout: 默认单次请求超时（秒）
+
+    Returns:
+        PooledSession
+    """
+    session = PooledSession(get_shared_adapter(), _stats, _controller,
+                            policy=policy, default_timeout=default_timeout)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def get_http_stats() -> Dict[str, Dict]:
+    """获取按主机划分的请求统计"""
+    return _stats.snapshot()
+
+
+def reset_http_stats():
+    """清空请求统计"""
+    _stats.reset()
+
+
+def get_endpoint_controller() -> EndpointController:
+    """获取进程内共享的端点控制器（可调整熔断/并发参数）"""
+    return _controller
+
+
+def get_endpoint_stats() -> Dict[str, Dict]:
+    """获取各端点的熔断状态与当前并发上限"""
+    return _controller.snapshot()
@@ -23,6 +23,11 @@ import requests
 import os
 import time
 
+try:
+    from http_client import create_session
+except ImportError:
+    from data.http_client import create_session
+
 
 class MacroCollector:
     """宏观数据收集器"""
@@ -48,6 +53,7 @@ class MacroCollector:
         """
         self.fred_api_key = fred_api_key or os.getenv('FRED_API_KEY')
         self.fred_base_url = "https://api.stlouisfed.org/fred/series/observations"
+        self.session = create_session()
         
     def get_indicator(self, 
                      indicator: str, 
@@ -181,7 +187,7 @@ class MacroCollector:
             
             print(f"正在从 FRED 获取 {series_id} 数据...")
             
-            response = requests.get(self.fred_base_url, params=params, timeout=10)
+            response = self.session.get(self.fred_base_url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
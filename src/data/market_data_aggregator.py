@@ -48,6 +48,11 @@ try:
 except ImportError:
     from data.news_collector import NewsCollector
 
+try:
+    from http_client import get_http_stats, get_endpoint_stats
+except ImportError:
+    from data.http_client import get_http_stats, get_endpoint_stats
+
 
 class MarketDataAggregator:
     """市场数据聚合器"""
@@ -228,8 +233,38 @@ class MarketDataAggregator:
         print("=" * 60)
         print()
         
+        # 请求耗时统计（按主机）
+        http_stats = self.get_http_stats()
+        if not http_stats.empty:
+            print("HTTP 请求统计:")
+            print(http_stats.to_string())
+            print()
+        
         return result
     
+    def get_http_stats(self) -> pd.DataFrame:
+        """
+        获取各数据源主机的请求统计（所有收集器共享连接池）
+        
+        Returns:
+            DataFrame (index=host) with requests, failures, retries, short_circuits,
+            total_latency, avg_latency, max_latency, wait_time,
+            circuit, concurrency_limit, circuit_opens
+        """
+        stats = get_http_stats()
+        if not stats:
+            return pd.DataFrame()
+        
+        df = pd.DataFrame.from_dict(stats, orient='index')
+        
+        endpoints = get_endpoint_stats()
+        if endpoints:
+            ep_df = pd.DataFrame.from_dict(endpoints, orient='index')
+            df = df.join(ep_df[['circuit', 'concurrency_limit', 'circuit_opens']], how='left')
+        
+        df.index.name = 'host'
+        return df.sort_values('total_latency', ascending=False)
+    
     def merge_ohlcv_data(self, data_dict: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         """
         合并多个数据源的 OHLCV 数据
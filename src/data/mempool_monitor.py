@@ -0,0 +1,402 @@
+"""
+内存池持续监控（鲸鱼交易告警 + 分钟级聚合）
+
+功能：
+1. 轮询未确认交易，维护已见 txid 集合，只处理新出现的交易
+2. 新交易的输出总额向量化计算
+3. 超过阈值的交易触发鲸鱼告警（回调 + 追加写入 CSV）
+4. 按分钟聚合新交易数、总额、手续费、鲸鱼交易，写入本地时间序列
+
+数据源：
+- 'mempool_space'（完整，推送）: mempool.space WebSocket 订阅 track-mempool，服务端只推送增量
+  （新增交易的完整内容），每次轮询读取已到达的消息，不发 HTTP 请求；增量序号不连续或断线重连时
+  该分钟标记为 sampled。需要 websockets，缺失时退回 'mempool_space_rest'
+- 'mempool_space_rest'（完整，轮询）: /mempool/txids 取全部未确认 txid 与上一次的快照求差，
+  逐笔获取新交易（/tx/{txid}）；首次轮询只建立快照。代价：txid 列表随内存池大小增长（数万个），
+  新交易每笔一个请求。每次轮询的成本有上限：最多 1 次 txid 列表 + max_fetch 次逐笔请求，
+  且待获取队列不少于 max_fetch 笔时不再下载 txid 列表（先消化积压）；积压数记入 pending_tx，
+  积压超过上限时丢弃最早的并记入 dropped_tx。积压较多时新交易会延后处理
+- 'blockchain'（抽样）: Blockchain.com /unconfirmed-transactions 只返回最近的一部分交易，
+  分钟聚合是样本而非总量，sampled 列为 True
+
+依赖：numpy, pandas, requests（推送数据源另需 websockets）
+"""
+
+import json
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import requests
+
+try:
+    from websockets.exceptions import WebSocketException
+    from websockets.sync.client import connect as ws_connect
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+
+try:
+    from onchain_collector import OnchainCollector
+    from series_store import SeriesStore
+except ImportError:
+    from data.onchain_collector import OnchainCollector
+    from data.series_store import SeriesStore
+
+
+class MempoolMonitor:
+    """内存池监控器"""
+
+    SOURCES = ('mempool_space', 'mempool_space_rest', 'blockchain')
+    SAMPLED_SOURCES = ('blockchain',)
+    MEMPOOL_WS_URL = 'wss://mempool.space/api/v1/ws'
+    AGGREGATE_KEY = 'mempool/minute_aggregates'
+
+    def __init__(self,
+                 collector: Optional[OnchainCollector] = None,
+                 source: str = 'mempool_space',
+                 whale_threshold_btc: float = 100.0,
+                 seen_capacity: int = 200_000,
+                 max_fetch: int = 200,
+                 tx_interval: float = 0.05,
+                 store: Optional[SeriesStore] = None,
+                 alerts_path: Optional[str] = 'data/raw/whale_alerts.csv',
+                 on_alert: Optional[Callable[[Dict], None]] = None,
+                 verbose: bool = True):
+        """
+        初始化
+
+        Args:
+            collector: 链上数据收集器（共享 Session 与限流）
+            source: 数据源 ('mempool_space' / 'mempool_space_rest' / 'blockchain')
+            whale_threshold_btc: 鲸鱼交易阈值（BTC）
+            seen_capacity: 已见 txid 集合 / 待获取队列上限（超出时淘汰最早的）
+            max_fetch: 'mempool_space_rest' 每次轮询最多逐笔获取的新交易数
+            tx_interval: 'mempool_space_rest' 逐笔获取的最小请求间隔（秒）
+            store: 分钟聚合的存储（默认 data/raw/store）
+            alerts_path: 鲸鱼告警 CSV（None 表示不写文件）
+            on_alert: 告警回调，参数为告警 Dict
+            verbose: 是否打印详细信息
+        """
+        if source not in self.SOURCES:
+            raise ValueError(f"不支持的数据源: {source} (可选: {', '.join(self.SOURCES)})")
+        if source == 'mempool_space' and not WEBSOCKETS_AVAILABLE:
+            print("[MempoolMonitor] 警告: 未安装 websockets，改用 mempool_space_rest 轮询 (pip install websockets)")
+            source = 'mempool_space_rest'
+
+        self.collector = collector or OnchainCollector()
+        self.source = source
+        self.whale_threshold_btc = whale_threshold_btc
+        self.seen_capacity = seen_capacity
+        self.max_fetch = max_fetch
+        self.tx_interval = tx_interval
+        self.sampled = source in self.SAMPLED_SOURCES
+        self.store = store or SeriesStore()
+        self.alerts_path = Path(alerts_path) if alerts_path else None
+        self.on_alert = on_alert
+        self.verbose = verbose
+
+        self._seen: OrderedDict = OrderedDict()
+        self._mempool_txids: Optional[set] = None
+        self._pending: deque = deque()
+        self._dropped = 0
+        self._ws = None
+        self._sequence: Optional[int] = None
+        self._incomplete = False
+        self._minutes: Dict[pd.Timestamp, Dict] = {}
+        self.alerts: List[Dict] = []
+        self.polls = 0
+
+    def log(self, message: str):
+        if self.verbose:
+            print(f"[MempoolMonitor] {message}")
+
+    # ==================== 获取 ====================
+
+    def _fetch_txids(self) -> List[str]:
+        """mempool.space 当前全部未确认 txid"""
+        collector = self.collector
+        collector._rate_limit()
+        response = collector.session.get(f"{collector.MEMPOOL_SPACE_BASE}/mempool/txids", timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def _fetch_tx(self, txid: str) -> Dict:
+        """mempool.space 单笔交易（含 vout、fee、weight）"""
+        collector = self.collector
+        collector._rate_limit(self.tx_interval)
+        response = collector.session.get(f"{collector.MEMPOOL_SPACE_BASE}/tx/{txid}", timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def _queue_new_txids(self, txids: List[str]):
+        """与上一次的 txid 快照求差，新出现的 txid 进入待获取队列"""
+        if self._mempool_txids is None:
+            self.log(f"建立内存池快照: {len(txids)} 笔（只跟踪此后新出现的交易）")
+        else:
+            self._pending.extend(t for t in txids if t not in self._mempool_txids)
+        self._mempool_txids = set(txids)
+
+        overflow = len(self._pending) - self.seen_capacity
+        if overflow > 0:
+            for _ in range(overflow):
+                self._pending.popleft()
+            self._dropped += overflow
+            self.log(f"警告: 待获取队列超过上限，丢弃 {overflow} 笔")
+
+    def _fetch_pending(self) -> List[Dict]:
+        """按顺序获取队列中的新交易（最多 max_fetch 笔，失败的留在队首下次重试）"""
+        txs = []
+        while self._pending and len(txs) < self.max_fetch:
+            txid = self._pending[0]
+            try:
+                txs.append(self._fetch_tx(txid))
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    # 已被替换（RBF）或逐出的交易
+                    self._pending.popleft()
+                    continue
+                self.log(f"✗ 获取交易 {txid} 失败: {e}")
+                break
+            except (requests.exceptions.RequestException, ValueError) as e:
+                self.log(f"✗ 获取交易 {txid} 失败: {e}")
+                break
+            self._pending.popleft()
+        return txs
+
+    def _connect_stream(self):
+        """连接 mempool.space WebSocket 并订阅内存池增量"""
+        self._ws = ws_connect(self.MEMPOOL_WS_URL, open_timeout=10, max_size=None)
+        self._ws.send(json.dumps({'track-mempool': True}))
+        self._sequence = None
+        self.log("已订阅 mempool.space 内存池增量推送（只跟踪此后新出现的交易）")
+
+    def _fetch_stream(self) -> List[Dict]:
+        """读取已到达的 mempool-transactions 增量（不阻塞）；断线后下次轮询重连"""
+        txs = []
+        try:
+            if self._ws is None:
+                self._connect_stream()
+            while True:
+                message = self._ws.recv(timeout=0)
+                try:
+                    delta = json.loads(message).get('mempool-transactions')
+                except (ValueError, AttributeError):
+                    continue
+                if not delta:
+                    continue
+                sequence = delta.get('sequence')
+                if self._sequence is not None and sequence is not None and sequence != self._sequence + 1:
+                    self._incomplete = True
+                    self.log(f"警告: 增量序号不连续 ({self._sequence} -> {sequence})")
+                self._sequence = sequence
+                txs.extend(delta.get('added', []))
+        except TimeoutError:
+            pass
+        except (WebSocketException, OSError) as e:
+            self.log(f"✗ 内存池推送连接中断: {e}（下次轮询重连）")
+            self.close()
+            self._incomplete = True
+        return txs
+
+    def _fetch(self) -> List[Dict]:
+        """获取新的未确认交易（原始格式）"""
+        collector = self.collector
+
+        if self.source == 'mempool_space':
+            return self._fetch_stream()
+
+        if self.source == 'mempool_space_rest':
+            # 积压足够本次获取时不下载 txid 列表，每次轮询最多 1 + max_fetch 个请求
+            if len(self._pending) < self.max_fetch:
+                self._queue_new_txids(self._fetch_txids())
+            return self._fetch_pending()
+
+        collector._rate_limit()
+        response = collector.session.get(f"{collector.BLOCKCHAIN_COM_BASE}/unconfirmed-transactions",
+                                         params={"format": "json"}, timeout=10)
+        response.raise_for_status()
+        return response.json().get('txs', [])
+
+    def _txid(self, tx: Dict) -> Optional[str]:
+        return tx.get('hash') if self.source == 'blockchain' else tx.get('txid')
+
+    def _normalize(self, txs: List[Dict]) -> pd.DataFrame:
+        """新交易 -> DataFrame(txid, value_btc, fee_btc, vsize)"""
+        if self.source != 'blockchain':
+            values = OnchainCollector.sum_tx_outputs(txs, outputs_key='vout')
+            sizes = [np.ceil(tx['weight'] / 4) if tx.get('weight') else tx.get('size') for tx in txs]
+        else:
+            values = OnchainCollector.sum_tx_outputs(txs)
+            sizes = [tx.get('vsize', tx.get('size')) for tx in txs]
+
+        return pd.DataFrame({
+            'txid': [self._txid(tx) for tx in txs],
+            'value_btc': values / 1e8,
+            'fee_btc': np.array([tx.get('fee', 0) for tx in txs], dtype=np.float64) / 1e8,
+            'vsize': sizes,
+        })
+
+    def _filter_new(self, txs: List[Dict]) -> List[Dict]:
+        """过滤出未见过的交易并记入已见集合"""
+        new = []
+        for tx in txs:
+            txid = self._txid(tx)
+            if txid is None or txid in self._seen:
+                continue
+            self._seen[txid] = None
+            new.append(tx)
+
+        while len(self._seen) > self.seen_capacity:
+            self._seen.popitem(last=False)
+        return new
+
+    # ==================== 处理 ====================
+
+    def poll_once(self, now: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        轮询一次，只处理新交易
+
+        Args:
+            now: 本次轮询时间（默认当前时间，用于分钟聚合）
+
+        Returns:
+            本次新交易 DataFrame(txid, value_btc, fee_btc, vsize)
+        """
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+        self.polls += 1
+
+        try:
+            raw = self._fetch()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.log(f"✗ 获取未确认交易失败: {e}")
+            raw = []
+
+        new_txs = self._filter_new(raw)
+        df = self._normalize(new_txs) if new_txs else pd.DataFrame(columns=['txid', 'value_btc', 'fee_btc', 'vsize'])
+
+        whales = df[df['value_btc'] >= self.whale_threshold_btc]
+        for row in whales.itertuples(index=False):
+            self._alert({'time': now, 'txid': row.txid, 'value_btc': row.value_btc,
+                         'fee_btc': row.fee_btc, 'source': self.source})
+
+        self._accumulate(now, df, len(whales), whales['value_btc'].sum())
+        self.flush(before=now.floor('min'))
+        return df
+
+    def _alert(self, alert: Dict):
+        self.alerts.append(alert)
+        self.log(f"🐋 鲸鱼交易 {alert['value_btc']:,.2f} BTC  {alert['txid']}")
+
+        if self.alerts_path is not None:
+            self.alerts_path.parent.mkdir(parents=True, exist_ok=True)
+            header = not self.alerts_path.exists()
+            pd.DataFrame([alert]).to_csv(self.alerts_path, mode='a', header=header, index=False)
+
+        if self.on_alert is not None:
+            self.on_alert(alert)
+
+    def _accumulate(self, now: pd.Timestamp, df: pd.DataFrame, whale_tx: int, whale_value: float):
+        minute = now.floor('min')
+        stats = self._minutes.setdefault(minute, {
+            'new_tx': 0, 'value_btc': 0.0, 'fee_btc': 0.0, 'max_tx_btc': 0.0,
+            'whale_tx': 0, 'whale_value_btc': 0.0, 'polls': 0,
+            'pending_tx': 0, 'dropped_tx': 0, 'sampled': self.sampled
+        })
+        stats['polls'] += 1
+        stats['pending_tx'] = len(self._pending)
+        stats['dropped_tx'] += self._dropped
+        if self._dropped or self._incomplete:
+            # 积压溢出、推送序号不连续或断线后该分钟不再是完整统计
+            stats['sampled'] = True
+            self._dropped = 0
+            self._incomplete = False
+        if df.empty:
+            return
+
+        stats['new_tx'] += len(df)
+        stats['value_btc'] += df['value_btc'].sum()
+        stats['fee_btc'] += df['fee_btc'].sum()
+        stats['max_tx_btc'] = max(stats['max_tx_btc'], df['value_btc'].max())
+        stats['whale_tx'] += whale_tx
+        stats['whale_value_btc'] += whale_value
+
+    def flush(self, before: Optional[pd.Timestamp] = None):
+        """
+        将已结束的分钟聚合写入存储
+
+        Args:
+            before: 只写入早于该时间的分钟（None 表示全部写入）
+        """
+        minutes = [m for m in self._minutes if before is None or m < before]
+        if not minutes:
+            return
+
+        rows = {m: self._minutes.pop(m) for m in sorted(minutes)}
+        df = pd.DataFrame.from_dict(rows, orient='index')
+        df.index.name = 'timestamp'
+        self.store.upsert(self.AGGREGATE_KEY, df)
+
+    def run(self, interval: float = 10.0, duration: Optional[float] = None, max_polls: Optional[int] = None):
+        """
+        持续轮询（Ctrl+C 停止）
+
+        Args:
+            interval: 轮询间隔（秒）
+            duration: 运行时长（秒），None 表示一直运行
+            max_polls: 最多轮询次数
+        """
+        start = time.time()
+        self.log(f"开始监控 ({self.source}{'，抽样数据源' if self.sampled else ''}，阈值 {self.whale_threshold_btc} BTC，间隔 {interval}s)")
+
+        try:
+            while True:
+                tick = time.time()
+                new = self.poll_once()
+                if len(new):
+                    self.log(f"新交易 {len(new)} 笔，合计 {new['value_btc'].sum():,.2f} BTC")
+
+                if max_polls is not None and self.polls >= max_polls:
+                    break
+                if duration is not None and time.time() - start >= duration:
+                    break
+                time.sleep(max(0.0, interval - (time.time() - tick)))
+        except KeyboardInterrupt:
+            self.log("已停止")
+        finally:
+            self.flush()
+            self.close()
+
+    def close(self):
+        """关闭推送连接"""
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except (WebSocketException, OSError):
+                pass
+            self._ws = None
+
+    def minute_aggregates(self, start=None, end=None) -> pd.DataFrame:
+        """读取分钟聚合时间序列"""
+        return self.store.read(self.AGGREGATE_KEY, start, end)
+
+
+def main():
+    """持续监控内存池鲸鱼交易"""
+    print("=" * 60)
+    print("  内存池鲸鱼交易监控")
+    print("=" * 60)
+
+    monitor = MempoolMonitor(whale_threshold_btc=100.0)
+    monitor.run(interval=10.0)
+
+    df = monitor.minute_aggregates()
+    if not df.empty:
+        print(df.tail(10).to_string())
+
+
+if __name__ == "__main__":
+    main()
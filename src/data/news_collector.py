@@ -21,6 +21,12 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 import time
 import os
+
+try:
+    from http_client import create_session
+except ImportError:
+    from data.http_client import create_session
+
 try:
     import feedparser
 except ImportError:
@@ -57,10 +63,7 @@ class NewsCollector:
         """
         self.cryptopanic_key = cryptopanic_key or os.getenv('CRYPTOPANIC_API_KEY')
         self.newsapi_key = newsapi_key or os.getenv('NEWSAPI_KEY')
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Bitcoin Research Agent)'
-        })
+        self.session = create_session()
     
     # ==================== CryptoPanic API ====================
     
@@ -276,7 +279,10 @@ class NewsCollector:
         try:
             print(f"正在从 {feed_name.upper()} RSS Feed 获取新闻...")
             
-            feed = feedparser.parse(feed_url)
+            # 通过共享连接池下载，再交给 feedparser 解析
+            response = self.session.get(feed_url, timeout=15)
+            response.raise_for_status()
+            feed = feedparser.parse(response.content)
             
             if not feed.entries:
                 print(f"✗ {feed_name} RSS Feed 为空")
@@ -7,21 +7,87 @@
 3. 活跃地址数和网络活跃度
 4. 大额转账监控（鲸鱼行为）
 5. 交易所资金流动
+6. Glassnode 指标批量获取（并发 + 本地增量存储，按配置扩展指标）
+7. 本地区块文件 / bitcoind RPC 计算链上指标（不依赖第三方 API 配额）
 
 支持的数据源：
 - Blockchain.com API (免费)
 - Glassnode API (免费层 + 付费)
 - Mempool.space API (免费)
+- 本地 Bitcoin Core 区块文件或 JSON-RPC（见 block_parser.py）
 
 依赖：requests, pandas
 """
 
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 import time
 import os
+import threading
+from itertools import chain
+from operator import methodcaller
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from http_client import create_session
+    from series_store import SeriesStore
+    from block_parser import ChainMetricsEngine, BitcoindRPCSource
+except ImportError:
+    from data.http_client import create_session
+    from data.series_store import SeriesStore
+    from data.block_parser import ChainMetricsEngine, BitcoindRPCSource
+
+
+# 本地区块计算的按天指标在存储中的 key
+CHAIN_METRICS_KEY = 'chain/daily_metrics'
+
+
+def read_glassnode_metrics(store: SeriesStore,
+                           metrics: Optional[List[str]] = None,
+                           interval: str = "24h",
+                           start=None,
+                           end=None) -> pd.DataFrame:
+    """
+    从本地存储读取 Glassnode 指标宽表（不发网络请求，不需要创建收集器）
+    
+    Args:
+        store: 本地存储
+        metrics: 列名列表，默认读取存储中该间隔的全部指标
+        interval: 数据间隔
+        start: 开始时间
+        end: 结束时间
+    
+    Returns:
+        按时间对齐的宽表 DataFrame（每个指标一列，无数据时为空）
+    """
+    if metrics is None:
+        suffix = f"_{interval}"
+        metrics = [
+            key[len('glassnode/'):-len(suffix)]
+            for key in store.keys()
+            if key.startswith('glassnode/') and key.endswith(suffix)
+        ]
+    
+    columns = {}
+    for name in metrics:
+        df = store.read(OnchainCollector._glassnode_key(name, interval), start, end)
+        if not df.empty:
+            columns[name] = df['value']
+    
+    if not columns:
+        return pd.DataFrame()
+    
+    result = pd.DataFrame(columns).sort_index()
+    result.index.name = 'timestamp'
+    return result
+
+
+def read_chain_metrics(store: SeriesStore) -> pd.DataFrame:
+    """从本地存储读取按天链上指标（不重新计算）"""
+    return store.read(CHAIN_METRICS_KEY)
 
 
 class OnchainCollector:
@@ -32,31 +98,50 @@ class OnchainCollector:
     MEMPOOL_SPACE_BASE = "https://mempool.space/api"
     GLASSNODE_BASE = "https://api.glassnode.com/v1/metrics"
     
-    def __init__(self, glassnode_key: Optional[str] = None):
+    # Glassnode 指标配置：列名 -> 指标路径（新增链上特征只需在此添加）
+    GLASSNODE_METRICS = {
+        'active_addresses': 'addresses/active_count',
+        'utxo_count': 'blockchain/utxo_count',
+        'exchange_inflow': 'transactions/transfers_volume_exchanges_in',
+        'exchange_outflow': 'transactions/transfers_volume_exchanges_out',
+        'exchange_netflow': 'transactions/transfers_volume_exchanges_net',
+    }
+    
+    def __init__(self, glassnode_key: Optional[str] = None,
+                 cache_dir: str = 'data/raw/store'):
         """
         初始化
         
         Args:
             glassnode_key: Glassnode API Key (可选，免费层也需要)
+            cache_dir: Glassnode 指标本地存储目录
         """
         self.glassnode_key = glassnode_key or os.getenv("GLASSNODE_API_KEY")
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Bitcoin Research Agent)'
-        })
+        self.cache_dir = cache_dir
+        self.session = create_session()
         self.request_count = 0
         self.last_request_time = time.time()
+        self._rate_lock = threading.Lock()
+        self._store = None
     
     def _rate_limit(self, min_interval: float = 1.0):
-        """限流控制"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < min_interval:
-            time.sleep(min_interval - time_since_last)
-        
-        self.last_request_time = time.time()
-        self.request_count += 1
+        """限流控制（多线程共享同一配额）"""
+        with self._rate_lock:
+            current_time = time.time()
+            time_since_last = current_time - self.last_request_time
+            
+            if time_since_last < min_interval:
+                time.sleep(min_interval - time_since_last)
+            
+            self.last_request_time = time.time()
+            self.request_count += 1
+    
+    @property
+    def store(self) -> SeriesStore:
+        """Glassnode 指标本地存储（懒加载）"""
+        if self._store is None:
+            self._store = SeriesStore(self.cache_dir)
+        return self._store
     
     # ==================== Blockchain.com API ====================
     
@@ -131,6 +216,17 @@ class OnchainCollector:
             print(f"✗ Mempool.space API 请求失败: {e}")
             return {}
     
+    @staticmethod
+    def _parse_balance(address: str, addr_data: Dict) -> Dict:
+        """Blockchain.com balance 接口的单个地址数据 -> Dict"""
+        return {
+            'address': address,
+            'balance_btc': addr_data.get('final_balance', 0) / 1e8,
+            'total_received_btc': addr_data.get('total_received', 0) / 1e8,
+            'total_sent_btc': addr_data.get('total_sent', 0) / 1e8,
+            'n_tx': addr_data.get('n_tx', 0)
+        }
+    
     def get_address_balance(self, address: str) -> Dict:
         """
         获取地址余额 (Blockchain.com)
@@ -152,15 +248,7 @@ class OnchainCollector:
             data = response.json()
             
             if address in data:
-                addr_data = data[address]
-                result = {
-                    'address': address,
-                    'balance_btc': addr_data.get('final_balance', 0) / 1e8,
-                    'total_received_btc': addr_data.get('total_received', 0) / 1e8,
-                    'total_sent_btc': addr_data.get('total_sent', 0) / 1e8,
-                    'n_tx': addr_data.get('n_tx', 0)
-                }
-                return result
+                return self._parse_balance(address, data[address])
             else:
                 return {}
                 
@@ -168,10 +256,113 @@ class OnchainCollector:
             print(f"✗ 地址余额查询失败: {e}")
             return {}
     
+    def _fetch_balances(self, addresses: List[str]) -> Dict[str, Dict]:
+        """单次请求查询多个地址余额（失败时抛出 requests 异常）"""
+        endpoint = f"{self.BLOCKCHAIN_COM_BASE}/balance"
+        params = {"active": "|".join(addresses)}
+        
+        self._rate_limit()
+        
+        response = self.session.get(endpoint, params=params, timeout=15)
+        response.raise_for_status()
+        data = response.json()
+        
+        return {addr: self._parse_balance(addr, data[addr]) for addr in addresses if addr in data}
+    
+    def get_address_balances(self,
+                             addresses: List[str],
+                             chunk_size: int = 100,
+                             max_workers: int = 3) -> pd.DataFrame:
+        """
+        批量获取地址余额 (Blockchain.com)
+        
+        balance 接口支持用 '|' 分隔一次查询多个地址；地址按 chunk_size 分块并发请求
+        （共享同一限流配额）。
+        
+        Args:
+            addresses: 地址列表
+            chunk_size: 每次请求的地址数
+            max_workers: 并发请求数
+        
+        Returns:
+            DataFrame (index=address) with balance_btc, total_received_btc, total_sent_btc, n_tx
+        """
+        addresses = list(dict.fromkeys(addresses))
+        chunks = [addresses[i:i + chunk_size] for i in range(0, len(addresses), max(1, chunk_size))]
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(self._fetch_balances, chunk): chunk for chunk in chunks}
+            
+            for future in as_completed(futures):
+                try:
+                    results.update(future.result())
+                except requests.exceptions.RequestException as e:
+                    print(f"✗ 批量地址余额查询失败 ({len(futures[future])} 个地址): {e}")
+        
+        if not results:
+            return pd.DataFrame()
+        
+        df = pd.DataFrame.from_dict(results, orient='index').drop(columns='address')
+        df.index.name = 'address'
+        print(f"✓ 成功获取 {len(df)}/{len(addresses)} 个地址余额 ({len(chunks)} 次请求)")
+        return df
+    
+    def get_block_height(self) -> Optional[int]:
+        """
+        获取当前区块高度 (Blockchain.com)
+        
+        Returns:
+            区块高度（失败返回 None）
+        """
+        endpoint = f"{self.BLOCKCHAIN_COM_BASE}/q/getblockcount"
+        
+        self._rate_limit()
+        
+        try:
+            response = self.session.get(endpoint, timeout=10)
+            response.raise_for_status()
+            return int(response.text.strip())
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"✗ 区块高度查询失败: {e}")
+            return None
+    
+    @staticmethod
+    def sum_tx_outputs(txs: List[Dict], outputs_key: str = 'out') -> np.ndarray:
+        """
+        向量化计算每笔交易的输出总额（聪）
+        
+        所有输出一次展平为一个数组，按每笔交易的起始位置 np.add.reduceat 分段求和；
+        展平和取值都用 map / chain（C 层迭代），没有逐笔交易的 Python 循环或生成器。
+        
+        Args:
+            txs: 交易列表（Blockchain.com 格式每笔含 'out': [{'value': 聪}, ...]；
+                 mempool.space 格式为 'vout'）
+            outputs_key: 输出列表的键名
+        
+        Returns:
+            np.ndarray (len(txs),)
+        """
+        outputs = list(map(methodcaller('get', outputs_key, ()), txs))
+        counts = np.fromiter(map(len, outputs), dtype=np.int64, count=len(outputs))
+        flat = list(chain.from_iterable(outputs))
+        # 缺少 value 的输出（不完整的 API 返回）按 0 计
+        values = np.fromiter(map(methodcaller('get', 'value', 0), flat), dtype=np.float64, count=len(flat))
+        
+        totals = np.zeros(len(txs))
+        nonempty = counts > 0
+        if len(values):
+            # 空交易不占位置：只在非空交易的起点分段，段内自然跨过空交易
+            starts = np.cumsum(counts) - counts
+            totals[nonempty] = np.add.reduceat(values, starts[nonempty])
+        return totals
+    
     def get_large_transactions(self, threshold_btc: float = 100.0) -> pd.DataFrame:
         """
         获取大额交易 (Blockchain.com)
         
+        持续监控请使用 MempoolMonitor（只处理新出现的交易）。
+        
         Args:
             threshold_btc: 大额交易阈值（BTC）
         
@@ -189,22 +380,21 @@ class OnchainCollector:
             response.raise_for_status()
             data = response.json()
             
+            txs = data.get('txs', [])
+            total_btc = self.sum_tx_outputs(txs) / 1e8
+            
             transactions = []
-            for tx in data.get('txs', []):
-                # 计算交易总额
-                total_output = sum(out.get('value', 0) for out in tx.get('out', []))
-                total_btc = total_output / 1e8
-                
-                if total_btc >= threshold_btc:
-                    transactions.append({
-                        'hash': tx.get('hash'),
-                        'time': datetime.fromtimestamp(tx.get('time', 0)),
-                        'size': tx.get('size'),
-                        'total_btc': total_btc,
-                        'fee_btc': tx.get('fee', 0) / 1e8,
-                        'n_inputs': len(tx.get('inputs', [])),
-                        'n_outputs': len(tx.get('out', []))
-                    })
+            for i in np.flatnonzero(total_btc >= threshold_btc):
+                tx = txs[i]
+                transactions.append({
+                    'hash': tx.get('hash'),
+                    'time': datetime.fromtimestamp(tx.get('time', 0)),
+                    'size': tx.get('size'),
+                    'total_btc': total_btc[i],
+                    'fee_btc': tx.get('fee', 0) / 1e8,
+                    'n_inputs': len(tx.get('inputs', [])),
+                    'n_outputs': len(tx.get('out', []))
+                })
             
             df = pd.DataFrame(transactions)
             if not df.empty:
@@ -220,53 +410,85 @@ class OnchainCollector:
     
     # ==================== Glassnode API ====================
     
-    def get_active_addresses(self, days: int = 30) -> pd.DataFrame:
+    def _check_glassnode_key(self) -> bool:
+        """检查 Glassnode API Key"""
+        if self.glassnode_key:
+            return True
+        print("⚠️  需要 Glassnode API Key")
+        print("   注册: https://studio.glassnode.com/settings/api")
+        print("   设置环境变量: GLASSNODE_API_KEY")
+        return False
+    
+    def _fetch_glassnode_metric(self, path: str, since: int,
+                                until: Optional[int] = None,
+                                interval: str = "24h") -> pd.Series:
         """
-        获取活跃地址数 (Glassnode)
+        获取单个 Glassnode 指标（失败时抛出 requests 异常）
         
         Args:
-            days: 回溯天数
+            path: 指标路径，例如 'addresses/active_count'
+            since: 开始时间（Unix 秒）
+            until: 结束时间（Unix 秒），默认到最新
+            interval: 数据间隔 ('24h', '1h' 等)
         
         Returns:
-            DataFrame with active addresses over time
+            Series (index=timestamp)
         """
-        if not self.glassnode_key:
-            print("⚠️  需要 Glassnode API Key")
-            print("   注册: https://studio.glassnode.com/settings/api")
-            print("   设置环境变量: GLASSNODE_API_KEY")
-            return pd.DataFrame()
-        
-        endpoint = f"{self.GLASSNODE_BASE}/addresses/active_count"
-        
-        since = int((datetime.now() - timedelta(days=days)).timestamp())
+        endpoint = f"{self.GLASSNODE_BASE}/{path}"
         params = {
             "a": "BTC",
             "api_key": self.glassnode_key,
             "s": since,
-            "i": "24h"  # 日数据
+            "i": interval
         }
+        if until is not None:
+            params["u"] = until
         
         self._rate_limit(min_interval=2.0)
         
+        response = self.session.get(endpoint, params=params, timeout=15)
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data:
+            return pd.Series(dtype=float)
+        
+        df = pd.DataFrame(data)
+        return pd.Series(df['v'].values, index=pd.to_datetime(df['t'], unit='s'), dtype=float)
+    
+    def _get_glassnode_series(self, path: str, column: str, days: int, label: str) -> pd.DataFrame:
+        """获取单个指标最近 days 天的数据（单列 DataFrame）"""
+        if not self._check_glassnode_key():
+            return pd.DataFrame()
+        
+        since = int((datetime.now() - timedelta(days=days)).timestamp())
+        
         try:
-            response = self.session.get(endpoint, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['t'], unit='s')
-            df['active_addresses'] = df['v']
-            df = df[['timestamp', 'active_addresses']]
-            df.set_index('timestamp', inplace=True)
-            
-            print(f"✓ 成功获取 {len(df)} 天的活跃地址数据")
-            return df
-            
+            series = self._fetch_glassnode_metric(path, since)
         except requests.exceptions.RequestException as e:
-            print(f"✗ Glassnode API 请求失败: {e}")
+            print(f"✗ Glassnode {label}数据请求失败: {e}")
             if "401" in str(e) or "403" in str(e):
                 print("   请检查 API Key 是否正确")
             return pd.DataFrame()
+        
+        df = series.to_frame(column)
+        df.index.name = 'timestamp'
+        print(f"✓ 成功获取 {len(df)} 天的{label}数据")
+        return df
+    
+    def get_active_addresses(self, days: int = 30) -> pd.DataFrame:
+        """
+        获取活跃地址数 (Glassnode)
+        
+        Args:
+            days: 回溯天数
+        
+        Returns:
+            DataFrame with active addresses over time
+        """
+        return self._get_glassnode_series(
+            self.GLASSNODE_METRICS['active_addresses'], 'active_addresses', days, '活跃地址'
+        )
     
     def get_utxo_count(self, days: int = 30) -> pd.DataFrame:
         """
@@ -278,39 +500,9 @@ class OnchainCollector:
         Returns:
             DataFrame with UTXO count over time
         """
-        if not self.glassnode_key:
-            print("⚠️  需要 Glassnode API Key")
-            return pd.DataFrame()
-        
-        endpoint = f"{self.GLASSNODE_BASE}/blockchain/utxo_count"
-        
-        since = int((datetime.now() - timedelta(days=days)).timestamp())
-        params = {
-            "a": "BTC",
-            "api_key": self.glassnode_key,
-            "s": since,
-            "i": "24h"
-        }
-        
-        self._rate_limit(min_interval=2.0)
-        
-        try:
-            response = self.session.get(endpoint, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['t'], unit='s')
-            df['utxo_count'] = df['v']
-            df = df[['timestamp', 'utxo_count']]
-            df.set_index('timestamp', inplace=True)
-            
-            print(f"✓ 成功获取 {len(df)} 天的 UTXO 数据")
-            return df
-            
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Glassnode UTXO 数据请求失败: {e}")
-            return pd.DataFrame()
+        return self._get_glassnode_series(
+            self.GLASSNODE_METRICS['utxo_count'], 'utxo_count', days, ' UTXO '
+        )
     
     def get_exchange_flows(self, flow_type: str = "net", days: int = 30) -> pd.DataFrame:
         """
@@ -323,48 +515,187 @@ class OnchainCollector:
         Returns:
             DataFrame with exchange flows
         """
-        if not self.glassnode_key:
-            print("⚠️  需要 Glassnode API Key")
-            return pd.DataFrame()
-        
-        flow_endpoints = {
-            "inflow": "transactions/transfers_volume_exchanges_in",
-            "outflow": "transactions/transfers_volume_exchanges_out",
-            "net": "transactions/transfers_volume_exchanges_net"
+        flow_metrics = {
+            "inflow": "exchange_inflow",
+            "outflow": "exchange_outflow",
+            "net": "exchange_netflow"
         }
         
-        if flow_type not in flow_endpoints:
+        if flow_type not in flow_metrics:
             flow_type = "net"
         
-        endpoint = f"{self.GLASSNODE_BASE}/{flow_endpoints[flow_type]}"
-        
-        since = int((datetime.now() - timedelta(days=days)).timestamp())
-        params = {
-            "a": "BTC",
-            "api_key": self.glassnode_key,
-            "s": since,
-            "i": "24h"
+        return self._get_glassnode_series(
+            self.GLASSNODE_METRICS[flow_metrics[flow_type]], 'flow_btc', days, f'交易所{flow_type}'
+        )
+    
+    @staticmethod
+    def _glassnode_key(name: str, interval: str) -> str:
+        """指标在本地存储中的 key"""
+        return f"glassnode/{name}_{interval}"
+    
+    def _resolve_metrics(self, metrics) -> Dict[str, str]:
+        """指标参数统一为 {列名: 指标路径}（列表中的路径以 '/' 替换为 '_' 作为列名）"""
+        if metrics is None:
+            return dict(self.GLASSNODE_METRICS)
+        if isinstance(metrics, dict):
+            return dict(metrics)
+        return {
+            name if name in self.GLASSNODE_METRICS else name.replace('/', '_'):
+                self.GLASSNODE_METRICS.get(name, name)
+            for name in metrics
         }
+    
+    def get_glassnode_metrics(self,
+                              metrics=None,
+                              days: int = 365,
+                              interval: str = "24h",
+                              max_workers: int = 3,
+                              use_cache: bool = True) -> pd.DataFrame:
+        """
+        批量获取 Glassnode 指标（并发 + 本地增量存储）
         
-        self._rate_limit(min_interval=2.0)
+        每个指标单独存储为一个序列；启用缓存时只请求最后一个数据点之后的数据
+        （最后一个点会重新获取，因为当天数据可能尚未完结）。
         
-        try:
-            response = self.session.get(endpoint, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['t'], unit='s')
-            df['flow_btc'] = df['v']
-            df = df[['timestamp', 'flow_btc']]
-            df.set_index('timestamp', inplace=True)
-            
-            print(f"✓ 成功获取 {len(df)} 天的交易所{flow_type}数据")
-            return df
+        Args:
+            metrics: 指标列表（路径或 GLASSNODE_METRICS 中的列名）或 {列名: 路径}，
+                     默认 GLASSNODE_METRICS
+            days: 回溯天数
+            interval: 数据间隔 ('24h', '1h' 等)
+            max_workers: 并发请求数（共享同一限流配额）
+            use_cache: 是否使用本地存储
+        
+        Returns:
+            按时间对齐的宽表 DataFrame（每个指标一列）
+        """
+        metrics = self._resolve_metrics(metrics)
+        start = pd.Timestamp(datetime.now() - timedelta(days=days)).normalize()
+        
+        if not self._check_glassnode_key():
+            return self.load_glassnode_metrics(list(metrics), interval=interval, start=start) if use_cache else pd.DataFrame()
+        
+        # 每个指标的增量起点
+        tasks = {}
+        for name, path in metrics.items():
+            since = start
+            if use_cache:
+                last = self.store.last_timestamp(self._glassnode_key(name, interval))
+                if last is not None and last > since:
+                    since = last
+            tasks[name] = (path, int(since.timestamp()))
+        
+        print(f"正在获取 {len(tasks)} 个 Glassnode 指标 ({interval})...")
+        
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                executor.submit(self._fetch_glassnode_metric, path, since, None, interval): name
+                for name, (path, since) in tasks.items()
+            }
             
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Glassnode 交易所流动数据请求失败: {e}")
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    series = future.result()
+                except requests.exceptions.RequestException as e:
+                    print(f"✗ Glassnode 指标 {name} 请求失败: {e}")
+                    continue
+                
+                fetched[name] = series
+                if use_cache and not series.empty:
+                    self.store.upsert(self._glassnode_key(name, interval), series.to_frame('value'))
+        
+        new_points = sum(len(s) for s in fetched.values())
+        
+        if use_cache:
+            df = self.load_glassnode_metrics(list(metrics), interval=interval, start=start)
+        elif fetched:
+            df = pd.DataFrame(fetched).loc[start:]
+            df.index.name = 'timestamp'
+        else:
+            df = pd.DataFrame()
+        
+        print(f"✓ Glassnode 指标宽表: {len(df)} 行 x {len(df.columns)} 列 (本次新获取 {new_points} 个数据点)")
+        return df
+    
+    def load_glassnode_metrics(self,
+                               metrics: Optional[List[str]] = None,
+                               interval: str = "24h",
+                               start=None,
+                               end=None) -> pd.DataFrame:
+        """
+        从本地存储读取 Glassnode 指标宽表（不发网络请求）
+        
+        Args:
+            metrics: 列名列表，默认读取存储中该间隔的全部指标
+            interval: 数据间隔
+            start: 开始时间
+            end: 结束时间
+        
+        Returns:
+            按时间对齐的宽表 DataFrame（每个指标一列，无数据时为空）
+        """
+        return read_glassnode_metrics(self.store, metrics, interval, start, end)
+    
+    # ==================== 本地区块数据 ====================
+    
+    CHAIN_METRICS_KEY = CHAIN_METRICS_KEY
+    
+    def get_chain_metrics(self,
+                          blocks_dir: Optional[str] = None,
+                          rpc_url: Optional[str] = None,
+                          rpc_user: Optional[str] = None,
+                          rpc_password: Optional[str] = None,
+                          processes: Optional[int] = None,
+                          checkpoint_path: Optional[str] = None) -> pd.DataFrame:
+        """
+        从本地区块文件或 bitcoind RPC 计算按天链上指标（从检查点增量继续）
+        
+        Args:
+            blocks_dir: blk*.dat 所在目录（默认环境变量 BITCOIN_BLOCKS_DIR）
+            rpc_url: bitcoind RPC 地址（未提供区块目录时使用，默认环境变量 BITCOIND_RPC_URL）
+            rpc_user: RPC 用户名
+            rpc_password: RPC 密码
+            processes: 解析区块文件的进程数
+            checkpoint_path: 检查点路径（默认 cache_dir/chain/checkpoint.sqlite）
+        
+        Returns:
+            DataFrame (index=date) with active_addresses, tx_count, output_value_btc,
+            utxo_count, block_count
+        """
+        blocks_dir = blocks_dir or os.getenv("BITCOIN_BLOCKS_DIR")
+        rpc_url = rpc_url or os.getenv("BITCOIND_RPC_URL")
+        if not blocks_dir and not rpc_url:
+            print("⚠️  需要区块文件目录或 bitcoind RPC 地址")
+            print("   设置环境变量: BITCOIN_BLOCKS_DIR 或 BITCOIND_RPC_URL")
             return pd.DataFrame()
+        
+        checkpoint_path = checkpoint_path or os.path.join(self.cache_dir, 'chain', 'checkpoint.sqlite')
+        engine = ChainMetricsEngine(checkpoint_path=checkpoint_path)
+        
+        try:
+            if blocks_dir:
+                df = engine.run_files(blocks_dir, processes=processes)
+            else:
+                source = BitcoindRPCSource(
+                    rpc_url,
+                    rpc_user or os.getenv("BITCOIND_RPC_USER"),
+                    rpc_password or os.getenv("BITCOIND_RPC_PASSWORD")
+                )
+                df = engine.run_rpc(source)
+        except (OSError, RuntimeError, requests.exceptions.RequestException) as e:
+            print(f"✗ 本地链上指标计算失败: {e}")
+            return self.load_chain_metrics()
+        
+        if not df.empty:
+            self.store.upsert(self.CHAIN_METRICS_KEY, df)
+        
+        print(f"✓ 本地链上指标: {len(df)} 天 (链高度 {engine.height})")
+        return df
+    
+    def load_chain_metrics(self) -> pd.DataFrame:
+        """从本地存储读取按天链上指标（不重新计算）"""
+        return read_chain_metrics(self.store)
     
     # ==================== 综合分析 ====================
     
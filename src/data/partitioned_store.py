@@ -0,0 +1,193 @@
+"""
+按时间分区的列式存储（Parquet）
+
+功能：
+1. 一个时间分区（默认按月）一个 Parquet 文件，分区独立写入，原子替换（临时文件 + os.replace）
+2. 按时间范围读取时只打开相交的分区，可只读取部分列（列式存储）
+3. 逐分区迭代，供超出内存的数据集流式处理
+
+目录结构：
+    root/
+        _meta.json          # {"freq": "M", "columns": [...]}
+        2024-01.parquet
+        2024-02.parquet
+        ...
+
+依赖：numpy, pandas, pyarrow
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+class PartitionedStore:
+    """按时间分区的 Parquet 存储"""
+
+    META_FILE = '_meta.json'
+
+    def __init__(self, root: str, freq: str = 'M'):
+        """
+        初始化
+
+        Args:
+            root: 存储目录
+            freq: 分区粒度（pandas Period 频率，如 'M' 按月、'W' 按周、'D' 按天）；
+                  已有存储以 _meta.json 中记录的粒度为准
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("PartitionedStore 需要 pyarrow: pip install pyarrow")
+
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        meta = self._load_meta()
+        self.freq = meta.get('freq', freq)
+        self.columns: Optional[List[str]] = meta.get('columns')
+        if not meta:
+            self._save_meta()
+
+    # ==================== 元数据 ====================
+
+    def _load_meta(self) -> dict:
+        path = self.root / self.META_FILE
+        if not path.exists():
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_meta(self):
+        path = self.root / self.META_FILE
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'freq': self.freq, 'columns': self.columns}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    # ==================== 分区 ====================
+
+    @staticmethod
+    def period_name(period: pd.Period) -> str:
+        """
+        Period 对应的分区名（即文件名）
+
+        按周等区间形式的 Period 字符串含 '/'（如 '2022-01-03/2022-01-09'），替换为 '_'
+        """
+        return str(period).replace('/', '_')
+
+    def partition_of(self, ts) -> str:
+        """时间戳所属分区名"""
+        return self.period_name(pd.Timestamp(ts).tz_localize(None).to_period(self.freq))
+
+    def _path(self, name: str) -> Path:
+        return self.root / f"{name}.parquet"
+
+    def partitions(self) -> List[str]:
+        """所有分区名（按时间排序）"""
+        return sorted(p.stem for p in self.root.glob('*.parquet'))
+
+    def _bounds(self, name: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        period = pd.Period(name.split('_', 1)[0], freq=self.freq)
+        return period.start_time, period.end_time
+
+    # ==================== 读写 ====================
+
+    def write_partition(self, name: str, df: pd.DataFrame):
+        """
+        写入（覆盖）一个分区
+
+        首次写入时记录列结构，之后的分区按相同列顺序写入（缺失列为 NaN）
+
+        Args:
+            name: 分区名（partition_of 的返回值）
+            df: 分区数据（时间索引）
+        """
+        with self._lock:
+            if self.columns is None:
+                self.columns = list(df.columns)
+                self._save_meta()
+        df = df.reindex(columns=self.columns)
+
+        path = self._path(name)
+        tmp_path = path.with_name(path.name + '.tmp')
+        df.to_parquet(tmp_path, engine='pyarrow')
+        os.replace(tmp_path, path)
+
+    def remove_partitions(self, names: List[str]):
+        """删除分区"""
+        for name in names:
+            self._path(name).unlink(missing_ok=True)
+
+    def reset(self, freq: Optional[str] = None):
+        """
+        清空存储（删除所有分区和列结构）
+
+        Args:
+            freq: 新的分区粒度（None 表示不变）
+        """
+        with self._lock:
+            self.remove_partitions(self.partitions())
+            self.freq = freq or self.freq
+            self.columns = None
+            self._save_meta()
+
+    def read_partition(self, name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """读取一个分区（可只读取部分列）"""
+        path = self._path(name)
+        if not path.exists():
+            return pd.DataFrame()
+        return pd.read_parquet(path, columns=columns, engine='pyarrow')
+
+    def iter_partitions(self, start=None, end=None,
+                        columns: Optional[List[str]] = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        逐分区读取（只打开与 [start, end] 相交的分区）
+
+        Yields:
+            (分区名, DataFrame)
+        """
+        start = pd.Timestamp(start).tz_localize(None) if start is not None else None
+        end = pd.Timestamp(end).tz_localize(None) if end is not None else None
+
+        for name in self.partitions():
+            lo, hi = self._bounds(name)
+            if (start is not None and hi < start) or (end is not None and lo > end):
+                continue
+            df = self.read_partition(name, columns)
+            if start is not None or end is not None:
+                naive = df.index.tz_localize(None) if df.index.tz is not None else df.index
+                mask = np.ones(len(df), dtype=bool)
+                if start is not None:
+                    mask &= naive >= start
+                if end is not None:
+                    mask &= naive <= end
+                df = df[mask]
+            yield name, df
+
+    def read(self, start=None, end=None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        按时间范围读取（拼接相交的分区）
+
+        Args:
+            start: 起始时间（含）
+            end: 结束时间（含）
+            columns: 只读取这些列（None 表示全部）
+
+        Returns:
+            DataFrame（没有数据时返回空 DataFrame）
+        """
+        frames = [df for _, df in self.iter_partitions(start, end, columns) if len(df)]
+        if not frames:
+            return pd.DataFrame(columns=columns or self.columns or [])
+        return pd.concat(frames)
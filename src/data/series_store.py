@@ -0,0 +1,194 @@
+"""
+本地时间序列存储
+
+功能：
+1. 按 key 持久化时间序列（CSV，一个 key 一个文件）
+2. 增量更新（按时间索引去重合并，新数据覆盖旧数据）
+3. 原子写入（临时文件 + os.replace）
+4. 记录已覆盖的时间区间，计算未覆盖的区间（只补拉缺失部分）
+
+key 可以包含 '/'，用于按数据源分组，例如 'coingecko/bitcoin_usd_daily'。
+
+依赖：pandas
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+
+class SeriesStore:
+    """本地时间序列存储"""
+
+    def __init__(self, root: str = 'data/raw/store'):
+        """
+        初始化
+
+        Args:
+            root: 存储根目录
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+
+    # ==================== 路径 ====================
+
+    def _data_path(self, key: str) -> Path:
+        return self.root / f"{key}.csv"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / f"{key}.meta.json"
+
+    def keys(self) -> List[str]:
+        """列出所有已存储的 key"""
+        return sorted(
+            str(p.relative_to(self.root).with_suffix('')).replace(os.sep, '/')
+            for p in self.root.rglob('*.csv')
+        )
+
+    # ==================== 读写 ====================
+
+    def read(self, key: str,
+             start: Optional[pd.Timestamp] = None,
+             end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        读取时间序列
+
+        Args:
+            key: 序列 key
+            start: 起始时间（含）
+            end: 结束时间（含）
+
+        Returns:
+            DataFrame（不存在时返回空 DataFrame）
+        """
+        path = self._data_path(key)
+        if not path.exists():
+            return pd.DataFrame()
+
+        df = pd.read_csv(path, index_col=0, parse_dates=True)
+        if start is not None or end is not None:
+            df = df.loc[start:end]
+        return df
+
+    def upsert(self, key: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        增量写入（相同时间戳以新数据为准）
+
+        Args:
+            key: 序列 key
+            df: 新数据（DatetimeIndex）
+
+        Returns:
+            合并后的完整序列
+        """
+        with self._lock:
+            existing = self.read(key)
+            if existing.empty:
+                merged = df.copy()
+            elif df.empty:
+                merged = existing
+            else:
+                merged = pd.concat([existing, df])
+                merged = merged[~merged.index.duplicated(keep='last')]
+
+            merged = merged.sort_index()
+            self._atomic_write(self._data_path(key), merged.to_csv)
+            return merged
+
+    def last_timestamp(self, key: str) -> Optional[pd.Timestamp]:
+        """最新数据点时间（不存在时返回 None）"""
+        df = self.read(key)
+        if df.empty:
+            return None
+        return df.index.max()
+
+    @staticmethod
+    def _atomic_write(path: Path, writer):
+        """先写临时文件再替换，避免中断留下半个文件"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+
+    # ==================== 覆盖区间 ====================
+
+    def get_coverage(self, key: str) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        获取已覆盖的时间区间（已请求过的区间，即使该区间没有数据）
+
+        Returns:
+            按时间排序、互不重叠的 [(start, end), ...]
+        """
+        path = self._meta_path(key)
+        if not path.exists():
+            return []
+
+        with open(path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return [(pd.Timestamp(s), pd.Timestamp(e)) for s, e in meta.get('coverage', [])]
+
+    def add_coverage(self, key: str, start, end):
+        """
+        标记区间为已覆盖（与已有区间合并）
+
+        Args:
+            key: 序列 key
+            start: 起始时间
+            end: 结束时间
+        """
+        with self._lock:
+            intervals = self.get_coverage(key) + [(pd.Timestamp(start), pd.Timestamp(end))]
+            intervals.sort()
+
+            merged = [intervals[0]]
+            for s, e in intervals[1:]:
+                last_s, last_e = merged[-1]
+                if s <= last_e:
+                    merged[-1] = (last_s, max(last_e, e))
+                else:
+                    merged.append((s, e))
+
+            meta = {'coverage': [[s.isoformat(), e.isoformat()] for s, e in merged]}
+
+            def writer(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, indent=2)
+
+            self._atomic_write(self._meta_path(key), writer)
+
+    def missing_ranges(self, key: str, start, end) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        计算 [start, end] 中尚未覆盖的子区间
+
+        Args:
+            key: 序列 key
+            start: 起始时间
+            end: 结束时间
+
+        Returns:
+            [(start, end), ...]
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        missing = []
+        cursor = start
+
+        for s, e in self.get_coverage(key):
+            if e < cursor:
+                continue
+            if s > end:
+                break
+            if s > cursor:
+                missing.append((cursor, min(s, end)))
+            cursor = max(cursor, e)
+            if cursor >= end:
+                break
+
+        if cursor < end:
+            missing.append((cursor, end))
+
+        return missing
@@ -22,6 +22,13 @@ warnings.filterwarnings('ignore')
 class FeatureEngineer:
     """特征工程类 - 负责数据清洗与特征提取"""
     
+    # 滚动窗口特征所需的最大回看行数（MA200）
+    FEATURE_LOOKBACK = 200
+    # EMA200 的初值误差衰减到 1e-13 以下所需的行数（(1 - 2/201)^3000 ≈ 1e-13）
+    EMA_WARMUP = 3000
+    # 累计量特征（与起点的误差为常数偏移，不会衰减）
+    CUMULATIVE_FEATURES = ('PVT', 'OBV')
+    
     def __init__(self, verbose: bool = True):
         """
         初始化特征工程器
@@ -30,12 +37,67 @@ class FeatureEngineer:
             verbose: 是否打印详细信息
         """
         self.verbose = verbose
+        # 递归特征（EMA、累计量）的续算种子与最近一次计算结果
+        self._seed: Optional[Dict] = None
+        self._recursive: Dict[str, pd.Series] = {}
     
     def log(self, message: str):
         """打印日志"""
         if self.verbose:
             print(f"[FeatureEngineer] {message}")
     
+    # ==================== 增量续算 ====================
+    
+    def set_recursive_seed(self, anchor: Optional[pd.Timestamp], state: Optional[Dict[str, float]] = None):
+        """
+        设置递归特征的续算种子（增量计算时使用）
+        
+        EMA 和累计量依赖全部历史。增量计算只在「回看窗口 + 新数据」上计算，
+        再用 anchor 行在完整历史上的真实值修正：EMA 的误差按 (1-alpha)^k 衰减，
+        累计量的误差为常数偏移，因此修正后与全量计算结果一致。
+        
+        Args:
+            anchor: 窗口中已在完整历史上计算过的最后一行（None 表示清除种子）
+            state: {特征 key: anchor 行的真实值}，由 recursive_state() 得到
+        """
+        self._seed = {'anchor': anchor, 'state': state or {}} if anchor is not None else None
+    
+    def recursive_state(self, at: pd.Timestamp) -> Dict[str, float]:
+        """
+        获取最近一次计算中各递归特征在 at 行的值（作为下一次增量的种子）
+        
+        Args:
+            at: 时间索引
+        
+        Returns:
+            {特征 key: 值}
+        """
+        return {
+            key: float(series.loc[at])
+            for key, series in self._recursive.items()
+            if at in series.index and pd.notna(series.loc[at])
+        }
+    
+    def _continue(self, result: pd.Series, key: str, decay: float) -> pd.Series:
+        """用种子修正 anchor 行及之后的值，并记录结果"""
+        seed = self._seed
+        if seed is not None and key in seed['state'] and seed['anchor'] in result.index:
+            pos = result.index.get_loc(seed['anchor'])
+            diff = seed['state'][key] - result.iloc[pos]
+            result = result.copy()
+            result.iloc[pos:] += diff * decay ** np.arange(len(result) - pos)
+        self._recursive[key] = result
+        return result
+    
+    def _ewm(self, series: pd.Series, span: int, key: str) -> pd.Series:
+        """EMA（adjust=False，可续算）"""
+        result = series.ewm(span=span, adjust=False).mean()
+        return self._continue(result, key, decay=1 - 2 / (span + 1))
+    
+    def _cumsum(self, series: pd.Series, key: str) -> pd.Series:
+        """累计和（可续算）"""
+        return self._continue(series.cumsum(), key, decay=1.0)
+    
     # ==================== 数据清洗 ====================
     
     def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -177,7 +239,7 @@ class FeatureEngineer:
             df[f'MA{window}'] = df['Close'].rolling(window=window).mean()
             
             # 指数移动平均 (EMA)
-            df[f'EMA{window}'] = df['Close'].ewm(span=window, adjust=False).mean()
+            df[f'EMA{window}'] = self._ewm(df['Close'], window, f'EMA{window}')
         
         self.log(f"添加了 {len(windows)} 个 MA/EMA 指标")
         return df
@@ -226,14 +288,14 @@ class FeatureEngineer:
         df = df.copy()
         
         # 计算 EMA
-        ema_fast = df['Close'].ewm(span=fast, adjust=False).mean()
-        ema_slow = df['Close'].ewm(span=slow, adjust=False).mean()
+        ema_fast = self._ewm(df['Close'], fast, f'MACD_EMA{fast}')
+        ema_slow = self._ewm(df['Close'], slow, f'MACD_EMA{slow}')
         
         # MACD 线
         df['MACD'] = ema_fast - ema_slow
         
         # 信号线
-        df['MACD_Signal'] = df['MACD'].ewm(span=signal, adjust=False).mean()
+        df['MACD_Signal'] = self._ewm(df['MACD'], signal, 'MACD_Signal')
         
         # MACD 柱状图
         df['MACD_Hist'] = df['MACD'] - df['MACD_Signal']
@@ -321,21 +383,11 @@ class FeatureEngineer:
         df['Volume_Change'] = df['Volume'].pct_change()
         
         # 价格成交量趋势 (Price Volume Trend)
-        df['PVT'] = (df['Close'].pct_change() * df['Volume']).cumsum()
-        
-        # 能量潮 (On-Balance Volume)
-        obv = []
-        obv_val = 0
-        for i in range(len(df)):
-            if i == 0:
-                obv.append(0)
-            else:
-                if df['Close'].iloc[i] > df['Close'].iloc[i-1]:
-                    obv_val += df['Volume'].iloc[i]
-                elif df['Close'].iloc[i] < df['Close'].iloc[i-1]:
-                    obv_val -= df['Volume'].iloc[i]
-                obv.append(obv_val)
-        df['OBV'] = obv
+        df['PVT'] = self._cumsum(df['Close'].pct_change() * df['Volume'], 'PVT')
+        
+        # 能量潮 (On-Balance Volume)：上涨加成交量、下跌减成交量
+        direction = np.sign(df['Close'].diff()).fillna(0)
+        df['OBV'] = self._cumsum(direction * df['Volume'], 'OBV')
         
         self.log("添加了成交量特征")
         return df
@@ -414,8 +466,8 @@ class FeatureEngineer:
         
         Args:
             dfs: 数据源字典，格式 {'source_name': DataFrame}
-            method: 合并方法 ('inner', 'outer', 'left')
-            fill_method: 缺失值填充方法
+            method: 合并方法 ('inner', 'outer', 'left'，或 'asof' 以第一个数据源为基准做时点对齐)
+            fill_method: 缺失值填充方法（'asof' 模式下不使用）
         
         Returns:
             对齐后的 DataFrame
@@ -428,6 +480,19 @@ class FeatureEngineer:
         if len(dfs) == 1:
             return list(dfs.values())[0]
         
+        if method == 'asof':
+            try:
+                from data.asof_join import asof_join
+            except ImportError:
+                from src.data.asof_join import asof_join
+            
+            names = list(dfs)
+            base = dfs[names[0]].add_prefix(f"{names[0]}_")
+            aligned = asof_join(base.index, {name: dfs[name] for name in names[1:]})
+            result = pd.concat([base, aligned], axis=1)
+            self.log(f"对齐完成，最终行数: {len(result)}, 列数: {len(result.columns)}")
+            return result
+        
         # 逐步合并所有数据源
         result = None
         for name, df in dfs.items():
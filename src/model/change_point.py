@@ -0,0 +1,451 @@
+"""
+Bitcoin Research Agent - 结构突变（change-point）检测
+
+功能：
+1. 在线检测：贝叶斯在线变点检测（BOCPD, Adams & MacKay 2007）
+   - 每个维度一个 Normal-Inverse-Gamma 共轭模型，预测分布为 Student-t
+   - 常数风险函数 H = 1 / hazard_lambda
+   - 运行长度截断：最多保留 max_run_length 个运行长度，每步 O(R·D) 向量化更新，内存有界
+2. 批量检测：PELT（高斯均值 + 方差变化代价，累积和 O(1) 计算区间代价，剪枝）
+3. 面向 DataFrame 的检测器：默认使用收益率和 7 日波动率，输出变点事件，
+   供 MarketRegimeIdentifier 作为重新训练的触发条件、调度器作为事件
+   （滚动波动率自相关很强，直接建模会把每次波动都当作突变，因此转换为对数变化后再检测）
+
+运行长度后验 P(r_t | x_1:t) 中 r_t = 0 的概率恒为 H，因此用「最近 min_run 步内发生变点」的
+概率 P(r_t < min_run) 作为变点信号，变点位置取 t - MAP 运行长度。
+
+作者：Bitcoin Research Agent Team
+日期：2025-10-25
+"""
+
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.special import gammaln, logsumexp
+
+
+# ==================== 在线检测（BOCPD） ====================
+
+class BOCPD:
+    """贝叶斯在线变点检测（运行长度截断）"""
+
+    def __init__(self,
+                 n_features: int,
+                 hazard_lambda: float = 250,
+                 max_run_length: int = 500,
+                 prior_mean: Optional[np.ndarray] = None,
+                 prior_var: Optional[np.ndarray] = None,
+                 kappa0: float = 1.0,
+                 alpha0: float = 2.0):
+        """
+        初始化
+
+        Args:
+            n_features: 维度（各维度独立建模）
+            hazard_lambda: 期望的区间长度（风险函数 H = 1 / hazard_lambda）
+            max_run_length: 保留的最大运行长度（更长的运行长度合并到最后一格）
+            prior_mean: 各维度先验均值（默认 0）
+            prior_var: 各维度先验方差（默认 1，即方差的先验期望）
+            kappa0: 均值先验的伪样本数
+            alpha0: 方差先验的形状参数（> 1）
+        """
+        self.n_features = n_features
+        self.hazard_lambda = hazard_lambda
+        self.log_hazard = -np.log(hazard_lambda)
+        self.log_1m_hazard = np.log1p(-1.0 / hazard_lambda)
+        self.max_run_length = max_run_length
+        self.kappa0 = kappa0
+        self.alpha0 = alpha0
+        self.mu0 = np.zeros(n_features) if prior_mean is None else np.asarray(prior_mean, dtype=np.float64)
+        var = np.ones(n_features) if prior_var is None else np.asarray(prior_var, dtype=np.float64)
+        self.beta0 = np.maximum(var, 1e-12) * (alpha0 - 1)
+        self.reset()
+
+    def reset(self):
+        """清空运行长度后验（下一个观测视为新区间的开始）"""
+        self.log_r = np.zeros(1)
+        self.mu = self.mu0[None, :].copy()
+        self.beta = self.beta0[None, :].copy()
+        self.t = 0
+
+    def _predictive_log_prob(self, x: np.ndarray, observed: np.ndarray) -> np.ndarray:
+        """各运行长度下观测 x 的对数预测概率（已观测维度的 Student-t 之和）"""
+        run = np.arange(len(self.log_r))
+        kappa = (self.kappa0 + run)[:, None]
+        alpha = (self.alpha0 + run / 2)[:, None]
+        nu = 2 * alpha
+        scale2 = self.beta * (kappa + 1) / (alpha * kappa)
+        z2 = (x[None, :] - self.mu) ** 2 / (nu * scale2)
+        log_pdf = (gammaln((nu + 1) / 2) - gammaln(nu / 2)
+                   - 0.5 * np.log(nu * np.pi * scale2) - (nu + 1) / 2 * np.log1p(z2))
+        return log_pdf @ observed.astype(np.float64)
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        """
+        处理一个观测
+
+        Args:
+            x: (n_features,)，NaN 维度不参与似然，也不更新统计量
+
+        Returns:
+            运行长度后验 P(r_t | x_1:t)，长度 <= max_run_length
+        """
+        x = np.asarray(x, dtype=np.float64)
+        observed = ~np.isnan(x)
+        x = np.where(observed, x, 0.0)
+
+        log_joint = self.log_r + self._predictive_log_prob(x, observed)
+        log_r = np.concatenate([[logsumexp(log_joint) + self.log_hazard], log_joint + self.log_1m_hazard])
+
+        # 充分统计量：新区间用先验，已有区间加入 x
+        kappa = (self.kappa0 + np.arange(len(self.log_r)))[:, None]
+        mu = np.where(observed, (kappa * self.mu + x) / (kappa + 1), self.mu)
+        beta = np.where(observed, self.beta + kappa * (x - self.mu) ** 2 / (2 * (kappa + 1)), self.beta)
+        mu = np.vstack([self.mu0, mu])
+        beta = np.vstack([self.beta0, beta])
+
+        # 截断：超出 max_run_length 的概率并入最后一格（沿用该格的统计量）
+        R = self.max_run_length
+        if len(log_r) > R:
+            log_r = np.concatenate([log_r[:R - 1], [logsumexp(log_r[R - 1:])]])
+            mu, beta = mu[:R], beta[:R]
+
+        self.log_r = log_r - logsumexp(log_r)
+        self.mu, self.beta = mu, beta
+        self.t += 1
+        return np.exp(self.log_r)
+
+    def short_run_probability(self, min_run: int) -> float:
+        """P(r_t < min_run)：最近 min_run 步内发生变点的概率"""
+        return float(np.exp(logsumexp(self.log_r[:min_run])))
+
+    def map_run_length(self) -> int:
+        """最可能的运行长度"""
+        return int(self.log_r.argmax())
+
+    def get_state(self) -> Dict:
+        """后验快照（可序列化为 JSON）"""
+        return {'log_r': self.log_r.tolist(), 'mu': self.mu.tolist(), 'beta': self.beta.tolist(), 't': self.t}
+
+    def set_state(self, state: Dict):
+        """恢复 get_state() 保存的后验"""
+        self.log_r = np.asarray(state['log_r'], dtype=np.float64)
+        self.mu = np.asarray(state['mu'], dtype=np.float64).reshape(-1, self.n_features)
+        self.beta = np.asarray(state['beta'], dtype=np.float64).reshape(-1, self.n_features)
+        self.t = state.get('t', 0)
+
+
+# ==================== 批量检测（PELT） ====================
+
+def pelt(X: np.ndarray, penalty: Optional[float] = None, min_size: int = 10) -> List[int]:
+    """
+    PELT 批量变点检测（各维度高斯均值 + 方差变化）
+
+    区间 (s, t] 的代价为 n · Σ_d log(var_d)，由累积和 O(1) 计算；每个 t 对全部候选起点向量化求值，
+    不可能成为最优起点的候选被剪枝。
+
+    Args:
+        X: (n_samples, n_features)，建议先标准化
+        penalty: 每个变点的惩罚（默认 BIC：2 · n_features · log(n)）
+        min_size: 最短区间长度
+
+    Returns:
+        变点位置（新区间第一行的行号，升序）
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    n, d = X.shape
+    if n < 2 * min_size:
+        return []
+    if penalty is None:
+        penalty = 2 * d * np.log(n)
+
+    S1 = np.vstack([np.zeros(d), np.cumsum(X, axis=0)])
+    S2 = np.vstack([np.zeros(d), np.cumsum(X ** 2, axis=0)])
+    var_floor = 1e-8 * max(X.var(axis=0).max(), 1e-12)
+
+    def cost(starts: np.ndarray, t: int) -> np.ndarray:
+        length = (t - starts)[:, None]
+        mean = (S1[t] - S1[starts]) / length
+        var = np.maximum((S2[t] - S2[starts]) / length - mean ** 2, var_floor)
+        return length[:, 0] * np.log(var).sum(axis=1)
+
+    F = np.full(n + 1, np.inf)
+    F[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+
+    for t in range(min_size, n + 1):
+        new_start = t - min_size
+        if new_start > 0 and np.isfinite(F[new_start]):
+            candidates = np.append(candidates, new_start)
+        seg_cost = F[candidates] + cost(candidates, t)
+        best = seg_cost.argmin()
+        F[t] = seg_cost[best] + penalty
+        last[t] = candidates[best]
+        candidates = candidates[seg_cost <= F[t]]
+
+    change_points = []
+    t = n
+    while last[t] > 0:
+        t = last[t]
+        change_points.append(int(t))
+    return change_points[::-1]
+
+
+# ==================== DataFrame 检测器 ====================
+
+class ChangePointDetector:
+    """收益率 / 波动率结构突变检测器"""
+
+    # 默认检测的特征（带或不带 market_ 前缀）
+    FEATURES = ('Return', 'Volatility_7d')
+    
+    # 名称包含这些关键字的特征（滚动指标）转换为对数变化
+    LOG_DIFF_KEYWORDS = ('Volatility',)
+
+    def __init__(self,
+                 features: Sequence[str] = FEATURES,
+                 hazard_lambda: float = 500,
+                 max_run_length: int = 500,
+                 threshold: float = 0.8,
+                 min_run: int = 10,
+                 verbose: bool = True):
+        """
+        初始化
+
+        Args:
+            features: 检测的特征列
+            hazard_lambda: 期望的区间长度（行）
+            max_run_length: BOCPD 保留的最大运行长度（每步计算量和内存上限）
+            threshold: P(r_t < min_run) 超过该值时报告变点
+            min_run: 判定变点的短运行长度窗口（行）
+            verbose: 是否打印详细信息
+        """
+        self.features = list(features)
+        self.hazard_lambda = hazard_lambda
+        self.max_run_length = max_run_length
+        self.threshold = threshold
+        self.min_run = min_run
+        self.verbose = verbose
+
+        self.center: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.model: Optional[BOCPD] = None
+        self.events: List[Dict] = []
+        self.last_timestamp = None
+        self._armed = True
+        self._timestamps: deque = deque(maxlen=max_run_length + 1)
+        self._log_diff = np.array([any(k in feat for k in self.LOG_DIFF_KEYWORDS) for feat in self.features])
+        self._prev_raw: Optional[np.ndarray] = None
+        self._last_change_step: Optional[int] = None
+
+    def log(self, message: str):
+        """打印日志"""
+        if self.verbose:
+            print(f"[ChangePoint] {message}")
+
+    def _raw(self, df: pd.DataFrame) -> np.ndarray:
+        columns = []
+        for feat in self.features:
+            col = f'market_{feat}' if f'market_{feat}' in df.columns else feat
+            columns.append(df[col].to_numpy(dtype=np.float64) if col in df.columns else np.full(len(df), np.nan))
+        return np.column_stack(columns)
+
+    def series(self, df: pd.DataFrame, prev_raw: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        提取检测特征（未标准化），缺少的列为 NaN
+
+        Args:
+            df: 特征 DataFrame
+            prev_raw: df 之前一行的原始值（用于对数变化的第一行）
+        """
+        X = self._raw(df)
+        if self._log_diff.any():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                logged = np.log(X[:, self._log_diff])
+                prev = np.full(logged.shape[1], np.nan) if prev_raw is None else np.log(prev_raw[self._log_diff])
+            X[:, self._log_diff] = np.diff(logged, axis=0, prepend=prev[None, :])
+        X[~np.isfinite(X)] = np.nan
+        return X
+
+    def calibrate(self, df: pd.DataFrame):
+        """
+        用历史数据确定标准化参数（中位数 / MAD，对历史中的突变不敏感）并重置后验
+
+        Args:
+            df: 历史数据（只在变点检测开始前的数据上调用，避免使用未来数据）
+        """
+        X = self.series(df)
+        self.center = np.nan_to_num(np.nanmedian(X, axis=0))
+        mad = np.nan_to_num(np.nanmedian(np.abs(X - self.center), axis=0) * 1.4826)
+        self.scale = np.where(mad > 0, mad, 1.0)
+        self.model = BOCPD(len(self.features), hazard_lambda=self.hazard_lambda,
+                           max_run_length=self.max_run_length)
+        self.events = []
+        self.last_timestamp = None
+        self._armed = True
+        self._last_change_step = None
+        self._timestamps.clear()
+        raw = self._raw(df)
+        self._prev_raw = raw[-1] if len(raw) else None
+
+    def _standardize(self, X: np.ndarray) -> np.ndarray:
+        if self.model is None:
+            raise ValueError("检测器未校准，请先调用 calibrate()")
+        return (X - self.center) / self.scale
+
+    def _step(self, x: np.ndarray, timestamp) -> Optional[Dict]:
+        """处理一行标准化特征，检测到新变点时返回事件"""
+        self.model.update(x)
+        self._timestamps.append(timestamp)
+        self.last_timestamp = timestamp
+
+        prob = self.model.short_run_probability(self.min_run)
+        if prob < self.threshold / 2:
+            self._armed = True
+        if prob < self.threshold or not self._armed or self.model.t <= self.min_run:
+            return None
+
+        # 同一次突变只报告一次：概率回落到阈值一半以下后才重新报警，且与上次变点至少相隔 min_run 行
+        self._armed = False
+        run_length = self.model.map_run_length()
+        step = self.model.t - run_length
+        if self._last_change_step is not None and step - self._last_change_step < self.min_run:
+            return None
+        self._last_change_step = step
+        # r_t = k 表示最近 k 个观测属于当前区间
+        location = self._timestamps[-min(max(run_length, 1), len(self._timestamps))]
+        event = {
+            'timestamp': timestamp,
+            'change_point': location,
+            'run_length': run_length,
+            'probability': prob,
+        }
+        self.events.append(event)
+        self.log(f"检测到结构突变: {location}（{timestamp} 确认，概率 {prob:.1%}）")
+        return event
+
+    def update(self, bar) -> Optional[Dict]:
+        """
+        处理一根新K线
+
+        Args:
+            bar: 一行特征（Series，name 为时间戳；或 {列名: 值} 字典）
+
+        Returns:
+            检测到新变点时返回 {'timestamp', 'change_point', 'run_length', 'probability'}，否则 None
+        """
+        if isinstance(bar, dict):
+            bar = pd.Series(bar)
+        frame = bar.to_frame().T
+        x = self._standardize(self.series(frame, self._prev_raw))[0]
+        self._prev_raw = self._raw(frame)[0]
+        return self._step(x, bar.name)
+
+    def scan(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        按顺序处理多根K线（跳过已处理的时间）
+
+        Args:
+            df: 特征 DataFrame（时间升序）
+
+        Returns:
+            DataFrame (index 与处理的行相同) with run_length, change_prob, is_change
+        """
+        if self.last_timestamp is not None and len(df):
+            df = df[df.index > self.last_timestamp]
+        X = self._standardize(self.series(df, self._prev_raw))
+        if len(df):
+            self._prev_raw = self._raw(df)[-1]
+
+        run_length = np.empty(len(df), dtype=np.int64)
+        change_prob = np.empty(len(df))
+        is_change = np.zeros(len(df), dtype=bool)
+        for i, timestamp in enumerate(df.index):
+            is_change[i] = self._step(X[i], timestamp) is not None
+            run_length[i] = self.model.map_run_length()
+            change_prob[i] = self.model.short_run_probability(self.min_run)
+
+        return pd.DataFrame({'run_length': run_length, 'change_prob': change_prob, 'is_change': is_change},
+                            index=df.index)
+
+    def detect(self, df: pd.DataFrame, penalty: Optional[float] = None, min_size: int = 10) -> List:
+        """
+        批量检测（PELT，用整段数据标准化）
+
+        Args:
+            df: 特征 DataFrame
+            penalty: 每个变点的惩罚（默认 BIC）
+            min_size: 最短区间长度（行）
+
+        Returns:
+            变点时间（新区间的第一行）
+        """
+        X = self.series(df)
+        X = np.nan_to_num((X - np.nanmean(X, axis=0)) / np.maximum(np.nanstd(X, axis=0), 1e-12))
+        positions = pelt(X, penalty=penalty, min_size=min_size)
+        self.log(f"PELT 检测到 {len(positions)} 个变点")
+        return [df.index[p] for p in positions]
+
+    # ==================== 状态保存 ====================
+
+    def get_state(self) -> Dict:
+        """检测器快照（可序列化为 JSON，用于重启后继续检测）"""
+        if self.model is None:
+            return {}
+        return {
+            'center': self.center.tolist(),
+            'scale': self.scale.tolist(),
+            'model': self.model.get_state(),
+            'last_timestamp': None if self.last_timestamp is None else pd.Timestamp(self.last_timestamp).isoformat(),
+            'timestamps': [pd.Timestamp(ts).isoformat() for ts in self._timestamps],
+            'prev_raw': None if self._prev_raw is None else [None if np.isnan(v) else float(v) for v in self._prev_raw],
+            'armed': self._armed,
+            'last_change_step': self._last_change_step,
+        }
+
+    def set_state(self, state: Dict):
+        """恢复 get_state() 保存的检测器"""
+        self.center = np.asarray(state['center'], dtype=np.float64)
+        self.scale = np.asarray(state['scale'], dtype=np.float64)
+        self.model = BOCPD(len(self.features), hazard_lambda=self.hazard_lambda,
+                           max_run_length=self.max_run_length)
+        self.model.set_state(state['model'])
+        self.last_timestamp = None if state.get('last_timestamp') is None else pd.Timestamp(state['last_timestamp'])
+        self._timestamps = deque((pd.Timestamp(ts) for ts in state.get('timestamps', [])),
+                                 maxlen=self.max_run_length + 1)
+        self._prev_raw = None if state.get('prev_raw') is None else \
+            np.array([np.nan if v is None else v for v in state['prev_raw']], dtype=np.float64)
+        self._armed = state.get('armed', True)
+        self._last_change_step = state.get('last_change_step')
+        self.events = []
+
+
+def main():
+    """测试结构突变检测：在线 BOCPD 与批量 PELT"""
+    print("\n" + "=" * 70)
+    print("  Bitcoin Research Agent - Change-point Detection Test")
+    print("=" * 70 + "\n")
+
+    try:
+        df = pd.read_csv('data/processed/integrated_features.csv', index_col=0, parse_dates=True)
+    except FileNotFoundError:
+        print("Error: Please run feature engineering first (WAL-13)")
+        return
+
+    detector = ChangePointDetector()
+    detector.calibrate(df.iloc[:180])
+    detector.scan(df.iloc[180:])
+    print(f"BOCPD: {len(detector.events)} 个变点")
+    for event in detector.events:
+        print(f"  {event['change_point']}  (确认于 {event['timestamp']}, {event['probability']:.1%})")
+
+    print(f"PELT: {detector.detect(df)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,13 @@ Bitcoin Research Agent - 市场状态识别模型
 
 功能：
 1. 识别市场状态：震荡(Consolidation)、趋势(Trending)、恐慌(Panic)、狂热(Euphoria)
-2. 使用K-Means聚类和Hidden Markov Model
+2. 使用K-Means聚类和Hidden Markov Model（hybrid：由K-Means划分初始化HMM）
 3. 生成Market Regime指标时间序列
+4. 模型持久化：数据未漂移时直接加载已保存的模型，漂移时用旧模型参数热启动重新训练
+5. 模型选择：进程池并行搜索状态数 / 方法 / 协方差类型，按 BIC/AIC、轮廓系数、似然和跨种子稳定性选优
+6. 软输出：各市场状态的概率（HMM 后验 / K-Means 距离软分配，float32）和置信度列
+7. 结构突变触发：训练之后的新数据出现收益率 / 波动率变点时，即使整体漂移不大也重新训练
+8. 集成：多个方法 × 随机种子并行训练，按簇统计量匈牙利对齐后投票得到共识标签和一致度
 
 作者：Bitcoin Research Agent Team
 日期：2025-10-25
@@ -12,15 +17,139 @@ Bitcoin Research Agent - 市场状态识别模型
 
 import pandas as pd
 import numpy as np
+import hashlib
+import itertools
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+from scipy.optimize import linear_sum_assignment
 from hmmlearn import hmm
 import warnings
+
+try:
+    from change_point import ChangePointDetector
+except ImportError:
+    from src.model.change_point import ChangePointDetector
 warnings.filterwarnings('ignore')
 
 
+def extract_features(df: pd.DataFrame, feature_names: List[str]) -> np.ndarray:
+    """
+    按指定特征列提取特征矩阵（MA_Diff 不在列中时现算，缺失值和无穷值置 0）
+    
+    Args:
+        df: 输入DataFrame
+        feature_names: 特征列（prepare_features 的返回值）
+    
+    Returns:
+        特征数组 (n_samples, n_features)
+    """
+    columns = {}
+    for col in feature_names:
+        if col == 'MA_Diff' and col not in df.columns:
+            columns[col] = (df['market_MA7'] - df['market_MA30']) / df['market_Close']
+        else:
+            columns[col] = df[col]
+    
+    X = pd.DataFrame(columns, index=df.index).to_numpy(dtype=np.float64)
+    return np.nan_to_num(X, nan=0, posinf=0, neginf=0)
+
+
+def _hmm_n_params(n_states: int, n_features: int, covariance_type: str) -> int:
+    """GaussianHMM 自由参数个数（初始分布 + 转移矩阵 + 均值 + 协方差）"""
+    covars = {
+        'full': n_states * n_features * (n_features + 1) // 2,
+        'diag': n_states * n_features,
+        'spherical': n_states,
+        'tied': n_features * (n_features + 1) // 2,
+    }[covariance_type]
+    return (n_states - 1) + n_states * (n_states - 1) + n_states * n_features + covars
+
+
+def _covars_for_type(full_covars: np.ndarray, covariance_type: str) -> np.ndarray:
+    """完整协方差矩阵 -> hmmlearn 对应协方差类型的参数形状"""
+    if covariance_type == 'full':
+        return full_covars
+    if covariance_type == 'diag':
+        return np.diagonal(full_covars, axis1=1, axis2=2).copy()
+    if covariance_type == 'spherical':
+        return np.diagonal(full_covars, axis1=1, axis2=2).mean(axis=1)
+    return full_covars.mean(axis=0)  # tied
+
+
+def _em_converged(model) -> bool:
+    """EM 是否因似然增量低于 tol 而停止（hmmlearn 的 monitor_.converged 在达到迭代上限时也为 True）"""
+    history = model.monitor_.history
+    return len(history) >= 2 and history[-1] - history[-2] < model.monitor_.tol
+
+
+def _fit_config(X: np.ndarray, method: str, n_regimes: int, covariance_type: Optional[str],
+                seed: int, silhouette_sample: int) -> Dict:
+    """
+    训练一个候选配置（一个随机种子），返回对数似然、参数个数、轮廓系数和标签
+    
+    K-Means 的似然按「共享方差的球形高斯混合 + 硬分配」计算，以便与 HMM 一起用 BIC/AIC 比较。
+    """
+    start = time.perf_counter()
+    n_samples, n_features = X.shape
+    result = {'method': method, 'n_regimes': n_regimes, 'covariance_type': covariance_type, 'seed': seed}
+    
+    try:
+        if method == 'kmeans':
+            # 每个种子只初始化一次，多个种子合起来相当于 n_init=len(seeds)
+            model = KMeans(n_clusters=n_regimes, random_state=seed, n_init=1, max_iter=500).fit(X)
+            labels = model.labels_
+            var = max(model.inertia_ / (n_samples * n_features), 1e-12)
+            counts = np.bincount(labels, minlength=n_regimes)
+            counts = counts[counts > 0]
+            log_likelihood = (-0.5 * n_samples * n_features * (np.log(2 * np.pi * var) + 1)
+                              + float(np.sum(counts * np.log(counts / n_samples))))
+            n_params = n_regimes * n_features + 1 + (n_regimes - 1)
+            converged = model.n_iter_ < 500
+        else:
+            model = hmm.GaussianHMM(n_components=n_regimes, covariance_type=covariance_type,
+                                    n_iter=200, random_state=seed).fit(X)
+            labels = model.predict(X)
+            log_likelihood = float(model.score(X))
+            n_params = _hmm_n_params(n_regimes, n_features, covariance_type)
+            converged = _em_converged(model)
+    except (ValueError, np.linalg.LinAlgError) as e:
+        return {**result, 'error': str(e), 'seconds': time.perf_counter() - start}
+    
+    silhouette = np.nan
+    if silhouette_sample and 1 < len(np.unique(labels)) < n_samples:
+        silhouette = float(silhouette_score(X, labels, sample_size=min(n_samples, silhouette_sample),
+                                            random_state=0))
+    
+    return {
+        **result,
+        'log_likelihood': float(log_likelihood),
+        'n_params': int(n_params),
+        'silhouette': silhouette,
+        'converged': converged,
+        'labels': labels.astype(np.int16),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _sweep_worker(shm_name: str, shape: Tuple[int, int], task: Dict) -> Dict:
+    """进程池任务：从共享内存读取标准化特征矩阵（不复制），训练一个候选配置"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return _fit_config(np.ndarray(shape, dtype=np.float64, buffer=shm.buf), **task)
+    finally:
+        shm.close()
+
+
 class MarketRegimeIdentifier:
     """市场状态识别器"""
     
@@ -39,18 +168,25 @@ class MarketRegimeIdentifier:
         3: '狂热'
     }
     
-    def __init__(self, n_regimes: int = 4, method: str = 'kmeans', verbose: bool = True):
+    # HMM EM 迭代上限：随机初始化 / 由初始划分或旧参数初始化（初值已接近最优，只需少量迭代）
+    HMM_N_ITER = 200
+    SEEDED_HMM_N_ITER = 100
+    
+    def __init__(self, n_regimes: int = 4, method: str = 'kmeans', verbose: bool = True,
+                 covariance_type: str = 'full'):
         """
         初始化市场状态识别器
         
         Args:
             n_regimes: 市场状态数量（默认4个）
-            method: 识别方法 ('kmeans', 'hmm', 'hybrid')
+            method: 识别方法 ('kmeans', 'hmm', 'hybrid', 'ensemble')
             verbose: 是否打印详细信息
+            covariance_type: HMM 协方差类型 ('full', 'diag', 'spherical', 'tied')
         """
         self.n_regimes = n_regimes
         self.method = method
         self.verbose = verbose
+        self.covariance_type = covariance_type
         
         # 模型
         self.kmeans_model = None
@@ -58,8 +194,31 @@ class MarketRegimeIdentifier:
         self.scaler = StandardScaler()
         self.pca = None
         
+        # K-Means 软分配的簇内方差（每维，标准化空间）
+        self.kmeans_sigma2 = 1.0
+        
         # 状态映射
         self.regime_mapping = None
+        
+        # 训练数据指纹（用于判断数据是否漂移）与最近一次 fit_or_load 的方式
+        self.fingerprint: Optional[Dict] = None
+        self.last_fit_mode: Optional[str] = None
+        
+        # 最近一次 fit_or_load 在训练期之后检测到的结构突变
+        self.change_events: List[Dict] = []
+        
+        # 最近一次 HMM 训练的迭代次数、是否收敛和耗时
+        self.fit_report: Optional[Dict] = None
+        
+        # 最近一次 fit_ensemble() 的成员结果与一致度
+        self.ensemble_report: Optional[Dict] = None
+        
+        # 最近一次 sweep() 的结果与最优配置
+        self.sweep_results: Optional[pd.DataFrame] = None
+        self.best_config: Optional[Dict] = None
+        
+        # 训练时使用的特征列（预测和在线跟踪使用相同的列）
+        self.feature_names: Optional[List[str]] = None
     
     def log(self, message: str):
         """打印日志"""
@@ -124,13 +283,31 @@ class MarketRegimeIdentifier:
         
         return X, feature_columns
     
-    def fit_kmeans(self, X: np.ndarray, random_state: int = 42) -> np.ndarray:
+    def feature_matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        按训练时的特征列提取特征矩阵（未标准化）
+        
+        Args:
+            df: 输入DataFrame
+        
+        Returns:
+            特征数组 (n_samples, n_features)
+        """
+        if self.feature_names is None:
+            raise ValueError("模型未训练，请先调用 fit()")
+        return extract_features(df, self.feature_names)
+    
+    def fit_kmeans(self, X: np.ndarray, random_state: int = 42,
+                   warm_scaler: Optional[StandardScaler] = None,
+                   n_init: int = 50) -> np.ndarray:
         """
         使用K-Means聚类识别市场状态
         
         Args:
             X: 特征矩阵
             random_state: 随机种子
+            warm_scaler: 旧模型的标准化器；给出时以旧质心（换算到新标准化空间）为初值，只训练一次
+            n_init: 随机初始化次数（热启动时为 1）
         
         Returns:
             状态标签数组
@@ -138,58 +315,171 @@ class MarketRegimeIdentifier:
         self.log(f"训练 K-Means 模型 (n_clusters={self.n_regimes})...")
         
         # 标准化
+        old_model = self.kmeans_model
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
+        init = 'k-means++'
+        if (warm_scaler is not None and old_model is not None and old_model.n_features_in_ == X.shape[1]
+                and old_model.n_clusters == self.n_regimes):
+            init = self.scaler.transform(warm_scaler.inverse_transform(old_model.cluster_centers_))
+            n_init = 1
+            self.log("  使用旧质心热启动")
+        
         # K-Means聚类
         self.kmeans_model = KMeans(
             n_clusters=self.n_regimes,
+            init=init,
             random_state=random_state,
-            n_init=50,
+            n_init=n_init,
             max_iter=500
         )
         
         labels = self.kmeans_model.fit_predict(X_scaled)
+        self.kmeans_sigma2 = max(self.kmeans_model.inertia_ / X_scaled.size, 1e-6)
         
         self.log(f"K-Means 训练完成")
         self.log(f"  Inertia: {self.kmeans_model.inertia_:.2f}")
         
         return labels
     
-    def fit_hmm(self, X: np.ndarray, random_state: int = 42) -> np.ndarray:
+    def _hmm_warm_ready(self, warm_scaler: Optional[StandardScaler], n_features: int) -> bool:
+        """当前 HMM 能否作为热启动初值（给出旧标准化器，且特征数、状态数一致）"""
+        return (warm_scaler is not None and self.hmm_model is not None
+                and self.hmm_model.n_features == n_features and self.hmm_model.n_components == self.n_regimes)
+    
+    def fit_hmm(self, X: np.ndarray, random_state: int = 42,
+                warm_scaler: Optional[StandardScaler] = None,
+                init_labels: Optional[np.ndarray] = None,
+                n_iter: Optional[int] = None,
+                tol: float = 1e-2) -> np.ndarray:
         """
         使用Hidden Markov Model识别市场状态
         
         Args:
             X: 特征矩阵
             random_state: 随机种子
+            warm_scaler: 旧模型的标准化器；给出时以旧模型参数（换算到新标准化空间）为初值
+            init_labels: 初始划分（如 K-Means 标签）；给出时由划分估计初始分布、转移矩阵、均值和协方差
+            n_iter: EM 最大迭代次数（默认随机初始化 HMM_N_ITER，热启动或由划分初始化 SEEDED_HMM_N_ITER）
+            tol: EM 收敛阈值（对数似然增量）
         
         Returns:
             状态标签数组
         """
         self.log(f"训练 Hidden Markov Model (n_states={self.n_regimes})...")
+        start = time.perf_counter()
         
         # 标准化
+        old_model = self.hmm_model
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
+        warm = self._hmm_warm_ready(warm_scaler, X.shape[1])
+        seeded = not warm and init_labels is not None
+        if n_iter is None:
+            n_iter = self.SEEDED_HMM_N_ITER if warm or seeded else self.HMM_N_ITER
+        
         # HMM模型
         self.hmm_model = hmm.GaussianHMM(
             n_components=self.n_regimes,
-            covariance_type="full",
-            n_iter=200,
-            random_state=random_state
+            covariance_type=self.covariance_type,
+            n_iter=n_iter,
+            tol=tol,
+            random_state=random_state,
+            init_params='' if warm or seeded else 'stmc'
         )
         
+        if warm:
+            # 旧参数换算到新标准化空间：均值先还原再标准化，协方差按尺度比缩放
+            ratio = warm_scaler.scale_ / self.scaler.scale_
+            self.hmm_model.startprob_ = old_model.startprob_
+            self.hmm_model.transmat_ = old_model.transmat_
+            self.hmm_model.means_ = self.scaler.transform(warm_scaler.inverse_transform(old_model.means_))
+            self.hmm_model.covars_ = _covars_for_type(old_model.covars_ * np.outer(ratio, ratio),
+                                                      self.covariance_type)
+            self.log("  使用旧模型参数热启动")
+        elif seeded:
+            params = self._params_from_labels(X_scaled, np.asarray(init_labels))
+            for name, value in params.items():
+                setattr(self.hmm_model, name, value)
+            self.log("  由初始划分估计 HMM 初值")
+        
         # 训练
         self.hmm_model.fit(X_scaled)
         
         # 预测状态序列
         labels = self.hmm_model.predict(X_scaled)
         
+        monitor = self.hmm_model.monitor_
+        self.fit_report = {
+            'method': 'hmm',
+            'init': 'warm' if warm else 'labels' if seeded else 'random',
+            'iterations': int(monitor.iter),
+            'converged': _em_converged(self.hmm_model),
+            'seconds': time.perf_counter() - start,
+            'log_likelihood': float(self.hmm_model.score(X_scaled)),
+        }
+        
         self.log(f"HMM 训练完成")
-        self.log(f"  Log Likelihood: {self.hmm_model.score(X_scaled):.2f}")
+        self.log(f"  Log Likelihood: {self.fit_report['log_likelihood']:.2f}")
+        self.log(f"  EM 迭代 {self.fit_report['iterations']} 次"
+                 f"{'（已收敛）' if self.fit_report['converged'] else '（未收敛）'}，"
+                 f"耗时 {self.fit_report['seconds']:.2f}s")
         
         return labels
     
+    def _params_from_labels(self, X_scaled: np.ndarray, labels: np.ndarray, min_covar: float = 1e-3) -> Dict:
+        """
+        由硬划分估计 HMM 初值
+        
+        - 初始分布：各状态占比
+        - 转移矩阵：相邻时刻的状态转移计数（每行加 1 平滑后归一化）
+        - 均值 / 协方差：各状态样本的均值和协方差（样本不足时用全体协方差）
+        """
+        n_states, n_features = self.n_regimes, X_scaled.shape[1]
+        labels = labels.astype(np.int64)
+        
+        counts = np.bincount(labels, minlength=n_states).astype(np.float64)
+        startprob = (counts + 1) / (counts + 1).sum()
+        
+        transitions = np.zeros((n_states, n_states))
+        np.add.at(transitions, (labels[:-1], labels[1:]), 1)
+        transmat = (transitions + 1) / (transitions + 1).sum(axis=1, keepdims=True)
+        
+        global_cov = np.cov(X_scaled, rowvar=False).reshape(n_features, n_features)
+        means = np.zeros((n_states, n_features))
+        covars = np.empty((n_states, n_features, n_features))
+        for k in range(n_states):
+            members = X_scaled[labels == k]
+            means[k] = members.mean(axis=0) if len(members) else X_scaled.mean(axis=0)
+            cov = np.cov(members, rowvar=False).reshape(n_features, n_features) if len(members) > n_features else global_cov
+            covars[k] = cov + min_covar * np.eye(n_features)
+        
+        return {
+            'startprob_': startprob,
+            'transmat_': transmat,
+            'means_': means,
+            'covars_': _covars_for_type(covars, self.covariance_type),
+        }
+    
+    def _cluster_means(self, df: pd.DataFrame, feature: str, labels: np.ndarray) -> np.ndarray:
+        """各簇某个特征的均值（忽略 NaN；缺少该列时为 0，空簇为 NaN）"""
+        col = f'market_{feature}' if f'market_{feature}' in df.columns else feature
+        if col not in df.columns:
+            return np.zeros(self.n_regimes)
+        values = df[col].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        sums = np.bincount(labels[valid], weights=values[valid], minlength=self.n_regimes)[:self.n_regimes]
+        counts = np.bincount(labels[valid], minlength=self.n_regimes)[:self.n_regimes]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+    
+    def _label_lookup(self) -> np.ndarray:
+        """模型状态 -> 市场状态的查找表（未映射的状态为趋势）"""
+        mapping = self.regime_mapping or {}
+        return np.array([mapping.get(k, 1) for k in range(self.n_regimes)], dtype=np.int64)
+    
     def map_regimes_to_meanings(self, df: pd.DataFrame, labels: np.ndarray) -> np.ndarray:
         """
         将聚类标签映射到有意义的市场状态
@@ -203,87 +493,80 @@ class MarketRegimeIdentifier:
         """
         self.log("映射市场状态...")
         
-        # 为每个簇计算特征统计
-        cluster_stats = []
-        for cluster_id in range(self.n_regimes):
-            mask = labels == cluster_id
-            cluster_data = df[mask]
-            
-            # 计算关键统计量
-            stats = {
-                'cluster_id': cluster_id,
-                'count': mask.sum(),
-                'avg_return': cluster_data.get('market_Return', cluster_data.get('Return', pd.Series([0]))).mean(),
-                'avg_volatility': cluster_data.get('market_Volatility_7d', cluster_data.get('Volatility_7d', pd.Series([0]))).mean(),
-                'avg_volume_change': cluster_data.get('market_Volume_Change', cluster_data.get('Volume_Change', pd.Series([0]))).mean(),
-            }
-            cluster_stats.append(stats)
-        
-        # 转换为DataFrame便于分析
-        stats_df = pd.DataFrame(cluster_stats)
+        # 为每个簇计算特征统计（bincount 一次计算所有簇的均值）
+        labels = np.asarray(labels)
+        counts = np.bincount(labels, minlength=self.n_regimes)[:self.n_regimes]
+        avg_return = self._cluster_means(df, 'Return', labels)
+        avg_volatility = self._cluster_means(df, 'Volatility_7d', labels)
         
         # 映射逻辑：
         # - 恐慌(Panic): 高波动 + 负收益
         # - 狂热(Euphoria): 高波动 + 正收益
         # - 趋势(Trending): 中等波动 + 明显收益
         # - 震荡(Consolidation): 低波动
+        # 空簇的统计量为 NaN，不参与选择
         
         mapping = {}
         
         # 1. 找出高波动的簇
-        high_vol_threshold = stats_df['avg_volatility'].quantile(0.6)
-        high_vol_clusters = stats_df[stats_df['avg_volatility'] > high_vol_threshold]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            high_vol_threshold = np.nanquantile(avg_volatility, 0.6)
+        high_vol_clusters = np.flatnonzero(avg_volatility > high_vol_threshold)
         
         if len(high_vol_clusters) >= 2:
+            high_vol_return = avg_return[high_vol_clusters]
             # 高波动 + 负收益 = 恐慌
-            panic_candidate = high_vol_clusters.loc[high_vol_clusters['avg_return'].idxmin()]
-            mapping[int(panic_candidate['cluster_id'])] = 2  # Panic
-            
+            mapping[int(high_vol_clusters[np.argmin(np.nan_to_num(high_vol_return, nan=np.inf))])] = 2  # Panic
             # 高波动 + 正收益 = 狂热
-            euphoria_candidate = high_vol_clusters.loc[high_vol_clusters['avg_return'].idxmax()]
-            mapping[int(euphoria_candidate['cluster_id'])] = 3  # Euphoria
+            mapping[int(high_vol_clusters[np.argmax(np.nan_to_num(high_vol_return, nan=-np.inf))])] = 3  # Euphoria
         
         # 2. 剩余簇
-        remaining_clusters = stats_df[~stats_df['cluster_id'].isin(mapping.keys())]
+        remaining_clusters = np.array([k for k in range(self.n_regimes) if k not in mapping], dtype=np.int64)
         
         if len(remaining_clusters) > 0:
             # 低波动 = 震荡
-            consolidation_candidate = remaining_clusters.loc[remaining_clusters['avg_volatility'].idxmin()]
-            mapping[int(consolidation_candidate['cluster_id'])] = 0  # Consolidation
+            consolidation = int(remaining_clusters[np.argmin(np.nan_to_num(avg_volatility[remaining_clusters], nan=np.inf))])
+            mapping[consolidation] = 0  # Consolidation
             
             # 剩余的 = 趋势
-            remaining_clusters = remaining_clusters[remaining_clusters['cluster_id'] != consolidation_candidate['cluster_id']]
-            for _, row in remaining_clusters.iterrows():
-                mapping[int(row['cluster_id'])] = 1  # Trending
+            for cluster_id in remaining_clusters[remaining_clusters != consolidation]:
+                mapping[int(cluster_id)] = 1  # Trending
         
         # 保存映射
         self.regime_mapping = mapping
         
-        # 应用映射
-        mapped_labels = np.array([mapping.get(label, 1) for label in labels])
+        # 应用映射（查找表）
+        mapped_labels = self._label_lookup()[labels]
         
         # 打印映射结果
         self.log("状态映射结果:")
         for old_label, new_label in mapping.items():
             regime_name = self.REGIMES[new_label]
             regime_cn = self.REGIME_CN[new_label]
-            count = (labels == old_label).sum()
-            self.log(f"  Cluster {old_label} -> {regime_name} ({regime_cn}): {count} 天")
+            self.log(f"  Cluster {old_label} -> {regime_name} ({regime_cn}): {counts[old_label]} 天")
         
         return mapped_labels
     
-    def fit(self, df: pd.DataFrame, method: Optional[str] = None) -> pd.DataFrame:
+    def fit(self, df: pd.DataFrame, method: Optional[str] = None, warm_start: bool = False,
+            n_iter: Optional[int] = None, tol: float = 1e-2) -> pd.DataFrame:
         """
         训练市场状态识别模型
         
         Args:
             df: 输入DataFrame (包含特征)
             method: 识别方法 (如不指定则使用初始化时的方法)
+            warm_start: 是否以当前模型参数为初值（特征列不变时生效）
+            n_iter: HMM EM 最大迭代次数（见 fit_hmm）
+            tol: HMM EM 收敛阈值
         
         Returns:
             添加了market_regime列的DataFrame
         """
         method = method or self.method
+        if method == 'ensemble':
+            return self.fit_ensemble(df)
+        self.method = method
         
         self.log("\n" + "=" * 60)
         self.log(f"开始训练市场状态识别模型 (方法: {method})")
@@ -291,43 +574,110 @@ class MarketRegimeIdentifier:
         
         # 准备特征
         X, feature_names = self.prepare_features(df)
+        warm_scaler = self.scaler if warm_start and feature_names == self.feature_names else None
+        self.feature_names = feature_names
         self.log(f"特征矩阵形状: {X.shape}")
         
         # 根据方法选择模型
         if method == 'kmeans':
-            labels = self.fit_kmeans(X)
+            labels = self.fit_kmeans(X, warm_scaler=warm_scaler)
         elif method == 'hmm':
-            labels = self.fit_hmm(X)
+            labels = self.fit_hmm(X, warm_scaler=warm_scaler, n_iter=n_iter, tol=tol)
         elif method == 'hybrid':
-            # 混合方法：先用K-Means，再用HMM平滑
-            labels_kmeans = self.fit_kmeans(X)
-            self.log("使用 HMM 平滑 K-Means 结果...")
-            labels = self.fit_hmm(X)
+            # 混合方法：由K-Means划分估计HMM初值，再用EM和时间结构平滑；
+            # 可用旧 HMM 参数热启动时 K-Means 划分不会被使用，跳过
+            labels_kmeans = None
+            if not self._hmm_warm_ready(warm_scaler, X.shape[1]):
+                labels_kmeans = self.fit_kmeans(X, warm_scaler=warm_scaler)
+                self.log("使用 K-Means 划分初始化 HMM...")
+            labels = self.fit_hmm(X, warm_scaler=warm_scaler, init_labels=labels_kmeans, n_iter=n_iter, tol=tol)
+            self.fit_report['method'] = 'hybrid'
         else:
             raise ValueError(f"Unknown method: {method}")
         
+        self.fingerprint = self.data_fingerprint(X, df.index)
+        
         # 映射到有意义的状态
         mapped_labels = self.map_regimes_to_meanings(df, labels)
-        
-        # 添加到DataFrame
-        df_result = df.copy()
-        df_result['market_regime'] = mapped_labels
-        df_result['market_regime_name'] = [self.REGIMES[label] for label in mapped_labels]
-        df_result['market_regime_cn'] = [self.REGIME_CN[label] for label in mapped_labels]
+        regime_probs = self.regime_probabilities(self.state_probabilities(self.scaler.transform(X)))
+        return self._regime_dataframe(df, mapped_labels, regime_probs)
+    
+    def _regime_dataframe(self, df: pd.DataFrame, mapped_labels: np.ndarray,
+                          regime_probs: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """添加 market_regime（及概率）列并打印状态分布"""
+        mapped_labels = np.asarray(mapped_labels)
+        
+        # 添加到DataFrame（名称列按编码查表；不用分类类型，下游 groupby / value_counts 不会出现零计数的状态）
+        columns = {
+            'market_regime': mapped_labels,
+            'market_regime_name': np.array(list(self.REGIMES.values()), dtype=object)[mapped_labels],
+            'market_regime_cn': np.array(list(self.REGIME_CN.values()), dtype=object)[mapped_labels],
+        }
+        if regime_probs is not None:
+            columns['market_regime_confidence'] = regime_probs[np.arange(len(mapped_labels)), mapped_labels]
+            for regime_id, regime_name in self.REGIMES.items():
+                columns[f'market_regime_prob_{regime_name}'] = regime_probs[:, regime_id]
+        df_result = df.drop(columns=[c for c in columns if c in df.columns]).assign(**columns)
         
         # 统计
+        counts = np.bincount(mapped_labels, minlength=len(self.REGIMES))
         self.log("\n" + "=" * 60)
         self.log("市场状态分布:")
         self.log("=" * 60)
         for regime_id, regime_name in self.REGIMES.items():
-            count = (mapped_labels == regime_id).sum()
-            pct = count / len(mapped_labels) * 100
-            self.log(f"  {regime_name} ({self.REGIME_CN[regime_id]}): {count} 天 ({pct:.1f}%)")
+            pct = counts[regime_id] / len(mapped_labels) * 100
+            self.log(f"  {regime_name} ({self.REGIME_CN[regime_id]}): {counts[regime_id]} 天 ({pct:.1f}%)")
         
         self.log("=" * 60 + "\n")
         
         return df_result
     
+    # ==================== 状态概率 ====================
+    
+    def state_probabilities(self, X_scaled: np.ndarray) -> np.ndarray:
+        """
+        各模型状态的后验概率
+        
+        - HMM / hybrid：前后向算法的平滑后验
+        - K-Means：等权各向同性高斯混合的后验，方差为训练时的簇内平均平方距离（每维）
+        
+        Args:
+            X_scaled: 标准化后的特征
+        
+        Returns:
+            (n_samples, n_regimes)
+        """
+        if self.method in ('hmm', 'hybrid') and self.hmm_model is not None:
+            return self.hmm_model.predict_proba(X_scaled)
+        if self.kmeans_model is None:
+            raise ValueError("模型未训练，请先调用 fit()")
+        
+        sq_dist = self.kmeans_model.transform(X_scaled) ** 2
+        logits = -sq_dist / (2 * self.kmeans_sigma2)
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+    
+    def regime_probabilities(self, state_probs: np.ndarray) -> np.ndarray:
+        """模型状态概率 -> 市场状态概率（float32，多个模型状态可能映射到同一市场状态）"""
+        onehot = np.eye(len(self.REGIMES), dtype=np.float32)[self._label_lookup()]
+        return state_probs.astype(np.float32) @ onehot
+    
+    def predict_proba(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        预测新数据属于各市场状态的概率
+        
+        Args:
+            df: 输入DataFrame
+        
+        Returns:
+            DataFrame (index 与 df 相同) with market_regime_prob_<状态> (float32)
+        """
+        X_scaled = self.scaler.transform(self.feature_matrix(df))
+        probs = self.regime_probabilities(self.state_probabilities(X_scaled))
+        return pd.DataFrame(probs, index=df.index,
+                            columns=[f'market_regime_prob_{name}' for name in self.REGIMES.values()])
+    
     def predict(self, df: pd.DataFrame) -> np.ndarray:
         """
         预测新数据的市场状态
@@ -341,25 +691,468 @@ class MarketRegimeIdentifier:
         if self.kmeans_model is None and self.hmm_model is None:
             raise ValueError("模型未训练，请先调用 fit()")
         
-        # 准备特征
-        X, _ = self.prepare_features(df)
+        # 准备特征（与训练时相同的列）
+        X = self.feature_matrix(df)
         X_scaled = self.scaler.transform(X)
         
         # 预测
-        if self.method == 'kmeans' and self.kmeans_model is not None:
+        if self.method in ('kmeans', 'ensemble') and self.kmeans_model is not None:
             labels = self.kmeans_model.predict(X_scaled)
-        elif self.method == 'hmm' and self.hmm_model is not None:
+        elif self.method in ('hmm', 'hybrid') and self.hmm_model is not None:
             labels = self.hmm_model.predict(X_scaled)
         else:
             raise ValueError("无可用模型进行预测")
         
         # 应用映射
         if self.regime_mapping:
-            mapped_labels = np.array([self.regime_mapping.get(label, 1) for label in labels])
+            return self._label_lookup()[labels]
+        return labels
+    
+    # ==================== 模型持久化 ====================
+    
+    @staticmethod
+    def data_fingerprint(X: np.ndarray, index=None) -> Dict:
+        """
+        训练数据指纹：行数、时间范围、内容哈希和各特征的均值 / 标准差
+        
+        Args:
+            X: 特征矩阵（未标准化）
+            index: 时间索引
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        return {
+            'n_rows': int(len(X)),
+            'start': str(index[0]) if index is not None and len(index) else None,
+            'end': str(index[-1]) if index is not None and len(index) else None,
+            'hash': hashlib.sha1(X.tobytes()).hexdigest(),
+            'mean': X.mean(axis=0).tolist() if len(X) else [],
+            'std': X.std(axis=0).tolist() if len(X) else [],
+        }
+    
+    def drift_score(self, X: np.ndarray) -> float:
+        """
+        当前数据相对训练数据的漂移程度
+        
+        取各特征「均值偏移 / 训练标准差」与「log 标准差比」中的最大值；
+        0 表示与训练数据一致，无指纹或特征数不同时返回 inf。
+        """
+        if self.fingerprint is None or len(self.fingerprint['mean']) != X.shape[1] or not len(X):
+            return float('inf')
+        if hashlib.sha1(np.ascontiguousarray(X, dtype=np.float64).tobytes()).hexdigest() == self.fingerprint['hash']:
+            return 0.0
+        
+        old_mean = np.asarray(self.fingerprint['mean'])
+        old_std = np.maximum(np.asarray(self.fingerprint['std']), 1e-12)
+        new_std = np.maximum(X.std(axis=0), 1e-12)
+        mean_shift = np.abs(X.mean(axis=0) - old_mean) / old_std
+        scale_shift = np.abs(np.log(new_std / old_std))
+        return float(max(mean_shift.max(), scale_shift.max()))
+    
+    def save_model(self, path: str):
+        """
+        保存模型（标准化器、K-Means / HMM 参数、特征列、状态映射、数据指纹），原子写入
+        
+        Args:
+            path: 保存路径（.pkl）
+        """
+        state = {
+            'n_regimes': self.n_regimes,
+            'method': self.method,
+            'covariance_type': self.covariance_type,
+            'scaler': self.scaler,
+            'kmeans_model': self.kmeans_model,
+            'kmeans_sigma2': self.kmeans_sigma2,
+            'hmm_model': self.hmm_model,
+            'feature_names': self.feature_names,
+            'regime_mapping': self.regime_mapping,
+            'fingerprint': self.fingerprint,
+            'saved_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.log(f"模型已保存: {path}")
+    
+    def load_model(self, path: str) -> bool:
+        """
+        加载 save_model() 保存的模型
+        
+        Args:
+            path: 模型路径
+        
+        Returns:
+            是否加载成功（文件不存在、损坏或状态数不一致时返回 False）
+        """
+        path = Path(path)
+        if not path.exists():
+            return False
+        
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            self.log(f"模型文件无法读取，忽略: {e}")
+            return False
+        
+        if state.get('n_regimes') != self.n_regimes:
+            return False
+        
+        self.method = state['method']
+        self.covariance_type = state.get('covariance_type', 'full')
+        self.scaler = state['scaler']
+        self.kmeans_model = state['kmeans_model']
+        self.kmeans_sigma2 = state.get('kmeans_sigma2', 1.0)
+        self.hmm_model = state['hmm_model']
+        self.feature_names = state['feature_names']
+        self.regime_mapping = state['regime_mapping']
+        self.fingerprint = state['fingerprint']
+        self.log(f"已加载模型: {path} (方法: {self.method}, 保存于 {state.get('saved_at')})")
+        return True
+    
+    def change_points_since_fit(self, df: pd.DataFrame, warmup: int = 250,
+                                detector: Optional[ChangePointDetector] = None) -> List[Dict]:
+        """
+        检测训练期之后的数据中的结构突变（BOCPD）
+        
+        检测器用训练期末尾 warmup 行校准并预热，只报告在训练结束之后确认的变点。
+        
+        Args:
+            df: 包含训练期和新数据的DataFrame
+            warmup: 用于校准和预热的训练期行数
+            detector: 变点检测器（默认使用收益率和 7 日波动率）
+        
+        Returns:
+            变点事件列表（见 ChangePointDetector.update）
+        """
+        if (self.fingerprint is None or self.fingerprint.get('end') is None
+                or not isinstance(df.index, pd.DatetimeIndex)):
+            return []
+        
+        train_end = pd.Timestamp(self.fingerprint['end'])
+        history = df[df.index <= train_end]
+        new_rows = df[df.index > train_end]
+        if new_rows.empty or len(history) < 2:
+            return []
+        
+        detector = detector or ChangePointDetector(verbose=False)
+        detector.calibrate(history.iloc[-warmup:])
+        detector.scan(history.iloc[-warmup:])
+        detector.events = []
+        detector.scan(new_rows)
+        return detector.events
+    
+    def fit_or_load(self,
+                    df: pd.DataFrame,
+                    method: Optional[str] = None,
+                    model_path: str = 'data/models/market_regime.pkl',
+                    drift_threshold: float = 0.25,
+                    refit_on_change: bool = True,
+                    n_iter: Optional[int] = None,
+                    tol: float = 1e-2) -> pd.DataFrame:
+        """
+        有可用的已保存模型时直接复用，否则训练并保存
+        
+        - 方法、状态数、特征列一致且漂移程度 <= drift_threshold、训练期之后没有结构突变：只做预测，不训练
+        - 数据漂移或训练期之后出现结构突变：以已保存模型的质心 / HMM 参数为初值热启动重新训练
+        - 无已保存模型或特征列变化：从头训练
+        
+        self.last_fit_mode 记录本次使用的方式（'loaded' / 'warm' / 'cold'）。
+        
+        Args:
+            df: 输入DataFrame (包含特征)
+            method: 识别方法 (如不指定则使用初始化时的方法)
+            model_path: 模型保存路径
+            drift_threshold: 漂移阈值（见 drift_score）
+            refit_on_change: 是否在训练期之后检测到结构突变时重新训练
+            n_iter: HMM EM 最大迭代次数（见 fit_hmm）
+            tol: HMM EM 收敛阈值
+        
+        Returns:
+            添加了market_regime列的DataFrame
+        """
+        method = method or self.method
+        covariance_type = self.covariance_type
+        loaded = (self.load_model(model_path) and self.method == method
+                  and (method == 'kmeans' or self.covariance_type == covariance_type))
+        self.covariance_type = covariance_type
+        
+        X, feature_names = self.prepare_features(df)
+        self.change_events = []
+        if loaded and feature_names == self.feature_names:
+            drift = self.drift_score(X)
+            if drift <= drift_threshold and refit_on_change:
+                self.change_events = self.change_points_since_fit(df)
+            if self.change_events:
+                self.log(f"训练期之后检测到 {len(self.change_events)} 个结构突变 "
+                         f"(最近: {self.change_events[-1]['change_point']})，热启动重新训练")
+                self.last_fit_mode = 'warm'
+            elif drift <= drift_threshold:
+                self.last_fit_mode = 'loaded'
+                self.log(f"数据未漂移 (drift={drift:.3f})，复用已保存模型")
+                regime_probs = self.regime_probabilities(self.state_probabilities(self.scaler.transform(X)))
+                return self._regime_dataframe(df, self.predict(df), regime_probs)
+            else:
+                self.log(f"数据漂移 (drift={drift:.3f} > {drift_threshold})，热启动重新训练")
+                self.last_fit_mode = 'warm'
         else:
-            mapped_labels = labels
+            self.last_fit_mode = 'cold'
         
-        return mapped_labels
+        df_result = self.fit(df, method=method, warm_start=self.last_fit_mode == 'warm', n_iter=n_iter, tol=tol)
+        self.save_model(model_path)
+        return df_result
+    
+    # ==================== 模型选择 ====================
+    
+    def sweep(self,
+              df: pd.DataFrame,
+              n_regimes_grid=(2, 3, 4, 5, 6),
+              methods=('kmeans', 'hmm'),
+              covariance_types=('full', 'diag', 'spherical', 'tied'),
+              seeds=(0, 1, 2),
+              criterion: str = 'bic',
+              processes: Optional[int] = None,
+              silhouette_sample: int = 2000,
+              apply_best: bool = False) -> pd.DataFrame:
+        """
+        并行搜索模型配置（状态数 × 方法 × HMM 协方差类型），每个配置用多个随机种子训练
+        
+        标准化特征矩阵放在共享内存中，各进程直接读取，不随任务序列化。每个配置报告：
+        - log_likelihood / bic / aic：取似然最高的种子
+        - silhouette：该种子标签的轮廓系数（抽样 silhouette_sample 行）
+        - stability：各种子标签两两之间的调整兰德指数均值（1 表示与初始化无关）
+        
+        Args:
+            df: 输入DataFrame (包含特征)
+            n_regimes_grid: 候选状态数
+            methods: 候选方法 ('kmeans', 'hmm')
+            covariance_types: HMM 候选协方差类型
+            seeds: 随机种子
+            criterion: 选优标准 ('bic', 'aic' 越小越好；'silhouette', 'log_likelihood', 'stability' 越大越好)
+            processes: 进程数（默认全部 CPU）
+            silhouette_sample: 轮廓系数抽样行数
+            apply_best: 是否将最优配置设为当前配置（n_regimes / method / covariance_type）
+        
+        Returns:
+            DataFrame，每行一个配置，按 criterion 排序（最优在前）
+        """
+        ascending = {'bic': True, 'aic': True, 'silhouette': False,
+                     'log_likelihood': False, 'stability': False}
+        if criterion not in ascending:
+            raise ValueError(f"Unknown criterion: {criterion}")
+        
+        X, feature_names = self.prepare_features(df)
+        X_scaled = np.ascontiguousarray(StandardScaler().fit_transform(X), dtype=np.float64)
+        n_samples = len(X_scaled)
+        
+        configs = []
+        for method, n_regimes in itertools.product(methods, n_regimes_grid):
+            if method == 'kmeans':
+                configs.append((method, n_regimes, None))
+            else:
+                configs.extend((method, n_regimes, cov) for cov in covariance_types)
+        tasks = [{'method': m, 'n_regimes': n, 'covariance_type': c, 'seed': seed,
+                  'silhouette_sample': silhouette_sample}
+                 for m, n, c in configs for seed in seeds]
+        
+        processes = processes or os.cpu_count() or 1
+        self.log(f"模型选择: {len(configs)} 个配置 × {len(seeds)} 个种子，{processes} 个进程")
+        start = time.perf_counter()
+        
+        shm = shared_memory.SharedMemory(create=True, size=max(X_scaled.nbytes, 1))
+        try:
+            np.ndarray(X_scaled.shape, dtype=np.float64, buffer=shm.buf)[:] = X_scaled
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                runs = list(pool.map(_sweep_worker, itertools.repeat(shm.name),
+                                     itertools.repeat(X_scaled.shape), tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+        
+        rows = []
+        for method, n_regimes, cov in configs:
+            group = [r for r in runs
+                     if (r['method'], r['n_regimes'], r['covariance_type']) == (method, n_regimes, cov)]
+            ok = [r for r in group if 'error' not in r]
+            row = {'method': method, 'n_regimes': n_regimes, 'covariance_type': cov,
+                   'seconds': sum(r['seconds'] for r in group), 'failed_seeds': len(group) - len(ok)}
+            if ok:
+                best = max(ok, key=lambda r: r['log_likelihood'])
+                pairs = list(itertools.combinations([r['labels'] for r in ok], 2))
+                row.update({
+                    'log_likelihood': best['log_likelihood'],
+                    'n_params': best['n_params'],
+                    'bic': -2 * best['log_likelihood'] + best['n_params'] * np.log(n_samples),
+                    'aic': -2 * best['log_likelihood'] + 2 * best['n_params'],
+                    'silhouette': best['silhouette'],
+                    'stability': float(np.mean([adjusted_rand_score(a, b) for a, b in pairs])) if pairs else np.nan,
+                    'converged': best['converged'],
+                    'best_seed': best['seed'],
+                })
+            rows.append(row)
+        
+        results = pd.DataFrame(rows)
+        if criterion in results.columns:
+            results = results.sort_values(criterion, ascending=ascending[criterion], na_position='last')
+        results = results.reset_index(drop=True)
+        
+        elapsed = time.perf_counter() - start
+        self.log(f"模型选择完成: {elapsed:.1f}s（单进程累计 {results['seconds'].sum():.1f}s）")
+        
+        self.sweep_results = results
+        self.best_config = None
+        if criterion in results.columns and pd.notna(results.loc[0, criterion]):
+            best = results.iloc[0]
+            cov = best['covariance_type']
+            self.best_config = {
+                'n_regimes': int(best['n_regimes']),
+                'method': best['method'],
+                'covariance_type': cov if isinstance(cov, str) else self.covariance_type,
+            }
+            self.log(f"最优配置 ({criterion}): {self.best_config}")
+            if apply_best:
+                self.n_regimes = self.best_config['n_regimes']
+                self.method = self.best_config['method']
+                self.covariance_type = self.best_config['covariance_type']
+        
+        return results
+    
+    # ==================== 集成 ====================
+    
+    def _cluster_signature(self, df: pd.DataFrame, labels: np.ndarray, X_scaled: np.ndarray) -> np.ndarray:
+        """各簇的统计量（与 map_regimes_to_meanings 相同：收益、波动、成交量变化），用于跨模型对齐"""
+        stats = np.column_stack([self._cluster_means(df, feat, labels)
+                                 for feat in ('Return', 'Volatility_7d', 'Volume_Change')])
+        if np.nanstd(stats, axis=0).max() > 0:
+            return stats
+        # 缺少统计列时退回到标准化特征空间的簇中心
+        counts = np.maximum(np.bincount(labels, minlength=self.n_regimes)[:self.n_regimes], 1)
+        centers = np.zeros((self.n_regimes, X_scaled.shape[1]))
+        np.add.at(centers, labels, X_scaled)
+        return centers / counts[:, None]
+    
+    def fit_ensemble(self,
+                     df: pd.DataFrame,
+                     methods=('kmeans', 'hmm'),
+                     seeds=(0, 1, 2, 3),
+                     processes: Optional[int] = None) -> pd.DataFrame:
+        """
+        集成训练：多个方法 × 随机种子并行训练，对齐标签后投票
+        
+        1. 各成员（方法 × 种子）在进程池中并行训练，标准化特征矩阵放在共享内存中
+        2. 以与其他成员平均调整兰德指数最高的成员为参照，按簇统计量（收益、波动、成交量变化，
+           跨成员标准化）的距离用匈牙利算法把各成员的簇编号对齐到参照成员
+        3. 每行取多数票为共识标签，得票比例为一致度；共识簇再映射到市场状态
+        4. 以共识簇中心初始化一个 K-Means 模型，用于 predict() / 持久化
+        
+        Args:
+            df: 输入DataFrame (包含特征)
+            methods: 成员方法 ('kmeans', 'hmm')
+            seeds: 每个方法的随机种子
+            processes: 进程数（默认全部 CPU；1 表示在当前进程中运行）
+        
+        Returns:
+            添加了 market_regime、概率（得票比例）和 market_regime_agreement 列的DataFrame
+        """
+        self.log("\n" + "=" * 60)
+        self.log(f"开始集成训练 (方法: {list(methods)}, 种子: {list(seeds)})")
+        self.log("=" * 60)
+        
+        X, feature_names = self.prepare_features(df)
+        self.feature_names = feature_names
+        self.scaler = StandardScaler()
+        X_scaled = np.ascontiguousarray(self.scaler.fit_transform(X), dtype=np.float64)
+        
+        tasks = [{'method': method, 'n_regimes': self.n_regimes,
+                  'covariance_type': None if method == 'kmeans' else self.covariance_type,
+                  'seed': seed, 'silhouette_sample': 0}
+                 for method in methods for seed in seeds]
+        processes = min(processes or os.cpu_count() or 1, len(tasks))
+        start = time.perf_counter()
+        
+        if processes > 1:
+            shm = shared_memory.SharedMemory(create=True, size=max(X_scaled.nbytes, 1))
+            try:
+                np.ndarray(X_scaled.shape, dtype=np.float64, buffer=shm.buf)[:] = X_scaled
+                with ProcessPoolExecutor(max_workers=processes) as pool:
+                    runs = list(pool.map(_sweep_worker, itertools.repeat(shm.name),
+                                         itertools.repeat(X_scaled.shape), tasks))
+            finally:
+                shm.close()
+                shm.unlink()
+        else:
+            runs = [_fit_config(X_scaled, **task) for task in tasks]
+        
+        members = [r for r in runs if 'error' not in r]
+        if not members:
+            raise ValueError("集成成员全部训练失败")
+        for r in runs:
+            if 'error' in r:
+                self.log(f"  成员 {r['method']} (seed={r['seed']}) 训练失败: {r['error']}")
+        
+        # 参照成员：与其他成员最一致的成员
+        labels = np.vstack([r['labels'].astype(np.int64) for r in members])
+        n_members = len(members)
+        ari = np.eye(n_members)
+        for i, j in itertools.combinations(range(n_members), 2):
+            ari[i, j] = ari[j, i] = adjusted_rand_score(labels[i], labels[j])
+        reference = int(ari.mean(axis=1).argmax())
+        
+        # 匈牙利对齐（簇统计量跨成员标准化）
+        signatures = np.stack([self._cluster_signature(df, member_labels, X_scaled) for member_labels in labels])
+        flat = signatures.reshape(-1, signatures.shape[-1])
+        signatures = np.nan_to_num((signatures - np.nanmean(flat, axis=0)) / np.maximum(np.nanstd(flat, axis=0), 1e-12))
+        aligned = np.empty_like(labels)
+        for m in range(n_members):
+            cost = np.linalg.norm(signatures[reference][:, None, :] - signatures[m][None, :, :], axis=2)
+            ref_idx, member_idx = linear_sum_assignment(cost)
+            perm = np.empty(self.n_regimes, dtype=np.int64)
+            perm[member_idx] = ref_idx
+            aligned[m] = perm[labels[m]]
+        
+        # 投票
+        votes = np.zeros((len(X_scaled), self.n_regimes), dtype=np.float32)
+        rows = np.arange(len(X_scaled))
+        for m in range(n_members):
+            votes[rows, aligned[m]] += 1
+        votes /= n_members
+        consensus = votes.argmax(axis=1)
+        agreement = votes[rows, consensus]
+        elapsed = time.perf_counter() - start
+        
+        # 预测模型：以共识簇中心初始化 K-Means（空簇用参照成员的簇中心）
+        counts = np.bincount(consensus, minlength=self.n_regimes)
+        centers = np.zeros((self.n_regimes, X_scaled.shape[1]))
+        np.add.at(centers, consensus, X_scaled)
+        centers[counts > 0] /= counts[counts > 0, None]
+        for k in np.flatnonzero(counts == 0):
+            mask = aligned[reference] == k
+            centers[k] = X_scaled[mask].mean(axis=0) if mask.any() else X_scaled[k % len(X_scaled)]
+        self.kmeans_model = KMeans(n_clusters=self.n_regimes, init=centers, n_init=1, max_iter=500).fit(X_scaled)
+        self.kmeans_sigma2 = max(self.kmeans_model.inertia_ / X_scaled.size, 1e-6)
+        self.hmm_model = None
+        self.method = 'ensemble'
+        self.fingerprint = self.data_fingerprint(X, df.index)
+        
+        self.ensemble_report = {
+            'members': pd.DataFrame([{
+                'method': r['method'], 'seed': r['seed'], 'log_likelihood': r['log_likelihood'],
+                'seconds': r['seconds'], 'agreement': float((aligned[m] == consensus).mean()),
+            } for m, r in enumerate(members)]),
+            'reference': reference,
+            'agreement': float(agreement.mean()),
+            'pairwise_ari': float(ari[np.triu_indices(n_members, 1)].mean()) if n_members > 1 else 1.0,
+            'seconds': elapsed,
+        }
+        self.log(f"集成完成: {n_members} 个成员，{elapsed:.1f}s（单进程累计 "
+                 f"{sum(r['seconds'] for r in runs):.1f}s），平均一致度 {agreement.mean():.1%}")
+        
+        mapped_labels = self.map_regimes_to_meanings(df, consensus)
+        df_result = self._regime_dataframe(df, mapped_labels, self.regime_probabilities(votes))
+        df_result['market_regime_agreement'] = agreement
+        return df_result
     
     def analyze_regime_characteristics(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -0,0 +1,281 @@
+"""
+Bitcoin Research Agent - 在线市场状态跟踪
+
+功能：
+1. 加载已训练的 GaussianHMM（来自 MarketRegimeIdentifier），维护前向概率
+2. 每根新K线用前向滤波更新状态后验：O(K²) 转移 + O(K·D²) 发射概率，不重新训练、不重跑 Viterbi
+3. 输出各市场状态的滤波概率和映射后的状态标签
+
+前向滤波（归一化）:
+    alpha_t ∝ (alpha_{t-1} · A) ⊙ p(x_t | state)
+alpha_t 只依赖 t 及之前的数据，因此与离线 predict_proba（前后向平滑）不同，没有未来数据泄漏。
+
+作者：Bitcoin Research Agent Team
+日期：2025-10-25
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional
+
+try:
+    from market_regime import MarketRegimeIdentifier, extract_features
+except ImportError:
+    from src.model.market_regime import MarketRegimeIdentifier, extract_features
+
+
+class RegimeTracker:
+    """基于 HMM 前向滤波的在线市场状态跟踪器"""
+
+    def __init__(self,
+                 hmm_model,
+                 scaler,
+                 feature_names: List[str],
+                 regime_mapping: Optional[Dict[int, int]] = None,
+                 verbose: bool = True):
+        """
+        初始化
+
+        Args:
+            hmm_model: 已训练的 hmmlearn GaussianHMM
+            scaler: 训练时使用的 StandardScaler
+            feature_names: 特征列（与训练时一致）
+            regime_mapping: HMM 状态 -> 市场状态（None 表示一一对应）
+            verbose: 是否打印详细信息
+        """
+        self.hmm_model = hmm_model
+        self.scaler = scaler
+        self.feature_names = list(feature_names)
+        self.verbose = verbose
+
+        n_states = hmm_model.n_components
+        mapping = regime_mapping or {i: i for i in range(n_states)}
+        self.state_regimes = np.array([mapping.get(i, 1) for i in range(n_states)])
+        self.n_regimes = max(len(MarketRegimeIdentifier.REGIMES), int(self.state_regimes.max()) + 1)
+
+        self.startprob = np.asarray(hmm_model.startprob_, dtype=np.float64)
+        self.transmat = np.asarray(hmm_model.transmat_, dtype=np.float64)
+        self._prepare_emissions()
+
+        self.reset()
+
+    @classmethod
+    def from_identifier(cls, identifier: MarketRegimeIdentifier, verbose: bool = True) -> 'RegimeTracker':
+        """
+        从已训练的 MarketRegimeIdentifier 创建跟踪器（需要 method='hmm' 或 'hybrid'）
+
+        Args:
+            identifier: 已调用 fit() 的识别器
+            verbose: 是否打印详细信息
+        """
+        if identifier.hmm_model is None or identifier.feature_names is None:
+            raise ValueError("需要已训练的 HMM 模型（method='hmm' 或 'hybrid'）")
+        return cls(identifier.hmm_model, identifier.scaler, identifier.feature_names,
+                   identifier.regime_mapping, verbose=verbose)
+
+    def log(self, message: str):
+        """打印日志"""
+        if self.verbose:
+            print(f"[RegimeTracker] {message}")
+
+    # ==================== 发射概率 ====================
+
+    def _prepare_emissions(self):
+        """预计算各状态高斯分布的 Cholesky 分解（covars_ 对所有协方差类型都返回完整矩阵）"""
+        means = np.asarray(self.hmm_model.means_, dtype=np.float64)
+        covars = np.asarray(self.hmm_model.covars_, dtype=np.float64)
+        n_features = means.shape[1]
+
+        self.means = means
+        self.chol_inv = np.empty_like(covars)
+        self.log_norm = np.empty(len(means))
+        for k, cov in enumerate(covars):
+            chol = np.linalg.cholesky(cov)
+            self.chol_inv[k] = np.linalg.inv(chol)
+            log_det = 2 * np.log(np.diag(chol)).sum()
+            self.log_norm[k] = -0.5 * (n_features * np.log(2 * np.pi) + log_det)
+
+    def log_likelihoods(self, X_scaled: np.ndarray) -> np.ndarray:
+        """
+        各状态的对数发射概率
+
+        Args:
+            X_scaled: 标准化后的特征 (n_samples, n_features)
+
+        Returns:
+            (n_samples, n_states)
+        """
+        diff = X_scaled[:, None, :] - self.means[None, :, :]
+        z = np.einsum('kij,tkj->tki', self.chol_inv, diff)
+        return self.log_norm[None, :] - 0.5 * (z ** 2).sum(axis=2)
+
+    # ==================== 前向滤波 ====================
+
+    def reset(self):
+        """重置为初始分布（未观测任何数据）"""
+        self.alpha: Optional[np.ndarray] = None
+        self.last_timestamp = None
+        self.log_likelihood = 0.0
+        self.n_updates = 0
+
+    def _step(self, log_lik: np.ndarray) -> np.ndarray:
+        """前向递推一步（输入该K线各状态的对数发射概率）"""
+        prior = self.startprob if self.alpha is None else self.alpha @ self.transmat
+        shift = log_lik.max()
+        alpha = prior * np.exp(log_lik - shift)
+        total = alpha.sum()
+
+        if not np.isfinite(total) or total <= 0:
+            # 数值下溢：观测在所有可达状态下都极不可能，退回先验
+            alpha, total = prior.copy(), 1.0
+
+        self.alpha = alpha / total
+        self.log_likelihood += np.log(total) + shift
+        self.n_updates += 1
+        return self.alpha
+
+    def filter(self, X_scaled: np.ndarray) -> np.ndarray:
+        """
+        按顺序处理多行标准化特征（发射概率向量化计算，递推逐行）
+
+        Args:
+            X_scaled: 标准化后的特征 (n_samples, n_features)
+
+        Returns:
+            各行的滤波后验 (n_samples, n_states)
+        """
+        log_lik = self.log_likelihoods(X_scaled)
+        alphas = np.empty_like(log_lik)
+        for t in range(len(log_lik)):
+            alphas[t] = self._step(log_lik[t])
+        return alphas
+
+    def regime_probabilities(self, state_probs: Optional[np.ndarray] = None) -> np.ndarray:
+        """HMM 状态概率 -> 市场状态概率（多个 HMM 状态可能映射到同一市场状态）"""
+        probs = self.alpha if state_probs is None else state_probs
+        if probs is None:
+            probs = self.startprob
+        return np.bincount(self.state_regimes, weights=probs, minlength=self.n_regimes)
+
+    def _output(self, timestamp) -> Dict:
+        regime_probs = self.regime_probabilities()
+        regime = int(regime_probs.argmax())
+        output = {
+            'timestamp': timestamp,
+            'regime': regime,
+            'regime_name': MarketRegimeIdentifier.REGIMES.get(regime, str(regime)),
+            'regime_cn': MarketRegimeIdentifier.REGIME_CN.get(regime, str(regime)),
+            'confidence': float(regime_probs[regime]),
+            'state': int(self.alpha.argmax()),
+        }
+        for regime_id, p in enumerate(regime_probs):
+            output[f'prob_{MarketRegimeIdentifier.REGIMES.get(regime_id, regime_id)}'] = float(p)
+        return output
+
+    def _scaled_features(self, df: pd.DataFrame) -> np.ndarray:
+        X = extract_features(df, self.feature_names)
+        return (X - self.scaler.mean_) / self.scaler.scale_
+
+    def update(self, bar) -> Dict:
+        """
+        处理一根新K线
+
+        Args:
+            bar: 一行特征（Series，name 为时间戳；或 {列名: 值} 字典）
+
+        Returns:
+            {'timestamp', 'regime', 'regime_name', 'regime_cn', 'confidence', 'state', 'prob_<状态>'...}
+        """
+        if isinstance(bar, dict):
+            bar = pd.Series(bar)
+        frame = bar.to_frame().T
+        log_lik = self.log_likelihoods(self._scaled_features(frame))[0]
+
+        self._step(log_lik)
+        self.last_timestamp = bar.name
+        return self._output(bar.name)
+
+    def update_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        按顺序处理多根新K线（发射概率一次性向量化计算，递推逐行）
+
+        Args:
+            df: 新K线的特征 DataFrame（时间升序）
+
+        Returns:
+            DataFrame (index 与 df 相同) with regime, regime_name, regime_cn, confidence, state, prob_<状态>
+        """
+        if self.last_timestamp is not None and len(df):
+            df = df[df.index > self.last_timestamp]
+        if df.empty:
+            return pd.DataFrame()
+
+        alphas = self.filter(self._scaled_features(df))
+        self.last_timestamp = df.index[-1]
+
+        regime_probs = alphas @ np.eye(self.n_regimes)[self.state_regimes]
+        regimes = regime_probs.argmax(axis=1)
+        result = pd.DataFrame({
+            'regime': regimes,
+            'regime_name': [MarketRegimeIdentifier.REGIMES.get(r, str(r)) for r in regimes],
+            'regime_cn': [MarketRegimeIdentifier.REGIME_CN.get(r, str(r)) for r in regimes],
+            'confidence': regime_probs[np.arange(len(regimes)), regimes],
+            'state': alphas.argmax(axis=1),
+        }, index=df.index)
+        for regime_id in range(self.n_regimes):
+            name = MarketRegimeIdentifier.REGIMES.get(regime_id, regime_id)
+            result[f'prob_{name}'] = regime_probs[:, regime_id]
+
+        self.log(f"处理 {len(df)} 根K线，当前状态: {result['regime_name'].iloc[-1]} "
+                 f"({result['confidence'].iloc[-1]:.1%})")
+        return result
+
+    def current(self) -> Optional[Dict]:
+        """当前滤波状态（未处理任何数据时返回 None）"""
+        if self.alpha is None:
+            return None
+        return self._output(self.last_timestamp)
+
+    # ==================== 状态保存 ====================
+
+    def get_state(self) -> Dict:
+        """前向概率快照（可序列化为 JSON，用于重启后继续跟踪）"""
+        return {
+            'alpha': None if self.alpha is None else self.alpha.tolist(),
+            'last_timestamp': None if self.last_timestamp is None else pd.Timestamp(self.last_timestamp).isoformat(),
+            'log_likelihood': self.log_likelihood,
+            'n_updates': self.n_updates,
+        }
+
+    def set_state(self, state: Dict):
+        """恢复 get_state() 保存的前向概率"""
+        self.alpha = None if state.get('alpha') is None else np.asarray(state['alpha'], dtype=np.float64)
+        self.last_timestamp = None if state.get('last_timestamp') is None else pd.Timestamp(state['last_timestamp'])
+        self.log_likelihood = state.get('log_likelihood', 0.0)
+        self.n_updates = state.get('n_updates', 0)
+
+
+def main():
+    """测试在线状态跟踪：用历史数据训练 HMM，逐根跟踪最近 30 天"""
+    print("\n" + "=" * 70)
+    print("  Bitcoin Research Agent - Online Regime Tracking Test")
+    print("=" * 70 + "\n")
+
+    try:
+        df = pd.read_csv('data/processed/integrated_features.csv', index_col=0, parse_dates=True)
+    except FileNotFoundError:
+        print("Error: Please run feature engineering first (WAL-13)")
+        return
+
+    identifier = MarketRegimeIdentifier(n_regimes=4, method='hmm', verbose=False)
+    identifier.fit(df.iloc[:-30])
+
+    tracker = RegimeTracker.from_identifier(identifier)
+    tracker.update_frame(df.iloc[:-30])
+    for _, row in df.iloc[-30:].iterrows():
+        out = tracker.update(row)
+        print(f"{out['timestamp']}  {out['regime_name']:<14} {out['confidence']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
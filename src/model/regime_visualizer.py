@@ -6,19 +6,154 @@ Bitcoin Research Agent - 市场状态可视化
 2. 展示不同状态下的价格表现
 3. 生成市场状态报告图表
 
+状态背景按游程编码（run-length encoding）：每段连续相同的状态画成一个矩形，
+所有矩形放在一个 PolyCollection 中一次绘制；价格线可按桶取最小 / 最大值抽稀，
+十年日线或分钟级数据都能在一秒内出图。
+
+generate_all_plots 对每张图的输入数据（用到的列 + 绘图参数）计算指纹，指纹记录在
+输出目录的 .plot_cache.json 中；数据未变的图直接跳过，变化的图在进程池中用 Agg 后端并行渲染，
+并报告每张图的渲染耗时。
+
 作者：Bitcoin Research Agent Team
 日期：2025-10-25
 """
 
+import os
+import json
+import time
+import hashlib
 import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from typing import Optional
+from matplotlib.collections import PolyCollection
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
 
+def _run_length_encode(x: np.ndarray, codes: np.ndarray, end: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """codes 的游程编码（-1 为无状态，不输出），x 为各行起始时间，end 为最后一行的结束时间"""
+    breaks = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    first = np.concatenate([[0], breaks])
+    starts = x[first]
+    ends = np.append(x[breaks], end)
+    keep = codes[first] >= 0
+    return starts[keep], ends[keep], codes[first][keep]
+
+
+def regime_segments(index: pd.DatetimeIndex, regimes,
+                    max_segments: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    状态序列的游程编码
+    
+    Args:
+        index: 时间索引（升序）
+        regimes: 状态序列（NaN 为无状态，不输出该段）
+        max_segments: 段数超过该值时，先把行按顺序分成 max_segments 个桶、每桶取众数状态再编码
+                      （窄于一个像素的段画出来也看不见；None 表示不合并）
+    
+    Returns:
+        (starts, ends, values)：各段起止时间（matplotlib 日期数值）和状态；
+        每段结束于下一段开始，最后一段延长一个中位数采样间隔
+    """
+    values = pd.Series(regimes).to_numpy(dtype=np.float64)
+    if len(values) == 0:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+    
+    x = mdates.date2num(index)
+    end = x[-1] + (np.median(np.diff(x)) if len(x) > 1 else 1.0)
+    codes = np.where(np.isnan(values), -1, values).astype(np.int64)
+    
+    segments = _run_length_encode(x, codes, end)
+    if max_segments is None or len(segments[0]) <= max_segments:
+        return segments
+    
+    # 按桶取众数（无状态记为最后一列）
+    n_buckets = max_segments
+    bucket = np.arange(len(codes)) * n_buckets // len(codes)
+    n_values = codes.max() + 2
+    counts = np.zeros((n_buckets, n_values), dtype=np.int64)
+    np.add.at(counts, (bucket, np.where(codes < 0, n_values - 1, codes)), 1)
+    modes = counts.argmax(axis=1)
+    modes[modes == n_values - 1] = -1
+    first_rows = np.searchsorted(bucket, np.arange(n_buckets))
+    return _run_length_encode(x[first_rows], modes, end)
+
+
+def decimate_minmax(y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    价格线抽稀：分桶后每桶保留最小值和最大值所在的行，保留尖峰
+    
+    Args:
+        y: 数值序列
+        max_points: 最多保留的点数
+    
+    Returns:
+        保留的行号（升序）
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n_points = len(y)
+    if n_points <= max_points:
+        return np.arange(n_points)
+    
+    bucket = int(np.ceil(n_points / max(max_points // 2, 1)))
+    n_buckets = int(np.ceil(n_points / bucket))
+    blocks = np.full(n_buckets * bucket, np.nan)
+    blocks[:n_points] = y
+    blocks = blocks.reshape(n_buckets, bucket)
+    missing = np.isnan(blocks)
+    
+    offsets = np.arange(n_buckets) * bucket
+    lo = offsets + np.where(missing, np.inf, blocks).argmin(axis=1)
+    hi = offsets + np.where(missing, -np.inf, blocks).argmax(axis=1)
+    
+    keep = np.unique(np.concatenate([lo, hi, [n_points - 1]]))
+    return keep[keep < n_points]
+
+
+# ==================== 批量渲染 ====================
+
+# 图表名 -> (绘图方法, 用到的列, 是否用到时间索引)
+CHARTS = {
+    'price_with_regimes': ('plot_price_with_regimes', ['market_Close', 'market_regime'], True),
+    'regime_statistics': ('plot_regime_statistics',
+                          ['market_regime', 'market_Return', 'Return', 'market_Volatility_7d',
+                           'Volatility_7d', 'market_RSI14', 'RSI14'], False),
+    'regime_transitions': ('plot_regime_transitions', ['market_regime'], False),
+}
+
+# 绘图代码改变图表外观时递增，使旧缓存失效
+RENDER_VERSION = 1
+
+PLOT_CACHE_FILE = '.plot_cache.json'
+
+
+def chart_fingerprint(name: str, df: pd.DataFrame, figsize: tuple) -> str:
+    """图表输入指纹：用到的列（及时间索引）的内容哈希 + 绘图参数"""
+    method, columns, uses_index = CHARTS[name]
+    data = df[[c for c in columns if c in df.columns]]
+    digest = hashlib.sha1(f'{name}|{method}|{RENDER_VERSION}|{tuple(figsize)}|{list(data.columns)}'.encode())
+    digest.update(pd.util.hash_pandas_object(data, index=uses_index).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _init_render_worker():
+    """渲染进程：无界面的 Agg 后端"""
+    matplotlib.use('Agg')
+
+
+def _render_chart(task: Tuple[str, pd.DataFrame, tuple, str]) -> Tuple[str, float]:
+    """渲染一张图（进程池任务），返回 (图表名, 耗时秒)"""
+    name, data, figsize, path = task
+    start = time.perf_counter()
+    getattr(RegimeVisualizer(figsize=figsize), CHARTS[name][0])(data, save_path=path)
+    return name, time.perf_counter() - start
+
+
 class RegimeVisualizer:
     """市场状态可视化器"""
     
@@ -47,11 +182,25 @@ class RegimeVisualizer:
         self.figsize = figsize
         plt.style.use('seaborn-v0_8-darkgrid')
     
+    def _regime_collection(self, starts: np.ndarray, ends: np.ndarray, values: np.ndarray,
+                           transform, alpha: float) -> PolyCollection:
+        """各状态段的矩形（x 为日期数值，y 为坐标轴比例 0~1），一个集合一次绘制"""
+        verts = np.empty((len(starts), 4, 2))
+        verts[:, 0, 0] = verts[:, 1, 0] = starts
+        verts[:, 2, 0] = verts[:, 3, 0] = ends
+        verts[:, [0, 3], 1] = 0
+        verts[:, [1, 2], 1] = 1
+        colors = [self.REGIME_COLORS.get(v, '#9E9E9E') for v in values]
+        return PolyCollection(verts, facecolors=colors, edgecolors='none', alpha=alpha,
+                              transform=transform)
+    
     def plot_price_with_regimes(self, 
                                df: pd.DataFrame,
                                price_col: str = 'market_Close',
                                regime_col: str = 'market_regime',
-                               save_path: Optional[str] = None):
+                               save_path: Optional[str] = None,
+                               max_points: Optional[int] = 5000,
+                               max_segments: Optional[int] = 5000):
         """
         绘制价格走势与市场状态
         
@@ -60,39 +209,41 @@ class RegimeVisualizer:
             price_col: 价格列名
             regime_col: 状态列名
             save_path: 保存路径
+            max_points: 价格线最多绘制的点数（按桶保留最小 / 最大值；None 表示不抽稀）
+            max_segments: 状态背景最多绘制的段数（超过时按桶取众数合并；None 表示不合并）
         """
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=self.figsize, 
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=self.figsize, sharex=True,
                                        gridspec_kw={'height_ratios': [3, 1]})
         
-        # 上图：价格走势
-        ax1.plot(df.index, df[price_col], linewidth=1.5, color='black', alpha=0.7)
+        # 上图：价格走势（可抽稀）
+        prices = df[price_col].to_numpy(dtype=np.float64)
+        rows = np.arange(len(df)) if max_points is None else decimate_minmax(prices, max_points)
+        ax1.plot(df.index[rows], prices[rows], linewidth=1.5, color='black', alpha=0.7)
         
-        # 按状态着色背景
-        for regime_id in df[regime_col].unique():
-            regime_mask = df[regime_col] == regime_id
-            regime_dates = df[regime_mask].index
-            
-            for date in regime_dates:
-                ax1.axvspan(date, date + pd.Timedelta(days=1), 
-                           color=self.REGIME_COLORS[regime_id], alpha=0.3)
+        # 按状态着色背景：游程编码，每段连续状态一个矩形
+        starts, ends, values = regime_segments(df.index, df[regime_col], max_segments)
+        ax1.add_collection(self._regime_collection(starts, ends, values, ax1.get_xaxis_transform(), 0.3),
+                           autolim=False)
         
         ax1.set_ylabel('Price (USD)', fontsize=12, fontweight='bold')
         ax1.set_title('Bitcoin Price with Market Regimes', fontsize=14, fontweight='bold')
         ax1.grid(True, alpha=0.3)
         ax1.legend(['BTC Price'], loc='upper left')
         
-        # 下图：市场状态条形图
-        colors = [self.REGIME_COLORS[r] for r in df[regime_col]]
-        ax2.bar(df.index, [1]*len(df), color=colors, width=1, edgecolor='none')
+        # 下图：市场状态条
+        ax2.add_collection(self._regime_collection(starts, ends, values, ax2.get_xaxis_transform(), 1.0),
+                           autolim=False)
+        if len(starts):
+            ax2.set_xlim(starts[0], ends[-1])
         ax2.set_ylabel('Regime', fontsize=12, fontweight='bold')
         ax2.set_yticks([])
         ax2.set_xlabel('Date', fontsize=12, fontweight='bold')
         
         # 添加图例
         from matplotlib.patches import Patch
-        legend_elements = [Patch(facecolor=self.REGIME_COLORS[i], 
-                                label=self.REGIME_NAMES[i]) 
-                          for i in sorted(df[regime_col].unique())]
+        legend_elements = [Patch(facecolor=self.REGIME_COLORS.get(i, '#9E9E9E'), 
+                                label=self.REGIME_NAMES.get(i, str(i))) 
+                          for i in np.unique(values)]
         ax2.legend(handles=legend_elements, loc='upper left', ncol=4)
         
         plt.tight_layout()
@@ -101,7 +252,7 @@ class RegimeVisualizer:
             plt.savefig(save_path, dpi=150, bbox_inches='tight')
             print(f"[SUCCESS] Chart saved to: {save_path}")
         
-        plt.close()
+        plt.close(fig)
     
     def plot_regime_statistics(self,
                               df: pd.DataFrame,
@@ -249,36 +400,68 @@ class RegimeVisualizer:
     
     def generate_all_plots(self,
                           df: pd.DataFrame,
-                          output_dir: str = 'data/processed/plots'):
+                          output_dir: str = 'data/processed/plots',
+                          processes: Optional[int] = None,
+                          use_cache: bool = True) -> pd.DataFrame:
         """
-        生成所有可视化图表
+        生成所有可视化图表（输入未变的图跳过，其余并行渲染）
         
         Args:
             df: DataFrame
             output_dir: 输出目录
+            processes: 渲染进程数（None 表示 CPU 核数；1 表示在当前进程顺序渲染）
+            use_cache: 是否跳过指纹未变且文件存在的图
+        
+        Returns:
+            每张图一行：chart, path, status ('rendered' / 'cached'), seconds
         """
-        import os
-        os.makedirs(output_dir, exist_ok=True)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        cache_path = output_dir / PLOT_CACHE_FILE
         
         print("\n" + "=" * 70)
         print("Generating Market Regime Visualization...")
         print("=" * 70)
         
-        # 1. 价格与状态
-        print("\n1. Plotting price with regimes...")
-        self.plot_price_with_regimes(df, save_path=f'{output_dir}/price_with_regimes.png')
-        
-        # 2. 状态统计
-        print("\n2. Plotting regime statistics...")
-        self.plot_regime_statistics(df, save_path=f'{output_dir}/regime_statistics.png')
-        
-        # 3. 状态转移
-        print("\n3. Plotting regime transitions...")
-        self.plot_regime_transitions(df, save_path=f'{output_dir}/regime_transitions.png')
-        
-        print("\n" + "=" * 70)
+        cache = {}
+        if use_cache and cache_path.exists():
+            try:
+                cache = json.loads(cache_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                cache = {}
+        
+        fingerprints = {name: chart_fingerprint(name, df, self.figsize) for name in CHARTS}
+        paths = {name: str(output_dir / f'{name}.png') for name in CHARTS}
+        todo = [name for name in CHARTS
+                if not (use_cache and cache.get(name) == fingerprints[name] and os.path.exists(paths[name]))]
+        
+        # 只把每张图用到的列传给渲染进程
+        tasks = [(name, df[[c for c in CHARTS[name][1] if c in df.columns]], self.figsize, paths[name])
+                 for name in todo]
+        processes = min(processes or os.cpu_count() or 1, max(len(tasks), 1))
+        start = time.perf_counter()
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_render_worker) as pool:
+                seconds = dict(pool.map(_render_chart, tasks))
+        else:
+            seconds = dict(_render_chart(task) for task in tasks)
+        elapsed = time.perf_counter() - start
+        
+        # 渲染成功后再记录指纹（原子写入）
+        cache.update({name: fingerprints[name] for name in todo})
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        tmp_path.write_text(json.dumps(cache, indent=2), encoding='utf-8')
+        os.replace(tmp_path, cache_path)
+        
+        report = pd.DataFrame([{'chart': name, 'path': paths[name],
+                                'status': 'rendered' if name in seconds else 'cached',
+                                'seconds': seconds.get(name, 0.0)} for name in CHARTS])
+        
+        print("\n" + report[['chart', 'status', 'seconds']].to_string(index=False, float_format='%.2f'))
+        print(f"\nRendered {len(todo)}/{len(CHARTS)} charts in {elapsed:.2f}s ({processes} processes)")
         print(f"All plots saved to: {output_dir}/")
         print("=" * 70 + "\n")
+        return report
 
 
 def main():
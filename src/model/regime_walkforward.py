@@ -0,0 +1,344 @@
+"""
+Bitcoin Research Agent - 市场状态滚动前推（walk-forward）回测
+
+功能：
+1. 按固定节奏（每 step 行）在扩张窗口或滚动窗口上重新训练 MarketRegimeIdentifier
+2. 每次训练只用窗口内的历史数据，标记之后 step 行的样本外状态（实时场景下能得到的标签）
+   - K-Means：最近质心
+   - HMM / hybrid：从窗口起点开始的前向滤波后验（不使用未来数据）
+3. 各窗口的训练是独立任务，在进程池中并行；特征矩阵通过进程初始化只传输一次
+4. 可选热启动：窗口按进程分成连续的块，块内每个窗口以前一个窗口的模型为初值
+5. 标签对齐：不同窗口的聚类编号是任意的，用匈牙利算法按质心 / 均值距离对齐到前一个窗口
+6. 记录每个窗口的训练耗时、EM 迭代次数和标签对齐情况
+
+作者：Bitcoin Research Agent Team
+日期：2025-10-25
+"""
+
+import os
+import time
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from scipy.optimize import linear_sum_assignment
+
+try:
+    from market_regime import MarketRegimeIdentifier
+    from regime_tracker import RegimeTracker
+except ImportError:
+    from src.model.market_regime import MarketRegimeIdentifier
+    from src.model.regime_tracker import RegimeTracker
+
+
+# 状态映射所需的统计列（map_regimes_to_meanings 使用，带或不带 market_ 前缀）
+STAT_COLUMNS = ['Return', 'Volatility_7d', 'Volume_Change']
+
+# 进程内共享的数据（由 _init_worker 设置，每个进程只接收一次）
+_WORKER_DATA: Dict = {}
+
+
+def _init_worker(X: np.ndarray, stats: pd.DataFrame, feature_names: List[str], config: Dict):
+    _WORKER_DATA.update({'X': X, 'stats': stats, 'feature_names': feature_names, 'config': config})
+
+
+def _centers(identifier: MarketRegimeIdentifier) -> np.ndarray:
+    """各状态中心（原始特征单位），用于跨窗口对齐"""
+    if identifier.method == 'kmeans':
+        centers = identifier.kmeans_model.cluster_centers_
+    else:
+        centers = identifier.hmm_model.means_
+    return identifier.scaler.inverse_transform(centers)
+
+
+def _run_block(windows: List[Tuple[int, int, int]]) -> List[Dict]:
+    """
+    训练一组连续的窗口（热启动时以前一个窗口为初值），返回各窗口的样本外结果
+
+    Args:
+        windows: [(train_start, train_end, test_end)]，行号，左闭右开
+    """
+    X, stats = _WORKER_DATA['X'], _WORKER_DATA['stats']
+    config = _WORKER_DATA['config']
+    method = config['method']
+
+    identifier = MarketRegimeIdentifier(n_regimes=config['n_regimes'], method=method, verbose=False,
+                                        covariance_type=config['covariance_type'])
+    identifier.feature_names = _WORKER_DATA['feature_names']
+
+    results = []
+    for train_start, train_end, test_end in windows:
+        start = time.perf_counter()
+        X_train = X[train_start:train_end]
+        warm_scaler = identifier.scaler if config['warm_start'] and results else None
+
+        iterations = None
+        if method == 'kmeans':
+            labels = identifier.fit_kmeans(X_train, random_state=config['random_state'],
+                                           warm_scaler=warm_scaler, n_init=config['n_init'])
+        else:
+            init_labels = None
+            if method == 'hybrid':
+                init_labels = identifier.fit_kmeans(X_train, random_state=config['random_state'],
+                                                    n_init=config['n_init'])
+            labels = identifier.fit_hmm(X_train, random_state=config['random_state'],
+                                        warm_scaler=warm_scaler, init_labels=init_labels,
+                                        n_iter=config['n_iter'], tol=config['tol'])
+            iterations = identifier.fit_report['iterations']
+
+        identifier.map_regimes_to_meanings(stats.iloc[train_start:train_end], labels)
+        state_regimes = np.array([identifier.regime_mapping.get(k, 1) for k in range(identifier.n_regimes)])
+        fit_seconds = time.perf_counter() - start
+
+        # 样本外标签（只用 test_end 之前的数据）
+        if method == 'kmeans':
+            probs = identifier.state_probabilities(identifier.scaler.transform(X[train_end:test_end]))
+            states = probs.argmax(axis=1)
+            confidence = probs.max(axis=1)
+        else:
+            tracker = RegimeTracker(identifier.hmm_model, identifier.scaler, identifier.feature_names,
+                                    identifier.regime_mapping, verbose=False)
+            alphas = tracker.filter(identifier.scaler.transform(X[train_start:test_end]))[train_end - train_start:]
+            states = alphas.argmax(axis=1)
+            confidence = alphas.max(axis=1)
+
+        results.append({
+            'train_start': train_start,
+            'train_end': train_end,
+            'test_end': test_end,
+            'warm': warm_scaler is not None,
+            'iterations': iterations,
+            'fit_seconds': fit_seconds,
+            'seconds': time.perf_counter() - start,
+            'centers': _centers(identifier),
+            'state_regimes': state_regimes,
+            'states': states.astype(np.int16),
+            'confidence': confidence,
+        })
+    return results
+
+
+class RegimeWalkForward:
+    """市场状态滚动前推回测"""
+
+    def __init__(self,
+                 n_regimes: int = 4,
+                 method: str = 'kmeans',
+                 covariance_type: str = 'full',
+                 window: str = 'expanding',
+                 train_size: int = 365,
+                 step: int = 30,
+                 warm_start: bool = False,
+                 processes: Optional[int] = None,
+                 n_init: int = 10,
+                 n_iter: int = 100,
+                 tol: float = 1e-2,
+                 random_state: int = 42,
+                 verbose: bool = True):
+        """
+        初始化
+
+        Args:
+            n_regimes: 市场状态数量
+            method: 识别方法 ('kmeans', 'hmm', 'hybrid')
+            covariance_type: HMM 协方差类型
+            window: 'expanding'（从头开始的扩张窗口）或 'rolling'（固定长度 train_size 的滚动窗口）
+            train_size: 首个窗口（扩张）/ 每个窗口（滚动）的训练行数
+            step: 重新训练的间隔行数（每个窗口标记之后 step 行）
+            warm_start: 是否以前一个窗口的模型为初值（窗口按进程分块，块内顺序训练）
+            processes: 进程数（默认全部 CPU；1 表示在当前进程中运行）
+            n_init: K-Means 随机初始化次数
+            n_iter: HMM EM 最大迭代次数
+            tol: HMM EM 收敛阈值
+            random_state: 随机种子
+            verbose: 是否打印详细信息
+        """
+        if window not in ('expanding', 'rolling'):
+            raise ValueError(f"Unknown window: {window}")
+        if method not in ('kmeans', 'hmm', 'hybrid'):
+            raise ValueError(f"Unknown method: {method}")
+
+        self.config = {
+            'n_regimes': n_regimes, 'method': method, 'covariance_type': covariance_type,
+            'warm_start': warm_start, 'n_init': n_init, 'n_iter': n_iter, 'tol': tol,
+            'random_state': random_state,
+        }
+        self.window = window
+        self.train_size = train_size
+        self.step = step
+        self.processes = processes
+        self.verbose = verbose
+
+        self.labels: Optional[pd.DataFrame] = None
+        self.windows: Optional[pd.DataFrame] = None
+
+    def log(self, message: str):
+        """打印日志"""
+        if self.verbose:
+            print(f"[WalkForward] {message}")
+
+    def _window_bounds(self, n_rows: int) -> List[Tuple[int, int, int]]:
+        """[(train_start, train_end, test_end)]"""
+        bounds = []
+        for train_end in range(self.train_size, n_rows, self.step):
+            train_start = 0 if self.window == 'expanding' else train_end - self.train_size
+            bounds.append((train_start, train_end, min(train_end + self.step, n_rows)))
+        return bounds
+
+    @staticmethod
+    def _align(results: List[Dict], scale: np.ndarray) -> List[np.ndarray]:
+        """
+        匈牙利算法对齐各窗口的状态编号
+
+        每个窗口的状态按中心距离（以全样本标准差为单位）匹配到前一个窗口对齐后的状态，
+        返回各窗口的「原编号 -> 对齐编号」数组
+        """
+        permutations = []
+        reference = None
+        for result in results:
+            centers = result['centers'] / scale
+            if reference is None:
+                perm = np.arange(len(centers))
+            else:
+                cost = np.linalg.norm(reference[:, None, :] - centers[None, :, :], axis=2)
+                ref_idx, cur_idx = linear_sum_assignment(cost)
+                perm = np.empty(len(centers), dtype=np.int64)
+                perm[cur_idx] = ref_idx
+            aligned = np.empty_like(centers)
+            aligned[perm] = centers
+            reference = aligned
+            permutations.append(perm)
+        return permutations
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        运行滚动前推回测
+
+        Args:
+            df: 输入DataFrame（来自特征工程，时间升序）
+
+        Returns:
+            样本外标签 DataFrame (index 为样本外时间) with market_regime, market_regime_name,
+            aligned_state, raw_state, confidence, window
+        """
+        identifier = MarketRegimeIdentifier(n_regimes=self.config['n_regimes'], verbose=False)
+        X, feature_names = identifier.prepare_features(df.copy())
+        stat_columns = [f'market_{c}' if f'market_{c}' in df.columns else c for c in STAT_COLUMNS]
+        stats = df[[c for c in stat_columns if c in df.columns]].reset_index(drop=True)
+
+        bounds = self._window_bounds(len(X))
+        if not bounds:
+            raise ValueError(f"数据不足：需要多于 train_size={self.train_size} 行")
+
+        processes = self.processes or os.cpu_count() or 1
+        processes = min(processes, len(bounds))
+        if self.config['warm_start']:
+            # 连续的窗口分到同一块，块内顺序热启动
+            blocks = [list(block) for block in np.array_split(np.arange(len(bounds)), processes) if len(block)]
+        else:
+            blocks = [[i] for i in range(len(bounds))]
+        window_blocks = [[bounds[i] for i in block] for block in blocks]
+
+        self.log(f"{len(bounds)} 个窗口 ({self.window}, train_size={self.train_size}, step={self.step}, "
+                 f"method={self.config['method']}, warm_start={self.config['warm_start']})，{processes} 个进程")
+        start = time.perf_counter()
+
+        init_args = (X, stats, feature_names, self.config)
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=init_args) as pool:
+                block_results = list(pool.map(_run_block, window_blocks, chunksize=max(1, len(window_blocks) // (4 * processes))))
+        else:
+            _init_worker(*init_args)
+            block_results = [_run_block(block) for block in window_blocks]
+        results = [r for block in block_results for r in block]
+
+        elapsed = time.perf_counter() - start
+        permutations = self._align(results, np.maximum(X.std(axis=0), 1e-12))
+
+        # 样本外标签
+        n_oos = sum(r['test_end'] - r['train_end'] for r in results)
+        raw_state = np.empty(n_oos, dtype=np.int16)
+        aligned_state = np.empty(n_oos, dtype=np.int16)
+        regime = np.empty(n_oos, dtype=np.int16)
+        confidence = np.empty(n_oos)
+        window_id = np.empty(n_oos, dtype=np.int32)
+        rows, pos = [], 0
+        for i, (result, perm) in enumerate(zip(results, permutations)):
+            states = result['states']
+            end = pos + len(states)
+            raw_state[pos:end] = states
+            aligned_state[pos:end] = perm[states]
+            regime[pos:end] = result['state_regimes'][states]
+            confidence[pos:end] = result['confidence']
+            window_id[pos:end] = i
+            pos = end
+
+            rows.append({
+                'train_start': df.index[result['train_start']],
+                'train_end': df.index[result['train_end'] - 1],
+                'test_start': df.index[result['train_end']],
+                'test_end': df.index[result['test_end'] - 1],
+                'train_rows': result['train_end'] - result['train_start'],
+                'warm': result['warm'],
+                'iterations': result['iterations'],
+                'fit_seconds': result['fit_seconds'],
+                'seconds': result['seconds'],
+                'label_switches': int((perm != np.arange(len(perm))).sum()),
+            })
+
+        oos_index = df.index[results[0]['train_end']:results[-1]['test_end']]
+        self.labels = pd.DataFrame({
+            'market_regime': regime,
+            'market_regime_name': [MarketRegimeIdentifier.REGIMES.get(r, str(r)) for r in regime],
+            'aligned_state': aligned_state,
+            'raw_state': raw_state,
+            'confidence': confidence,
+            'window': window_id,
+        }, index=oos_index)
+        self.windows = pd.DataFrame(rows)
+
+        fit_total = self.windows['seconds'].sum()
+        self.log(f"完成: {len(bounds)} 次训练，{elapsed:.1f}s（单窗口平均 {fit_total / len(bounds) * 1000:.0f}ms，"
+                 f"并行加速 {fit_total / max(elapsed, 1e-9):.1f}x），"
+                 f"标签重排 {int((self.windows['label_switches'] > 0).sum())} 个窗口")
+        return self.labels
+
+    def stability(self) -> Dict[str, float]:
+        """
+        样本外标签的稳定性
+
+        Returns:
+            {'switch_rate': 相邻样本状态变化比例, 'avg_duration': 平均持续行数,
+             'window_relabel_rate': 需要重排编号的窗口比例}
+        """
+        if self.labels is None:
+            raise ValueError("请先调用 run()")
+        regimes = self.labels['market_regime'].to_numpy()
+        changes = int((regimes[1:] != regimes[:-1]).sum())
+        return {
+            'switch_rate': changes / max(len(regimes) - 1, 1),
+            'avg_duration': len(regimes) / (changes + 1),
+            'window_relabel_rate': float((self.windows['label_switches'] > 0).mean()),
+        }
+
+
+def main():
+    """滚动前推回测：扩张窗口，每 30 天重新训练"""
+    print("\n" + "=" * 70)
+    print("  Bitcoin Research Agent - Walk-forward Regime Backtest")
+    print("=" * 70 + "\n")
+
+    try:
+        df = pd.read_csv('data/processed/integrated_features.csv', index_col=0, parse_dates=True)
+    except FileNotFoundError:
+        print("Error: Please run feature engineering first (WAL-13)")
+        return
+
+    backtest = RegimeWalkForward(method='kmeans', window='expanding', train_size=365, step=30)
+    labels = backtest.run(df)
+    print(labels['market_regime_name'].value_counts().to_string())
+    print(backtest.stability())
+
+
+if __name__ == '__main__':
+    main()
@@ -191,11 +191,17 @@ class WeeklyReportGenerator:
         # 上周主导状态
         prev_regime = self.prev_week_data['market_regime_cn'].mode()[0]
         
+        # 状态置信度（由状态识别模型输出，缺失时为 None）
+        confidence = None
+        if 'market_regime_confidence' in self.week_data.columns:
+            confidence = float(self.week_data['market_regime_confidence'].mean() * 100)
+        
         return {
             'current_regime': current_regime,
             'prev_regime': prev_regime,
             'regime_changed': current_regime != prev_regime,
-            'regime_distribution': regime_dist
+            'regime_distribution': regime_dist,
+            'confidence': confidence
         }
     
     def _calculate_volatility_stats(self) -> Dict:
@@ -419,6 +425,9 @@ class WeeklyReportGenerator:
             if regime.get('regime_changed', False):
                 content += f"，相比上周的**{regime['prev_regime']}**状态有所变化"
             
+            if regime.get('confidence') is not None:
+                content += f"（平均置信度 {regime['confidence']:.0f}%）"
+            
             content += "。\n\n**本周状态分布**:\n"
             for state, pct in regime_dist.items():
                 content += f"- {state}: {pct:.1f}%\n"
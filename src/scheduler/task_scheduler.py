@@ -6,6 +6,7 @@ Bitcoin Research Agent - 定时任务调度器
 2. 自动生成分析报告
 3. 日志记录和错误通知
 4. 灵活的任务配置
+5. 事件：结构突变检测等任务发出事件，可注册处理函数（如触发一次市场分析）
 
 支持：
 - Python schedule 库（跨平台）
@@ -22,7 +23,7 @@ import time
 import logging
 import schedule
 from datetime import datetime
-from typing import Optional, Dict, Any, Callable
+from typing import Optional, Dict, Any, Callable, List
 import yaml
 import json
 import traceback
@@ -82,6 +83,9 @@ class ScheduledTaskManager:
         if AGENT_AVAILABLE and self.config.get('agent', {}).get('enabled', True):
             self._init_agent()
         
+        # 事件处理函数 {事件名: [handler(payload)]}
+        self.event_handlers: Dict[str, List[Callable[[Dict], Any]]] = {}
+        
         # 注册任务
         self.tasks = {}
         self._register_tasks()
@@ -154,6 +158,17 @@ class ScheduledTaskManager:
                     'enabled': False,
                     'time': '23:00',
                     'description': '每日数据备份'
+                },
+                'gap_backfill': {
+                    'enabled': False,
+                    'time': '02:00',
+                    'description': '数据缺口检测与回补'
+                },
+                'change_point_scan': {
+                    'enabled': False,
+                    'time': '08:30',
+                    'description': '结构突变检测',
+                    'trigger_analysis': False
                 }
             },
             'notifications': {
@@ -232,6 +247,33 @@ class ScheduledTaskManager:
                 'status': 'active'
             }
             self.log(f"✅ 注册任务: 数据备份 ({backup_time})")
+        
+        # 数据缺口回补任务
+        if tasks_config.get('gap_backfill', {}).get('enabled'):
+            backfill_time = tasks_config['gap_backfill'].get('time', '02:00')
+            schedule.every().day.at(backfill_time).do(self.task_gap_backfill)
+            self.tasks['gap_backfill'] = {
+                'schedule': f"每天 {backfill_time}",
+                'description': '数据缺口检测与回补',
+                'last_run': None,
+                'status': 'active'
+            }
+            self.log(f"✅ 注册任务: 数据缺口回补 ({backfill_time})")
+        
+        # 结构突变检测任务
+        change_config = tasks_config.get('change_point_scan', {})
+        if change_config.get('enabled'):
+            change_time = change_config.get('time', '08:30')
+            schedule.every().day.at(change_time).do(self.task_change_point_scan)
+            self.tasks['change_point_scan'] = {
+                'schedule': f"每天 {change_time}",
+                'description': '结构突变检测',
+                'last_run': None,
+                'status': 'active'
+            }
+            if change_config.get('trigger_analysis') and 'daily_analysis' in self.tasks:
+                self.on_event('change_point', lambda payload: self.task_daily_analysis())
+            self.log(f"✅ 注册任务: 结构突变检测 ({change_time})")
     
     # ==================== 任务函数 ====================
     
@@ -369,6 +411,151 @@ class ScheduledTaskManager:
         finally:
             self.log(f"{'='*70}\n")
     
+    def task_gap_backfill(self):
+        """任务：检测数据缺口并只回补缺失区间"""
+        task_name = "gap_backfill"
+        self.log(f"\n{'='*70}")
+        self.log(f"开始执行: {task_name}")
+        self.log(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self.log(f"{'='*70}")
+        
+        try:
+            from src.data.gap_scanner import GapScanner, default_backfillers
+            
+            task_config = self.config.get('tasks', {}).get(task_name, {})
+            scanner = GapScanner(raw_dir=task_config.get('raw_dir', 'data/raw'), verbose=self.verbose)
+            
+            gaps = scanner.scan()
+            if gaps.empty:
+                self.log("✅ 未发现数据缺口")
+            else:
+                result = scanner.backfill(
+                    gaps,
+                    default_backfillers(scanner),
+                    max_workers=task_config.get('max_workers', 4)
+                )
+                failed = result[result['status'] != 'ok'] if not result.empty else result
+                self.log(f"✅ 回补 {len(result) - len(failed)}/{len(result)} 个缺口区间")
+            
+            # 覆盖率报告
+            report = scanner.coverage_report()
+            if not report.empty:
+                for source, row in report.iterrows():
+                    self.log(f"  {source}: 覆盖率 {row['coverage_pct']:.1f}% ({row['n_gaps']} 个缺口)")
+            
+            # 更新任务状态
+            self.tasks[task_name]['last_run'] = datetime.now().isoformat()
+            self.tasks[task_name]['status'] = 'success'
+            
+            self._notify_success(task_name, "数据缺口回补完成")
+            
+        except Exception as e:
+            self.log(f"❌ 任务执行失败: {e}", 'error')
+            self.log(traceback.format_exc(), 'error')
+            
+            self.tasks[task_name]['status'] = 'failed'
+            self._notify_error(task_name, str(e))
+        
+        finally:
+            self.log(f"{'='*70}\n")
+    
+    def task_change_point_scan(self):
+        """任务：在新数据上增量运行在线变点检测，检测到结构突变时发出 change_point 事件"""
+        task_name = "change_point_scan"
+        self.log(f"\n{'='*70}")
+        self.log(f"开始执行: {task_name}")
+        self.log(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self.log(f"{'='*70}")
+        
+        try:
+            import pandas as pd
+            from src.model.change_point import ChangePointDetector
+            
+            task_config = self.config.get('tasks', {}).get(task_name, {})
+            data_dir = self.config.get('output', {}).get('data_dir', 'data/processed')
+            data_path = task_config.get('data_path', os.path.join(data_dir, 'integrated_features.csv'))
+            state_path = task_config.get('state_path', 'data/models/change_point_state.json')
+            
+            if not os.path.exists(data_path):
+                self.log(f"数据文件不存在: {data_path}", 'warning')
+                return
+            df = pd.read_csv(data_path, index_col=0, parse_dates=True)
+            
+            detector = ChangePointDetector(
+                hazard_lambda=task_config.get('hazard_lambda', 500),
+                threshold=task_config.get('threshold', 0.8),
+                verbose=self.verbose
+            )
+            
+            # 首次运行：用已有数据校准并预热，不对历史数据发出事件
+            if os.path.exists(state_path):
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    detector.set_state(json.load(f))
+                detector.scan(df)
+                events = detector.events
+            else:
+                detector.calibrate(df)
+                detector.scan(df)
+                events = []
+                self.log(f"变点检测器已初始化 ({len(df)} 行)")
+            
+            for event in events:
+                self._emit_event('change_point', {
+                    'timestamp': str(event['timestamp']),
+                    'change_point': str(event['change_point']),
+                    'probability': event['probability'],
+                    'run_length': event['run_length'],
+                })
+            self.log(f"✅ 检测完成: {len(events)} 个新的结构突变")
+            
+            # 保存检测器状态（原子写入）
+            os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+            tmp_path = state_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(detector.get_state(), f)
+            os.replace(tmp_path, state_path)
+            
+            # 更新任务状态
+            self.tasks[task_name]['last_run'] = datetime.now().isoformat()
+            self.tasks[task_name]['status'] = 'success'
+            
+            self._notify_success(task_name, f"结构突变检测完成 ({len(events)} 个事件)")
+            
+        except Exception as e:
+            self.log(f"❌ 任务执行失败: {e}", 'error')
+            self.log(traceback.format_exc(), 'error')
+            
+            self.tasks[task_name]['status'] = 'failed'
+            self._notify_error(task_name, str(e))
+        
+        finally:
+            self.log(f"{'='*70}\n")
+    
+    # ==================== 事件 ====================
+    
+    def on_event(self, event: str, handler: Callable[[Dict], Any]):
+        """
+        注册事件处理函数
+        
+        Args:
+            event: 事件名（如 'change_point'）
+            handler: 处理函数，参数为事件内容字典
+        """
+        self.event_handlers.setdefault(event, []).append(handler)
+    
+    def _emit_event(self, event: str, payload: Dict):
+        """发出事件：记录日志和通知文件，依次调用处理函数（单个处理函数失败不影响其他）"""
+        self.log(f"📣 事件 {event}: {payload}")
+        
+        if 'file' in self.config.get('notifications', {}).get('methods', ['log']):
+            self._save_notification('event', event, json.dumps(payload, ensure_ascii=False))
+        
+        for handler in self.event_handlers.get(event, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                self.log(f"❌ 事件处理失败 ({event}): {e}", 'error')
+    
     # ==================== 通知系统 ====================
     
     def _notify_success(self, task_name: str, message: str):
@@ -443,6 +630,10 @@ class ScheduledTaskManager:
             self.task_weekly_report()
         elif task_name == 'data_backup':
             self.task_data_backup()
+        elif task_name == 'gap_backfill':
+            self.task_gap_backfill()
+        elif task_name == 'change_point_scan':
+            self.task_change_point_scan()
         else:
             self.log(f"未知任务: {task_name}", 'warning')
     
@@ -494,7 +685,7 @@ def main():
     
     parser = argparse.ArgumentParser(description='Bitcoin Research Agent 定时任务调度器')
     parser.add_argument('--config', default='configs/schedule_config.yaml', help='配置文件路径')
-    parser.add_argument('--run-once', help='立即运行指定任务（daily_analysis/weekly_report/data_backup）')
+    parser.add_argument('--run-once', help='立即运行指定任务（daily_analysis/weekly_report/data_backup/gap_backfill/change_point_scan）')
     parser.add_argument('--list', action='store_true', help='列出所有任务')
     
     args = parser.parse_args()
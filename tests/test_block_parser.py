@@ -0,0 +1,263 @@
+"""
+本地区块解析测试（合成区块文件，离线）
+
+测试内容：
+1. 区块文件解析（SegWit txid、乱序区块按链连接、OP_RETURN）
+2. 按天指标（活跃地址、交易数、输出总额、UTXO 数量）
+3. 多进程解析 + 检查点续跑 + xor.dat 混淆
+4. RPC 区块来源
+5. UTXO 索引落盘（写缓冲溢出、检查点后从库中花费）、分叉区块丢弃
+"""
+
+import sys
+import os
+import hashlib
+import shutil
+import struct
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+
+from data import block_parser
+from data.block_parser import (
+    MAINNET_MAGIC, ChainMetricsEngine, parse_block, read_block_file
+)
+
+
+DAY = 86400
+T0 = 1_700_006_400  # 2023-11-15 00:00 UTC
+
+SCRIPT_A = b'\x00\x14' + b'\xaa' * 20
+SCRIPT_B = b'\x00\x14' + b'\xbb' * 20
+SCRIPT_C = b'\x00\x14' + b'\xcc' * 20
+SCRIPT_D = b'\x00\x14' + b'\xdd' * 20
+SCRIPT_E = b'\x00\x14' + b'\xee' * 20
+OP_RETURN = b'\x6a\x04test'
+
+
+def _dsha256(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def _varint(n):
+    if n < 0xfd:
+        return bytes([n])
+    return b'\xfd' + struct.pack('<H', n)
+
+
+def _tx(inputs, outputs, segwit=False):
+    """inputs: [(prev_txid, vout)]（None 表示 coinbase），outputs: [(btc, script)]"""
+    body = _varint(len(inputs))
+    for prev in inputs:
+        txid, vout = prev if prev else (b'\x00' * 32, 0xffffffff)
+        script_sig = b'' if segwit else b'\x01\x51'
+        body += txid + struct.pack('<I', vout) + _varint(len(script_sig)) + script_sig + b'\xff' * 4
+    body += _varint(len(outputs))
+    for btc, script in outputs:
+        body += struct.pack('<q', int(round(btc * 1e8))) + _varint(len(script)) + script
+
+    version, locktime = struct.pack('<i', 2), b'\x00' * 4
+    txid = _dsha256(version + body + locktime)
+    if segwit:
+        witness = b''.join(_varint(1) + _varint(72) + b'\x30' * 72 for _ in inputs)
+        return version + b'\x00\x01' + body + witness + locktime, txid
+    return version + body + locktime, txid
+
+
+def _block(prev_hash, block_time, txs):
+    header = struct.pack('<i', 1) + prev_hash + b'\x00' * 32 + struct.pack('<III', block_time, 0x1d00ffff, 0)
+    raw = header + _varint(len(txs)) + b''.join(raw for raw, _ in txs)
+    return raw, _dsha256(header)
+
+
+def _build_chain():
+    """3 个区块：day1 两个区块，day2 一个区块（含同区块内花费）"""
+    cb0 = _tx([None], [(50, SCRIPT_A)])
+    b0, h0 = _block(b'\x00' * 32, T0 + 100, [cb0])
+
+    cb1 = _tx([None], [(50, SCRIPT_B)])
+    tx1 = _tx([(cb0[1], 0)], [(30, SCRIPT_C), (19.9, SCRIPT_A), (0, OP_RETURN)], segwit=True)
+    b1, h1 = _block(h0, T0 + 700, [cb1, tx1])
+
+    cb2 = _tx([None], [(50, SCRIPT_A)])
+    tx2 = _tx([(tx1[1], 0)], [(30, SCRIPT_D)])
+    tx3 = _tx([(tx2[1], 0)], [(29, SCRIPT_E)], segwit=True)
+    b2, h2 = _block(h1, T0 + DAY + 300, [cb2, tx2, tx3])
+    return [b0, b1, b2]
+
+
+def _write_blk(path, blocks, xor_key=None):
+    data = b''.join(MAINNET_MAGIC + struct.pack('<I', len(b)) + b for b in blocks) + b'\x00' * 64
+    if xor_key:
+        data = bytes(c ^ xor_key[i % len(xor_key)] for i, c in enumerate(data))
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+EXPECTED = pd.DataFrame({
+    'active_addresses': [3, 4],
+    'tx_count': [3, 3],
+    'output_value_btc': [149.9, 109.0],
+    'utxo_count': [3, 4],
+    'block_count': [2, 1],
+}, index=pd.to_datetime([T0, T0 + DAY], unit='s'))
+
+
+class FakeRPC:
+    def __init__(self, blocks):
+        self.blocks = blocks
+
+    def get_block_count(self):
+        return len(self.blocks) - 1
+
+    def get_raw_block(self, height):
+        return self.blocks[height]
+
+
+def _check(df):
+    assert list(df.index) == list(EXPECTED.index)
+    for col in EXPECTED.columns:
+        assert list(df[col].round(8)) == list(EXPECTED[col]), col
+
+
+def test_parse_blocks():
+    """测试 1: 解析区块文件，SegWit 交易的 txid 不含见证数据"""
+    print("\n" + "=" * 60)
+    print("测试 1: 区块文件解析")
+    print("=" * 60)
+
+    b0, b1, b2 = _build_chain()
+    blocks_dir = tempfile.mkdtemp()
+    path = os.path.join(blocks_dir, 'blk00000.dat')
+    _write_blk(path, [b0, b1, b2])
+
+    blocks = read_block_file(path)
+    assert len(blocks) == 3
+    assert blocks[1][1] == blocks[0][0]
+    assert [len(b[3]) for b in blocks] == [1, 2, 3]
+
+    # tx2 花费 tx1 的输出：输入 key 与 tx1 输出 key 一致（SegWit txid 正确）
+    tx1_base = blocks[1][3][1][0]
+    tx2_inputs = blocks[2][3][1][2]
+    assert tx2_inputs == [tx1_base | 0]
+    assert blocks[1][3][1][3][2][1] is None  # OP_RETURN
+    assert parse_block(b1)[0] == blocks[1][0]
+    print("✓ 区块文件解析测试通过")
+
+
+def test_daily_metrics_out_of_order():
+    """测试 2: 区块跨文件乱序，按链连接后统计按天指标"""
+    print("\n" + "=" * 60)
+    print("测试 2: 按天链上指标")
+    print("=" * 60)
+
+    b0, b1, b2 = _build_chain()
+    blocks_dir = tempfile.mkdtemp()
+    _write_blk(os.path.join(blocks_dir, 'blk00000.dat'), [b0, b2])
+    _write_blk(os.path.join(blocks_dir, 'blk00001.dat'), [b1])
+
+    engine = ChainMetricsEngine(verbose=False)
+    df = engine.run_files(blocks_dir, processes=2)
+    _check(df)
+    assert engine.height == 2
+    assert not engine.pending
+    print(df)
+    print("✓ 按天链上指标测试通过")
+
+
+def test_checkpoint_resume():
+    """测试 3: 检查点续跑（已处理文件不重复解析）+ xor 混淆"""
+    print("\n" + "=" * 60)
+    print("测试 3: 检查点续跑")
+    print("=" * 60)
+
+    b0, b1, b2 = _build_chain()
+    blocks_dir = tempfile.mkdtemp()
+    xor_key = bytes(range(1, 9))
+    with open(os.path.join(blocks_dir, 'xor.dat'), 'wb') as f:
+        f.write(xor_key)
+    _write_blk(os.path.join(blocks_dir, 'blk00000.dat'), [b0, b2], xor_key)
+
+    checkpoint = os.path.join(tempfile.mkdtemp(), 'chain', 'checkpoint.sqlite')
+    engine = ChainMetricsEngine(checkpoint_path=checkpoint, verbose=False)
+    df = engine.run_files(blocks_dir, processes=1)
+    assert engine.height == 0 and len(df) == 1
+    assert os.path.exists(checkpoint)
+
+    # 新文件到达后从检查点继续，blk00000 不再解析
+    _write_blk(os.path.join(blocks_dir, 'blk00001.dat'), [b1], xor_key)
+    parsed = []
+    original = block_parser.read_block_file
+
+    def tracking_read(path, *args):
+        parsed.append(os.path.basename(path))
+        return original(path, *args)
+
+    block_parser.read_block_file = tracking_read
+    try:
+        engine = ChainMetricsEngine(checkpoint_path=checkpoint, verbose=False)
+        _check(engine.run_files(blocks_dir, processes=1))
+    finally:
+        block_parser.read_block_file = original
+        shutil.rmtree(blocks_dir)
+    assert parsed == ['blk00001.dat']
+    print("✓ 检查点续跑测试通过")
+
+
+def test_rpc_source():
+    """测试 4: RPC 来源按高度获取，结果与区块文件一致"""
+    print("\n" + "=" * 60)
+    print("测试 4: RPC 区块来源")
+    print("=" * 60)
+
+    engine = ChainMetricsEngine(verbose=False)
+    _check(engine.run_rpc(FakeRPC(_build_chain()), batch_size=2))
+    print("✓ RPC 区块来源测试通过")
+
+
+def test_compact_utxo_store():
+    """测试 5: UTXO 写缓冲溢出 / 检查点落盘后结果不变，分叉区块按深度丢弃，旧版检查点转换"""
+    print("\n" + "=" * 60)
+    print("测试 5: UTXO 索引与待连接区块")
+    print("=" * 60)
+
+    b0, b1, b2 = _build_chain()
+
+    # 每个区块后都把写缓冲落盘：之后的花费全部从 sqlite 查询
+    engine = ChainMetricsEngine(cache_size=1, verbose=False)
+    _check(engine.run_rpc(FakeRPC([b0, b1, b2]), batch_size=1))
+    assert len(engine.utxo) == 4
+    assert engine.conn.execute('SELECT COUNT(*) FROM utxo').fetchone()[0] + len(engine.utxo._new) == 4
+
+    # 检查点提交后重启：块 2 花费的输出只在库中
+    checkpoint = os.path.join(tempfile.mkdtemp(), 'chain.sqlite')
+    engine = ChainMetricsEngine(checkpoint_path=checkpoint, verbose=False)
+    engine.run_rpc(FakeRPC([b0, b1, b2]), end_height=1)
+    engine.close()
+    engine = ChainMetricsEngine(checkpoint_path=checkpoint, verbose=False)
+    assert engine.height == 1 and len(engine.utxo) == 3 and not engine.utxo._new
+    _check(engine.run_rpc(FakeRPC([b0, b1, b2])))
+    engine.close()
+
+    # 分叉区块（父块早已处理过）：链尖前进 stale_depth 个区块后丢弃
+    fork, _ = _block(block_parser.parse_block(b0)[0], T0 + 800, [_tx([None], [(50, SCRIPT_E)])])
+    for stale_depth, kept in ((1000, 1), (0, 0)):
+        blocks_dir = tempfile.mkdtemp()
+        _write_blk(os.path.join(blocks_dir, 'blk00000.dat'), [b0, b1])
+        _write_blk(os.path.join(blocks_dir, 'blk00001.dat'), [b2, fork])
+        engine = ChainMetricsEngine(stale_depth=stale_depth, verbose=False)
+        _check(engine.run_files(blocks_dir, processes=2))
+        assert len(engine.pending) == kept
+        shutil.rmtree(blocks_dir)
+    print("✓ UTXO 索引测试通过")
+
+
+if __name__ == "__main__":
+    test_parse_blocks()
+    test_daily_metrics_out_of_order()
+    test_checkpoint_resume()
+    test_rpc_source()
+    test_compact_utxo_store()
+    print("\n✓ 所有测试通过")
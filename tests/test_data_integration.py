@@ -0,0 +1,243 @@
+"""
+数据整合测试（合成数据，离线）
+
+测试内容：
+1. 增量整合结果与全量整合一致（含 EMA / MACD / OBV 等递归特征）
+2. 中断的追加写入在下次运行时回滚
+3. 时点对齐与 pd.merge_asof 一致，发布延迟不泄漏未来数据，超过陈旧度为缺失
+4. 分块整合（顺序 / 进程池；按月 / 按周分区）写入分区存储，结果与全量整合一致
+5. 并行加载数据源（线程池 / 进程池）与逐个加载一致，记录加载耗时
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pandas as pd
+
+from src.data.asof_join import asof_join
+from src.data.data_integrator import DataIntegrator, read_csv_tail, read_source_csv
+
+
+def _make_market(n, seed=0):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range('2022-01-01', periods=n, freq='D')
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.005, n)),
+        'High': close * (1 + np.abs(rng.normal(0, 0.01, n))),
+        'Low': close * (1 - np.abs(rng.normal(0, 0.01, n))),
+        'Close': close,
+        'Volume': rng.uniform(1e9, 5e9, n),
+    }, index=idx)
+
+
+def _write_sources(data_dir, market, onchain):
+    raw_dir = os.path.join(data_dir, 'raw')
+    os.makedirs(raw_dir, exist_ok=True)
+    market.to_csv(os.path.join(raw_dir, 'bitcoin_price.csv'))
+    onchain.to_csv(os.path.join(raw_dir, 'onchain_data.csv'))
+
+
+def test_incremental_matches_full():
+    """测试 1: 分两次增量整合与一次全量整合结果一致"""
+    print("\n" + "=" * 60)
+    print("测试 1: 增量整合")
+    print("=" * 60)
+
+    market = _make_market(400)
+    onchain = pd.DataFrame({'active_addresses': np.arange(400.0)}, index=market.index)
+
+    # 全量基准
+    full_dir = tempfile.mkdtemp()
+    _write_sources(full_dir, market, onchain)
+    expected = DataIntegrator(data_dir=full_dir, verbose=False).integrate_all_data()
+
+    # 先整合前 300 天，再增量追加
+    inc_dir = tempfile.mkdtemp()
+    _write_sources(inc_dir, market.iloc[:300], onchain.iloc[:300])
+    integrator = DataIntegrator(data_dir=inc_dir, verbose=False)
+    integrator.integrate_all_data(incremental=True)
+
+    _write_sources(inc_dir, market, onchain)
+    appended = integrator.integrate_all_data(incremental=True)
+    assert len(appended) == 100
+
+    # 再次运行没有新数据
+    assert integrator.integrate_all_data(incremental=True).empty
+
+    result = pd.read_csv(integrator.output_file, index_col=0, parse_dates=True)
+    assert list(result.index) == list(expected.index)
+    assert list(result.columns) == list(expected.columns)
+
+    numeric = [c for c in expected.columns if not c.endswith('_outlier')]
+    tail = expected.index[-100:]
+    for col in ['market_MA200', 'market_EMA200', 'market_MACD', 'market_MACD_Signal',
+                'market_OBV', 'market_PVT', 'onchain_active_addresses']:
+        np.testing.assert_allclose(result.loc[tail, col], expected.loc[tail, col], rtol=1e-9)
+    np.testing.assert_allclose(result[numeric].values.astype(float),
+                               expected[numeric].values.astype(float), rtol=1e-6)
+    print("✓ 增量整合测试通过")
+
+
+def test_interrupted_append_recovery():
+    """测试 2: 追加写入中断后，下次运行先截断回滚再继续"""
+    print("\n" + "=" * 60)
+    print("测试 2: 追加中断恢复")
+    print("=" * 60)
+
+    market = _make_market(260, seed=1)
+    onchain = pd.DataFrame({'active_addresses': np.arange(260.0)}, index=market.index)
+
+    data_dir = tempfile.mkdtemp()
+    _write_sources(data_dir, market.iloc[:250], onchain.iloc[:250])
+    integrator = DataIntegrator(data_dir=data_dir, verbose=False)
+    integrator.integrate_all_data(incremental=True)
+    rows_before = len(read_csv_tail(integrator.output_file))
+
+    # 模拟写了一半的追加
+    with open(integrator.output_file, 'a', encoding='utf-8') as f:
+        f.write('2022-09-08,1.0,2.0,')
+
+    _write_sources(data_dir, market, onchain)
+    appended = integrator.integrate_all_data(incremental=True)
+    assert len(appended) == 10
+
+    result = pd.read_csv(integrator.output_file, index_col=0, parse_dates=True)
+    assert len(result) == rows_before + 10
+    assert result.index.is_monotonic_increasing and not result.index.duplicated().any()
+    print("✓ 追加中断恢复测试通过")
+
+
+def test_asof_join():
+    """测试 3: 时点对齐（对照 pd.merge_asof）"""
+    print("\n" + "=" * 60)
+    print("测试 3: 时点对齐")
+    print("=" * 60)
+
+    rng = np.random.default_rng(2)
+    base = pd.date_range('2024-01-01', periods=2000, freq='min')
+    offsets = np.sort(rng.choice(2000 * 60, size=300, replace=False))
+    irregular = pd.DataFrame({'value': rng.normal(size=300), 'flag': rng.integers(0, 2, 300) > 0},
+                             index=pd.Timestamp('2023-12-31 23:30') + pd.to_timedelta(offsets, unit='s'))
+
+    result = asof_join(base, {'src': {'data': irregular, 'tolerance': '10min'}})
+    expected = pd.merge_asof(pd.DataFrame(index=base), irregular, left_index=True, right_index=True,
+                             direction='backward', tolerance=pd.Timedelta('10min'))
+    np.testing.assert_allclose(result['src_value'], expected['value'])
+    assert result['src_value'].isna().any()
+
+    # 发布延迟：日度数据 T+1 才可用，基准时刻只能看到前一天
+    daily = pd.DataFrame({'gdp': np.arange(5.0)}, index=pd.date_range('2024-01-01', periods=5, freq='D'))
+    hourly = pd.date_range('2024-01-01', periods=96, freq='h')
+    lagged = asof_join(hourly, {'macro': {'data': daily, 'lag': '1D', 'prefix': ''}})
+    assert lagged['gdp'].iloc[:24].isna().all()
+    assert (lagged['gdp'].iloc[24:48] == 0).all()
+    assert (lagged['gdp'].values[24:] == (hourly[24:] - pd.Timedelta('1D')).floor('D').day - 1).all()
+
+    # 超过陈旧度为缺失
+    stale = asof_join(hourly, {'macro': {'data': daily.iloc[:1], 'tolerance': '12h'}})
+    assert stale['macro_gdp'].iloc[:13].notna().all() and stale['macro_gdp'].iloc[13:].isna().all()
+
+    # 整合器 asof 模式
+    market = _make_market(300, seed=3)
+    onchain = pd.DataFrame({'active_addresses': np.arange(0.0, 300.0, 2)}, index=market.index[::2])
+    data_dir = tempfile.mkdtemp()
+    _write_sources(data_dir, market, onchain)
+    integrator = DataIntegrator(data_dir=data_dir, verbose=False)
+    df = integrator.integrate_all_data(align_method='asof')
+    assert df.index.equals(integrator.integrate_all_data().index)
+    assert df['onchain_active_addresses'].notna().all()
+    print("✓ 时点对齐测试通过")
+
+
+def test_chunked_matches_full():
+    """测试 4: 分块整合与全量整合一致"""
+    print("\n" + "=" * 60)
+    print("测试 4: 分块整合")
+    print("=" * 60)
+
+    market = _make_market(500, seed=4)
+    onchain = pd.DataFrame({'active_addresses': np.arange(0.0, 500.0, 2)}, index=market.index[::2])
+    data_dir = tempfile.mkdtemp()
+    _write_sources(data_dir, market, onchain)
+
+    integrator = DataIntegrator(data_dir=data_dir, verbose=False)
+    expected = integrator.integrate_all_data()
+    numeric = [c for c in expected.columns if not c.endswith('_outlier')]
+
+    for processes in (None, 2):
+        summary = integrator.integrate_chunked(partition_freq='M', processes=processes, read_rows=45)
+        store = summary['store']
+        assert summary['rows'] == len(expected)
+        assert store.partitions()[0] == '2022-07' and len(store.partitions()) == summary['partitions']
+
+        result = store.read()
+        assert list(result.index) == list(expected.index)
+        assert list(result.columns) == list(expected.columns)
+        np.testing.assert_allclose(result[numeric].values.astype(float),
+                                   expected[numeric].values.astype(float), rtol=1e-6)
+
+    # 按时间范围只读取部分列
+    part = store.read(start='2023-01-10', end='2023-02-05', columns=['market_Close'])
+    assert list(part.columns) == ['market_Close'] and len(part) == 27
+
+    # 按周分区：分区名不含路径分隔符，按时间范围读取时能还原分区区间
+    weekly = integrator.integrate_chunked(partition_freq='W', read_rows=45)['store']
+    assert weekly.partitions()[0] == '2022-07-18_2022-07-24' and all('/' not in p for p in weekly.partitions())
+    result = weekly.read()
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result[numeric].values.astype(float),
+                               expected[numeric].values.astype(float), rtol=1e-6)
+    part = weekly.read(start='2023-01-10', end='2023-02-05', columns=['market_Close'])
+    assert len(part) == 27
+    print("✓ 分块整合测试通过")
+
+
+def test_parallel_source_loading():
+    """测试 5: 并行加载数据源"""
+    print("\n" + "=" * 60)
+    print("测试 5: 并行加载")
+    print("=" * 60)
+
+    market = _make_market(100, seed=5)
+    onchain = pd.DataFrame({'active_addresses': np.arange(100.0)}, index=market.index)
+    data_dir = tempfile.mkdtemp()
+    _write_sources(data_dir, market, onchain)
+    news = pd.DataFrame({'sentiment_score': np.linspace(-1, 1, 10), 'label': ['pos'] * 10},
+                        index=pd.date_range('2022-01-01 08:30', periods=10, freq='6h'))
+    news.to_csv(os.path.join(data_dir, 'raw', 'news_sentiment.csv'))
+
+    integrator = DataIntegrator(data_dir=data_dir, verbose=False)
+    expected = {name: getattr(integrator, loader)() for name, loader in integrator.SOURCE_LOADERS.items()}
+
+    for executor in ('thread', 'process'):
+        sources = integrator.load_sources(executor=executor)
+        assert list(sources) == list(integrator.SOURCE_LOADERS)
+        assert sources['macro'] is None
+        for name in ('market', 'onchain', 'news'):
+            pd.testing.assert_frame_equal(sources[name], expected[name])
+        assert set(integrator.load_timings) == set(sources)
+
+    assert isinstance(sources['news'].index, pd.DatetimeIndex)
+    assert sources['market']['Close'].dtype == np.float64
+
+    # 类型不匹配时回退到推断（yfinance 多级表头）
+    path = os.path.join(data_dir, 'raw', 'yf.csv')
+    with open(path, 'w') as f:
+        f.write('Price,Close,Volume\nTicker,BTC-USD,BTC-USD\n2024-01-01,42000.5,1000\n')
+    df = read_source_csv(path, {'Close': 'float64', 'Volume': 'float64'})
+    assert len(df) == 2 and df['Close'].iloc[1] == '42000.5'
+    print("✓ 并行加载测试通过")
+
+
+if __name__ == "__main__":
+    test_incremental_matches_full()
+    test_interrupted_append_recovery()
+    test_asof_join()
+    test_chunked_matches_full()
+    test_parallel_source_loading()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,430 @@
+"""
+本地数据存储与增量获取测试（离线）
+
+测试内容：
+1. SeriesStore 增量写入与覆盖区间
+2. CoinGecko 区间分块获取 + 缓存
+3. 缺口检测、覆盖率报告与定向回补；按调度器方式（src.data.gap_scanner）导入并构建默认回补函数
+4. Glassnode 指标批量增量获取与宽表加载
+5. 地址观察列表：批量查询、区块高度缓存、余额变化
+6. 内存池监控：只处理新交易、鲸鱼告警、分钟聚合；轮询成本有上限；WebSocket 增量推送
+"""
+
+import sys
+import os
+import json
+import subprocess
+import tempfile
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+
+from data.series_store import SeriesStore
+from data.coingecko_collector import CoinGeckoCollector
+from data.gap_scanner import GapScanner
+from data.onchain_collector import OnchainCollector
+from data.data_integrator import DataIntegrator
+from data.address_watchlist import AddressWatchlist
+from data.mempool_monitor import MempoolMonitor
+
+
+def test_series_store():
+    """测试 1: 增量写入与未覆盖区间计算"""
+    print("\n" + "=" * 60)
+    print("测试 1: SeriesStore")
+    print("=" * 60)
+
+    store = SeriesStore(tempfile.mkdtemp())
+    idx = pd.date_range('2024-01-01', periods=10, freq='D')
+    store.upsert('demo/series', pd.DataFrame({'v': np.arange(10.0)}, index=idx))
+    store.upsert('demo/series', pd.DataFrame({'v': [100.0, 200.0]}, index=idx[-1:].append(idx[-1:] + pd.Timedelta(days=1))))
+
+    df = store.read('demo/series')
+    assert len(df) == 11
+    assert df['v'].iloc[-2] == 100.0
+    assert store.keys() == ['demo/series']
+
+    store.add_coverage('demo/series', '2024-01-01', '2024-01-05')
+    store.add_coverage('demo/series', '2024-01-04', '2024-01-08')
+    store.add_coverage('demo/series', '2024-01-20', '2024-01-25')
+    assert len(store.get_coverage('demo/series')) == 2
+
+    missing = store.missing_ranges('demo/series', '2023-12-30', '2024-01-31')
+    assert missing == [
+        (pd.Timestamp('2023-12-30'), pd.Timestamp('2024-01-01')),
+        (pd.Timestamp('2024-01-08'), pd.Timestamp('2024-01-20')),
+        (pd.Timestamp('2024-01-25'), pd.Timestamp('2024-01-31')),
+    ]
+    print("✓ SeriesStore 测试通过")
+
+
+def test_coingecko_range_cache():
+    """测试 2: 区间分块保持粒度，重复请求只补拉未覆盖部分"""
+    print("\n" + "=" * 60)
+    print("测试 2: CoinGecko 区间获取")
+    print("=" * 60)
+
+    collector = CoinGeckoCollector(cache_dir=tempfile.mkdtemp())
+    collector._rate_limit = lambda: None
+    calls = []
+
+    def fake_fetch(start, end):
+        calls.append((start, end))
+        idx = pd.date_range(start.ceil('D'), end, freq='D')
+        return pd.DataFrame({'price': 1.0, 'market_cap': 2.0, 'volume': 3.0}, index=idx)
+
+    collector._fetch_market_chart_range = fake_fetch
+
+    df = collector.get_market_chart_range('2021-01-01', '2023-01-01', granularity='daily')
+    assert len(df) == 731
+    assert len(calls) == 2
+    # 每个分块都超过 90 天，CoinGecko 才会返回日线
+    assert all((e - s).days > 90 for s, e in calls)
+
+    calls.clear()
+    df = collector.get_market_chart_range('2022-06-01', '2023-01-20', granularity='daily')
+    assert len(calls) == 1
+    assert calls[0][1] == pd.Timestamp('2023-01-20')
+    assert df.index.min() == pd.Timestamp('2022-06-01')
+    assert df.index.max() == pd.Timestamp('2023-01-20')
+
+    # 小时粒度的分块不超过 90 天
+    chunks = collector._split_range(pd.Timestamp('2024-01-01'), pd.Timestamp('2024-12-31'), 'hourly')
+    assert all(1 < (e - s).days < 90 for s, e in chunks)
+
+    # 一天的缺口：请求仍扩展到 91 天以保持日线，但只写入缺口（含两端边界点）内的数据
+    key = 'coingecko/bitcoin_usd_daily'
+    hole = collector.store.read(key).drop(pd.Timestamp('2022-03-15'))
+    original_fetch = collector._fetch_market_chart_range
+    collector = CoinGeckoCollector(cache_dir=tempfile.mkdtemp())
+    collector._rate_limit = lambda: None
+    store = collector.store
+    store.upsert(key, hole)
+    store.add_coverage(key, pd.Timestamp('2021-01-01'), pd.Timestamp('2022-03-14'))
+    store.add_coverage(key, pd.Timestamp('2022-03-16'), pd.Timestamp('2023-01-20'))
+    calls.clear()
+    collector._fetch_market_chart_range = lambda s, e: original_fetch(s, e) * 10
+    df = collector.get_market_chart_range('2022-01-01', '2022-06-01', granularity='daily')
+    assert len(calls) == 1 and (calls[0][1] - calls[0][0]).days == 91
+    assert len(df) == 152 and list(df.index[df['price'] == 10.0]) == list(pd.date_range('2022-03-14', '2022-03-16'))
+
+    # 截止到当前：实时点（当天 00:00 之后）不写入缓存，覆盖区间只到最后一根已结束的K线
+    collector._fetch_market_chart_range = lambda s, e: pd.concat([
+        original_fetch(s, e), pd.DataFrame({'price': 9.0, 'market_cap': 2.0, 'volume': 3.0}, index=[e])])
+    today = pd.Timestamp.now(tz='UTC').tz_localize(None).floor('D')
+    start = (today - pd.Timedelta(days=10)).strftime('%Y-%m-%d')
+    for _ in range(2):
+        calls.clear()
+        df = collector.get_market_chart_range(start, granularity='daily')
+        assert len(calls) == 1 and df['price'].iloc[-1] == 9.0 and df.index[-1] > today
+    cached = store.read(key, start)
+    assert (cached.index == cached.index.normalize()).all() and cached.index.max() == today
+    assert store.get_coverage(key)[-1][1] == today
+    print("✓ CoinGecko 区间获取测试通过")
+
+
+def test_gap_scanner():
+    """测试 3: 按日历检测缺口，只回补缺失区间"""
+    print("\n" + "=" * 60)
+    print("测试 3: 缺口检测与回补")
+    print("=" * 60)
+
+    raw_dir = tempfile.mkdtemp()
+    scanner = GapScanner(raw_dir=raw_dir, verbose=False)
+
+    # 加密货币日线：缺 3 天 + 1 天
+    crypto_idx = pd.date_range('2024-01-01', '2024-01-31', freq='D')
+    crypto_idx = crypto_idx.drop(pd.date_range('2024-01-10', '2024-01-12').append(pd.DatetimeIndex(['2024-01-20'])))
+    pd.DataFrame({'Close': 1.0}, index=crypto_idx).to_csv(os.path.join(raw_dir, 'bitcoin_price.csv'))
+
+    # 宏观日线：周末不算缺口，1 个工作日缺失
+    macro_idx = pd.bdate_range('2024-03-04', '2024-03-29').drop(pd.Timestamp('2024-03-13'))
+    pd.DataFrame({'Close': 2.0}, index=macro_idx).to_csv(os.path.join(raw_dir, 'macro_vix.csv'))
+
+    sources = scanner.default_sources()
+    assert sources['market']['calendar'] == 'crypto'
+    assert sources['macro_vix']['calendar'] == 'macro'
+
+    gaps = scanner.scan(sources)
+    market_gaps = gaps[gaps['source'] == 'market']
+    assert list(market_gaps['n_missing']) == [3, 1]
+    assert market_gaps['start'].iloc[0] == pd.Timestamp('2024-01-10')
+    assert list(gaps[gaps['source'] == 'macro_vix']['start']) == [pd.Timestamp('2024-03-13')]
+
+    report = scanner.coverage_report(sources)
+    assert report.loc['market', 'missing'] == 4
+    assert report.loc['market', 'max_gap'] == 3
+
+    requested = []
+
+    def fake_backfill(start, end):
+        requested.append((start, end))
+        idx = pd.date_range(start, end, freq='D')
+        return pd.DataFrame({'Close': 9.0}, index=idx)
+
+    result = scanner.backfill(gaps, {'market': fake_backfill}, sources=sources, merge_within=None)
+    assert len(result) == 2 and (result['status'] == 'ok').all()
+    assert sorted(requested) == [(pd.Timestamp('2024-01-10'), pd.Timestamp('2024-01-12')),
+                                 (pd.Timestamp('2024-01-20'), pd.Timestamp('2024-01-20'))]
+
+    # 回补后市场数据无缺口，原有数据未被覆盖
+    gaps_after = scanner.scan(sources)
+    assert 'market' not in set(gaps_after['source'])
+    df = pd.read_csv(os.path.join(raw_dir, 'bitcoin_price.csv'), index_col=0, parse_dates=True)
+    assert (df['Close'] == 9.0).sum() == 4
+
+    # 调度器的导入方式：只有项目根目录在路径上（独立进程，不受本测试的 sys.path 影响）
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    pd.Series([1.0], index=pd.to_datetime(['2024-01-01'])).to_frame('price').to_csv(
+        os.path.join(raw_dir, 'store_probe.csv'))
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from src.data.gap_scanner import GapScanner, default_backfillers\n"
+        "import pandas as pd\n"
+        "scanner = GapScanner(raw_dir=sys.argv[2], verbose=False)\n"
+        "scanner.store.upsert('coingecko/bitcoin_usd_daily', pd.read_csv(sys.argv[3], index_col=0, parse_dates=True))\n"
+        "print(','.join(sorted(default_backfillers(scanner))))\n"
+    )
+    env = {k: v for k, v in os.environ.items() if k != 'PYTHONPATH'}
+    proc = subprocess.run([sys.executable, '-c', script, root, raw_dir, os.path.join(raw_dir, 'store_probe.csv')],
+                          cwd=tempfile.mkdtemp(), env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert {'market', 'macro_vix', 'coingecko/bitcoin_usd_daily'} <= set(proc.stdout.strip().split(','))
+    print("✓ 缺口检测与回补测试通过")
+
+
+def test_glassnode_metrics():
+    """测试 4: 多指标并发获取，重复调用只请求最后一个点之后的数据"""
+    print("\n" + "=" * 60)
+    print("测试 4: Glassnode 指标批量获取")
+    print("=" * 60)
+
+    data_dir = tempfile.mkdtemp()
+    collector = OnchainCollector(glassnode_key='test', cache_dir=os.path.join(data_dir, 'raw', 'store'))
+    collector._rate_limit = lambda min_interval=1.0: None
+    today = pd.Timestamp.now().normalize()
+    calls = []
+
+    def fake_fetch(path, since, until=None, interval='24h'):
+        calls.append((path, pd.Timestamp(since, unit='s')))
+        idx = pd.date_range(pd.Timestamp(since, unit='s').ceil('D'), today, freq='D')
+        return pd.Series(float(len(path)), index=idx)
+
+    collector._fetch_glassnode_metric = fake_fetch
+
+    df = collector.get_glassnode_metrics(['active_addresses', 'mining/hash_rate_mean'], days=30)
+    assert list(df.columns) == ['active_addresses', 'mining_hash_rate_mean']
+    assert len(df) == 31 and not df.isnull().any().any()
+    assert len(calls) == 2
+
+    calls.clear()
+    df = collector.get_glassnode_metrics(['active_addresses', 'mining/hash_rate_mean'], days=30)
+    assert len(calls) == 2
+    assert all(since == today for _, since in calls)
+    assert len(df) == 31
+
+    # 兼容原有单指标接口
+    active = collector.get_active_addresses(days=7)
+    assert list(active.columns) == ['active_addresses']
+
+    # DataIntegrator 从本地存储读取宽表（无 onchain_data.csv）
+    integrator = DataIntegrator(data_dir=data_dir, verbose=False)
+    onchain = integrator.load_onchain_data()
+    assert {'active_addresses', 'mining_hash_rate_mean'} <= set(onchain.columns)
+    assert len(onchain) == 31
+
+    # 没有本地存储时不创建存储目录
+    empty_dir = tempfile.mkdtemp()
+    assert DataIntegrator(data_dir=empty_dir, verbose=False).load_onchain_data() is None
+    assert not os.path.exists(os.path.join(empty_dir, 'raw', 'store'))
+    print("✓ Glassnode 指标批量获取测试通过")
+
+
+def test_address_watchlist():
+    """测试 5: 多地址单次请求；高度不变不发请求；只返回余额变化"""
+    print("\n" + "=" * 60)
+    print("测试 5: 地址观察列表")
+    print("=" * 60)
+
+    collector = OnchainCollector(cache_dir=tempfile.mkdtemp())
+    collector._rate_limit = lambda min_interval=1.0: None
+    state = {'height': 100, 'balances': {f'addr{i}': 1000 * i for i in range(250)}}
+    requests_made = []
+
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    def fake_get(url, params=None, timeout=None):
+        addrs = params['active'].split('|')
+        requests_made.append(len(addrs))
+        return FakeResponse({a: {'final_balance': state['balances'][a], 'n_tx': 1} for a in addrs})
+
+    collector.session.get = fake_get
+    collector.get_block_height = lambda: state['height']
+
+    labels = {f'addr{i}': 'whale' if i < 10 else '' for i in range(250)}
+    watchlist = AddressWatchlist(labels, collector=collector, chunk_size=100,
+                                 cache_path=os.path.join(tempfile.mkdtemp(), 'balances.json'), verbose=False)
+
+    # 首次扫描只建立基准
+    assert watchlist.sweep().empty
+    assert sorted(requests_made) == [50, 100, 100]
+    assert len(watchlist.balances()) == 250
+
+    # 高度未变化：不发请求
+    requests_made.clear()
+    assert watchlist.sweep().empty
+    assert requests_made == []
+
+    # 新区块：只返回变化的地址
+    state['height'] = 101
+    state['balances']['addr3'] += 5 * 10 ** 8
+    state['balances']['addr200'] -= 1000
+    deltas = watchlist.sweep()
+    assert list(deltas.index) == ['addr3', 'addr200']
+    assert deltas.loc['addr3', 'delta_btc'] == 5.0
+    assert deltas.loc['addr3', 'label'] == 'whale'
+    print(deltas)
+    print("✓ 地址观察列表测试通过")
+
+
+def test_mempool_monitor():
+    """测试 6: 重复出现的交易只处理一次，鲸鱼告警，按分钟聚合落盘"""
+    print("\n" + "=" * 60)
+    print("测试 6: 内存池监控")
+    print("=" * 60)
+
+    def tx(txid, outputs, fee=1000):
+        return {'hash': txid, 'fee': fee, 'size': 250, 'out': [{'value': int(v * 1e8)} for v in outputs]}
+
+    payloads = [
+        [tx('a', [1.0, 2.0]), tx('b', [150.0, 0.5])],
+        [tx('a', [1.0, 2.0]), tx('b', [150.0, 0.5]), tx('c', [0.1]), tx('d', [])],
+        [tx('c', [0.1]), tx('e', [99.0, 1.0])],
+    ]
+
+    alerts = []
+    monitor = MempoolMonitor(OnchainCollector(cache_dir=tempfile.mkdtemp()), source='blockchain',
+                             store=SeriesStore(tempfile.mkdtemp()), alerts_path=None,
+                             on_alert=alerts.append, verbose=False)
+    monitor._fetch = lambda: payloads[monitor.polls - 1]
+
+    t0 = pd.Timestamp('2024-05-01 12:00:10')
+    new = monitor.poll_once(t0)
+    assert list(new['txid']) == ['a', 'b']
+    assert list(new['value_btc']) == [3.0, 150.5]
+
+    new = monitor.poll_once(t0 + pd.Timedelta(seconds=30))
+    assert list(new['txid']) == ['c', 'd']
+    assert list(new['value_btc']) == [0.1, 0.0]
+    assert monitor.minute_aggregates().empty
+
+    new = monitor.poll_once(t0 + pd.Timedelta(minutes=1))
+    assert list(new['txid']) == ['e']
+    assert [a['txid'] for a in alerts] == ['b', 'e']
+
+    # 第一分钟已结束并写入存储，第二分钟在 flush 时写入
+    agg = monitor.minute_aggregates()
+    assert list(agg.index) == [pd.Timestamp('2024-05-01 12:00')]
+    assert agg['new_tx'].iloc[0] == 4 and agg['whale_tx'].iloc[0] == 1
+    assert abs(agg['value_btc'].iloc[0] - 153.6) < 1e-9
+
+    monitor.flush()
+    agg = monitor.minute_aggregates()
+    assert len(agg) == 2 and agg['max_tx_btc'].iloc[1] == 100.0
+    assert agg['sampled'].all()
+    print(agg)
+
+    # 缺少 value 的输出按 0 计，不中断整批计算
+    totals = OnchainCollector.sum_tx_outputs([{'out': [{'value': 5}, {'script': '6a'}]}, {}, {'out': [{'value': 7}]}])
+    assert list(totals) == [5.0, 0.0, 7.0]
+    monitor._fetch = lambda: [{'hash': 'f', 'fee': 0, 'size': 100, 'out': [{'value': int(2e8)}, {'n': 1}]}]
+    new = monitor.poll_once(t0 + pd.Timedelta(minutes=2))
+    assert list(new['value_btc']) == [2.0]
+
+    # mempool.space 轮询：txid 快照求差，只逐笔获取新交易，超出 max_fetch 的排队到下次；
+    # 积压不少于 max_fetch 时不下载 txid 列表
+    snapshots = iter([['x1', 'x2'], ['x1', 'x2', 'n1', 'n2', 'n3', 'n4', 'n5'], ['n3', 'n4', 'n5', 'n6']])
+    txs = {f'n{i}': {'txid': f'n{i}', 'fee': 500, 'weight': 800, 'vout': [{'value': int(v * 1e8)} for v in outputs]}
+           for i, outputs in enumerate([[1.0], [200.0, 5.0], [], [0.25, 0.25], [2.0], [3.0]], start=1)}
+    fetched, txid_calls = [], []
+    space = MempoolMonitor(OnchainCollector(cache_dir=tempfile.mkdtemp()), source='mempool_space_rest', max_fetch=2,
+                           store=SeriesStore(tempfile.mkdtemp()), alerts_path=None, verbose=False)
+    space._fetch_txids = lambda: txid_calls.append(1) or next(snapshots)
+    space._fetch_tx = lambda txid: fetched.append(txid) or txs[txid]
+
+    assert space.poll_once(t0).empty and not fetched          # 首次轮询只建立快照
+    new = space.poll_once(t0 + pd.Timedelta(seconds=10))
+    assert list(new['txid']) == ['n1', 'n2'] and list(new['value_btc']) == [1.0, 205.0]
+    assert list(new['vsize']) == [200, 200] and [a['txid'] for a in space.alerts] == ['n2']
+    new = space.poll_once(t0 + pd.Timedelta(seconds=20))
+    assert list(new['txid']) == ['n3', 'n4'] and list(new['value_btc']) == [0.0, 0.5]
+    assert len(txid_calls) == 2
+    new = space.poll_once(t0 + pd.Timedelta(seconds=30))
+    assert list(new['txid']) == ['n5', 'n6'] and len(txid_calls) == 3
+    assert fetched == ['n1', 'n2', 'n3', 'n4', 'n5', 'n6']
+
+    space.flush()
+    agg = space.minute_aggregates()
+    assert agg['new_tx'].iloc[0] == 6 and not agg['sampled'].any() and agg['pending_tx'].iloc[0] == 0
+
+    # mempool.space 推送：读取 track-mempool 增量，序号不连续或断线时该分钟标记为 sampled
+    class FakeSocket:
+        def __init__(self, messages):
+            self.messages = deque(messages)
+            self.closed = False
+
+        def recv(self, timeout=None):
+            if not self.messages:
+                raise TimeoutError
+            message = self.messages.popleft()
+            if isinstance(message, Exception):
+                raise message
+            return message
+
+        def close(self):
+            self.closed = True
+
+    def delta(sequence, *txids):
+        return json.dumps({'mempool-transactions': {'sequence': sequence, 'added': [txs[t] for t in txids],
+                                                    'removed': []}})
+
+    sockets = [FakeSocket([delta(1, 'n1', 'n2'), json.dumps({'conversions': {}}), delta(2, 'n3')]),
+               FakeSocket([delta(1, 'n5')])]
+    stream = MempoolMonitor(OnchainCollector(cache_dir=tempfile.mkdtemp()), source='mempool_space',
+                            store=SeriesStore(tempfile.mkdtemp()), alerts_path=None, verbose=False)
+    connects = []
+    stream._connect_stream = lambda: connects.append(1) or setattr(stream, '_ws', sockets[len(connects) - 1])
+
+    new = stream.poll_once(t0)
+    assert list(new['txid']) == ['n1', 'n2', 'n3'] and list(new['value_btc']) == [1.0, 205.0, 0.0]
+    sockets[0].messages.extend([delta(4, 'n4'), OSError('connection reset')])
+    new = stream.poll_once(t0 + pd.Timedelta(minutes=1))
+    assert list(new['txid']) == ['n4'] and sockets[0].closed and stream._ws is None
+    new = stream.poll_once(t0 + pd.Timedelta(minutes=1, seconds=10))
+    assert list(new['txid']) == ['n5'] and len(connects) == 2
+
+    stream.flush()
+    agg = stream.minute_aggregates()
+    assert list(agg['new_tx']) == [3, 2] and list(agg['sampled']) == [False, True]
+    print("✓ 内存池监控测试通过")
+
+
+if __name__ == "__main__":
+    test_series_store()
+    test_coingecko_range_cache()
+    test_gap_scanner()
+    test_glassnode_metrics()
+    test_address_watchlist()
+    test_mempool_monitor()
+    print("\n✓ 所有测试通过")
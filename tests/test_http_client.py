@@ -0,0 +1,213 @@
+"""
+共享 HTTP 客户端测试
+
+测试内容：
+1. 连接池在多个 Session 之间共享
+2. 5xx 响应的有界重试与统计
+3. 总超时预算
+4. 熔断打开后返回最近一次成功的数据，冷却后半开恢复
+5. AIMD 并发上限随错误收缩、随成功增长
+"""
+
+import sys
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data.http_client import (
+    RetryPolicy, CircuitOpenError, create_session, get_shared_adapter, get_http_stats,
+    reset_http_stats, get_endpoint_controller, get_endpoint_stats
+)
+from data.endpoint_controller import AIMDLimiter
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """前 N 次返回 503，之后返回 200"""
+
+    failures_left = 0
+
+    def do_GET(self):
+        if _FlakyHandler.failures_left > 0:
+            _FlakyHandler.failures_left -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_sessions_share_pool():
+    """测试 1: 多个 Session 共享同一个连接池"""
+    print("\n" + "=" * 60)
+    print("测试 1: 连接池共享")
+    print("=" * 60)
+
+    a = create_session()
+    b = create_session(headers={'Accept': 'application/json'})
+
+    assert a.get_adapter('https://api.binance.com') is get_shared_adapter()
+    assert b.get_adapter('https://api.coingecko.com') is get_shared_adapter()
+    assert a.headers.get('Accept') != 'application/json'
+    print("✓ 连接池共享测试通过")
+
+
+def test_retry_and_stats():
+    """测试 2: 503 重试后成功，统计重试次数"""
+    print("\n" + "=" * 60)
+    print("测试 2: 重试与统计")
+    print("=" * 60)
+
+    server, base_url = _start_server()
+    try:
+        reset_http_stats()
+        _FlakyHandler.failures_left = 2
+        session = create_session(policy=RetryPolicy(max_retries=3, backoff_base=0.01))
+
+        response = session.get(f"{base_url}/ok", timeout=5)
+        assert response.status_code == 200
+        assert response.json() == {'ok': True}
+
+        host = base_url.split('//')[1]
+        stats = get_http_stats()[host]
+        assert stats['requests'] == 1
+        assert stats['retries'] == 2
+        assert stats['failures'] == 0
+
+        # 重试耗尽后返回最后一次响应
+        _FlakyHandler.failures_left = 5
+        session = create_session(policy=RetryPolicy(max_retries=1, backoff_base=0.01))
+        response = session.get(f"{base_url}/fail", timeout=5)
+        assert response.status_code == 503
+        assert get_http_stats()[host]['failures'] == 1
+        print("✓ 重试与统计测试通过")
+    finally:
+        _FlakyHandler.failures_left = 0
+        server.shutdown()
+
+
+def test_timeout_budget():
+    """测试 3: 退避等待超出总预算时立即放弃"""
+    print("\n" + "=" * 60)
+    print("测试 3: 总超时预算")
+    print("=" * 60)
+
+    server, base_url = _start_server()
+    try:
+        _FlakyHandler.failures_left = 10
+        policy = RetryPolicy(max_retries=10, backoff_base=5.0, total_timeout=1.0)
+        session = create_session(policy=policy)
+
+        response = session.get(f"{base_url}/slow", timeout=5)
+        assert response.status_code == 503
+        # 首次 503 后需要等待约 5s，超出 1s 预算，不应再重试
+        assert _FlakyHandler.failures_left == 9
+        print("✓ 总超时预算测试通过")
+    finally:
+        _FlakyHandler.failures_left = 0
+        server.shutdown()
+
+
+def test_circuit_breaker():
+    """测试 4: 连续失败触发熔断，熔断期间不发请求，冷却后探测恢复"""
+    print("\n" + "=" * 60)
+    print("测试 4: 熔断与降级")
+    print("=" * 60)
+
+    server, base_url = _start_server()
+    controller = get_endpoint_controller()
+    old_threshold, old_recovery = controller.failure_threshold, controller.recovery_timeout
+    try:
+        controller.reset()
+        controller.failure_threshold, controller.recovery_timeout = 2, 0.3
+        session = create_session(policy=RetryPolicy(max_retries=0))
+
+        assert session.get(f"{base_url}/data", timeout=5).json() == {'ok': True}
+
+        _FlakyHandler.failures_left = 10
+        for _ in range(2):
+            assert session.get(f"{base_url}/data", timeout=5).status_code == 503
+
+        host = base_url.split('//')[1]
+        assert get_endpoint_stats()[host]['circuit'] == 'open'
+
+        # 熔断中：返回最近一次成功的响应，服务端不再收到请求
+        cached = session.get(f"{base_url}/data", timeout=5)
+        assert cached.status_code == 200 and cached.from_cache
+        assert cached.json() == {'ok': True}
+        assert _FlakyHandler.failures_left == 8
+
+        # 没有缓存的 URL 直接抛出异常
+        try:
+            session.get(f"{base_url}/other", timeout=5)
+            assert False, "应抛出 CircuitOpenError"
+        except CircuitOpenError:
+            pass
+        assert get_endpoint_stats()[host]['short_circuits'] == 2
+
+        # 冷却后半开，探测成功即关闭熔断
+        _FlakyHandler.failures_left = 0
+        time.sleep(0.35)
+        response = session.get(f"{base_url}/other", timeout=5)
+        assert response.status_code == 200 and not getattr(response, 'from_cache', False)
+        assert get_endpoint_stats()[host]['circuit'] == 'closed'
+        print("✓ 熔断与降级测试通过")
+    finally:
+        controller.failure_threshold, controller.recovery_timeout = old_threshold, old_recovery
+        controller.reset()
+        _FlakyHandler.failures_left = 0
+        server.shutdown()
+
+
+def test_aimd_limiter():
+    """测试 5: 出错或超时乘性减少，成功加性增加"""
+    print("\n" + "=" * 60)
+    print("测试 5: AIMD 并发控制")
+    print("=" * 60)
+
+    limiter = AIMDLimiter(initial_limit=4.0, max_limit=6.0, latency_target=1.0)
+    assert limiter.acquire(timeout=0)
+    limiter.release(latency=0.1, ok=False)
+    assert limiter.limit == 2.0
+
+    assert limiter.acquire(timeout=0)
+    limiter.release(latency=5.0, ok=True)
+    assert limiter.limit == 1.0
+
+    # 并发上限为 1 时第二个请求拿不到槽位
+    assert limiter.acquire(timeout=0)
+    assert not limiter.acquire(timeout=0.05)
+    limiter.release(latency=0.1, ok=True)
+    assert limiter.limit == 2.0
+
+    for _ in range(50):
+        limiter.acquire(timeout=0)
+        limiter.release(latency=0.1, ok=True)
+    assert limiter.limit == 6.0
+    assert limiter.in_flight == 0
+    print("✓ AIMD 并发控制测试通过")
+
+
+if __name__ == "__main__":
+    test_sessions_share_pool()
+    test_retry_and_stats()
+    test_timeout_budget()
+    test_circuit_breaker()
+    test_aimd_limiter()
+    print("\n✓ 所有测试通过")
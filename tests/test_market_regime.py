@@ -0,0 +1,547 @@
+"""
+市场状态识别测试（合成数据，离线）
+
+测试内容：
+1. 在线跟踪：前向滤波概率与 hmmlearn 在同一前缀上的后验一致，逐根更新与批量更新一致
+2. 模型持久化：未漂移时复用已保存模型，漂移时热启动重新训练
+3. 并行模型选择：信息准则、轮廓系数、跨种子稳定性，选出最优配置
+4. hybrid：K-Means 划分初始化 HMM，跨随机种子稳定，迭代上限和收敛报告，热启动跳过 K-Means
+5. 滚动前推：样本外标签覆盖训练期之后的全部样本，并行与顺序一致，HMM 样本外标签不使用未来数据
+6. 软输出：状态映射查找表、名称列为普通字符串列（非分类类型）、float32 概率列与置信度
+7. 结构突变：BOCPD 在线检测（运行长度有界、逐根与批量一致、状态可恢复）、PELT 批量检测、触发重新训练
+8. 集成：各成员编号不同的相同划分对齐后完全一致，并行与顺序结果一致，集成模型可预测
+9. 可视化：状态游程编码与逐行结果一致，价格抽稀保留极值，分钟级长序列出图耗时有界
+10. 批量出图：并行渲染，输入未变的图跳过，只重绘输入变化或文件缺失的图
+"""
+
+import sys
+import os
+import json
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates as mdates
+
+from sklearn.metrics import adjusted_rand_score
+
+from src.model.market_regime import MarketRegimeIdentifier
+from src.model.regime_tracker import RegimeTracker
+from src.model.regime_walkforward import RegimeWalkForward
+from src.model.change_point import ChangePointDetector, pelt
+from src.model.regime_visualizer import RegimeVisualizer, regime_segments, decimate_minmax, CHARTS
+
+
+def _make_regime_features(n=600, seed=0):
+    """四段不同波动 / 收益的合成特征"""
+    rng = np.random.default_rng(seed)
+    segments = [(0.000, 0.01), (0.004, 0.02), (-0.01, 0.06), (0.01, 0.05)]
+    regime = np.repeat(np.arange(4), n // 4)
+    mu = np.array([segments[r][0] for r in regime])
+    sigma = np.array([segments[r][1] for r in regime])
+    ret = rng.normal(mu, sigma)
+    return pd.DataFrame({
+        'market_Return': ret,
+        'market_Return_7d': pd.Series(ret).rolling(7, min_periods=1).sum().values,
+        'market_Volatility_7d': pd.Series(ret).rolling(7, min_periods=2).std().bfill().values,
+        'market_Volume_Change': rng.normal(0, 0.1, len(ret)) * (1 + 3 * (regime >= 2)),
+    }, index=pd.date_range('2022-01-01', periods=len(ret), freq='D'))
+
+
+def _fit_hmm(df):
+    identifier = MarketRegimeIdentifier(n_regimes=4, method='hmm', verbose=False)
+    identifier.fit(df)
+    return identifier
+
+
+def test_regime_tracker_forward_filter():
+    """测试 1: 在线前向滤波"""
+    print("\n" + "=" * 60)
+    print("测试 1: 在线状态跟踪")
+    print("=" * 60)
+
+    df = _make_regime_features()
+    identifier = _fit_hmm(df)
+    X_scaled = identifier.scaler.transform(identifier.feature_matrix(df))
+
+    tracker = RegimeTracker.from_identifier(identifier, verbose=False)
+    result = tracker.update_frame(df)
+    assert len(result) == len(df)
+    prob_cols = [c for c in result.columns if c.startswith('prob_')]
+    np.testing.assert_allclose(result[prob_cols].sum(axis=1), 1.0)
+
+    # 前缀最后一点的平滑后验 = 滤波后验
+    for t in (0, 37, 299, len(df) - 1):
+        expected = identifier.hmm_model.predict_proba(X_scaled[:t + 1])[-1]
+        replay = RegimeTracker.from_identifier(identifier, verbose=False)
+        replay.update_frame(df.iloc[:t + 1])
+        np.testing.assert_allclose(replay.alpha, expected, atol=1e-8)
+
+    np.testing.assert_allclose(tracker.log_likelihood, identifier.hmm_model.score(X_scaled), rtol=1e-8)
+
+    # 逐根更新（从保存的状态恢复）与批量结果一致，已处理的K线不重复处理
+    stream = RegimeTracker.from_identifier(identifier, verbose=False)
+    stream.update_frame(df.iloc[:500])
+    resumed = RegimeTracker.from_identifier(identifier, verbose=False)
+    resumed.set_state(stream.get_state())
+    assert resumed.update_frame(df.iloc[:500]).empty
+    for ts, row in df.iloc[500:].iterrows():
+        out = resumed.update(row)
+        assert out['timestamp'] == ts
+        assert out['regime'] == result.loc[ts, 'regime']
+        np.testing.assert_allclose(out['confidence'], result.loc[ts, 'confidence'])
+
+    mapped = identifier.predict(df)
+    agreement = (result['regime'].values == mapped).mean()
+    print(f"滤波标签与 Viterbi 一致率: {agreement:.1%}")
+    assert agreement > 0.8
+    print("✓ 在线状态跟踪测试通过")
+
+
+def test_model_persistence():
+    """测试 2: 模型持久化与热启动"""
+    print("\n" + "=" * 60)
+    print("测试 2: 模型持久化")
+    print("=" * 60)
+
+    df = _make_regime_features(seed=1)
+    model_dir = tempfile.mkdtemp()
+
+    for method in ('kmeans', 'hmm'):
+        path = os.path.join(model_dir, f'regime_{method}.pkl')
+
+        first = MarketRegimeIdentifier(method=method, verbose=False)
+        start = time.perf_counter()
+        expected = first.fit_or_load(df.copy(), model_path=path)
+        cold_time = time.perf_counter() - start
+        assert first.last_fit_mode == 'cold' and os.path.exists(path)
+
+        # 新实例、相同数据：直接加载，标签不变
+        second = MarketRegimeIdentifier(method=method, verbose=False)
+        start = time.perf_counter()
+        result = second.fit_or_load(df.copy(), model_path=path)
+        load_time = time.perf_counter() - start
+        assert second.last_fit_mode == 'loaded'
+        assert second.regime_mapping == first.regime_mapping
+        assert (result['market_regime'] == expected['market_regime']).all()
+        print(f"{method}: 训练 {cold_time * 1000:.0f}ms, 加载 {load_time * 1000:.0f}ms")
+
+        # 追加少量同一状态的数据不算漂移（也没有结构突变）
+        more = pd.concat([df, df.iloc[-40:-20].set_axis(
+            pd.date_range(df.index[-1] + pd.Timedelta('1D'), periods=20, freq='D'))])
+        third = MarketRegimeIdentifier(method=method, verbose=False)
+        third.fit_or_load(more.copy(), model_path=path)
+        assert third.last_fit_mode == 'loaded'
+
+        # 波动放大：漂移，热启动重新训练并覆盖保存
+        drifted = df.copy()
+        drifted[['market_Return', 'market_Return_7d', 'market_Volatility_7d']] *= 2
+        fourth = MarketRegimeIdentifier(method=method, verbose=False)
+        refit = fourth.fit_or_load(drifted, model_path=path)
+        assert fourth.last_fit_mode == 'warm'
+        assert refit['market_regime'].nunique() >= 3
+        if method == 'kmeans':
+            assert fourth.kmeans_model.n_init == 1
+
+        fifth = MarketRegimeIdentifier(method=method, verbose=False)
+        fifth.fit_or_load(drifted.copy(), model_path=path)
+        assert fifth.last_fit_mode == 'loaded'
+
+    # 方法不同：不复用
+    other = MarketRegimeIdentifier(method='hmm', verbose=False)
+    other.fit_or_load(df.copy(), model_path=os.path.join(model_dir, 'regime_kmeans.pkl'))
+    assert other.last_fit_mode == 'cold'
+    print("✓ 模型持久化测试通过")
+
+
+def test_model_sweep():
+    """测试 3: 并行模型选择"""
+    print("\n" + "=" * 60)
+    print("测试 3: 模型选择")
+    print("=" * 60)
+
+    df = _make_regime_features(n=400, seed=3)
+    identifier = MarketRegimeIdentifier(verbose=False)
+    results = identifier.sweep(df, n_regimes_grid=(2, 3, 4), covariance_types=('full', 'diag'),
+                               seeds=(0, 1), processes=2, apply_best=True)
+    print(results.drop(columns=['seconds']).to_string())
+
+    assert len(results) == 3 + 3 * 2
+    assert results['bic'].is_monotonic_increasing
+    assert results[['log_likelihood', 'aic', 'silhouette', 'stability']].notna().all().all()
+    assert results['stability'].between(-1, 1).all()
+    assert (results['failed_seeds'] == 0).all()
+
+    # HMM 似然不低于同状态数的 K-Means（硬分配球形高斯）
+    ll = results.set_index(['method', 'n_regimes', 'covariance_type'])['log_likelihood']
+    assert ll[('hmm', 4, 'full')] > ll[('kmeans', 4, None)]
+
+    best = results.iloc[0]
+    assert identifier.best_config['n_regimes'] == best['n_regimes']
+    assert identifier.best_config['method'] == best['method']
+    assert identifier.best_config['covariance_type'] in ('full', 'diag')
+    assert identifier.n_regimes == best['n_regimes'] and identifier.method == best['method']
+
+    # 按最优配置训练
+    regimes = identifier.fit(df)['market_regime']
+    assert regimes.nunique() >= 2
+    print("✓ 模型选择测试通过")
+
+
+def test_hybrid_initialization():
+    """测试 4: K-Means 初始化的 HMM"""
+    print("\n" + "=" * 60)
+    print("测试 4: hybrid 方法")
+    print("=" * 60)
+
+    df = _make_regime_features(n=1200, seed=5)
+
+    identifier = MarketRegimeIdentifier(method='hybrid', verbose=False)
+    result = identifier.fit(df.copy())
+    report = identifier.fit_report
+    print(report)
+    assert report['method'] == 'hybrid' and report['init'] == 'labels' and report['converged']
+    assert result['market_regime'].nunique() >= 3
+
+    labels, iterations = {}, {}
+    for mode in ('random', 'kmeans'):
+        labels[mode], iterations[mode] = [], []
+        for random_state in range(3):
+            model = MarketRegimeIdentifier(method='hmm', verbose=False)
+            X, _ = model.prepare_features(df.copy())
+            init = model.fit_kmeans(X, random_state=random_state) if mode == 'kmeans' else None
+            labels[mode].append(model.fit_hmm(X, random_state=random_state, init_labels=init))
+            iterations[mode].append(model.fit_report['iterations'])
+
+    print(f"EM 迭代次数: 随机初始化 {iterations['random']}, K-Means 初始化 {iterations['kmeans']}")
+    stability = np.mean([adjusted_rand_score(labels['kmeans'][0], other) for other in labels['kmeans'][1:]])
+    assert stability > 0.99
+
+    # 迭代上限
+    capped = MarketRegimeIdentifier(method='hmm', verbose=False)
+    X, _ = capped.prepare_features(df.copy())
+    capped.fit_hmm(X, n_iter=3, tol=0)
+    assert capped.fit_report['iterations'] == 3 and not capped.fit_report['converged']
+
+    # 由划分初始化的 EM 使用较小的迭代上限；fit 可覆盖 n_iter / tol
+    assert identifier.hmm_model.n_iter == MarketRegimeIdentifier.SEEDED_HMM_N_ITER
+    identifier.fit(df.copy(), n_iter=2, tol=0)
+    assert identifier.fit_report['iterations'] == 2
+
+    # 热启动：直接以旧 HMM 参数为初值，不再训练 K-Means
+    kmeans_model = identifier.kmeans_model
+    identifier.fit(df.copy(), warm_start=True)
+    assert identifier.fit_report['init'] == 'warm' and identifier.kmeans_model is kmeans_model
+    assert identifier.hmm_model.n_iter == MarketRegimeIdentifier.SEEDED_HMM_N_ITER
+    print("✓ hybrid 方法测试通过")
+
+
+def test_walk_forward():
+    """测试 5: 滚动前推回测"""
+    print("\n" + "=" * 60)
+    print("测试 5: 滚动前推")
+    print("=" * 60)
+
+    df = _make_regime_features(n=800, seed=6)
+
+    kwargs = dict(method='kmeans', window='expanding', train_size=300, step=50, n_init=3, verbose=False)
+    sequential = RegimeWalkForward(processes=1, **kwargs).run(df)
+    backtest = RegimeWalkForward(processes=2, **kwargs)
+    parallel = backtest.run(df)
+    assert parallel.index.equals(df.index[300:])
+    pd.testing.assert_frame_equal(sequential, parallel)
+    assert len(backtest.windows) == 10 and backtest.windows['train_rows'].iloc[-1] == 750
+    assert backtest.windows['label_switches'].iloc[0] == 0
+
+    # 标签对齐：编号被打乱的相同质心对齐回前一个窗口的编号
+    centers = np.arange(12.0).reshape(4, 3) ** 2
+    shuffled = np.array([2, 0, 3, 1])
+    perms = RegimeWalkForward._align([{'centers': centers}, {'centers': centers[shuffled] + 0.1}], np.ones(3))
+    np.testing.assert_array_equal(perms[1], shuffled)
+    assert parallel['aligned_state'].between(0, 3).all()
+
+    # 滚动窗口 + 热启动
+    rolling = RegimeWalkForward(method='kmeans', window='rolling', train_size=200, step=100,
+                                warm_start=True, processes=2, verbose=False)
+    rolling.run(df)
+    assert (rolling.windows['train_rows'] == 200).all()
+    assert rolling.windows['warm'].tolist() == [False, True, True, False, True, True]
+
+    # HMM：样本外后验只依赖当时已有的数据
+    hmm = RegimeWalkForward(method='hmm', train_size=500, step=150, processes=1, verbose=False)
+    labels = hmm.run(df)
+    truncated = RegimeWalkForward(method='hmm', train_size=500, step=150, processes=1, verbose=False).run(df.iloc[:600])
+    pd.testing.assert_frame_equal(labels.iloc[:100], truncated)
+    assert labels['confidence'].between(0, 1).all()
+    print(hmm.stability())
+    print("✓ 滚动前推测试通过")
+
+
+def test_soft_probabilities():
+    """测试 6: 状态概率与向量化映射"""
+    print("\n" + "=" * 60)
+    print("测试 6: 状态概率")
+    print("=" * 60)
+
+    # 映射规则：高波动中收益最低为恐慌、最高为狂热，其余波动最低为震荡，空簇为趋势
+    stats = pd.DataFrame({'market_Return': [0.0, 0.01, -0.02, 0.03, 0.005, 0.02],
+                          'market_Volatility_7d': [0.01, 0.02, 0.08, 0.07, np.nan, 0.02]})
+    identifier = MarketRegimeIdentifier(n_regimes=5, verbose=False)
+    mapped = identifier.map_regimes_to_meanings(stats, np.array([0, 1, 2, 3, 1, 1]))
+    assert identifier.regime_mapping == {2: 2, 3: 3, 0: 0, 1: 1, 4: 1}
+    np.testing.assert_array_equal(mapped, [0, 1, 2, 3, 1, 1])
+
+    df = _make_regime_features(n=800, seed=7)
+    prob_cols = [f'market_regime_prob_{name}' for name in MarketRegimeIdentifier.REGIMES.values()]
+    for method in ('kmeans', 'hmm'):
+        identifier = MarketRegimeIdentifier(method=method, verbose=False)
+        result = identifier.fit(df.copy())
+        assert not isinstance(result['market_regime_name'].dtype, pd.CategoricalDtype)
+        assert not isinstance(result['market_regime_cn'].dtype, pd.CategoricalDtype)
+        assert (result['market_regime_name'].to_numpy()
+                == [MarketRegimeIdentifier.REGIMES[r] for r in result['market_regime']]).all()
+        # 只统计出现过的状态
+        assert set(result['market_regime_name'].value_counts().index) == set(result['market_regime_name'])
+        assert (result[prob_cols].dtypes == np.float32).all()
+        np.testing.assert_allclose(result[prob_cols].sum(axis=1), 1.0, atol=1e-5)
+        confidence = result[prob_cols].to_numpy()[np.arange(len(result)), result['market_regime']]
+        np.testing.assert_array_equal(result['market_regime_confidence'], confidence)
+
+        # 新数据的概率与训练输出一致
+        np.testing.assert_allclose(identifier.predict_proba(df)[prob_cols], result[prob_cols], atol=1e-6)
+
+    # K-Means：概率最大的簇即最近质心
+    identifier = MarketRegimeIdentifier(method='kmeans', verbose=False)
+    identifier.fit(df.copy())
+    X_scaled = identifier.scaler.transform(identifier.feature_matrix(df))
+    np.testing.assert_array_equal(identifier.state_probabilities(X_scaled).argmax(axis=1),
+                                  identifier.kmeans_model.predict(X_scaled))
+
+    # HMM：市场状态概率 = 映射到该状态的 HMM 状态后验之和
+    identifier = _fit_hmm(df.copy())
+    posterior = identifier.hmm_model.predict_proba(identifier.scaler.transform(identifier.feature_matrix(df)))
+    expected = np.zeros((len(df), 4))
+    for state, regime in identifier.regime_mapping.items():
+        expected[:, regime] += posterior[:, state]
+    np.testing.assert_allclose(identifier.predict_proba(df).to_numpy(), expected, atol=1e-5)
+    print("✓ 状态概率测试通过")
+
+
+def _make_breaks(seed=0):
+    """300 行处波动放大并转为下跌，600 行处回落"""
+    rng = np.random.default_rng(seed)
+    sigma = np.repeat([0.01, 0.05, 0.015], 300)
+    mu = np.repeat([0.0, -0.01, 0.005], 300)
+    ret = rng.normal(mu, sigma)
+    return pd.DataFrame({
+        'market_Return': ret,
+        'market_Volatility_7d': pd.Series(ret).rolling(7, min_periods=2).std().bfill().values,
+    }, index=pd.date_range('2022-01-01', periods=len(ret), freq='D'))
+
+
+def test_change_points():
+    """测试 7: 结构突变检测"""
+    print("\n" + "=" * 60)
+    print("测试 7: 结构突变检测")
+    print("=" * 60)
+
+    df = _make_breaks()
+    detector = ChangePointDetector(max_run_length=150, verbose=False)
+    detector.calibrate(df.iloc[:200])
+    result = detector.scan(df.iloc[200:])
+    found = [df.index.get_loc(e['change_point']) for e in detector.events]
+    print(f"BOCPD 变点: {found}")
+    assert any(abs(p - 300) <= 5 for p in found) and any(abs(p - 600) <= 10 for p in found)
+    assert len(found) <= 5
+    assert len(detector.model.log_r) == 150 and result['run_length'].max() < 150
+    assert result['is_change'].sum() == len(detector.events)
+
+    # 逐根更新（从保存的状态恢复）与批量结果一致
+    stream = ChangePointDetector(max_run_length=150, verbose=False)
+    stream.calibrate(df.iloc[:200])
+    stream.scan(df.iloc[200:500])
+    resumed = ChangePointDetector(max_run_length=150, verbose=False)
+    resumed.set_state(json.loads(json.dumps(stream.get_state())))
+    assert resumed.scan(df.iloc[:500]).empty
+    events = [resumed.update(row) for _, row in df.iloc[500:].iterrows()]
+    np.testing.assert_allclose(resumed.model.log_r, detector.model.log_r)
+    assert [e['change_point'] for e in events if e] == [e['change_point'] for e in detector.events
+                                                      if e['timestamp'] > df.index[499]]
+
+    # PELT
+    positions = [df.index.get_loc(ts) for ts in ChangePointDetector(verbose=False).detect(df)]
+    print(f"PELT 变点: {positions}")
+    assert any(abs(p - 300) <= 5 for p in positions) and any(abs(p - 600) <= 5 for p in positions)
+    assert pelt(np.random.default_rng(1).normal(size=(500, 2))) == []
+
+    # 训练期之后出现突变：即使整体漂移不大也热启动重新训练
+    features = _make_regime_features(n=800, seed=8)
+    model_path = os.path.join(tempfile.mkdtemp(), 'regime.pkl')
+    MarketRegimeIdentifier(verbose=False).fit_or_load(features.iloc[:500].copy(), model_path=model_path)
+
+    calm = MarketRegimeIdentifier(verbose=False)
+    calm.fit_or_load(features.iloc[:500].copy(), model_path=model_path)
+    assert calm.last_fit_mode == 'loaded' and calm.change_events == []
+
+    shocked = features.iloc[:560].copy()
+    shocked.iloc[500:, shocked.columns.get_loc('market_Return')] = np.random.default_rng(9).normal(-0.05, 0.2, 60)
+    identifier = MarketRegimeIdentifier(verbose=False)
+    identifier.fit_or_load(shocked, model_path=model_path, drift_threshold=10)
+    assert identifier.last_fit_mode == 'warm' and identifier.change_events
+    assert identifier.change_events[0]['change_point'] >= shocked.index[495]
+    print("✓ 结构突变检测测试通过")
+
+
+def test_ensemble():
+    """测试 8: 集成标签"""
+    print("\n" + "=" * 60)
+    print("测试 8: 集成标签")
+    print("=" * 60)
+
+    # 分离良好的四个簇：各种子得到相同划分（编号不同），对齐后完全一致
+    rng = np.random.default_rng(11)
+    centers = np.array([[0.0, 0.01, 0.0], [0.02, 0.03, 0.5], [-0.04, 0.08, 1.0], [0.05, 0.07, -0.5]])
+    truth = rng.integers(0, 4, 800)
+    values = centers[truth] + rng.normal(0, [0.002, 0.002, 0.05], (800, 3))
+    blobs = pd.DataFrame(values, columns=['market_Return', 'market_Volatility_7d', 'market_Volume_Change'],
+                         index=pd.date_range('2022-01-01', periods=800, freq='D'))
+    identifier = MarketRegimeIdentifier(verbose=False)
+    result = identifier.fit_ensemble(blobs.copy(), methods=('kmeans',), seeds=range(6), processes=1)
+    assert (result['market_regime_agreement'] == 1).all()
+    assert adjusted_rand_score(truth, result['market_regime']) == 1.0
+    assert (identifier.predict(blobs) == result['market_regime']).all()
+
+    # 噪声数据：并行与顺序结果一致，一致度与得票概率对应
+    df = _make_regime_features(n=1000, seed=12)
+    sequential = MarketRegimeIdentifier(verbose=False).fit_ensemble(df.copy(), seeds=(0, 1, 2), processes=1)
+    ensemble = MarketRegimeIdentifier(verbose=False)
+    parallel = ensemble.fit_ensemble(df.copy(), seeds=(0, 1, 2), processes=2)
+    pd.testing.assert_frame_equal(sequential, parallel)
+    report = ensemble.ensemble_report
+    print(report['members'].to_string(index=False))
+    print(f"平均一致度 {report['agreement']:.1%}, 成员两两 ARI {report['pairwise_ari']:.2f}, {report['seconds']:.2f}s")
+    assert len(report['members']) == 6 and 0 < report['agreement'] <= 1
+    assert parallel['market_regime_agreement'].min() >= 1 / 6 - 1e-6
+    assert (parallel['market_regime_confidence'] >= parallel['market_regime_agreement'] - 1e-6).all()
+
+    # 通过 fit(method='ensemble') 调用，集成模型可预测、可保存加载
+    via_fit = MarketRegimeIdentifier(method='ensemble', verbose=False)
+    via_fit.fit(df.copy())
+    assert via_fit.method == 'ensemble' and (via_fit.predict(df) == via_fit.predict(df.iloc[::-1])[::-1]).all()
+    path = os.path.join(tempfile.mkdtemp(), 'ensemble.pkl')
+    via_fit.save_model(path)
+    loaded = MarketRegimeIdentifier(verbose=False)
+    assert loaded.load_model(path) and loaded.method == 'ensemble'
+    np.testing.assert_array_equal(loaded.predict(df), via_fit.predict(df))
+    print("✓ 集成标签测试通过")
+
+
+def test_regime_rendering():
+    """状态背景游程编码 + 价格抽稀"""
+    print("\n" + "=" * 60)
+    print("测试 9: 状态图游程编码与抽稀")
+    print("=" * 60)
+
+    index = pd.date_range('2024-01-01', periods=12, freq='D')
+    regimes = pd.Series([0, 0, 1, 1, 1, np.nan, np.nan, 2, 2, 0, 3, 3], index=index)
+    starts, ends, values = regime_segments(index, regimes)
+    np.testing.assert_array_equal(values, [0, 1, 2, 0, 3])
+    x = mdates.date2num(index)
+    np.testing.assert_allclose(starts, x[[0, 2, 7, 9, 10]])
+    np.testing.assert_allclose(ends, np.append(x[[2, 5, 9, 10]], x[-1] + 1))
+
+    # 每一行都落在取值相同的段内
+    for t, r in zip(x, regimes):
+        inside = (starts <= t) & (t < ends)
+        assert inside.sum() == (0 if np.isnan(r) else 1)
+        if inside.any():
+            assert values[inside][0] == r
+
+    # 段数超限时按桶取众数合并
+    rng = np.random.default_rng(0)
+    long_index = pd.date_range('2024-01-01', periods=100_000, freq='min')
+    noisy = pd.Series(np.repeat(rng.integers(0, 4, 20_000), 5), index=long_index)
+    merged = regime_segments(long_index, noisy, max_segments=1000)
+    assert len(merged[0]) <= 1000 and np.all(merged[1][:-1] == merged[0][1:])
+    assert merged[0][0] == mdates.date2num(long_index[0])
+
+    # 抽稀保留全局极值和最后一点
+    y = rng.standard_normal(100_000).cumsum()
+    rows = decimate_minmax(y, 2000)
+    assert len(rows) <= 2001 and rows[-1] == len(y) - 1
+    assert y.argmax() in rows and y.argmin() in rows
+    np.testing.assert_array_equal(decimate_minmax(y[:100], 2000), np.arange(100))
+
+    # 分钟级长序列出图
+    df = pd.DataFrame({'market_Close': 40000 + y * 10, 'market_regime': noisy.values},
+                      index=long_index)
+    path = os.path.join(tempfile.mkdtemp(), 'regimes.png')
+    start = time.perf_counter()
+    RegimeVisualizer().plot_price_with_regimes(df, save_path=path)
+    seconds = time.perf_counter() - start
+    print(f"{len(df)} 行 -> {len(merged[0])} 段, 出图 {seconds:.2f}s")
+    assert os.path.getsize(path) > 0 and seconds < 10
+    print("✓ 状态图游程编码测试通过")
+
+
+def test_plot_cache():
+    """批量出图：指纹缓存 + 并行渲染"""
+    print("\n" + "=" * 60)
+    print("测试 10: 批量出图缓存")
+    print("=" * 60)
+
+    rng = np.random.default_rng(1)
+    n = 400
+    df = pd.DataFrame({
+        'market_Close': 30000 * np.exp(rng.normal(0, 0.02, n).cumsum()),
+        'market_Return': rng.normal(0, 0.02, n),
+        'market_Volatility_7d': rng.uniform(0.01, 0.05, n),
+        'market_RSI14': rng.uniform(20, 80, n),
+        'market_regime': np.repeat(rng.integers(0, 4, n // 20), 20),
+        'unrelated': rng.normal(size=n),
+    }, index=pd.date_range('2023-01-01', periods=n, freq='D'))
+    output_dir = tempfile.mkdtemp()
+    visualizer = RegimeVisualizer(figsize=(8, 5))
+
+    first = visualizer.generate_all_plots(df, output_dir, processes=2)
+    assert (first['status'] == 'rendered').all() and len(first) == len(CHARTS)
+    assert (first['seconds'] > 0).all() and all(os.path.getsize(p) > 0 for p in first['path'])
+    mtimes = {p: os.path.getmtime(p) for p in first['path']}
+
+    # 输入未变（无关列变化也不算）：全部跳过，文件不动
+    df['unrelated'] += 1
+    second = visualizer.generate_all_plots(df, output_dir)
+    assert (second['status'] == 'cached').all()
+    assert all(os.path.getmtime(p) == mtimes[p] for p in second['path'])
+
+    # 只改价格：只重绘价格图；删除的文件重新生成
+    df.iloc[-1, df.columns.get_loc('market_Close')] *= 1.1
+    os.remove(first.set_index('chart').loc['regime_transitions', 'path'])
+    third = visualizer.generate_all_plots(df, output_dir, processes=1).set_index('chart')['status']
+    assert third.to_dict() == {'price_with_regimes': 'rendered', 'regime_statistics': 'cached',
+                               'regime_transitions': 'rendered'}
+
+    # 图表尺寸变化或关闭缓存：全部重绘
+    assert (RegimeVisualizer(figsize=(9, 5)).generate_all_plots(df, output_dir)['status'] == 'rendered').all()
+    assert (RegimeVisualizer(figsize=(9, 5)).generate_all_plots(df, output_dir, use_cache=False)['status']
+            == 'rendered').all()
+    print("✓ 批量出图缓存测试通过")
+
+
+if __name__ == "__main__":
+    test_regime_tracker_forward_filter()
+    test_model_persistence()
+    test_model_sweep()
+    test_hybrid_initialization()
+    test_walk_forward()
+    test_soft_probabilities()
+    test_change_points()
+    test_ensemble()
+    test_regime_rendering()
+    test_plot_cache()
+    print("\n✓ 所有测试通过")
@@ -0,0 +1,203 @@
+"""
+波动率分析测试（合成数据，离线）
+
+测试内容：
+1. OHLC 估计量：Parkinson / Garman-Klass 与逐窗口计算一致，Rogers-Satchell / Yang-Zhang 与公式逐窗口计算一致，
+   几何布朗运动上接近真实波动率，分钟级长序列耗时有界
+2. 滚动GARCH：样本外预测不使用未来数据，并行与顺序一致，热启动与冷启动一致，参数缓存命中后结果不变
+3. GARCH模型选择：36 个候选并行拟合，按 AIC / BIC / QLIKE 排序，最优模型默认保存，可加载预测，
+   新对象的 full_analysis 按保存的设定拟合
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.volatility_analyzer import VolatilityAnalyzer, OHLC_ESTIMATORS
+
+
+def _make_ohlc(n: int, sigma: float = 0.02, gap: float = 0.005, seed: int = 0,
+               steps: int = 50, freq: str = 'D') -> pd.DataFrame:
+    """几何布朗运动的 OHLC（每根K线内 steps 步，开盘相对前收有隔夜跳空）"""
+    rng = np.random.default_rng(seed)
+    paths = rng.normal(0, sigma / np.sqrt(steps), (n, steps)).cumsum(axis=1)
+    opens = np.concatenate([[0.0], paths[:-1, -1]]).cumsum() + rng.normal(0, gap, n).cumsum()
+    log_path = opens[:, None] + np.concatenate([np.zeros((n, 1)), paths], axis=1)
+    return pd.DataFrame({
+        'market_Open': 30000 * np.exp(log_path[:, 0]),
+        'market_High': 30000 * np.exp(log_path.max(axis=1)),
+        'market_Low': 30000 * np.exp(log_path.min(axis=1)),
+        'market_Close': 30000 * np.exp(log_path[:, -1]),
+    }, index=pd.date_range('2020-01-01', periods=n, freq=freq))
+
+
+def test_ohlc_estimators():
+    """测试 1: OHLC 波动率估计量"""
+    print("\n" + "=" * 60)
+    print("测试 1: OHLC 波动率估计量")
+    print("=" * 60)
+
+    analyzer = VolatilityAnalyzer(verbose=False)
+    df = _make_ohlc(400)
+    window = 30
+    result = analyzer.calculate_ohlc_volatility(df, windows=[window, 90])
+    assert all(f'{prefix}_{w}d' in result.columns for prefix in OHLC_ESTIMATORS.values() for w in (window, 90))
+
+    # 与逐窗口计算一致
+    o, h, l, c = (np.log(df[f'market_{name}']) for name in ('Open', 'High', 'Low', 'Close'))
+    hl, co = h - l, c - o
+    parkinson = hl.rolling(window).apply(lambda x: np.sqrt(np.mean(x ** 2) / (4 * np.log(2))) * np.sqrt(252))
+    np.testing.assert_allclose(result[f'ParkinsonVol_{window}d'], parkinson, rtol=1e-9)
+    np.testing.assert_allclose(analyzer.calculate_parkinson_volatility(df)[f'ParkinsonVol_{window}d'], parkinson, rtol=1e-9)
+    gk = np.sqrt(0.5 * hl.rolling(window).apply(lambda x: np.mean(x ** 2))
+                 - (2 * np.log(2) - 1) * co.rolling(window).apply(lambda x: np.mean(x ** 2))) * np.sqrt(252)
+    np.testing.assert_allclose(analyzer.calculate_garman_klass_volatility(df)[f'GKVol_{window}d'], gk, rtol=1e-9)
+
+    rs_terms = ((h - c) * (h - o) + (l - c) * (l - o)).to_numpy()
+    overnight = (o - c.shift(1)).to_numpy()
+    k = 0.34 / (1.34 + (window + 1) / (window - 1))
+    for t in (window, 200, len(df) - 1):
+        rows = slice(t - window + 1, t + 1)
+        rs_var = rs_terms[rows].mean()
+        yz_var = overnight[rows].var(ddof=1) + k * co.to_numpy()[rows].var(ddof=1) + (1 - k) * rs_var
+        assert np.isclose(result[f'RSVol_{window}d'].iloc[t], np.sqrt(rs_var * 252))
+        assert np.isclose(result[f'YZVol_{window}d'].iloc[t], np.sqrt(yz_var * 252))
+    assert result[f'YZVol_{window}d'].iloc[:window].isna().all()
+
+    # 几何布朗运动：区间估计量接近日内波动率，Yang-Zhang 计入隔夜跳空
+    daily = result.iloc[window:].mean() / np.sqrt(252)
+    print(daily.filter(like=f'_{window}d').round(4).to_string())
+    for prefix in ('ParkinsonVol', 'GKVol', 'RSVol'):
+        assert abs(daily[f'{prefix}_{window}d'] - 0.02) < 0.003
+    assert abs(daily[f'YZVol_{window}d'] - np.sqrt(0.02 ** 2 + 0.005 ** 2)) < 0.003
+
+    # 分钟级长序列：全部估计量 × 多窗口
+    minute = _make_ohlc(200_000, sigma=0.001, gap=0.0, steps=5, freq='min')
+    start = time.perf_counter()
+    out = analyzer.calculate_ohlc_volatility(minute, windows=[30, 60, 240, 1440], periods_per_year=525600)
+    seconds = time.perf_counter() - start
+    print(f"{len(minute)} 根分钟K线 × 4 窗口 × 4 估计量: {seconds:.2f}s")
+    assert seconds < 5 and out['YZVol_1440d'].notna().sum() == len(minute) - 1440
+    print("✓ OHLC 波动率估计量测试通过")
+
+
+def _simulate_garch(n: int, omega: float = 0.05, alpha: float = 0.08, beta: float = 0.9,
+                    seed: int = 0) -> pd.DataFrame:
+    """GARCH(1,1) 日收益率（比例）"""
+    rng = np.random.default_rng(seed)
+    var = omega / (1 - alpha - beta)
+    returns = np.empty(n)
+    for t in range(n):
+        returns[t] = np.sqrt(var) * rng.standard_normal()
+        var = omega + alpha * returns[t] ** 2 + beta * var
+    return pd.DataFrame({'market_Return': returns / 100}, index=pd.date_range('2019-01-01', periods=n, freq='D'))
+
+
+def test_rolling_garch():
+    """测试 2: 滚动GARCH样本外预测"""
+    print("\n" + "=" * 60)
+    print("测试 2: 滚动GARCH")
+    print("=" * 60)
+
+    df = _simulate_garch(1200)
+    cache_path = os.path.join(tempfile.mkdtemp(), 'garch_params.json')
+    analyzer = VolatilityAnalyzer(verbose=False)
+    oos = analyzer.rolling_garch(df, min_train=500, step=50, processes=1, cache_path=cache_path)
+    assert len(oos) == 700 and oos.index[0] == df.index[500] and oos['forecast_volatility'].gt(0).all()
+    assert oos['window'].nunique() == len(analyzer.rolling_params) == 14
+    assert analyzer.rolling_params['converged'].all() and not analyzer.rolling_params['cached'].any()
+    params = analyzer.rolling_params.iloc[-1]
+    assert 0 < params['alpha[1]'] + params['beta[1]'] < 1
+
+    # 一步预测：t 时刻只用到 t-1 及之前的收益（改动窗口边界之后的数据，之前的预测不变）
+    boundary = 800
+    shocked = df.copy()
+    shocked.iloc[boundary:, 0] *= 3
+    shocked_oos = VolatilityAnalyzer(verbose=False).rolling_garch(shocked, min_train=500, step=50, processes=1)
+    cut = df.index[boundary]
+    pd.testing.assert_series_equal(oos.loc[:cut, 'forecast_volatility'], shocked_oos.loc[:cut, 'forecast_volatility'])
+    assert (oos.loc[cut:, 'forecast_volatility'].iloc[1:] != shocked_oos.loc[cut:, 'forecast_volatility'].iloc[1:]).all()
+
+    # 并行与顺序一致（冷启动），热启动收敛到相同参数
+    cold = VolatilityAnalyzer(verbose=False).rolling_garch(df, min_train=500, step=50, warm_start=False, processes=1)
+    parallel = VolatilityAnalyzer(verbose=False).rolling_garch(df, min_train=500, step=50, warm_start=False, processes=3)
+    pd.testing.assert_frame_equal(cold, parallel)
+    np.testing.assert_allclose(oos['forecast_volatility'], cold['forecast_volatility'], rtol=1e-3)
+
+    # 参数缓存：新对象从文件加载，全部命中，结果不变
+    reloaded = VolatilityAnalyzer(verbose=False)
+    start = time.perf_counter()
+    again = reloaded.rolling_garch(df, min_train=500, step=50, processes=1, cache_path=cache_path)
+    print(f"缓存命中重算: {time.perf_counter() - start:.2f}s, 首次逐窗口拟合 {analyzer.rolling_params['seconds'].sum():.2f}s")
+    assert reloaded.rolling_params['cached'].all()
+    pd.testing.assert_frame_equal(oos, again)
+
+    # 滚动窗口：每个窗口训练长度固定
+    rolling = VolatilityAnalyzer(verbose=False).rolling_garch(df, window=300, step=100, processes=1)
+    assert len(rolling) == 900 and rolling['window'].nunique() == 9
+
+    # 预测波动率跟随实际波动：|收益| 与预测正相关
+    corr = np.corrcoef(np.abs(oos['return']), oos['forecast_volatility'])[0, 1]
+    print(f"|收益| 与预测波动率相关系数: {corr:.2f}")
+    assert corr > 0
+    print("✓ 滚动GARCH测试通过")
+
+
+def test_garch_selection():
+    """测试 3: GARCH 族模型选择"""
+    print("\n" + "=" * 60)
+    print("测试 3: GARCH模型选择")
+    print("=" * 60)
+
+    df = _simulate_garch(1500, seed=1)
+    save_path = os.path.join(tempfile.mkdtemp(), 'garch_model.json')
+    analyzer = VolatilityAnalyzer(verbose=False, garch_path=save_path)
+    table = analyzer.select_garch(df, processes=2)
+    print(table.head(5)[['family', 'p', 'o', 'q', 'dist', 'aic', 'bic', 'qlike']].to_string(index=False))
+
+    # 3 个模型族 × 4 个阶数 × 3 个分布
+    assert len(table) == 36 and table['qlike'].notna().all()
+    assert set(table['family']) == {'GARCH', 'GJR', 'EGARCH'} and set(table['dist']) == {'normal', 't', 'skewt'}
+    assert table['qlike'].is_monotonic_increasing and table['rank_qlike'].iloc[0] == 1
+    assert table.loc[table['rank_bic'] == 1, 'bic'].iloc[0] == table['bic'].min()
+
+    # 最优模型设为 forecast_garch 使用的模型
+    best = table.iloc[0]
+    assert analyzer.garch_spec == {'vol': best['vol'], 'p': best['p'], 'o': best['o'], 'q': best['q'], 'dist': best['dist']}
+    forecast = analyzer.forecast_garch(horizon=5)
+    assert len(forecast) == 5 and forecast['forecast_volatility'].gt(0).all()
+
+    # 保存的模型加载后一步预测一致
+    loaded = VolatilityAnalyzer(verbose=False)
+    assert loaded.load_garch(df, save_path) and loaded.garch_spec == analyzer.garch_spec
+    assert np.isclose(loaded.forecast_garch(horizon=1)['forecast_volatility'].iloc[0],
+                      forecast['forecast_volatility'].iloc[0])
+
+    # 新对象的 full_analysis 读取保存的设定，而不是退回 GARCH(1,1)-normal
+    full = df.join(_make_ohlc(len(df), seed=1).set_axis(df.index)).assign(market_Volume=1e9)
+    results = VolatilityAnalyzer(verbose=False, garch_path=save_path).full_analysis(full)
+    fitted = results['garch_model']['model']
+    assert np.allclose(fitted.params, analyzer.garch_model.params)
+    assert len(results['forecast']) == 30
+    assert VolatilityAnalyzer(verbose=False, garch_path=None).load_garch_spec() is None
+
+    # 并行与顺序一致；按 BIC 选择
+    kwargs = dict(families=('GARCH', 'GJR'), orders=((1, 1),), dists=('normal', 't'), criterion='bic')
+    sequential = VolatilityAnalyzer(verbose=False, garch_path=None).select_garch(df, processes=1, **kwargs)
+    parallel = VolatilityAnalyzer(verbose=False, garch_path=None).select_garch(df, processes=2, **kwargs)
+    pd.testing.assert_frame_equal(sequential.drop(columns='seconds'), parallel.drop(columns='seconds'))
+    assert len(sequential) == 4 and sequential['bic'].is_monotonic_increasing
+    print("✓ GARCH模型选择测试通过")
+
+
+if __name__ == "__main__":
+    test_ohlc_estimators()
+    test_rolling_garch()
+    test_garch_selection()
+    print("\n✓ 所有测试通过")